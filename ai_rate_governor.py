@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Shared AI Rate Governor
+One call budget for every hosted-model client in every process: gunicorn
+workers, the scan scripts and the CLI tools all draw from the same daily and
+monthly quota and the same token bucket, kept in a single Mongo document
+(collection ai_usage, one document per governor name).
+
+    quota     calendar-day and calendar-month call counters (UTC); a lease is
+              granted only up to what is left, so limits hold across workers
+    rate      a token bucket (GCRA: one "theoretical arrival time") refilling
+              at rate calls/second with room for burst calls at once; a call
+              waits exactly until its token is due instead of a fixed sleep
+    lease     each process reserves lease calls per round trip and hands them
+              out locally, so most calls never touch Mongo; unused calls go
+              back to the pool after LEASE_TTL seconds or at exit
+
+Without MONGODB_URI (or when Mongo stops answering) the same arithmetic runs
+on an in-process backend, which is what the scripts had before.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = 'ai_usage'
+LEASE_TTL = 60.0          # seconds a process may sit on unused leased calls
+EXHAUSTED_BACKOFF = 30.0  # seconds to answer "no budget" locally after the pool ran dry
+
+
+def _periods(now: float) -> Tuple[str, str]:
+    moment = datetime.fromtimestamp(now, timezone.utc)
+    return moment.strftime('%Y-%m-%d'), moment.strftime('%Y-%m')
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+@dataclass
+class Grant:
+    granted: int        # calls reserved, 0 when a quota is used up
+    tat: float          # bucket's theoretical arrival time after the grant
+    day_count: int
+    month_count: int
+
+
+class MemoryQuotaBackend:
+    """Per-process quota and bucket (tests, scripts without Mongo, Mongo outages)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict] = {}
+
+    def lease(self, name: str, amount: int, daily_limit: int, monthly_limit: int,
+              interval: float, now: float) -> Grant:
+        day, month = _periods(now)
+        with self._lock:
+            state = self._state.setdefault(name, {'total': 0})
+            if state.get('day') != day:
+                state['day'], state['day_count'] = day, 0
+            if state.get('month') != month:
+                state['month'], state['month_count'] = month, 0
+            granted = max(0, min(amount, daily_limit - state['day_count'], monthly_limit - state['month_count']))
+            state['day_count'] += granted
+            state['month_count'] += granted
+            state['total'] += granted
+            state['tat'] = max(state.get('tat', now), now) + granted * interval
+            return Grant(granted, state['tat'], state['day_count'], state['month_count'])
+
+    def release(self, name: str, amount: int, day: str, month: str, interval: float) -> None:
+        with self._lock:
+            state = self._state.get(name)
+            if not state:
+                return
+            if state.get('day') == day:
+                state['day_count'] = max(0, state['day_count'] - amount)
+            if state.get('month') == month:
+                state['month_count'] = max(0, state['month_count'] - amount)
+            state['total'] = max(0, state['total'] - amount)
+            state['tat'] = state.get('tat', 0.0) - amount * interval
+
+    def usage(self, name: str, now: float) -> Dict:
+        day, month = _periods(now)
+        with self._lock:
+            state = dict(self._state.get(name, {}))
+        return {
+            'day_count': state.get('day_count', 0) if state.get('day') == day else 0,
+            'month_count': state.get('month_count', 0) if state.get('month') == month else 0,
+            'total': state.get('total', 0),
+        }
+
+
+class MongoQuotaBackend:
+    """Quota and bucket in one document, updated atomically with a pipeline update (MongoDB 4.2+)"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def lease(self, name: str, amount: int, daily_limit: int, monthly_limit: int,
+              interval: float, now: float) -> Grant:
+        from pymongo import ReturnDocument
+
+        day, month = _periods(now)
+        # Every field in a $set stage sees the document as it was before the
+        # stage, so rollover, grant and counters are three stages
+        day_count = {'$cond': [{'$eq': ['$day', day]}, {'$ifNull': ['$day_count', 0]}, 0]}
+        month_count = {'$cond': [{'$eq': ['$month', month]}, {'$ifNull': ['$month_count', 0]}, 0]}
+        pipeline = [
+            {'$set': {'day_count': day_count, 'month_count': month_count, 'day': day, 'month': month}},
+            {'$set': {'granted': {'$max': [0, {'$min': [
+                amount,
+                {'$subtract': [daily_limit, '$day_count']},
+                {'$subtract': [monthly_limit, '$month_count']},
+            ]}]}}},
+            {'$set': {
+                'day_count': {'$add': ['$day_count', '$granted']},
+                'month_count': {'$add': ['$month_count', '$granted']},
+                'total': {'$add': [{'$ifNull': ['$total', 0]}, '$granted']},
+                'tat': {'$add': [{'$max': [{'$ifNull': ['$tat', now]}, now]}, {'$multiply': ['$granted', interval]}]},
+                'updated_at': now,
+            }},
+        ]
+        doc = self.collection.find_one_and_update({'_id': name}, pipeline, upsert=True,
+                                                  return_document=ReturnDocument.AFTER)
+        return Grant(int(doc['granted']), float(doc['tat']), int(doc['day_count']), int(doc['month_count']))
+
+    def release(self, name: str, amount: int, day: str, month: str, interval: float) -> None:
+        def give_back(field_name: str, period_field: str, period: str):
+            return {'$cond': [{'$eq': [f'${period_field}', period]},
+                              {'$max': [0, {'$subtract': [f'${field_name}', amount]}]}, f'${field_name}']}
+
+        self.collection.update_one({'_id': name}, [{'$set': {
+            'day_count': give_back('day_count', 'day', day),
+            'month_count': give_back('month_count', 'month', month),
+            'total': {'$max': [0, {'$subtract': ['$total', amount]}]},
+            'tat': {'$subtract': ['$tat', amount * interval]},
+        }}])
+
+    def usage(self, name: str, now: float) -> Dict:
+        day, month = _periods(now)
+        doc = self.collection.find_one({'_id': name}) or {}
+        return {
+            'day_count': doc.get('day_count', 0) if doc.get('day') == day else 0,
+            'month_count': doc.get('month_count', 0) if doc.get('month') == month else 0,
+            'total': doc.get('total', 0),
+        }
+
+
+# ============================================================================
+# GOVERNOR
+# ============================================================================
+
+@dataclass
+class _Lease:
+    admit_at: Deque[float] = field(default_factory=deque)  # when each leased call may start
+    day: str = ''
+    month: str = ''
+    expires: float = 0.0
+
+
+class RateGovernor:
+    """Process-local front end to a shared call budget"""
+
+    def __init__(self, name: str, daily_limit: int, monthly_limit: int, rate: float = 1.0, burst: int = 5,
+                 lease: int = 5, max_wait: float = 30.0, backend=None,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self.daily_limit = int(daily_limit)
+        self.monthly_limit = int(monthly_limit)
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.burst = max(1, int(burst))
+        self.lease_size = max(1, int(lease))
+        self.max_wait = max_wait
+        self.backend = backend or MemoryQuotaBackend()
+        self.clock = clock
+        self.sleep = sleep
+        self._lease = _Lease()
+        self._lock = threading.Lock()
+        self._exhausted_until = 0.0
+        self.stats = {'acquired': 0, 'denied': 0, 'leases': 0, 'waited_seconds': 0.0}
+
+    def _call_backend(self, method: str, *args):
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception as e:
+            if isinstance(self.backend, MemoryQuotaBackend):
+                raise
+            logger.warning(f"⚠️ Shared AI quota unavailable ({e}); governing {self.name} in-process")
+            self.backend = MemoryQuotaBackend()
+            return getattr(self.backend, method)(*args)
+
+    def _refill(self, now: float) -> bool:
+        """Lease more calls from the shared pool; False when a quota is used up"""
+        self._give_back()
+        grant = self._call_backend('lease', self.name, self.lease_size, self.daily_limit, self.monthly_limit,
+                                   self.interval, now)
+        self.stats['leases'] += 1
+        if not grant.granted:
+            self._exhausted_until = now + EXHAUSTED_BACKOFF
+            return False
+        # Call j of the grant owns the bucket slot ending at tat - (granted-1-j)*interval
+        # and may start burst slots ahead of it
+        tolerance = self.burst * self.interval
+        first = grant.tat - grant.granted * self.interval
+        self._lease.admit_at.extend(first + (j + 1) * self.interval - tolerance for j in range(grant.granted))
+        self._lease.day, self._lease.month = _periods(now)
+        self._lease.expires = now + LEASE_TTL
+        return True
+
+    def _give_back(self) -> None:
+        unused = len(self._lease.admit_at)
+        if unused:
+            try:
+                self._call_backend('release', self.name, unused, self._lease.day, self._lease.month, self.interval)
+            except Exception as e:
+                logger.debug(f"Could not return {unused} leased calls: {e}")
+        self._lease = _Lease()
+
+    def acquire(self, max_wait: Optional[float] = None) -> bool:
+        """Take one call from the budget, waiting for the bucket if needed.
+
+        False (take the rule-based path) when the daily or monthly quota is
+        used up or the call could not start within max_wait seconds.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        with self._lock:
+            now = self.clock()
+            if now < self._exhausted_until:
+                self.stats['denied'] += 1
+                return False
+            if self._lease.admit_at and (now >= self._lease.expires or _periods(now) != (self._lease.day, self._lease.month)):
+                self._give_back()
+            if not self._lease.admit_at and not self._refill(now):
+                self.stats['denied'] += 1
+                logger.warning(f"🚫 {self.name} AI quota used up - using rule-based processing")
+                return False
+            wait = self._lease.admit_at[0] - now
+            if wait > max_wait:
+                self.stats['denied'] += 1
+                logger.info(f"⏳ {self.name} AI rate limit: next call in {wait:.1f}s, not waiting")
+                return False
+            self._lease.admit_at.popleft()
+            self.stats['acquired'] += 1
+        if wait > 0:
+            self.stats['waited_seconds'] += wait
+            self.sleep(wait)
+        return True
+
+    def available(self) -> bool:
+        """False while the pool is known to be used up (no round trip)"""
+        return self.clock() >= self._exhausted_until
+
+    def usage(self) -> Dict:
+        """Shared counters (calls leased by all processes, including unused leases)"""
+        now = self.clock()
+        usage = self._call_backend('usage', self.name, now)
+        usage.update({
+            'daily_limit': self.daily_limit,
+            'monthly_limit': self.monthly_limit,
+            'leased_unused': len(self._lease.admit_at),
+            'exhausted': now < self._exhausted_until,
+        })
+        return usage
+
+    def close(self) -> None:
+        with self._lock:
+            self._give_back()
+
+
+# ============================================================================
+# PROCESS-WIDE GOVERNORS
+# ============================================================================
+
+_governors: Dict[str, RateGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def _mongo_backend():
+    if not (os.getenv('MONGODB_URI') or os.getenv('MONGO_URI')):
+        return None
+    try:
+        from mongo_client import MongoDBClient
+        client = MongoDBClient()
+        if client.db is not None:
+            return MongoQuotaBackend(client.db[COLLECTION])
+    except Exception as e:
+        logger.warning(f"⚠️ MongoDB unavailable for the shared AI quota: {e}")
+    return None
+
+
+def get_rate_governor(name: str = 'huggingface') -> RateGovernor:
+    """Process-wide governor for one hosted-model budget, shared through Mongo when configured"""
+    governor = _governors.get(name)
+    if governor is None:
+        with _governors_lock:
+            governor = _governors.get(name)
+            if governor is None:
+                from config import Config
+                # Calls stop at the fallback threshold, as the per-client trackers did
+                threshold = getattr(Config, 'FALLBACK_TO_RULES_THRESHOLD', 0.8)
+                batch_delay = getattr(Config, 'AI_BATCH_DELAY', 1.0)
+                governor = RateGovernor(
+                    name,
+                    daily_limit=int(getattr(Config, 'HUGGINGFACE_DAILY_LIMIT', 200) * threshold),
+                    monthly_limit=int(getattr(Config, 'HUGGINGFACE_MONTHLY_LIMIT', 5000) * threshold),
+                    rate=getattr(Config, 'AI_RATE_PER_SECOND', 1.0 / batch_delay if batch_delay > 0 else 0.0),
+                    burst=getattr(Config, 'AI_RATE_BURST', 5),
+                    lease=getattr(Config, 'AI_GOVERNOR_LEASE', 5),
+                    max_wait=getattr(Config, 'AI_MAX_WAIT_SECONDS', 30.0),
+                    backend=_mongo_backend(),
+                )
+                atexit.register(governor.close)
+                _governors[name] = governor
+    return governor
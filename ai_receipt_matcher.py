@@ -460,15 +460,19 @@ class IntegratedAIReceiptMatcher:
             # Look for similar transactions in the last 6 months
             six_months_ago = datetime.now() - timedelta(days=180)
             
-            similar_transactions = list(self.mongo_client.db.bank_transactions.find({
-                'description': {'$regex': merchant_name, '$options': 'i'},
-                'amount': {'$gte': -(amount + 1), '$lte': -(amount - 1)},
-                'date': {'$gte': six_months_ago}
-            }).limit(10))
+            # Columnar scan: the regex runs once per distinct description, not per row
+            from transaction_snapshot import get_transaction_snapshot
+            snapshot = get_transaction_snapshot(self.mongo_client.db)
+            recent = snapshot.select(start_date=six_months_ago)
+            similar = recent.where(
+                recent.description_matches(merchant_name)
+                & (recent.amounts >= -(amount + 1))
+                & (recent.amounts <= -(amount - 1))
+            )
             
-            if len(similar_transactions) >= 2:
+            if len(similar) >= 2:
                 # Analyze date patterns
-                dates = sorted([t['date'] for t in similar_transactions])
+                dates = sorted(similar.dates[:10].tolist())
                 intervals = [(dates[i+1] - dates[i]).days for i in range(len(dates)-1)]
                 
                 # Check for monthly pattern (28-32 days)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+AI Response Cache
+Hosted-model answers for categorization and business-purpose analysis, keyed
+by what actually decides the answer rather than by the exact receipt:
+
+    merchant   upper-cased, card-processor prefixes, store numbers and
+               punctuation removed ("SQ *BLUE BOTTLE #4410" -> "BLUE BOTTLE")
+    amount     a log bucket about 25% wide, so a $4.85 and a $5.10 coffee share
+               an answer while a $5 and a $500 charge at one merchant do not
+    context    the business keywords found on the receipt, plus whatever the
+               call depends on (the category, for the purpose analysis)
+
+The same SaaS charge every month or the same coffee shop every week reaches a
+model once. Entries expire after AI_CACHE_TTL_DAYS and the least recently
+used are dropped past AI_CACHE_MAX_ENTRIES. They live in MongoDB
+(`ai_response_cache`) once configure_response_cache() attaches a database,
+with an in-process LRU in front; without MongoDB only the in-process tier
+exists.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bump when prompts or models change enough that old answers should not be reused
+RESPONSE_CACHE_VERSION = 1
+
+DEFAULT_TTL = float(os.getenv('AI_CACHE_TTL_DAYS', 45)) * 86400  # longer than a billing month
+MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 20000))
+MEMORY_ENTRIES = 1024
+AMOUNT_BUCKET_RATIO = 1.25
+TOUCH_INTERVAL = 3600.0  # seconds between last_used writes for one entry
+PRUNE_EVERY = 200        # MongoDB writes between LRU prunes
+
+# Square/Toast/Shopify prefixes only count with their '*'; the rest must be whole words
+# (so SPOTIFY and POSTMATES keep their names)
+_PROCESSOR_PREFIX = re.compile(
+    r'^(?:(?:SQ|TST|SP)\s*\*|(?:PAYPAL|VENMO|ZELLE|CHECKCARD|DEBIT CARD|CREDIT CARD|POS)\b\s*\*?)\s*')
+_NOISE = re.compile(r'[^A-Z ]+')
+# What receipts without a merchant normalize to; answers must never be keyed on these
+PLACEHOLDER_MERCHANTS = {'UNKNOWN', 'UNKNOWN MERCHANT', 'UNKNOWN VENDOR', 'MERCHANT', 'VENDOR',
+                         'N A', 'NA', 'NONE', 'NULL'}
+
+
+def normalize_merchant(merchant: Optional[str]) -> str:
+    name = _PROCESSOR_PREFIX.sub('', (merchant or '').upper().strip())
+    return ' '.join(_NOISE.sub(' ', name).split())
+
+
+def merchant_key(merchant: Optional[str]) -> Optional[str]:
+    """Canonical merchant name, None when there is no real merchant to key answers on"""
+    name = normalize_merchant(merchant)
+    return name if name and name not in PLACEHOLDER_MERCHANTS else None
+
+
+def amount_bucket(amount) -> int:
+    try:
+        amount = abs(float(amount))
+    except (TypeError, ValueError):
+        return -1
+    return int(math.floor(math.log(amount, AMOUNT_BUCKET_RATIO))) if amount >= 1 else 0
+
+
+def response_fingerprint(merchant: Optional[str], amount, context_terms: Iterable[str] = ()) -> Optional[str]:
+    """Stable key part for one (merchant, amount bucket, receipt context) combination; None without a merchant"""
+    name = merchant_key(merchant)
+    if name is None:
+        return None
+    terms = ','.join(sorted({t.lower() for t in context_terms if t}))
+    raw = f"{name}|{amount_bucket(amount)}|{terms}|v{RESPONSE_CACHE_VERSION}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:24]
+
+
+def response_key(kind: str, fingerprint: str, extra: str = '') -> str:
+    return f"{kind}:{fingerprint}:{extra}" if extra else f"{kind}:{fingerprint}"
+
+
+class _MongoStore:
+    def __init__(self, collection, max_entries: int):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.writes = 0
+        try:
+            self.collection.create_index('expires_at', expireAfterSeconds=0)
+            self.collection.create_index('last_used')
+        except Exception as e:
+            logger.warning(f"Could not index ai_response_cache: {e}")
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self.collection.find_one({'_id': key})
+        # The TTL monitor runs once a minute, so expiry is checked here too
+        if entry and entry['expires_at'] > datetime.utcnow():
+            return entry
+        return None
+
+    def touch(self, key: str):
+        self.collection.update_one({'_id': key}, {'$set': {'last_used': datetime.utcnow()}})
+
+    def put(self, key: str, kind: str, response: Dict, ttl: float):
+        now = datetime.utcnow()
+        self.collection.replace_one({'_id': key}, {
+            'kind': kind,
+            'response': response,
+            'created_at': now,
+            'last_used': now,
+            'expires_at': now + timedelta(seconds=ttl),
+        }, upsert=True)
+        self.writes += 1
+        if self.writes % PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        excess = self.collection.estimated_document_count() - self.max_entries
+        if excess > 0:
+            stale = [doc['_id'] for doc in self.collection.find({}, {'_id': 1}).sort('last_used', 1).limit(excess)]
+            self.collection.delete_many({'_id': {'$in': stale}})
+            logger.info(f"🧹 Dropped {len(stale)} least recently used AI responses")
+
+
+class ResponseCache:
+    """Model answers with a TTL, an in-process LRU and an optional MongoDB tier"""
+
+    def __init__(self, db=None, ttl: float = DEFAULT_TTL, max_entries: int = MAX_ENTRIES,
+                 memory_entries: int = MEMORY_ENTRIES, clock=time.time):
+        self.store = _MongoStore(db.ai_response_cache, max_entries) if db is not None else None
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.clock = clock
+        # key -> (response, expires_at, last written to the store)
+        self._memory: 'OrderedDict[str, Tuple[Dict, float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, response: Dict, expires_at: float, touched: float):
+        with self._lock:
+            self._memory[key] = (response, expires_at, touched)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = self.clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is not None:
+            response, expires_at, touched = entry
+            if self.store is not None and now - touched > TOUCH_INTERVAL:
+                # Keep the shared LRU order roughly current without a write per hit
+                try:
+                    self.store.touch(key)
+                    self._remember(key, response, expires_at, now)
+                except Exception as e:
+                    logger.debug(f"AI cache touch failed: {e}")
+        elif self.store is not None:
+            try:
+                stored = self.store.get(key)
+            except Exception as e:
+                logger.warning(f"AI cache lookup failed: {e}")
+                stored = None
+            if stored is not None:
+                response = stored['response']
+                expires_at = now + (stored['expires_at'] - datetime.utcnow()).total_seconds()
+                self._remember(key, response, expires_at, 0.0)
+                entry = (response, expires_at, 0.0)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(entry[0])
+
+    def put(self, key: str, response: Dict, kind: str = ''):
+        now = self.clock()
+        if self.store is not None:
+            try:
+                self.store.put(key, kind or key.split(':', 1)[0], dict(response), self.ttl)
+            except Exception as e:
+                logger.warning(f"AI cache write failed: {e}")
+        self._remember(key, dict(response), now + self.ttl, now)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'backend': 'mongodb' if self.store is not None else 'memory',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'memory_entries': len(self._memory)
+        }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache; in-process only until configure_response_cache attaches MongoDB"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def configure_response_cache(db=None, ttl: float = DEFAULT_TTL, max_entries: int = MAX_ENTRIES) -> ResponseCache:
+    """Replace the process-wide cache, e.g. with a MongoDB-backed one at startup"""
+    global _cache
+    with _cache_lock:
+        _cache = ResponseCache(db=db, ttl=ttl, max_entries=max_entries)
+    return _cache
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+AI Call Tracing
+One record per model call from every AI client: which client and model, the
+latency, request/response bytes, whether a cache answered, the outcome and
+the cost units it used (hosted calls count against the shared quota; local
+models and cache lookups cost nothing).
+
+    with trace_call('huggingface_client', 'bart-large-mnli', 'categorize', request_bytes=n) as call:
+        response = session.post(...)
+        call.response(response)
+
+Records go to an in-process ring buffer (recent calls with exact
+percentiles) and, once configure_ai_tracer() attaches MongoDB, to hourly
+rollups in `ai_call_rollups`. Rollups keep a latency histogram per model so
+p50/p95 can be combined across workers. /api/ai/metrics serves both.
+"""
+
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RING_SIZE = int(os.getenv('AI_TRACE_RING_SIZE', 5000))
+FLUSH_INTERVAL = 30.0  # seconds between rollup writes
+# Upper edges of the rollup latency histogram, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+SUCCESS_OUTCOMES = ('ok', 'empty')
+
+
+def payload_bytes(payload: Any) -> int:
+    """Size of a request body as it goes over the wire"""
+    if payload is None:
+        return 0
+    if isinstance(payload, (bytes, bytearray)):
+        return len(payload)
+    if isinstance(payload, str):
+        return len(payload.encode('utf-8'))
+    try:
+        return len(json.dumps(payload, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+@dataclass
+class CallTrace:
+    """What one call did; fields are filled in by the caller inside trace_call"""
+    client: str
+    model: str
+    operation: str = ''
+    request_bytes: int = 0
+    response_bytes: int = 0
+    cost_units: float = 1.0
+    cache: Optional[str] = None     # 'hit', 'miss' or None when no cache was involved
+    outcome: str = 'ok'
+    error: Optional[str] = None
+    latency: float = 0.0
+    at: float = 0.0
+
+    def response(self, response, streamed: bool = False) -> 'CallTrace':
+        """Take the outcome and size from an HTTP response (a streamed body is left unread)"""
+        if streamed:
+            self.response_bytes = int(getattr(response, 'headers', {}).get('Content-Length') or 0)
+        else:
+            content = getattr(response, 'content', None)
+            if isinstance(content, (bytes, bytearray)):
+                self.response_bytes = len(content)
+        status = getattr(response, 'status_code', 200)
+        if status == 429:
+            self.outcome = 'rate_limited'
+        elif status == 503:
+            self.outcome = 'unavailable'
+        elif status != 200:
+            self.outcome = f'http_{status}'
+        return self
+
+    def fail(self, outcome: str = 'error', error: Optional[str] = None) -> 'CallTrace':
+        self.outcome = outcome
+        self.error = error[:200] if error else None
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            'client': self.client, 'model': self.model, 'operation': self.operation,
+            'latency_ms': round(self.latency * 1000, 2), 'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes, 'cost_units': self.cost_units, 'cache': self.cache,
+            'outcome': self.outcome, 'error': self.error, 'at': self.at
+        }
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _histogram_percentile(histogram: List[int], q: float) -> float:
+    """Upper edge of the bucket holding the q-th call (the overflow bucket reports the last edge)"""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    running = 0
+    for i, count in enumerate(histogram):
+        running += count
+        if running >= q * total:
+            return float(LATENCY_BUCKETS_MS[min(i, len(LATENCY_BUCKETS_MS) - 1)])
+    return float(LATENCY_BUCKETS_MS[-1])
+
+
+class ModelCallTracer:
+    """Ring buffer of recent calls plus hourly MongoDB rollups"""
+
+    def __init__(self, db=None, ring_size: int = RING_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 clock=time.time):
+        self.collection = db.ai_call_rollups if db is not None else None
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.calls: deque = deque(maxlen=ring_size)
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._last_flush = clock()
+        if self.collection is not None:
+            try:
+                self.collection.create_index('hour')
+            except Exception as e:
+                logger.warning(f"Could not index ai_call_rollups: {e}")
+
+    def record(self, call: CallTrace):
+        call.at = call.at or self.clock()
+        latency_ms = call.latency * 1000
+        with self._lock:
+            self.calls.append(call.to_dict())
+            if self.collection is None:
+                return
+            hour = datetime.utcfromtimestamp(call.at).replace(minute=0, second=0, microsecond=0)
+            key = f"{hour:%Y%m%d%H}|{call.client}|{call.model}"
+            pending = self._pending.setdefault(key, {'hour': hour, 'client': call.client, 'model': call.model,
+                                                     'inc': {}})
+            inc = pending['inc']
+            for name, value in (('calls', 1), ('latency_ms_sum', latency_ms), ('request_bytes', call.request_bytes),
+                                ('response_bytes', call.response_bytes), ('cost_units', call.cost_units),
+                                (f'outcomes.{call.outcome}', 1),
+                                (f'latency_hist.{bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)}', 1)):
+                inc[name] = inc.get(name, 0) + value
+            if call.cache:
+                inc[f'cache_{call.cache}s'] = inc.get(f'cache_{call.cache}s', 0) + 1
+            due = call.at - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write pending rollup increments (one upsert per client/model/hour)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = self.clock()
+        if not pending or self.collection is None:
+            return
+        from pymongo import UpdateOne
+        try:
+            self.collection.bulk_write([
+                UpdateOne({'_id': key}, {'$inc': p['inc'],
+                                         '$setOnInsert': {'hour': p['hour'], 'client': p['client'], 'model': p['model']}},
+                          upsert=True)
+                for key, p in pending.items()
+            ], ordered=False)
+        except Exception as e:
+            logger.warning(f"AI call rollup write failed: {e}")
+
+    def metrics(self, window: float = 3600.0) -> List[Dict]:
+        """Per client/model figures for calls in the ring buffer, slowest total latency first"""
+        since = self.clock() - window
+        with self._lock:
+            calls = [c for c in self.calls if c['at'] >= since]
+        groups: Dict[tuple, List[Dict]] = {}
+        for call in calls:
+            groups.setdefault((call['client'], call['model']), []).append(call)
+
+        total_latency = sum(c['latency_ms'] for c in calls) or 1.0
+        rows = []
+        for (client, model), group in groups.items():
+            latencies = sorted(c['latency_ms'] for c in group)
+            outcomes: Dict[str, int] = {}
+            for call in group:
+                outcomes[call['outcome']] = outcomes.get(call['outcome'], 0) + 1
+            hits = sum(1 for c in group if c['cache'] == 'hit')
+            lookups = sum(1 for c in group if c['cache'])
+            rows.append({
+                'client': client,
+                'model': model,
+                'calls': len(group),
+                'errors': sum(n for outcome, n in outcomes.items() if outcome not in SUCCESS_OUTCOMES),
+                'outcomes': outcomes,
+                'cache_hit_rate': round(hits / lookups, 3) if lookups else None,
+                'p50_ms': round(_percentile(latencies, 0.5), 1),
+                'p95_ms': round(_percentile(latencies, 0.95), 1),
+                'max_ms': round(latencies[-1], 1),
+                'latency_share': round(sum(latencies) / total_latency, 3),
+                'request_bytes': sum(c['request_bytes'] for c in group),
+                'response_bytes': sum(c['response_bytes'] for c in group),
+                'cost_units': round(sum(c['cost_units'] for c in group), 3)
+            })
+        return sorted(rows, key=lambda r: -r['latency_share'])
+
+    def rollup(self, hours: int = 24) -> Optional[List[Dict]]:
+        """Per client/model figures across all workers from MongoDB (None without a database)"""
+        if self.collection is None:
+            return None
+        self.flush()
+        since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+        merged: Dict[tuple, Dict] = {}
+        for doc in self.collection.find({'hour': {'$gte': since}}):
+            row = merged.setdefault((doc['client'], doc['model']), {
+                'client': doc['client'], 'model': doc['model'], 'calls': 0, 'latency_ms_sum': 0.0,
+                'request_bytes': 0, 'response_bytes': 0, 'cost_units': 0.0, 'cache_hits': 0, 'cache_misses': 0,
+                'outcomes': {}, 'histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1)})
+            for name in ('calls', 'latency_ms_sum', 'request_bytes', 'response_bytes', 'cost_units',
+                         'cache_hits', 'cache_misses'):
+                row[name] += doc.get(name, 0)
+            for outcome, count in (doc.get('outcomes') or {}).items():
+                row['outcomes'][outcome] = row['outcomes'].get(outcome, 0) + count
+            for bucket, count in (doc.get('latency_hist') or {}).items():
+                row['histogram'][int(bucket)] += count
+
+        rows = []
+        for row in merged.values():
+            histogram = row.pop('histogram')
+            lookups = row['cache_hits'] + row['cache_misses']
+            row.update({
+                'errors': sum(n for outcome, n in row['outcomes'].items() if outcome not in SUCCESS_OUTCOMES),
+                'cache_hit_rate': round(row['cache_hits'] / lookups, 3) if lookups else None,
+                'mean_ms': round(row['latency_ms_sum'] / row['calls'], 1) if row['calls'] else 0.0,
+                'p50_ms': _histogram_percentile(histogram, 0.5),
+                'p95_ms': _histogram_percentile(histogram, 0.95),
+                'cost_units': round(row['cost_units'], 3)
+            })
+            rows.append(row)
+        return sorted(rows, key=lambda r: -r['latency_ms_sum'])
+
+
+_tracer: Optional[ModelCallTracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> ModelCallTracer:
+    """Process-wide tracer; ring buffer only until configure_ai_tracer attaches MongoDB"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = ModelCallTracer()
+    return _tracer
+
+
+def configure_ai_tracer(db=None, ring_size: int = RING_SIZE) -> ModelCallTracer:
+    """Replace the process-wide tracer, e.g. with a MongoDB-backed one at startup"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.flush()
+        _tracer = ModelCallTracer(db=db, ring_size=ring_size)
+    return _tracer
+
+
+@atexit.register
+def _flush_on_exit():
+    if _tracer is not None:
+        _tracer.flush()
+
+
+@contextmanager
+def trace_call(client: str, model: str, operation: str = '', request_bytes: int = 0, cost_units: float = 1.0,
+               cache: Optional[str] = None) -> Iterator[CallTrace]:
+    """Time a model call; exceptions are recorded (as 'timeout' or 'error') and re-raised"""
+    call = CallTrace(client, model, operation, request_bytes, cost_units=cost_units, cache=cache)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call.fail('timeout' if 'Timeout' in type(e).__name__ else 'error', str(e))
+        raise
+    finally:
+        call.latency = time.perf_counter() - started
+        try:
+            get_tracer().record(call)
+        except Exception as e:
+            logger.debug(f"AI call trace dropped: {e}")
+
+
+def record_cache_lookup(client: str, cache_name: str, hit: bool, operation: str = '', latency: float = 0.0):
+    """Cache lookups are traced like calls to a free, instant model"""
+    call = CallTrace(client, cache_name, operation, cost_units=0.0, cache='hit' if hit else 'miss',
+                     latency=latency)
+    get_tracer().record(call)
+
+
+def traced(client: str, model: str, operation: str = '', cost_units: float = 0.0) -> Callable:
+    """Decorator for local model calls; a None result is recorded as 'empty'"""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with trace_call(client, model, operation or fn.__name__, cost_units=cost_units) as call:
+                result = fn(*args, **kwargs)
+                if result is None:
+                    call.outcome = 'empty'
+                return result
+        return wrapper
+    return decorator
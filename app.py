@@ -30,6 +30,16 @@ load_dotenv()
 # MongoDB
 from bson import ObjectId
 
+# Shared list projections and fast JSON encoding
+from fast_json import json_response, TRANSACTION_LIST_PROJECTION, RECEIPT_LIST_PROJECTION
+from keyset_pagination import fetch_page, count_cache, InvalidCursor
+from merchant_category_table import configure_merchant_table, get_merchant_table
+from ai_response_cache import configure_response_cache, get_response_cache
+from ai_tracing import configure_ai_tracer, get_tracer
+from ocr_cache import configure_ocr_cache
+from model_registry import configure_model_registry, get_model_registry
+from transaction_snapshot import mark_transaction_matched
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -113,6 +123,8 @@ class Config:
     
     # AI Configuration
     HUGGINGFACE_API_KEY = os.getenv('HUGGINGFACE_API_KEY')
+    MODEL_WARMUP = [m for m in os.getenv('MODEL_WARMUP', '').split(',') if m.strip()]  # e.g. enhanced_receipt,hf_cloud
+    MODEL_IDLE_TTL_SECONDS = float(os.getenv('MODEL_IDLE_TTL_SECONDS', 1800))  # 0 keeps models loaded
     
     # Google Sheets Configuration
     GOOGLE_SHEETS_CREDENTIALS = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
@@ -271,6 +283,16 @@ def create_app():
     mongo_client = SafeMongoClient()
     teller_client = SafeTellerClient()
     
+    # Share OCR results and model answers across workers and restarts once the database is up
+    if mongo_client.connected:
+        configure_ocr_cache(db=mongo_client.db)
+        configure_response_cache(db=mongo_client.db)
+        configure_merchant_table(db=mongo_client.db)
+        configure_ai_tracer(db=mongo_client.db)
+    
+    # Shared processors/models: idle eviction plus optional warm-up for this worker
+    configure_model_registry(idle_ttl=Config.MODEL_IDLE_TTL_SECONDS, warm_up=Config.MODEL_WARMUP)
+    
     # Create upload directory
     upload_dir = getattr(Config, 'UPLOAD_FOLDER', './uploads') or './uploads'
     os.makedirs(upload_dir, exist_ok=True)
@@ -377,6 +399,28 @@ def create_app():
                 "timestamp": datetime.utcnow().isoformat()
             }), 500
     
+    @app.route('/api/ai/metrics')
+    def ai_metrics():
+        """Latency, outcomes, cache use and cost per AI model: recent calls on this worker plus all-worker rollups"""
+        try:
+            window = request.args.get('window', 60, type=int)  # minutes of this worker's recent calls
+            hours = request.args.get('hours', 24, type=int)    # hours of rollups across workers
+            tracer = get_tracer()
+            return json_response({
+                "window_minutes": window,
+                "recent": tracer.metrics(window * 60),
+                "rollup_hours": hours,
+                "rollup": tracer.rollup(hours),
+                "caches": {
+                    "responses": get_response_cache().stats(),
+                    "merchant_categories": get_merchant_table().stats()
+                },
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        except Exception as e:
+            logger.error(f"AI metrics failed: {e}")
+            return jsonify({"error": str(e)}), 500
+    
     @app.route('/api/storage/health')
     def storage_health():
         """Check R2 storage health"""
@@ -556,6 +600,10 @@ def create_app():
                 offset = int(offset)
             else:
                 offset = (page - 1) * page_size
+            # Continuation token from a previous response; when present the
+            # page is found by index seek instead of skipping `offset` rows
+            cursor = request.args.get('cursor')
+            total_mode = request.args.get('total', 'cached')
 
             # Convert dates
             start_dt = datetime.strptime(start_date, '%Y-%m-%d')
@@ -569,17 +617,17 @@ def create_app():
                 }
             }
             
-            # Get total count first
-            total_count = mongo_client.db.bank_transactions.count_documents(query)
+            # Total is cached briefly so paging does not re-count the range
+            total_count = count_cache.count(mongo_client.db.bank_transactions, query, mode=total_mode)
             
-            # Query transactions with pagination
-            transactions = list(mongo_client.db.bank_transactions.find(query).sort('date', -1).limit(limit).skip(offset))
+            # Query transactions with pagination - raw bank payloads stay in the database
+            transactions, next_cursor = fetch_page(
+                mongo_client.db.bank_transactions, query, sort_field='date', limit=limit,
+                cursor=cursor, projection=TRANSACTION_LIST_PROJECTION, skip=offset
+            )
             
             # Process transactions to enhance descriptions and ensure proper fields
             for transaction in transactions:
-                # Ensure _id is string
-                transaction['_id'] = str(transaction['_id'])
-                
                 # Ensure merchant field exists - use description if merchant is missing
                 if not transaction.get('merchant') and transaction.get('description'):
                     transaction['merchant'] = transaction['description']
@@ -601,19 +649,23 @@ def create_app():
                 # Check receipt status
                 transaction['has_receipt'] = bool(transaction.get('receipt_id'))
             
-            return jsonify({
+            return json_response({
                 'success': True,
                 'transactions': transactions,
                 'total': total_count,  # Return total count from database
                 'page': page,
                 'page_size': page_size,
-                'total_pages': (total_count + page_size - 1) // page_size,
+                'total_pages': (total_count + page_size - 1) // page_size if total_count is not None else None,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
                 'date_range': {
                     'start': start_date,
                     'end': end_date
                 }
             })
             
+        except InvalidCursor as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             app.logger.error(f"Error fetching transactions: {str(e)}")
             return jsonify({
@@ -963,7 +1015,7 @@ def create_app():
                 
                 # Get data to export
                 if export_type == 'transactions' or export_type == 'all':
-                    transactions = list(mongo_client.db.bank_transactions.find().sort("date", -1))
+                    transactions = list(mongo_client.db.bank_transactions.find({}, TRANSACTION_LIST_PROJECTION).sort("date", -1))
                 else:
                     transactions = []
                 
@@ -1111,12 +1163,11 @@ def create_app():
     def api_enhanced_receipt_processing():
         """Enhanced receipt processing endpoint with improved algorithms"""
         try:
-            from receipt_processor import EnhancedReceiptProcessor
             from datetime import datetime
             import os
             
-            # Initialize enhanced processor
-            processor = EnhancedReceiptProcessor()
+            # Shared enhanced processor
+            processor = get_model_registry().get('enhanced_receipt')
             
             # Get request parameters
             data = request.get_json() if request.is_json else {}
@@ -1302,12 +1353,11 @@ def create_app():
     def api_process_single_receipt():
         """Process a single receipt file with enhanced algorithms"""
         try:
-            from receipt_processor import EnhancedReceiptProcessor
             from werkzeug.utils import secure_filename
             import os
             
-            # Initialize processor
-            processor = EnhancedReceiptProcessor()
+            # Shared processor
+            processor = get_model_registry().get('enhanced_receipt')
             
             # Check if file was uploaded
             if 'receipt_file' not in request.files:
@@ -1487,6 +1537,8 @@ def create_app():
                         }}
                     )
                     
+                    if transaction_update.modified_count > 0:
+                        mark_transaction_matched(match.transaction_id)
                     if transaction_update.modified_count > 0 and receipt_update.modified_count > 0:
                         saved_count += 1
                         
@@ -1589,6 +1641,22 @@ def create_app():
             filename = f"hf_receipt_{timestamp}_{file.filename}"
             filepath = os.path.join(upload_folder, filename)
             file.save(filepath)
+            
+            # Check photo quality before spending API quota on it
+            if request.form.get('skip_quality_check', 'false').lower() != 'true' and \
+                    os.path.splitext(filename)[1].lower() in ('.jpg', '.jpeg', '.png', '.webp', '.bmp'):
+                from receipt_image_pipeline import assess_receipt_image
+                with open(filepath, 'rb') as f:
+                    _, quality = assess_receipt_image(f.read())
+                if quality.retake:
+                    os.remove(filepath)
+                    logger.info(f"📸 Retake requested for {filename}: {', '.join(quality.reasons)}")
+                    return jsonify({
+                        "status": "retake_required",
+                        "message": f"Photo quality too low to read reliably ({', '.join(quality.reasons)}); please retake it",
+                        "quality": quality.to_dict()
+                    }), 422
+            
             logger.info(f"🤗 Processing receipt with HuggingFace: {filename}")
             logger.info(f"   Model: {model_name}")
             logger.info(f"   API Token: {'✅ Configured' if api_token else '❌ Missing'}")
@@ -1791,22 +1859,11 @@ def create_app():
             limit = int(request.args.get('limit', 25))
             skip = (page - 1) * limit
             
-            receipts = list(mongo_client.db.receipts.find().sort("date", -1).skip(skip).limit(limit))
+            receipts = list(mongo_client.db.receipts.find({}, RECEIPT_LIST_PROJECTION).sort("date", -1).skip(skip).limit(limit))
             
-            # Convert ObjectId to string
-            for receipt in receipts:
-                receipt['_id'] = str(receipt['_id'])
-                if receipt.get('date'):
-                    # Handle both datetime objects and strings
-                    if hasattr(receipt['date'], 'isoformat'):
-                        receipt['date'] = receipt['date'].isoformat()
-                    elif isinstance(receipt['date'], str):
-                        # Already a string, keep as is
-                        pass
+            total = count_cache.count(mongo_client.db.receipts, {}, mode='estimated')
             
-            total = mongo_client.db.receipts.count_documents({})
-            
-            return jsonify({
+            return json_response({
                 "success": True,
                 "receipts": receipts,
                 "total": total,
@@ -1828,27 +1885,27 @@ def create_app():
             page = int(request.args.get('page', 1))
             limit = int(request.args.get('limit', 25))
             skip = (page - 1) * limit
+            cursor = request.args.get('cursor')
             
-            transactions = list(mongo_client.db.bank_transactions.find(
-                {}, {"raw_data": 0}
-            ).sort("date", -1).skip(skip).limit(limit))
-            
-            # Convert ObjectId to string
-            for txn in transactions:
-                txn['_id'] = str(txn['_id'])
-                if txn.get('date'):
-                    txn['date'] = txn['date'].isoformat()
+            transactions, next_cursor = fetch_page(
+                mongo_client.db.bank_transactions, {}, sort_field='date', limit=limit,
+                cursor=cursor, projection=TRANSACTION_LIST_PROJECTION, skip=skip
+            )
             
-            total = mongo_client.db.bank_transactions.count_documents({})
+            total = count_cache.count(mongo_client.db.bank_transactions, {},
+                                      mode=request.args.get('total', 'estimated'))
             
-            return jsonify({
+            return json_response({
                 "success": True,
                 "transactions": transactions,
                 "total": total,
                 "page": page,
                 "limit": limit,
-                "has_more": total > skip + limit
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
             })
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             logger.error(f"Bank transactions API error: {e}")
             return jsonify({"error": str(e)}), 500
@@ -2027,7 +2084,7 @@ def create_app():
 
     @app.route('/api/upload-csv', methods=['POST'])
     def api_upload_csv():
-        """Upload CSV file for processing"""
+        """Stream-import a bank CSV export into bank_transactions"""
         try:
             if 'csv_file' not in request.files:
                 return jsonify({"error": "No CSV file provided"}), 400
@@ -2036,35 +2093,34 @@ def create_app():
             if file.filename == '':
                 return jsonify({"error": "No file selected"}), 400
             
-            # Save and process CSV
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"upload_{timestamp}_{file.filename}"
-            filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
-            file.save(filepath)
+            if not mongo_client.connected:
+                return jsonify({"error": "Database not connected"}), 500
             
-            # Process CSV (placeholder implementation)
-            processed_count = 0
+            from csv_import_engine import CSVImportEngine
             
-            try:
-                # Basic CSV processing
-                import csv
-                with open(filepath, 'r') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    for row in reader:
-                        # Process each row
-                        processed_count += 1
-                
-                os.remove(filepath)
-                
-                return jsonify({
-                    "success": True,
-                    "message": f"CSV processed successfully",
-                    "processed_rows": processed_count
-                })
-            except Exception as e:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                raise e
+            # Non-numeric input falls back to the default; keep batches between 1 and 10k rows
+            batch_size = request.form.get('batch_size', 1000, type=int) or 1000
+            engine = CSVImportEngine(
+                mongo_client.db,
+                batch_size=max(1, min(batch_size, 10000))
+            )
+            
+            # Parse straight from the upload stream - nothing is written to disk
+            summary = engine.import_file(
+                file.stream,
+                bank_format=request.form.get('bank_format'),
+                user_id=request.form.get('user_id'),
+                account_name=request.form.get('account_name'),
+                progress_callback=lambda p: logger.info(
+                    f"📥 CSV import {p.job_id}: batch {p.batches}, {p.inserted} inserted, {p.duplicates} duplicates"
+                )
+            )
+            
+            return jsonify({
+                "success": True,
+                "message": f"Imported {summary['inserted']} new transactions ({summary['duplicates']} duplicates skipped)",
+                **summary
+            })
                 
         except Exception as e:
             logger.error(f"CSV upload error: {e}")
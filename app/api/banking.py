@@ -8,6 +8,8 @@ import logging
 import requests
 from urllib.parse import urlencode
 
+from transaction_snapshot import invalidate_transaction_snapshots
+
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('banking', __name__, url_prefix='/api/banking')
@@ -200,6 +202,8 @@ def teller_webhook():
                         {"$set": bank_transaction},
                         upsert=True
                     )
+                    # The upsert can change category without moving a snapshot watermark
+                    invalidate_transaction_snapshots()
                     
                     logger.info(f"✅ Stored transaction {bank_transaction['transaction_id']} from webhook")
         
@@ -9,6 +9,8 @@ import os
 import logging
 from datetime import datetime
 
+from fast_json import json_response, TRANSACTION_LIST_PROJECTION
+
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('dashboard', __name__, url_prefix='/api')
@@ -99,17 +101,9 @@ def get_transactions():
         
         # Get paginated results
         skip = (page - 1) * page_size
-        transactions = list(current_app.mongo_service.client.db.transactions.find(query).skip(skip).limit(page_size))
-        
-        # Convert ObjectId to string
-        for transaction in transactions:
-            if '_id' in transaction:
-                transaction['_id'] = str(transaction['_id'])
-            if 'date' in transaction:
-                if isinstance(transaction['date'], datetime):
-                    transaction['date'] = transaction['date'].isoformat()
+        transactions = list(current_app.mongo_service.client.db.transactions.find(query, TRANSACTION_LIST_PROJECTION).skip(skip).limit(page_size))
         
-        return jsonify({
+        return json_response({
             'transactions': transactions,
             'pagination': {
                 'page': page,
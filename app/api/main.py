@@ -8,6 +8,8 @@ import jwt
 import os
 import logging
 
+from fast_json import json_response
+
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('main', __name__)
@@ -76,7 +78,7 @@ def transactions():
             search=search
         )
         
-        return jsonify(result), 200
+        return json_response(result, 200)
         
     except Exception as e:
         logger.error(f"Get transactions error: {e}")
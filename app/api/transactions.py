@@ -4,9 +4,10 @@ Transactions API endpoints
 
 from flask import Blueprint, request, jsonify, current_app
 from bson.objectid import ObjectId
-from datetime import datetime
 import logging
 
+from fast_json import json_response
+
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('transactions', __name__, url_prefix='/api/transactions')
@@ -28,6 +29,7 @@ def get_transactions():
         date_to = request.args.get('date_to')
         category = request.args.get('category')
         search = request.args.get('search')
+        search_mode = request.args.get('search_mode', 'exact')
         
         # Use transaction service
         result = current_app.transaction_service.get_transactions(
@@ -36,28 +38,11 @@ def get_transactions():
             date_from=date_from,
             date_to=date_to,
             category=category,
-            search=search
+            search=search,
+            search_mode=search_mode
         )
         
-        # In the list transactions endpoint (not just get_transaction)
-        # After fetching transactions from the database:
-        for tx in result['transactions']:
-            if '_id' in tx:
-                tx['_id'] = str(tx['_id'])
-            for date_field in ['transaction_date', 'date', 'created_at', 'updated_at', 'bank_synced_at']:
-                if date_field in tx and tx[date_field]:
-                    if isinstance(tx[date_field], datetime):
-                        tx[date_field] = tx[date_field].isoformat()
-            if 'raw_bank_data' in tx and tx['raw_bank_data']:
-                raw_data = tx['raw_bank_data']
-                if isinstance(raw_data, dict):
-                    for key, value in raw_data.items():
-                        if isinstance(value, datetime):
-                            raw_data[key] = value.isoformat()
-                        if key == '_id' and hasattr(value, '__str__'):
-                            raw_data[key] = str(value)
-        
-        return jsonify(result), 200
+        return json_response(result, 200)
         
     except Exception as e:
         logger.error(f"Get transactions error: {e}")
@@ -65,21 +50,13 @@ def get_transactions():
 
 @bp.route('/<transaction_id>', methods=['GET'])
 def get_transaction(transaction_id):
-    """Get a specific transaction"""
+    """Get a specific transaction, including its raw bank payload"""
     try:
         transaction = current_app.mongo_service.client.db.transactions.find_one({'_id': ObjectId(transaction_id)})
         if not transaction:
             return jsonify({'error': 'Transaction not found'}), 404
         
-        if '_id' in transaction:
-            transaction['_id'] = str(transaction['_id'])
-        if transaction.get('receipt_id'):
-            transaction['receipt_id'] = str(transaction['receipt_id'])
-        if 'date' in transaction:
-            if isinstance(transaction['date'], datetime):
-                transaction['date'] = transaction['date'].isoformat()
-        
-        return jsonify(transaction), 200
+        return json_response(transaction, 200)
         
     except Exception as e:
         logger.error(f"Get transaction error: {e}")
@@ -27,9 +27,9 @@ class AIService:
                 return self._fallback_extraction()
             
             # Use HuggingFace for receipt processing
-            from huggingface_receipt_processor import HuggingFaceReceiptProcessor
+            from huggingface_receipt_processor import create_huggingface_processor
             
-            processor = HuggingFaceReceiptProcessor()
+            processor = create_huggingface_processor(api_token=self.hf_api_key)
             result = processor.process_receipt(file_data)
             
             if result and result.get('success'):
@@ -95,7 +95,7 @@ class BankService:
         # Mark as matched
         merged['csv_matched'] = True
         merged['csv_transaction_id'] = csv_tx.get('transaction_id')
-        merged['matched_at'] = datetime.now()
+        merged['matched_at'] = datetime.utcnow()
         
         return merged
     
@@ -151,9 +151,10 @@ class BankService:
                                 tx['user_id'] = user_id
                                 tx['token_id'] = token_record.get('_id')
                                 tx['account_id'] = account_id
+                                tx['transaction_id'] = tx.get('id')  # Key the existing-row lookup below uses
                                 tx['account_name'] = account.get('name')
                                 tx['institution_name'] = account.get('institution', {}).get('name')
-                                tx['imported_at'] = datetime.now()
+                                tx['imported_at'] = datetime.utcnow()
                                 tx['source'] = 'teller'
                                 
                                 # Check if transaction already exists (exact match)
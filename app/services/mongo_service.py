@@ -8,6 +8,8 @@ from pymongo import MongoClient
 from ..config import Config
 from datetime import datetime
 
+from fast_json import TRANSACTION_LIST_PROJECTION, RECEIPT_LIST_PROJECTION
+
 logger = logging.getLogger(__name__)
 
 class MongoService:
@@ -141,7 +143,7 @@ class SafeMongoClient:
             if not self.connected:
                 return []
             
-            cursor = self.db.receipts.find().sort('processed_at', -1).skip(skip).limit(limit)
+            cursor = self.db.receipts.find({}, RECEIPT_LIST_PROJECTION).sort('processed_at', -1).skip(skip).limit(limit)
             return list(cursor)
         except Exception as e:
             logger.error(f"Error getting receipts: {e}")
@@ -166,7 +168,7 @@ class SafeMongoClient:
             if not self.connected:
                 return []
             
-            cursor = self.db.bank_transactions.find().sort('date', -1).skip(skip).limit(limit)
+            cursor = self.db.bank_transactions.find({}, TRANSACTION_LIST_PROJECTION).sort('date', -1).skip(skip).limit(limit)
             return list(cursor)
         except Exception as e:
             logger.error(f"Error getting transactions: {e}")
@@ -9,6 +9,9 @@ from typing import Dict, Optional, List
 from ..utils.validators import validate_upload
 from ..config import Config
 
+from fast_json import RECEIPT_LIST_PROJECTION
+from keyset_pagination import fetch_page, count_cache
+
 logger = logging.getLogger(__name__)
 
 class ReceiptService:
@@ -107,23 +110,36 @@ class ReceiptService:
             logger.error(f"Error getting receipt stats: {e}")
             return {'total': 0, 'processed': 0, 'unprocessed': 0}
     
-    def get_receipts(self, limit: int = 50, skip: int = 0) -> List[Dict]:
+    def get_receipts(self, limit: int = 50, skip: int = 0, cursor: Optional[str] = None) -> List[Dict]:
         """Get receipts with pagination"""
+        return self.get_receipts_page(limit=limit, skip=skip, cursor=cursor, total_mode='none')['receipts']
+    
+    def get_receipts_page(self, limit: int = 50, skip: int = 0, cursor: Optional[str] = None,
+                          total_mode: str = 'estimated') -> Dict:
+        """Get one page of receipts plus the continuation token for the next"""
+        empty = {'receipts': [], 'next_cursor': None, 'total': 0}
         try:
             if not self.db or not self.db.client.connected:
-                return []
+                return empty
             
-            cursor = self.db.client.db.receipts.find().sort('processed_at', -1).skip(skip).limit(limit)
-            receipts = list(cursor)
+            collection = self.db.client.db.receipts
+            receipts, next_cursor = fetch_page(
+                collection, {}, sort_field='processed_at', limit=limit,
+                cursor=cursor, projection=RECEIPT_LIST_PROJECTION, skip=skip
+            )
             
             # Convert ObjectId to string
             for receipt in receipts:
                 receipt['_id'] = str(receipt['_id'])
             
-            return receipts
+            return {
+                'receipts': receipts,
+                'next_cursor': next_cursor,
+                'total': count_cache.count(collection, {}, mode=total_mode)
+            }
         except Exception as e:
             logger.error(f"Error getting receipts: {e}")
-            return []
+            return empty
     
     def get_receipt(self, receipt_id: str) -> Optional[Dict]:
         """Get a specific receipt by ID"""
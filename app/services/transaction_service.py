@@ -7,8 +7,13 @@ from datetime import datetime
 from typing import Dict, List, Optional
 from bson import ObjectId
 
+from fast_json import TRANSACTION_LIST_PROJECTION
+
 logger = logging.getLogger(__name__)
 
+# Ranked (search_mode=semantic) results are cut off at this many hits
+SEMANTIC_SEARCH_LIMIT = 200
+
 class TransactionService:
     """Service for managing transactions and syncing from bank data"""
     
@@ -77,15 +82,21 @@ class TransactionService:
             'business_type': 'personal',
             'receipt_url': None,
             'notes': '',
-            'created_at': datetime.now(),
-            'updated_at': datetime.now(),
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
             'bank_transaction_id': bank_tx.get('id'),
             'raw_bank_data': bank_tx
         }
     
     def get_transactions(self, page: int = 1, page_size: int = 50, date_from: str = None, 
-                        date_to: str = None, category: str = None, search: str = None) -> Dict:
-        """Get transactions with pagination and filtering"""
+                        date_to: str = None, category: str = None, search: str = None,
+                        search_mode: str = 'exact') -> Dict:
+        """Get transactions with pagination and filtering
+
+        search_mode='exact' matches merchant, description and category by
+        regex; 'semantic' ranks by similarity through the semantic index and
+        falls back to the exact search until an index has been built.
+        """
         try:
             if not self.db or not hasattr(self.db, 'client') or not self.db.client:
                 return {"success": False, "error": "Database not connected"}
@@ -124,6 +135,11 @@ class TransactionService:
             if category:
                 query['category'] = category
             
+            if search and search_mode == 'semantic':
+                ranked = self._semantic_search(query, search, page, page_size)
+                if ranked is not None:
+                    return ranked
+            
             if search:
                 search_query = {'$or': [
                     {'merchant': {'$regex': search, '$options': 'i'}},
@@ -142,31 +158,12 @@ class TransactionService:
             
             # Get paginated results
             skip = (page - 1) * page_size
-            transactions = list(self.db.client.db.transactions.find(query)
+            transactions = list(self.db.client.db.transactions.find(query, TRANSACTION_LIST_PROJECTION)
                               .sort('transaction_date', -1)
                               .skip(skip)
                               .limit(page_size))
             
-            # Convert ObjectId to string for JSON serialization
-            for tx in transactions:
-                if '_id' in tx:
-                    tx['_id'] = str(tx['_id'])
-                # Handle date fields
-                for date_field in ['transaction_date', 'date', 'created_at', 'updated_at', 'bank_synced_at']:
-                    if date_field in tx and tx[date_field]:
-                        if isinstance(tx[date_field], datetime):
-                            tx[date_field] = tx[date_field].isoformat()
-                # Handle raw_bank_data datetime fields and ObjectId
-                if 'raw_bank_data' in tx and tx['raw_bank_data']:
-                    raw_data = tx['raw_bank_data']
-                    if isinstance(raw_data, dict):
-                        for key, value in raw_data.items():
-                            if isinstance(value, datetime):
-                                raw_data[key] = value.isoformat()
-                            if key == '_id' and hasattr(value, '__str__'):
-                                raw_data[key] = str(value)
-            
-            # Ensure the return value is serializable
+            # ObjectId/datetime values are encoded by fast_json at the response layer
             return {
                 'transactions': transactions,
                 'pagination': {
@@ -181,6 +178,39 @@ class TransactionService:
             logger.error(f"Get transactions error: {e}")
             return {"success": False, "error": str(e)}
     
+    def _semantic_search(self, query: Dict, search: str, page: int, page_size: int) -> Optional[Dict]:
+        """Transactions ranked by similarity to the search text, best first; None without an index"""
+        from semantic_index import document_ids, get_semantic_index, search_fresh
+        
+        index = get_semantic_index()
+        if index is None:
+            return None
+        
+        db = self.db.client.db
+        hits = search_fresh(db, index, search, k=SEMANTIC_SEARCH_LIMIT, collections=['transactions'])
+        scores = {hit.id: hit.score for hit in hits}
+        
+        # The other filters stay exact; only the text match is ranked
+        id_query = {'_id': {'$in': document_ids(hits)}}
+        transactions = list(db.transactions.find({'$and': [query, id_query]} if query else id_query,
+                                                 TRANSACTION_LIST_PROJECTION))
+        transactions.sort(key=lambda tx: -scores[str(tx['_id'])])
+        for tx in transactions:
+            tx['search_score'] = round(scores[str(tx['_id'])], 3)
+        
+        total = len(transactions)
+        skip = (page - 1) * page_size
+        return {
+            'transactions': transactions[skip:skip + page_size],
+            'search_mode': 'semantic',
+            'pagination': {
+                'page': page,
+                'page_size': page_size,
+                'total': total,
+                'pages': (total + page_size - 1) // page_size
+            }
+        }
+    
     def update_transaction(self, transaction_id: str, updates: Dict) -> Dict:
         """Update a transaction"""
         try:
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Batch OCR Engine
+Fans receipts out across CPU cores: R2 downloads run on a thread pool while
+tesseract / PDF text extraction and field parsing run in worker processes.
+Results are yielded in completion order with per-item timings.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DOWNLOAD_WORKERS = 8
+
+# Set in each worker process by _init_worker
+_WORKER_PROCESSOR = None
+
+
+def _init_worker(processor_class):
+    """Build one processor per worker process"""
+    global _WORKER_PROCESSOR
+    # Tesseract is single-threaded per page; stop OpenMP from oversubscribing
+    # cores the pool is already using
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    _WORKER_PROCESSOR = processor_class()
+
+
+def _ocr_with(processor, filename: str, content: bytes) -> Dict:
+    """Text extraction plus parsing for one attachment, with timings"""
+    started = time.perf_counter()
+    text = processor.extract_text(filename, content)
+    ocr_done = time.perf_counter()
+    if not text:
+        return {'extracted': None, 'ocr_seconds': ocr_done - started, 'parse_seconds': 0.0,
+                'error': 'No text extracted', 'worker_pid': os.getpid()}
+    extracted = processor.parse_text(text)
+    return {'extracted': extracted, 'ocr_seconds': ocr_done - started,
+            'parse_seconds': time.perf_counter() - ocr_done, 'error': None, 'worker_pid': os.getpid()}
+
+
+def _ocr_worker(filename: str, content: bytes) -> Dict:
+    return _ocr_with(_WORKER_PROCESSOR, filename, content)
+
+
+@dataclass
+class BatchOCRResult:
+    """One receipt's outcome; `index` is its position in the input batch"""
+    index: int
+    receipt: Dict
+    success: bool = False
+    error: Optional[str] = None
+    timing: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:
+        return {
+            'index': self.index,
+            'receipt_id': str(self.receipt.get('_id')),
+            'success': self.success,
+            'error': self.error,
+            'timing': self.timing
+        }
+
+
+@dataclass
+class _InFlight:
+    index: int
+    receipt: Dict
+    submitted_at: float
+    download_seconds: float = 0.0
+    ocr_submitted_at: float = 0.0
+
+
+class BatchOCREngine:
+    """Download/OCR pipeline around a ReceiptOCRProcessor"""
+
+    def __init__(self, processor, max_workers: Optional[int] = None,
+                 download_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+                 max_in_flight: Optional[int] = None, use_processes: bool = True):
+        self.processor = processor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.download_workers = download_workers
+        # Bounds how many downloaded files sit in memory waiting for a core
+        self.max_in_flight = max_in_flight or self.max_workers * 3 + download_workers
+        self.use_processes = use_processes
+
+    def _create_ocr_pool(self):
+        if self.use_processes:
+            # spawn: forking while download threads are running is unsafe
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(type(self.processor),)
+            )
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ocr')
+
+    def _submit_ocr(self, pool, filename: str, content: bytes):
+        if self.use_processes:
+            return pool.submit(_ocr_worker, filename, content)
+        return pool.submit(_ocr_with, self.processor, filename, content)
+
+    def _finish(self, item: _InFlight, payload: Optional[Dict] = None,
+                error: Optional[str] = None) -> BatchOCRResult:
+        now = time.perf_counter()
+        receipt = item.receipt
+        timing = {'download': round(item.download_seconds, 4)}
+        if payload:
+            error = error or payload.get('error')
+            timing['queued'] = round(max(0.0, now - item.ocr_submitted_at
+                                         - payload['ocr_seconds'] - payload['parse_seconds']), 4)
+            timing['ocr'] = round(payload['ocr_seconds'], 4)
+            timing['parse'] = round(payload['parse_seconds'], 4)
+            if payload.get('extracted'):
+                receipt.update(payload['extracted'])
+        timing['total'] = round(now - item.submitted_at, 4)
+        receipt['ocr_timing'] = timing
+        if '_id' in receipt:
+            receipt['_id'] = str(receipt['_id'])
+        return BatchOCRResult(index=item.index, receipt=receipt, success=error is None,
+                              error=error, timing=timing)
+
+    def process(self, receipts: Iterable[Dict],
+                progress_callback: Optional[Callable[[BatchOCRResult, int, int], None]] = None
+                ) -> Iterator[BatchOCRResult]:
+        """Yield a BatchOCRResult per receipt as soon as it finishes"""
+        receipts = list(receipts)
+        total = len(receipts)
+        if not total:
+            return
+
+        started = time.perf_counter()
+        queue = iter(enumerate(receipts))
+        ready = deque()
+        pending = {}
+        completed = 0
+
+        with ThreadPoolExecutor(max_workers=self.download_workers, thread_name_prefix='ocr-download') as downloads, \
+                self._create_ocr_pool() as ocr_pool:
+
+            def fill():
+                while len(pending) < self.max_in_flight:
+                    item = next(queue, None)
+                    if item is None:
+                        return
+                    index, receipt = item
+                    state = _InFlight(index, receipt, submitted_at=time.perf_counter())
+                    r2_urls = receipt.get('r2_urls') or []
+                    if not r2_urls:
+                        ready.append(self._finish(state, error='No R2 URLs'))
+                        continue
+                    pending[downloads.submit(self.processor.download_from_r2, r2_urls[0])] = ('download', state)
+
+            fill()
+            while pending or ready:
+                while ready:
+                    result = ready.popleft()
+                    completed += 1
+                    if progress_callback:
+                        progress_callback(result, completed, total)
+                    yield result
+                if not pending:
+                    fill()
+                    continue
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, state = pending.pop(future)
+                    try:
+                        payload = future.result()
+                    except Exception as e:
+                        logger.error(f"OCR {kind} failed for receipt {state.receipt.get('_id')}: {e}")
+                        ready.append(self._finish(state, error=f"{kind} failed: {e}"))
+                        continue
+
+                    if kind == 'download':
+                        state.download_seconds = time.perf_counter() - state.submitted_at
+                        if not payload:
+                            ready.append(self._finish(state, error='Download failed'))
+                            continue
+                        filename = self.processor.attachment_filename(state.receipt)
+                        state.ocr_submitted_at = time.perf_counter()
+                        pending[self._submit_ocr(ocr_pool, filename, payload)] = ('ocr', state)
+                    else:
+                        ready.append(self._finish(state, payload))
+                fill()
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"✅ Batch OCR finished {total} receipts in {elapsed:.1f}s "
+                    f"({total / elapsed:.1f}/s, {self.max_workers} workers)")
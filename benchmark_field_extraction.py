@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Receipt Field Extraction Benchmark
+Times the regex tables in receipt_field_engine over a generated corpus of
+receipt and receipt-email texts, three ways per table:
+
+    loop      for pattern in table: re.search / re.finditer (the pre-engine code)
+    combined  one alternation regex with a named group per pattern
+    engine    PatternSet.first / PatternSet.scan
+
+and then times each extractor's public parsing entry point end to end.
+
+    python benchmark_field_extraction.py --docs 500 --repeat 5
+    python benchmark_field_extraction.py --json field_extraction.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import receipt_field_engine as engine
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CORPUS
+# ============================================================================
+
+MERCHANTS = ['TARGET', 'KROGER', 'WALMART SUPERCENTER', 'STARBUCKS', 'SHELL OIL', 'CHIPOTLE',
+             'HOME DEPOT', 'COSTCO WHOLESALE', 'HILTON NASHVILLE', 'DELTA AIR LINES']
+ITEMS = ['Milk', 'Bananas', 'Bread', 'Coffee Beans', 'Eggs Large', 'Paper Towels', 'Chicken Bowl',
+         'Latte Grande', 'Unleaded Gas', 'Drywall Screws', 'Room Charge', 'Parking']
+STREETS = ['Main St', 'Broadway', 'Elm Street', 'Church Ave', 'Division Rd', 'Demonbreun Blvd']
+
+
+def _date_text(rng: random.Random, day: date) -> str:
+    style = rng.randrange(4)
+    if style == 0:
+        return day.strftime('%m/%d/%Y')
+    if style == 1:
+        return day.strftime('%Y-%m-%d')
+    if style == 2:
+        return day.strftime('%b %d, %Y')
+    return day.strftime('%d %b %Y')
+
+
+def _pos_receipt(rng: random.Random, day: date) -> str:
+    lines = [rng.choice(MERCHANTS), f"{rng.randint(100, 9999)} {rng.choice(STREETS)}",
+             f"({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}",
+             f"{_date_text(rng, day)} {rng.randint(7, 22)}:{rng.randint(0, 59):02d}"]
+    subtotal = 0.0
+    for _ in range(rng.randint(2, 25)):
+        price = round(rng.uniform(0.5, 60), 2)
+        qty = rng.randint(1, 4)
+        subtotal += price * qty
+        if qty > 1:
+            lines.append(f"{qty} x {rng.choice(ITEMS)} ${price:.2f}")
+        else:
+            lines.append(f"{rng.choice(ITEMS)} ${price:.2f}")
+    tax = round(subtotal * 0.0925, 2)
+    lines += [f"SUBTOTAL ${subtotal:.2f}", f"TAX ${tax:.2f}", f"TOTAL ${subtotal + tax:.2f}",
+              f"{rng.choice(['VISA', 'MASTERCARD', 'AMEX', 'CASH'])} **** {rng.randint(1000, 9999)}",
+              f"Receipt # {rng.choice('ABCDEFGH')}{rng.randint(10000, 99999)}", "Thank you for shopping"]
+    return '\n'.join(lines)
+
+
+def _email_receipt(rng: random.Random, day: date) -> str:
+    amount = rng.uniform(3, 900)
+    merchant = rng.choice(MERCHANTS).title()
+    body = ["Hi there,", f"Thanks for your order with {merchant}.",
+            f"Order #{rng.randint(100000, 999999)} placed on {_date_text(rng, day)}."]
+    body += ["We hope you enjoy your purchase. Questions? Reply to this email."] * rng.randint(3, 30)
+    body.append(rng.choice([f"Total: ${amount:,.2f}", f"Amount charged: {amount:.2f} USD",
+                            f"Your payment of ${amount:.2f} has been processed",
+                            f"You were charged {amount:.2f} dollars"]))
+    body += ["Unsubscribe | Privacy | Terms", f"{merchant} Inc, {rng.randint(1, 999)} {rng.choice(STREETS)}"]
+    return '\n'.join(body)
+
+
+def _hotel_folio(rng: random.Random, day: date) -> str:
+    lines = ['HILTON NASHVILLE DOWNTOWN', f"Arrival {_date_text(rng, day)}", 'GUEST FOLIO']
+    balance = 0.0
+    for night in range(rng.randint(2, 14)):
+        rate = round(rng.uniform(180, 420), 2)
+        balance += rate
+        lines.append(f"{(day + timedelta(days=night)).strftime('%m/%d/%Y')} Room Charge ${rate:.2f}")
+        lines.append(f"{(day + timedelta(days=night)).strftime('%m/%d/%Y')} Occupancy Tax ${rate * 0.15:.2f}")
+    lines += [f"Balance Due ${balance:.2f}", f"Amount Paid ${balance:.2f}", 'Thank you for staying with us']
+    return '\n'.join(lines)
+
+
+def generate_corpus(docs: int = 300, seed: int = 34) -> List[Dict]:
+    """Mixed POS receipts, receipt emails and hotel folios with realistic lengths"""
+    rng = random.Random(seed)
+    today = date.today()
+    corpus = []
+    for i in range(docs):
+        day = today - timedelta(days=rng.randint(0, 300))
+        kind = ('pos', 'email', 'folio')[i % 3]
+        text = {'pos': _pos_receipt, 'email': _email_receipt, 'folio': _hotel_folio}[kind](rng, day)
+        corpus.append({'kind': kind, 'text': text, 'subject': f"Your {kind} receipt"})
+    return corpus
+
+
+# ============================================================================
+# TABLE BENCHMARKS
+# ============================================================================
+
+TABLES = {
+    'receipt_dates (scan)': (engine.RECEIPT_DATE_PATTERNS, 'scan'),
+    'receipt_amounts (scan)': (engine.RECEIPT_AMOUNT_PATTERNS, 'scan'),
+    'text_amounts (first)': (engine.TEXT_AMOUNT_PATTERNS, 'first'),
+    'email_amounts (first)': (engine.EMAIL_AMOUNT_PATTERNS, 'first'),
+    'extractor_amounts (first)': (engine.EXTRACTOR_AMOUNT_PATTERNS, 'first'),
+    'ocr_dates (first)': (engine.OCR_DATE_PATTERNS, 'first'),
+}
+
+
+def _loop_reader(patterns, mode: str) -> Callable[[str], object]:
+    raw = [p if isinstance(p, str) else p[0] for p in patterns]
+    if mode == 'scan':
+        return lambda text: [m for line in text.split('\n') for p in raw
+                             for m in re.finditer(p, line, re.IGNORECASE)]
+
+    def first(text):
+        for p in raw:
+            m = re.search(p, text, re.IGNORECASE)
+            if m:
+                return m
+        return None
+    return first
+
+
+def _combined_reader(patterns, mode: str) -> Callable[[str], object]:
+    raw = [p if isinstance(p, str) else p[0] for p in patterns]
+    combined = re.compile('|'.join(f'(?P<p{i}>{p})' for i, p in enumerate(raw)), re.IGNORECASE)
+    if mode == 'scan':
+        return lambda text: list(combined.finditer(text))
+
+    def first(text):
+        best = None
+        for m in combined.finditer(text):
+            index = int(m.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if index == 0:
+                    break
+        return best
+    return first
+
+
+def _engine_reader(patterns, mode: str) -> Callable[[str], object]:
+    compiled = engine.pattern_set(patterns)
+    return compiled.scan if mode == 'scan' else compiled.first
+
+
+def _time_per_doc(fn: Callable[[str], object], texts: List[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best / len(texts) * 1e6
+
+
+def bench_tables(corpus: List[Dict], repeat: int) -> List[Dict]:
+    texts = [doc['text'] for doc in corpus]
+    rows = []
+    for name, (patterns, mode) in TABLES.items():
+        row = {'table': name, 'patterns': len(patterns)}
+        for reader_name, reader in (('loop', _loop_reader), ('combined', _combined_reader),
+                                    ('engine', _engine_reader)):
+            row[f'{reader_name}_us'] = round(_time_per_doc(reader(patterns, mode), texts, repeat), 2)
+        row['speedup'] = round(row['loop_us'] / row['engine_us'], 2) if row['engine_us'] else None
+        rows.append(row)
+    return rows
+
+
+# ============================================================================
+# EXTRACTOR BENCHMARKS
+# ============================================================================
+
+def _extractor_entry_points() -> Dict[str, Callable[[Dict], object]]:
+    from enhanced_receipt_extractor import EnhancedReceiptExtractor
+    from helper_functions import _extract_amount_from_email
+    from improved_amount_extractor import ImprovedAmountExtractor
+    from pdf_text_pipeline import has_total_and_date
+    from receipt_ocr_processor import ReceiptOCRProcessor
+    from receipt_processor import EnhancedReceiptProcessor
+
+    processor = EnhancedReceiptProcessor()
+    improved = ImprovedAmountExtractor()
+    extractor = EnhancedReceiptExtractor()
+    ocr = ReceiptOCRProcessor()
+    return {
+        'EnhancedReceiptProcessor._enhanced_parse_receipt': lambda d: processor._enhanced_parse_receipt(d['text']),
+        'ImprovedAmountExtractor.extract_amount': lambda d: improved.extract_amount(d['text']),
+        'EnhancedReceiptExtractor._extract_amount_from_text': lambda d: extractor._extract_amount_from_text(d['text']),
+        'helper_functions._extract_amount_from_email': lambda d: _extract_amount_from_email(d['text'], d['subject']),
+        'ReceiptOCRProcessor.parse_text': lambda d: ocr.parse_text(d['text']),
+        'pdf_text_pipeline.has_total_and_date': lambda d: has_total_and_date(d['text']),
+    }
+
+
+def bench_extractors(corpus: List[Dict], repeat: int) -> List[Dict]:
+    rows = []
+    for name, fn in _extractor_entry_points().items():
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for doc in corpus:
+                fn(doc)
+            best = min(best, time.perf_counter() - started)
+        rows.append({'extractor': name, 'us_per_doc': round(best / len(corpus) * 1e6, 2)})
+    return rows
+
+
+def run_benchmark(docs: int = 300, repeat: int = 5, seed: int = 34) -> Dict:
+    corpus = generate_corpus(docs, seed)
+    return {
+        'docs': docs,
+        'repeat': repeat,
+        'avg_chars': round(sum(len(d['text']) for d in corpus) / len(corpus)),
+        'tables': bench_tables(corpus, repeat),
+        'extractors': bench_extractors(corpus, repeat)
+    }
+
+
+def print_report(report: Dict):
+    print("\n🧾 Receipt Field Extraction Benchmark")
+    print(f"{report['docs']} documents, {report['avg_chars']} chars on average, best of {report['repeat']}")
+    print("=" * 82)
+    print(f"{'table':<30}{'patterns':>9}{'loop µs':>11}{'combined µs':>13}{'engine µs':>11}{'speedup':>8}")
+    for row in report['tables']:
+        print(f"{row['table']:<30}{row['patterns']:>9}{row['loop_us']:>11.1f}{row['combined_us']:>13.1f}"
+              f"{row['engine_us']:>11.1f}{row['speedup']:>7.1f}x")
+    print("-" * 82)
+    print(f"{'extractor':<64}{'µs/doc':>10}")
+    for row in report['extractors']:
+        print(f"{row['extractor']:<64}{row['us_per_doc']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark receipt field extraction over a generated corpus')
+    parser.add_argument('--docs', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=34)
+    parser.add_argument('--json', help='write the report to this path')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_benchmark(args.docs, args.repeat, args.seed)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
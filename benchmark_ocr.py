@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+OCR Benchmark
+Runs every receipt extraction engine, and several extraction cascade
+configurations, over the checked-in synthetic corpus in data/ocr_benchmark
+(text-layer PDFs, scanned PDFs and phone photos with known merchant, total
+and date) and reports pages/sec, p50/p95 latency per document, peak memory
+and field-level accuracy.
+
+    python benchmark_ocr.py
+    python benchmark_ocr.py --engine cascade --engine EnhancedReceiptProcessor --repeat 5
+    python benchmark_ocr.py --local-model naver-clova-ix/donut-base-finetuned-cord-v2
+    python benchmark_ocr.py --json before.json
+    python benchmark_ocr.py --json after.json --baseline before.json
+    python benchmark_ocr.py --generate          # re-render the corpus
+
+Nothing here calls a live service: the cloud tier is left out of the cascade
+configurations and the local model only runs with --local-model. Every pass
+starts with an empty OCR cache so one engine never reads another's results.
+
+EnhancedReceiptProcessor ignores dates more than a year old, so date accuracy
+drops once the corpus ages; the report carries the corpus age and --generate
+re-dates it (commit the new corpus on its own, then compare reports).
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_field_extraction import ITEMS, STREETS, _date_text
+
+logger = logging.getLogger(__name__)
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ocr_benchmark')
+MANIFEST = 'manifest.json'
+FIELDS = ('merchant', 'amount', 'date')
+KINDS = ('pdf_text', 'pdf_scan', 'photo')
+MAX_AGE_DAYS = 240  # documents are dated up to 120 days before generation; 240 + 120 stays under a year
+
+
+# ============================================================================
+# CORPUS
+# ============================================================================
+
+MERCHANTS = [('KROGER', 'kroger.com'), ('TARGET', 'target.com'), ('STARBUCKS', 'starbucks.com'),
+             ('SHELL OIL', 'shell.com'), ('CHIPOTLE', 'chipotle.com'), ('HOME DEPOT', 'homedepot.com'),
+             ('COSTCO WHOLESALE', 'costco.com'), ('WALGREENS', 'walgreens.com')]
+PAYMENTS = ['VISA', 'MASTERCARD', 'AMEX', 'DISCOVER']
+
+
+def _receipt_lines(rng: random.Random, day: date, merchant: str, folio: bool = False) -> Tuple[List[str], float]:
+    """Receipt text and its printed total (a hotel folio when folio is set)"""
+    if folio:
+        lines = [f"{merchant} HOTEL", f"{rng.randint(100, 999)} {rng.choice(STREETS)}", 'GUEST FOLIO',
+                 f"Arrival {_date_text(rng, day)}"]
+        balance = 0.0
+        for night in range(rng.randint(30, 44)):
+            rate = round(rng.uniform(150, 320), 2)
+            tax = round(rate * 0.15, 2)
+            balance += rate + tax
+            stamp = (day + timedelta(days=night // 2)).strftime('%m/%d')
+            lines.append(f"{stamp} Room Charge ${rate:.2f}" if night % 2 == 0 else f"{stamp} Occupancy Tax ${tax:.2f}")
+        balance = round(balance, 2)
+        lines += [f"Balance Due ${balance:.2f}", 'Thank you for staying with us']
+        return lines, balance
+
+    lines = [merchant, f"{rng.randint(100, 9999)} {rng.choice(STREETS)}",
+             f"({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}",
+             f"{_date_text(rng, day)} {rng.randint(7, 22)}:{rng.randint(0, 59):02d}"]
+    subtotal = 0.0
+    for _ in range(rng.randint(3, 12)):
+        price = round(rng.uniform(0.5, 40), 2)
+        subtotal += price
+        lines.append(f"{rng.choice(ITEMS)} ${price:.2f}")
+    subtotal = round(subtotal, 2)
+    tax = round(subtotal * 0.0925, 2)
+    total = round(subtotal + tax, 2)
+    lines += [f"SUBTOTAL ${subtotal:.2f}", f"TAX ${tax:.2f}", f"TOTAL ${total:.2f}",
+              f"{rng.choice(PAYMENTS)} **** {rng.randint(1000, 9999)}",
+              f"Receipt # {rng.choice('ABCDEFGH')}{rng.randint(10000, 99999)}", 'Thank you for shopping']
+    return lines, total
+
+
+def _email(rng: random.Random, day: date, merchant: str, domain: str, amount: float, informative: bool) -> Dict:
+    """The email a receipt arrived with; vague ones are forwarded photos that say nothing useful"""
+    if informative:
+        sent = datetime(day.year, day.month, day.day, rng.randint(8, 20), rng.randint(0, 59))
+        return {'subject': f"Your {merchant.title()} receipt",
+                'body': f"Thanks for shopping with us.\nTotal: ${amount:.2f}\nQuestions? Reply to this email.",
+                'from_email': f"receipts@{domain}", 'date': format_datetime(sent)}
+    sent = datetime(day.year, day.month, day.day, 21, 5) + timedelta(days=rng.randint(0, 6))
+    return {'subject': 'Receipt', 'body': 'Sent from my iPhone', 'from_email': 'me@example.com',
+            'date': format_datetime(sent)}
+
+
+def _render_paper(lines: List[str], width: int = 720, line_height: int = 34):
+    import cv2
+    import numpy as np
+
+    paper = np.full((70 + line_height * len(lines), width), 250, np.uint8)
+    for row, line in enumerate(lines):
+        cv2.putText(paper, line, (28, 50 + row * line_height), cv2.FONT_HERSHEY_SIMPLEX, 0.75, 25, 2, cv2.LINE_AA)
+    return paper
+
+
+def _photo_jpeg(paper, rng: random.Random) -> bytes:
+    """Receipt on a dark table, slightly rotated, with sensor noise"""
+    import cv2
+    import numpy as np
+
+    height, width = paper.shape
+    canvas = np.full((height + 400, width + 500), 70, np.uint8)
+    canvas[200:200 + height, 250:250 + width] = paper
+    center = (canvas.shape[1] / 2, canvas.shape[0] / 2)
+    matrix = cv2.getRotationMatrix2D(center, rng.uniform(-4, 4), 1.0)
+    canvas = cv2.warpAffine(canvas, matrix, (canvas.shape[1], canvas.shape[0]), borderValue=70)
+    noise = np.random.RandomState(rng.randint(0, 2 ** 31)).normal(0, 4, canvas.shape)
+    canvas = np.clip(canvas + noise, 0, 255).astype(np.uint8)
+    return cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+
+
+def _scanned_pdf(paper, dpi: int = 200) -> bytes:
+    import cv2
+    import fitz
+
+    png = cv2.imencode('.png', paper)[1].tobytes()
+    doc = fitz.open()
+    page = doc.new_page(width=paper.shape[1] * 72 / dpi, height=paper.shape[0] * 72 / dpi)
+    page.insert_image(page.rect, stream=png)
+    data = doc.tobytes(garbage=3, deflate=True, no_new_id=True)  # no random /ID: reproducible bytes
+    doc.close()
+    return data
+
+
+def _text_pdf(lines: List[str], lines_per_page: int = 30) -> Tuple[bytes, int]:
+    import fitz
+
+    doc = fitz.open()
+    for start in range(0, len(lines), lines_per_page):
+        page = doc.new_page(width=288, height=60 + 13 * lines_per_page)
+        page.insert_text((24, 36), '\n'.join(lines[start:start + lines_per_page]), fontsize=9, fontname='cour')
+    pages = doc.page_count
+    data = doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+    return data, pages
+
+
+def generate_corpus(directory: str = CORPUS_DIR, per_kind: int = 8, seed: int = 40,
+                    reference_date: Optional[date] = None) -> Dict:
+    """Render the corpus and its manifest; the same seed and reference date give the same documents"""
+    rng = random.Random(seed)
+    reference_date = reference_date or date.today()
+    os.makedirs(directory, exist_ok=True)
+    documents = []
+    for kind in KINDS:
+        for index in range(per_kind):
+            merchant, domain = MERCHANTS[rng.randrange(len(MERCHANTS))]
+            day = reference_date - timedelta(days=rng.randint(1, 120))
+            lines, amount = _receipt_lines(rng, day, merchant, folio=kind == 'pdf_text' and index % 4 == 3)
+            doc_id = f"{kind}_{index:02d}"
+            pages = 1
+            if kind == 'pdf_text':
+                filename = f"{doc_id}.pdf"
+                content, pages = _text_pdf(lines)
+            elif kind == 'pdf_scan':
+                filename = f"{doc_id}.pdf"
+                content = _scanned_pdf(_render_paper(lines))
+            else:
+                filename = f"{doc_id}.jpg"
+                content = _photo_jpeg(_render_paper(lines), rng)
+            with open(os.path.join(directory, filename), 'wb') as f:
+                f.write(content)
+            documents.append({
+                'id': doc_id, 'file': filename, 'kind': kind, 'pages': pages,
+                'truth': {'merchant': merchant, 'amount': amount, 'date': day.isoformat()},
+                'email': _email(rng, day, merchant, domain, amount, informative=index % 2 == 0)
+            })
+    manifest = {'version': 1, 'seed': seed, 'reference_date': reference_date.isoformat(), 'documents': documents}
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_corpus(directory: str = CORPUS_DIR) -> Dict:
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    for doc in manifest['documents']:
+        doc['path'] = os.path.join(directory, doc['file'])
+    return manifest
+
+
+# ============================================================================
+# SCORING
+# ============================================================================
+
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%m-%d-%Y', '%b %d, %Y', '%B %d, %Y', '%d %b %Y', '%d %B %Y')
+
+
+def normalize_date(value) -> Optional[str]:
+    """ISO day for the date shapes the engines return (datetime, ISO, US, RFC 2822, printed)"""
+    if not value:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    try:
+        return parsedate_to_datetime(text).strftime('%Y-%m-%d')
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _words(value) -> str:
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in str(value or '').lower()).split())
+
+
+def score_fields(truth: Dict, found: Dict) -> Dict[str, bool]:
+    """Per-field hit: merchant names contain one another, amounts within a cent, same calendar day"""
+    merchant, expected = _words(found.get('merchant')), _words(truth['merchant'])
+    try:
+        amount = float(found.get('amount') or 0)
+    except (TypeError, ValueError):
+        amount = 0.0
+    return {
+        'merchant': len(merchant) >= 3 and (merchant in expected or expected in merchant),
+        'amount': abs(amount - truth['amount']) < 0.01,
+        'date': normalize_date(found.get('date')) == truth['date']
+    }
+
+
+# ============================================================================
+# ENGINES
+# ============================================================================
+
+def _receipt_ocr_processor() -> Callable[[Dict], Dict]:
+    from receipt_ocr_processor import ReceiptOCRProcessor
+
+    processor = ReceiptOCRProcessor()
+
+    def extract(doc):
+        with open(doc['path'], 'rb') as f:
+            parsed = processor.parse_text(processor.extract_text(doc['file'], f.read()) or '')
+        return {'merchant': parsed.get('receipt_merchant'), 'amount': parsed.get('receipt_amount'),
+                'date': parsed.get('receipt_date')}
+    return extract
+
+
+def _enhanced_receipt_processor() -> Callable[[Dict], Dict]:
+    from receipt_processor import EnhancedReceiptProcessor
+
+    processor = EnhancedReceiptProcessor()
+
+    def extract(doc):
+        parsed = processor.extract_receipt_data(doc['path']) or {}
+        return {'merchant': parsed.get('merchant'), 'amount': parsed.get('total_amount'), 'date': parsed.get('date')}
+    return extract
+
+
+def _enhanced_receipt_extractor() -> Callable[[Dict], Dict]:
+    from enhanced_receipt_extractor import EnhancedReceiptExtractor
+
+    extractor = EnhancedReceiptExtractor()
+
+    def extract(doc):
+        data = extractor.extract_from_file(doc['path'], doc['email'])
+        return {'merchant': data.merchant, 'amount': data.amount, 'date': data.date}
+    return extract
+
+
+def _fallback_ocr_processor() -> Callable[[Dict], Dict]:
+    from fallback_ocr_processor import FallbackOCRProcessor
+
+    processor = FallbackOCRProcessor()
+    return lambda doc: asyncio.run(processor.extract_receipt_data(doc['path'], doc['email']))
+
+
+def _local_huggingface_processor(model_name: str) -> Callable[[], Callable[[Dict], Dict]]:
+    def build():
+        from extraction_cascade import _model_outcome
+        from huggingface_receipt_processor import LocalHuggingFaceProcessor
+
+        processor = LocalHuggingFaceProcessor(model_name=model_name)
+
+        def extract(doc):
+            image = doc['path']
+            if doc['file'].lower().endswith('.pdf'):
+                import fitz
+                from PIL import Image
+                with fitz.open(doc['path']) as pdf:
+                    pixmap = pdf[0].get_pixmap(dpi=150)
+                image = Image.open(io.BytesIO(pixmap.tobytes('png'))).convert('RGB')
+            outcome = _model_outcome(processor.process_receipt_image(image), 'local_model', 1.0)
+            return {name: found.value for name, found in outcome.fields.items()} if outcome else {}
+        return extract
+    return build
+
+
+def _cascade(only: Optional[Tuple[str, ...]] = None, exhaustive: bool = False) -> Callable[[], Callable[[Dict], Dict]]:
+    def build():
+        from extraction_cascade import ExtractionCascade, default_tiers
+
+        # No cloud tier: the benchmark never spends API quota
+        tiers = [t for t in default_tiers() if t.name != 'cloud_model']
+        thresholds = {name: 1.01 for name in FIELDS} if exhaustive else None
+        cascade = ExtractionCascade(tiers=tiers, thresholds=thresholds)
+
+        def extract(doc):
+            result = cascade.run(email=doc['email'], file_path=doc['path'], only=only)
+            return {'merchant': result.value('merchant'), 'amount': result.value('amount'),
+                    'date': result.value('date'), 'answered_by': result.tier or 'unresolved'}
+        return extract
+    return build
+
+
+def available_engines(local_model: Optional[str] = None) -> Dict[str, Callable[[], Callable[[Dict], Dict]]]:
+    """Engine name -> factory returning extract(doc) -> {'merchant', 'amount', 'date'}"""
+    engines = {
+        'ReceiptOCRProcessor': _receipt_ocr_processor,
+        'EnhancedReceiptProcessor': _enhanced_receipt_processor,
+        'EnhancedReceiptExtractor': _enhanced_receipt_extractor,
+        'FallbackOCRProcessor': _fallback_ocr_processor,
+        'cascade': _cascade(),
+        'cascade:files_only': _cascade(only=('cached_ocr', 'pdf_text', 'tesseract', 'local_model')),
+        'cascade:exhaustive': _cascade(exhaustive=True),
+    }
+    if local_model:
+        # Last, so its weights don't inflate the other engines' RSS numbers
+        engines['LocalHuggingFaceProcessor'] = _local_huggingface_processor(local_model)
+    return engines
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _fresh_ocr_cache(scratch: str):
+    from ocr_cache import configure_ocr_cache
+    shutil.rmtree(scratch, ignore_errors=True)
+    configure_ocr_cache(directory=scratch)
+
+
+def _run_pass(extract: Callable[[Dict], Dict], documents: List[Dict], scratch: str) -> Tuple[List[float], List]:
+    _fresh_ocr_cache(scratch)
+    latencies, outputs = [], []
+    for doc in documents:
+        started = time.perf_counter()
+        try:
+            found = extract(doc) or {}
+        except Exception as e:
+            found = {'error': f"{type(e).__name__}: {e}"}
+        latencies.append(time.perf_counter() - started)
+        outputs.append(found)
+    return latencies, outputs
+
+
+def bench_engine(name: str, factory: Callable[[], Callable[[Dict], Dict]], documents: List[Dict],
+                 repeat: int = 3) -> Dict:
+    """Timed passes for latency/throughput, then one traced pass for Python heap peak"""
+    scratch = tempfile.mkdtemp(prefix='ocr-bench-')
+    rss_before = _max_rss_mb()
+    try:
+        started = time.perf_counter()
+        try:
+            extract = factory()
+            # One untimed call so lazy imports and registry loads count as load time, not latency
+            extract(documents[0])
+        except Exception as e:
+            return {'engine': name, 'skipped': f"{type(e).__name__}: {e}"}
+        load_seconds = time.perf_counter() - started
+
+        latencies: List[float] = []
+        outputs: List = []
+        for _ in range(max(1, repeat)):
+            pass_latencies, pass_outputs = _run_pass(extract, documents, scratch)
+            latencies += pass_latencies
+            outputs = outputs or pass_outputs  # accuracy from the first (cold) pass
+
+        tracemalloc.start()
+        try:
+            _run_pass(extract, documents, scratch)
+            python_peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    pages = sum(doc['pages'] for doc in documents) * max(1, repeat)
+    hits = {field: 0 for field in FIELDS}
+    by_kind: Dict[str, Dict[str, int]] = {}
+    misses, errors, answered_by = {}, {}, {}
+    complete = 0
+    for doc, found in zip(documents, outputs):
+        if 'error' in found:
+            errors[doc['id']] = found['error']
+        if 'answered_by' in found:
+            answered_by[found['answered_by']] = answered_by.get(found['answered_by'], 0) + 1
+        scored = score_fields(doc['truth'], found)
+        kind = by_kind.setdefault(doc['kind'], {'documents': 0, **{field: 0 for field in FIELDS}})
+        kind['documents'] += 1
+        for field, hit in scored.items():
+            hits[field] += hit
+            kind[field] += hit
+        if all(scored.values()):
+            complete += 1
+        else:
+            misses[doc['id']] = sorted(field for field, hit in scored.items() if not hit)
+
+    count = len(documents)
+    result = {
+        'engine': name,
+        'documents': count,
+        'passes': max(1, repeat),
+        'load_seconds': round(load_seconds, 3),
+        'pages_per_second': round(pages / sum(latencies), 2) if sum(latencies) else None,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'python_peak_mb': round(python_peak / (1024 * 1024), 2),
+        'rss_growth_mb': round(_max_rss_mb() - rss_before, 1),
+        'accuracy': {**{field: round(hits[field] / count, 3) for field in FIELDS},
+                     'all_fields': round(complete / count, 3)},
+        'accuracy_by_kind': {kind: {field: round(v[field] / v['documents'], 3) for field in FIELDS}
+                             for kind, v in sorted(by_kind.items())},
+        'misses': misses,
+        'errors': errors
+    }
+    if answered_by:
+        result['answered_by'] = answered_by
+    return result
+
+
+def _environment() -> Dict:
+    from ocr_cache import tesseract_version
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except Exception:
+        commit = ''
+    return {'commit': commit or None, 'python': platform.python_version(), 'platform': platform.platform(),
+            'tesseract': None if tesseract_version() == 'unknown' else tesseract_version()}
+
+
+def run_benchmark(engines: Optional[List[str]] = None, repeat: int = 3, directory: str = CORPUS_DIR,
+                  kinds: Optional[List[str]] = None, local_model: Optional[str] = None) -> Dict:
+    manifest = load_corpus(directory)
+    documents = [doc for doc in manifest['documents'] if not kinds or doc['kind'] in kinds]
+    registry = available_engines(local_model)
+    unknown = set(engines or []) - set(registry)
+    if unknown:
+        raise ValueError(f"Unknown engine(s): {', '.join(sorted(unknown))}")
+    age = (date.today() - date.fromisoformat(manifest['reference_date'])).days
+    if age > MAX_AGE_DAYS:
+        logger.warning(f"⚠️ Corpus is {age} days old; date accuracy will drop (re-render with --generate)")
+
+    report = {
+        'corpus': {'documents': len(documents), 'pages': sum(doc['pages'] for doc in documents),
+                   'kinds': {kind: sum(doc['kind'] == kind for doc in documents) for kind in KINDS},
+                   'reference_date': manifest['reference_date'], 'age_days': age, 'seed': manifest['seed']},
+        'environment': _environment(),
+        'repeat': repeat,
+        'results': []
+    }
+    for name, factory in registry.items():
+        if engines and name not in engines:
+            continue
+        logger.info(f"⏱️ Benchmarking {name}")
+        report['results'].append(bench_engine(name, factory, documents, repeat))
+    return report
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def compare_reports(baseline: Dict, report: Dict) -> List[Dict]:
+    """Per-engine deltas against an earlier report (positive is better for every column)"""
+    before = {r['engine']: r for r in baseline.get('results', []) if 'skipped' not in r}
+    rows = []
+    for r in report['results']:
+        old = before.get(r['engine'])
+        if 'skipped' in r or not old:
+            continue
+        rows.append({
+            'engine': r['engine'],
+            'pages_per_second': round((r['pages_per_second'] or 0) - (old['pages_per_second'] or 0), 2),
+            'p95_ms': round(old['p95_ms'] - r['p95_ms'], 2),
+            **{field: round(r['accuracy'][field] - old['accuracy'][field], 3) for field in FIELDS + ('all_fields',)}
+        })
+    return rows
+
+
+def print_report(report: Dict, deltas: Optional[List[Dict]] = None):
+    corpus = report['corpus']
+    print("\n🧾 OCR Benchmark")
+    print(f"{corpus['documents']} documents ({corpus['pages']} pages), corpus dated {corpus['reference_date']}, "
+          f"{report['repeat']} pass(es), tesseract {report['environment']['tesseract'] or 'not installed'}")
+    print("=" * 110)
+    print(f"{'engine':<28}{'pages/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'heap MB':>9}{'rss +MB':>9}"
+          f"{'merchant':>10}{'amount':>8}{'date':>7}{'all':>7}{'errors':>8}")
+    print("-" * 110)
+    for r in report['results']:
+        if 'skipped' in r:
+            print(f"{r['engine']:<28}skipped: {r['skipped']}")
+            continue
+        acc = r['accuracy']
+        print(f"{r['engine']:<28}{r['pages_per_second'] or 0:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{r['python_peak_mb']:>9.1f}{r['rss_growth_mb']:>9.1f}{acc['merchant']:>10.0%}{acc['amount']:>8.0%}"
+              f"{acc['date']:>7.0%}{acc['all_fields']:>7.0%}{len(r['errors']):>8}")
+    print("=" * 110)
+    if corpus['age_days'] > MAX_AGE_DAYS:
+        print(f"⚠️ Corpus is {corpus['age_days']} days old; date accuracy will drop (re-render with --generate)")
+    if deltas:
+        print(f"{'vs baseline':<28}{'pages/s':>9}{'p95 ms':>9}{'merchant':>10}{'amount':>8}{'date':>7}{'all':>7}")
+        for d in deltas:
+            print(f"{d['engine']:<28}{d['pages_per_second']:>+9.1f}{d['p95_ms']:>+9.1f}{d['merchant']:>+10.0%}"
+                  f"{d['amount']:>+8.0%}{d['date']:>+7.0%}{d['all_fields']:>+7.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark receipt OCR engines over the synthetic corpus')
+    parser.add_argument('--engine', action='append', help='engine to run (repeatable); default all')
+    parser.add_argument('--kind', action='append', choices=KINDS, help='only documents of this kind')
+    parser.add_argument('--repeat', type=int, default=3, help='timed passes per engine')
+    parser.add_argument('--corpus', default=CORPUS_DIR)
+    parser.add_argument('--local-model', help='also benchmark LocalHuggingFaceProcessor with this model')
+    parser.add_argument('--generate', action='store_true', help='re-render the corpus and exit')
+    parser.add_argument('--per-kind', type=int, default=8, help='documents per kind when generating')
+    parser.add_argument('--seed', type=int, default=40)
+    parser.add_argument('--json', help='write the report to this path')
+    parser.add_argument('--baseline', help='earlier JSON report to compare against')
+    parser.add_argument('--verbose', action='store_true', help='show engine logging')
+    args = parser.parse_args()
+
+    # Engines log every OCR failure; keep the table readable unless asked
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    if args.generate:
+        manifest = generate_corpus(args.corpus, args.per_kind, args.seed)
+        print(f"📁 Wrote {len(manifest['documents'])} documents to {args.corpus}")
+        return
+
+    report = run_benchmark(args.engine, args.repeat, args.corpus, args.kind, args.local_model)
+    deltas = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            deltas = compare_reports(json.load(f), report)
+    print_report(report, deltas)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Teller Sync Benchmark
+Drives TellerClient, TellerService and BankService.sync_transactions against
+the local Teller stand-in and reports transactions/sec, HTTP requests and
+MongoDB operations per transaction.
+
+    python benchmark_teller_sync.py --accounts 3 --transactions 2000 --latency-ms 30 --mtls
+    python benchmark_teller_sync.py --mongo-uri mongodb://localhost:27017 --json report.json
+
+Without --mongo-uri the sync writes to an in-memory collection, so timings
+exclude database round trips but operation counts are exact.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from teller_fake_server import FakeTellerConfig, FakeTellerServer, generate_fixtures
+
+logger = logging.getLogger(__name__)
+
+FAKE_ACCESS_TOKEN = 'token_fake_benchmark'
+MISSING_CERT_PATH = '/nonexistent/fake_teller_client.pem'
+
+
+# ============================================================================
+# DATABASE INSTRUMENTATION
+# ============================================================================
+
+class CountingCollection:
+    """Wraps a collection and counts every method call by name"""
+
+    def __init__(self, collection, counter: Counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def _counted(*args, **kwargs):
+            self._counter[name] += 1
+            return attr(*args, **kwargs)
+        return _counted
+
+
+class MemoryCollection:
+    """Covers the query shapes BankService.sync_transactions issues"""
+
+    def __init__(self):
+        self.docs: List[Dict] = []
+        self._next_id = 0
+
+    @staticmethod
+    def _matches(doc, query):
+        for key, cond in query.items():
+            value = doc.get(key)
+            if isinstance(cond, dict):
+                if '$gte' in cond and (value is None or value < cond['$gte']):
+                    return False
+                if '$lte' in cond and (value is None or value > cond['$lte']):
+                    return False
+            elif value != cond:
+                return False
+        return True
+
+    def find(self, query=None, projection=None):
+        return [d for d in self.docs if self._matches(d, query or {})]
+
+    def find_one(self, query=None, projection=None):
+        return next((d for d in self.docs if self._matches(d, query or {})), None)
+
+    def insert_one(self, doc):
+        self._next_id += 1
+        doc.setdefault('_id', self._next_id)
+        self.docs.append(doc)
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.find_one(query)
+        if doc is not None:
+            doc.update(update.get('$set', {}))
+
+    def count_documents(self, query):
+        return len(self.find(query))
+
+
+class BenchmarkDatabase:
+    """Stands in for the MongoService handed to BankService"""
+
+    def __init__(self, mongo_uri: Optional[str] = None, database: str = 'teller_benchmark'):
+        from types import SimpleNamespace
+
+        self.ops = Counter()
+        self.database_name = database
+        self._mongo = None
+        if mongo_uri:
+            from pymongo import MongoClient
+            self._mongo = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+            db = self._mongo[database]
+            db.bank_transactions.drop()
+            raw = db.bank_transactions
+        else:
+            raw = MemoryCollection()
+        self.bank_transactions = raw
+        self.client = SimpleNamespace(
+            connected=True,
+            db=SimpleNamespace(bank_transactions=CountingCollection(raw, self.ops))
+        )
+        self.connected = True
+
+    def get_teller_tokens(self) -> List[Dict]:
+        return [{'_id': 'tok_benchmark', 'access_token': FAKE_ACCESS_TOKEN,
+                 'user_id': 'benchmark_user', 'status': 'active'}]
+
+    def close(self):
+        if self._mongo:
+            self._mongo.drop_database(self.database_name)
+            self._mongo.close()
+
+
+# ============================================================================
+# SCENARIOS
+# ============================================================================
+
+def _configure_environment(server: FakeTellerServer):
+    """Point the Teller clients at the stand-in before they are constructed"""
+    os.environ['TELLER_APPLICATION_ID'] = 'app_fake_benchmark'
+    os.environ['TELLER_API_URL'] = server.url
+    bundle = server.certificates
+    if bundle:
+        # requests lets these override Session.verify, so trust the fake CA here
+        os.environ['REQUESTS_CA_BUNDLE'] = bundle.ca_cert
+        os.environ['CURL_CA_BUNDLE'] = bundle.ca_cert
+    if bundle and server.config.mtls:
+        os.environ['TELLER_CERT_PATH'] = bundle.client_cert
+        os.environ['TELLER_KEY_PATH'] = bundle.client_key
+    else:
+        # No client certificate: both clients skip cert loading for missing paths
+        os.environ['TELLER_CERT_PATH'] = MISSING_CERT_PATH
+        os.environ['TELLER_KEY_PATH'] = MISSING_CERT_PATH
+
+
+def _result(name: str, server: FakeTellerServer, transactions: int, elapsed: float,
+            mongo_ops: Optional[Counter] = None, **extra) -> Dict:
+    stats = dict(server.stats)
+    result = {
+        'scenario': name,
+        'transactions': transactions,
+        'seconds': round(elapsed, 3),
+        'transactions_per_second': round(transactions / elapsed, 1) if elapsed else None,
+        'http_requests': stats.get('requests', 0),
+        'rate_limited': stats.get('rate_limited', 0),
+        'bytes_received': stats.get('bytes_sent', 0),
+    }
+    if mongo_ops is not None:
+        total_ops = sum(mongo_ops.values())
+        result['mongo_ops'] = total_ops
+        result['mongo_ops_per_transaction'] = round(total_ops / transactions, 2) if transactions else None
+        result['mongo_ops_breakdown'] = dict(mongo_ops)
+    result.update(extra)
+    return result
+
+
+def bench_teller_client(server: FakeTellerServer, page_size: int) -> Dict:
+    """Root-level TellerClient: account listing plus one transactions call per account"""
+    from teller_client import TellerClient
+
+    _configure_environment(server)
+    client = TellerClient()
+
+    server.reset_stats()
+    start = time.perf_counter()
+    fetched = 0
+    for account in client.get_connected_accounts():
+        fetched += len(client.get_transactions(account.id, limit=page_size))
+    return _result('TellerClient', server, fetched, time.perf_counter() - start,
+                   note=f"one request per account, capped at count={page_size}")
+
+
+def bench_teller_service(server: FakeTellerServer, start_date: str, end_date: str) -> Dict:
+    """app.services TellerService (SafeTellerClient underneath)"""
+    from app.config import Config
+    from app.services.teller_service import TellerService
+
+    _configure_environment(server)
+    if server.certificates and server.config.mtls:
+        os.environ['TELLER_CERT_PATH'] = server.certificates.client_cert_b64
+        os.environ['TELLER_KEY_PATH'] = server.certificates.client_key_b64
+    Config.TELLER_API_URL = server.url
+    service = TellerService()
+
+    server.reset_stats()
+    start = time.perf_counter()
+    fetched = 0
+    for account in service.get_accounts(FAKE_ACCESS_TOKEN):
+        fetched += len(service.get_transactions(FAKE_ACCESS_TOKEN, account['id'], start_date, end_date))
+    return _result('TellerService', server, fetched, time.perf_counter() - start)
+
+
+def bench_bank_sync(server: FakeTellerServer, start_date: str, end_date: str,
+                    mongo_uri: Optional[str] = None) -> List[Dict]:
+    """BankService.sync_transactions: cold run (all inserts) then warm run (all updates)"""
+    from app.config import Config
+    from app.services.bank_service import BankService
+    from app.services.teller_service import SafeTellerClient
+
+    _configure_environment(server)
+    if server.certificates and server.config.mtls:
+        os.environ['TELLER_CERT_PATH'] = server.certificates.client_cert_b64
+        os.environ['TELLER_KEY_PATH'] = server.certificates.client_key_b64
+    Config.TELLER_API_URL = server.url
+    teller = SafeTellerClient()
+
+    database = BenchmarkDatabase(mongo_uri)
+    service = BankService(database, teller)
+    results = []
+    try:
+        for label in ('cold', 'warm'):
+            server.reset_stats()
+            database.ops.clear()
+            start = time.perf_counter()
+            summary = service.sync_transactions(start_date=start_date, end_date=end_date)
+            elapsed = time.perf_counter() - start
+            if not summary.get('success'):
+                raise RuntimeError(summary.get('error'))
+            results.append(_result(f"BankService.sync_transactions ({label})", server,
+                                   summary['total_transactions'], elapsed, Counter(database.ops),
+                                   new_transactions=summary['new_transactions']))
+    finally:
+        database.close()
+    return results
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def run_benchmark(accounts: int = 3, transactions: int = 1000, latency_ms: float = 0.0,
+                  jitter_ms: float = 0.0, rate_limit: float = 0.0, mtls: bool = False,
+                  page_size: int = 500, days: int = 365, mongo_uri: Optional[str] = None,
+                  scenarios: Optional[List[str]] = None) -> Dict:
+    scenarios = scenarios or ['client', 'service', 'sync']
+    fixtures = generate_fixtures(accounts, transactions, days=days)
+    config = FakeTellerConfig(latency_ms=latency_ms, jitter_ms=jitter_ms,
+                              rate_limit_per_second=rate_limit, mtls=mtls)
+    end_date = date.today()
+    start_date = (end_date - timedelta(days=days)).isoformat()
+
+    report = {
+        'config': {'accounts': accounts, 'transactions_per_account': transactions,
+                   'latency_ms': latency_ms, 'jitter_ms': jitter_ms, 'rate_limit': rate_limit,
+                   'mtls': mtls, 'mongo': bool(mongo_uri)},
+        'results': []
+    }
+    with FakeTellerServer(fixtures, config) as server:
+        if 'client' in scenarios:
+            report['results'].append(bench_teller_client(server, page_size))
+        if 'service' in scenarios:
+            report['results'].append(bench_teller_service(server, start_date, end_date.isoformat()))
+        if 'sync' in scenarios:
+            report['results'].extend(bench_bank_sync(server, start_date, end_date.isoformat(), mongo_uri))
+    return report
+
+
+def print_report(report: Dict):
+    print("\n🏦 Teller Sync Benchmark")
+    print("=" * 96)
+    print(f"{'scenario':<44}{'tx':>8}{'tx/s':>10}{'http':>7}{'429s':>6}{'mongo ops':>11}{'ops/tx':>8}")
+    print("-" * 96)
+    for r in report['results']:
+        print(f"{r['scenario']:<44}{r['transactions']:>8}{r['transactions_per_second'] or 0:>10.1f}"
+              f"{r['http_requests']:>7}{r['rate_limited']:>6}"
+              f"{r.get('mongo_ops', '-'):>11}{r.get('mongo_ops_per_transaction') or '-':>8}")
+    print("=" * 96)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Teller sync paths against a local stand-in')
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--transactions', type=int, default=1000, help='transactions per account')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests per second per client')
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--mtls', action='store_true')
+    parser.add_argument('--mongo-uri', help='write synced transactions to a real (scratch) database')
+    parser.add_argument('--scenario', action='append', choices=['client', 'service', 'sync'])
+    parser.add_argument('--json', help='write the report to this path')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_benchmark(args.accounts, args.transactions, args.latency_ms, args.jitter_ms,
+                           args.rate_limit, args.mtls, args.page_size, args.days,
+                           args.mongo_uri, args.scenario)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
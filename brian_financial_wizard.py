@@ -9,10 +9,14 @@ import json
 import logging
 import requests
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+from ai_rate_governor import get_rate_governor
+from ai_tracing import payload_bytes, record_cache_lookup, trace_call
+from merchant_category_table import get_merchant_table
+
 logger = logging.getLogger(__name__)
 
 class BusinessType(Enum):
@@ -115,8 +119,20 @@ class BrianFinancialWizard:
             description = expense_data.get('description', '').lower()
             date = expense_data.get('date', datetime.now())
             
+            # Merchants already settled by the models or a correction skip them
+            learned = get_merchant_table().lookup('wizard', expense_data.get('merchant'))
+            record_cache_lookup('brian_financial_wizard', 'merchant_category_table', bool(learned), 'expense_analysis')
+            if learned:
+                business_type = learned.business_type or 'Personal'
+                ai_analysis = {
+                    'category': learned.category,
+                    'business_type': business_type,
+                    'purpose': learned.details.get('purpose') or self._generate_purpose(merchant, learned.category, business_type),
+                    'confidence': learned.confidence,
+                    'reasoning': f"Learned from {learned.count} {'correction' if learned.source == 'user' else 'AI answer'}{'s' if learned.count != 1 else ''} for {learned.merchant}"
+                }
             # Use AI analysis if connected
-            if self.connected:
+            elif self.connected:
                 ai_analysis = self._ai_expense_analysis(expense_data)
             else:
                 ai_analysis = self._rule_based_analysis(expense_data)
@@ -178,6 +194,9 @@ class BrianFinancialWizard:
             Response format: JSON
             """
             
+            if not get_rate_governor('huggingface').acquire():
+                return self._rule_based_analysis(expense_data)
+            
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
@@ -192,16 +211,14 @@ class BrianFinancialWizard:
                 }
             }
             
-            response = requests.post(
-                self.model_endpoint,
-                headers=headers,
-                json=payload,
-                timeout=10
-            )
+            response = self._post_model('expense_analysis', headers, payload, timeout=10)
             
             if response.status_code == 200:
-                ai_response = response.json()
-                return self._parse_ai_response(ai_response, expense_data)
+                analysis = self._parse_ai_response(response.json(), expense_data)
+                get_merchant_table().record('wizard', merchant, analysis['category'], analysis['confidence'],
+                                            business_type=analysis['business_type'],
+                                            details={'purpose': analysis['purpose']})
+                return analysis
             else:
                 logger.warning(f"AI API error: {response.status_code}")
                 return self._rule_based_analysis(expense_data)
@@ -506,18 +523,17 @@ class BrianFinancialWizard:
         Generate intelligent chat responses about expenses
         """
         try:
-            message_lower = message.lower()
+            intent = self._chat_intent(message)
             
-            # Analyze intent
-            if any(word in message_lower for word in ['analyze', 'report', 'summary', 'breakdown']):
+            if intent == 'expense_analysis':
                 return self._generate_expense_analysis_response(context)
-            elif any(word in message_lower for word in ['categorize', 'category', 'business']):
+            elif intent == 'categorization':
                 return self._generate_categorization_help_response()
-            elif any(word in message_lower for word in ['down home', 'video', 'production']):
+            elif intent == 'down_home':
                 return self._generate_down_home_response(context)
-            elif any(word in message_lower for word in ['music city', 'rodeo', 'mcr']):
+            elif intent == 'mcr':
                 return self._generate_mcr_response(context)
-            elif any(word in message_lower for word in ['help', 'what', 'how']):
+            elif intent == 'help':
                 return self._generate_help_response()
             else:
                 return self._generate_general_response(message, context)
@@ -530,6 +546,46 @@ class BrianFinancialWizard:
                 'suggestions': ['Show expense summary', 'Categorize transactions', 'Help with business expenses']
             }
     
+    def stream_chat_response(self, message: str, context: Dict = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Streaming chat_response: ('token', {'text'}) events while the model
+        generates, then ('done', response) with the same response chat_response returns
+        """
+        if not self.connected or self._chat_intent(message) != 'general':
+            yield 'done', self.chat_response(message, context)
+            return
+        
+        text = []
+        try:
+            for chunk in self._stream_ai_chat_response(message, context):
+                text.append(chunk)
+                yield 'token', {'text': chunk}
+        except Exception as e:
+            logger.error(f"AI chat stream error: {e}")
+        
+        if not text:
+            yield 'done', self._general_fallback_response(message)
+            return
+        yield 'done', {
+            'message': ''.join(text),
+            'type': 'ai_response',
+            'quick_actions': ['Analyze expenses', 'Show breakdown', 'Help with categorization']
+        }
+    
+    def _chat_intent(self, message: str) -> str:
+        message_lower = message.lower()
+        if any(word in message_lower for word in ['analyze', 'report', 'summary', 'breakdown']):
+            return 'expense_analysis'
+        elif any(word in message_lower for word in ['categorize', 'category', 'business']):
+            return 'categorization'
+        elif any(word in message_lower for word in ['down home', 'video', 'production']):
+            return 'down_home'
+        elif any(word in message_lower for word in ['music city', 'rodeo', 'mcr']):
+            return 'mcr'
+        elif any(word in message_lower for word in ['help', 'what', 'how']):
+            return 'help'
+        return 'general'
+    
     def _generate_expense_analysis_response(self, context: Dict = None) -> Dict:
         """Generate expense analysis response with real data"""
         # In a real implementation, this would query the database
@@ -598,15 +654,16 @@ class BrianFinancialWizard:
             except Exception as e:
                 logger.error(f"AI chat error: {e}")
         
-        # Fallback response
+        return self._general_fallback_response(message)
+    
+    def _general_fallback_response(self, message: str) -> Dict:
         return {
             'message': f"I understand you're asking about: '{message}'\n\nI'm here to help with your Down Home Media and Music City Rodeo expense management. I can analyze spending patterns, categorize transactions, and help with business/personal separation.\n\nWhat would you like me to help you with?",
             'type': 'general',
             'quick_actions': ['Show expense summary', 'Categorize transactions', 'Business breakdown']
         }
     
-    def _get_ai_chat_response(self, message: str, context: Dict = None) -> str:
-        """Get AI response for general conversation"""
+    def _chat_request(self, message: str, context: Dict = None, stream: bool = False) -> Tuple[Dict, Dict]:
         prompt = f"""
         You are Brian's AI financial assistant for Down Home Media (video production) and Music City Rodeo (music/events).
         
@@ -616,6 +673,13 @@ class BrianFinancialWizard:
         Keep responses friendly and specific to Brian's businesses.
         """
         
+        # Ground the answer in the receipts and transactions the message is about
+        related = (context or {}).get('related_records') or []
+        if related:
+            lines = '\n'.join(f"        - {r.get('date') or ''} {r['merchant']}: ${abs(r.get('amount') or 0):,.2f} "
+                              f"({r.get('category') or 'uncategorized'}, {r['source']})" for r in related)
+            prompt += f"\n        Related records:\n{lines}\n"
+        
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -629,13 +693,26 @@ class BrianFinancialWizard:
                 "return_full_text": False
             }
         }
+        if stream:
+            payload["stream"] = True
+        return headers, payload
+    
+    def _post_model(self, operation: str, headers: Dict, payload: Dict, stream: bool = False,
+                    **kwargs) -> requests.Response:
+        """POST to the wizard's hosted model, traced"""
+        with trace_call('brian_financial_wizard', self.model_endpoint.rsplit('/models/', 1)[-1], operation,
+                        request_bytes=payload_bytes(payload)) as call:
+            response = requests.post(self.model_endpoint, headers=headers, json=payload, stream=stream, **kwargs)
+            call.response(response, streamed=stream)
+        return response
+    
+    def _get_ai_chat_response(self, message: str, context: Dict = None) -> str:
+        """Get AI response for general conversation"""
+        if not get_rate_governor('huggingface').acquire():
+            return 'I can help you with expense analysis and categorization for your businesses!'
         
-        response = requests.post(
-            self.model_endpoint,
-            headers=headers,
-            json=payload,
-            timeout=10
-        )
+        headers, payload = self._chat_request(message, context)
+        response = self._post_model('chat', headers, payload, timeout=10)
         
         if response.status_code == 200:
             ai_response = response.json()
@@ -644,6 +721,41 @@ class BrianFinancialWizard:
         
         return 'I can help you with expense analysis and categorization for your businesses!'
     
+    def _stream_ai_chat_response(self, message: str, context: Dict = None) -> Iterator[str]:
+        """Get AI response for general conversation token by token (Inference API server-sent events)"""
+        if not get_rate_governor('huggingface').acquire():
+            yield 'I can help you with expense analysis and categorization for your businesses!'
+            return
+        
+        headers, payload = self._chat_request(message, context, stream=True)
+        # Traced up to the response headers, i.e. the wait before the first token
+        response = self._post_model('chat_stream', headers, payload, stream=True,
+                                    timeout=(5, 30))  # connect, then the longest gap between tokens
+        try:
+            if response.status_code != 200:
+                logger.warning(f"AI chat stream error: {response.status_code}")
+                return
+            
+            if 'text/event-stream' not in response.headers.get('Content-Type', ''):
+                # Models without streaming support answer in one piece
+                ai_response = response.json()
+                if isinstance(ai_response, list) and ai_response and ai_response[0].get('generated_text'):
+                    yield ai_response[0]['generated_text']
+                return
+            
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                event = json.loads(line[5:].strip())
+                if event.get('error'):
+                    logger.warning(f"AI chat stream error: {event['error']}")
+                    return
+                token = event.get('token') or {}
+                if token.get('text') and not token.get('special'):
+                    yield token['text']
+        finally:
+            response.close()
+    
     def learn_from_correction(self, original: ReceiptIntelligence, 
                             corrected_category: str, corrected_business_type: str, 
                             user_feedback: str):
@@ -673,6 +785,9 @@ class BrianFinancialWizard:
                     'confidence': 0.9
                 }
         
+        # Drops what the models taught about this merchant and pins the correction
+        get_merchant_table().correct('wizard', original.merchant, corrected_category, corrected_business_type)
+        
         logger.info(f"🧠 Learning from correction: {original.merchant} → {corrected_category} ({corrected_business_type})")
     
     def get_health_status(self) -> Dict:
@@ -685,6 +800,7 @@ class BrianFinancialWizard:
             'business_rules_loaded': len(self.business_rules) > 0,
             'expense_patterns': len(self.expense_patterns['recurring_subscriptions']),
             'learning_entries': len(self.learning_data),
+            'learned_merchants': get_merchant_table().stats(),
             'capabilities': [
                 'Expense Categorization',
                 'Business Type Detection', 
@@ -6,9 +6,11 @@ Integration with Flask app for comprehensive expense management
 import os
 import json
 import logging
+from concurrent.futures import as_completed
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from brian_financial_wizard import BrianFinancialWizard, ReceiptIntelligence
+from chat_streaming import sse_response, start_lookup, wants_stream
 from email_receipt_detector import EmailReceiptDetector
 
 logger = logging.getLogger(__name__)
@@ -392,6 +394,7 @@ def ultimate_ai_conversation():
     """
     🎙️ ULTIMATE AI CONVERSATION WIZARD
     Natural language expense management - "Would you like to do your expenses..."
+    Streams report progress as server-sent events when the client asks for them
     """
     try:
         data = request.get_json()
@@ -400,6 +403,9 @@ def ultimate_ai_conversation():
         # Parse the conversation context
         conversation_analysis = analyze_user_intent(user_message)
         
+        if wants_stream(request, data):
+            return sse_response(stream_conversation(conversation_analysis))
+        
         # Generate intelligent response based on context
         if conversation_analysis['intent'] == 'expense_report_request':
             return handle_expense_report_conversation(conversation_analysis)
@@ -498,84 +504,46 @@ def analyze_user_intent(message):
         'confidence': 0.9 if date_range else 0.6
     }
 
+def stream_conversation(analysis):
+    """Streaming conversation: report progress as each business finishes, then the full reply"""
+    if analysis['intent'] != 'expense_report_request':
+        handlers = {
+            'missing_receipt_handling': handle_missing_receipt_conversation,
+            'business_separation': handle_business_separation_conversation
+        }
+        handler = handlers.get(analysis['intent'])
+        yield 'done', (handler(analysis) if handler else initiate_expense_conversation()).get_json()
+        return
+    
+    date_range = analysis['date_range']
+    business_types = analysis['business_types']
+    yield 'status', {'ai_message': f"📊 Building {len(business_types)} expense report(s) for {date_range['description']}..."}
+    
+    # The business reports are independent lookups, so they run side by side
+    pending = {start_lookup(generate_business_expense_report, date_range, business_type): business_type
+               for business_type in business_types}
+    reports = {}
+    for future in as_completed(pending):
+        business_type = pending[future]
+        report = reports[business_type] = future.result()
+        yield 'report', {
+            'business_type': business_type,
+            'business_display': business_type.replace('_', ' ').title(),
+            'totals': report.get('totals', {}),
+            'missing_count': len(report.get('missing_receipts', []))
+        }
+    
+    yield 'done', build_expense_report_response(analysis, {bt: reports[bt] for bt in business_types})
+
 def handle_expense_report_conversation(analysis):
     """Handle complete expense report request with dates and business types"""
-    from bson import ObjectId
-    
     try:
-        date_range = analysis['date_range']
-        business_types = analysis['business_types']
-        
         # Generate reports for each business type
-        reports = {}
-        total_missing_receipts = 0
-        
-        for business_type in business_types:
-            report = generate_business_expense_report(date_range, business_type)
-            reports[business_type] = report
-            total_missing_receipts += len(report.get('missing_receipts', []))
-        
-        # Prepare AI response
-        response = {
-            'success': True,
-            'understood': {
-                'date_range': date_range['description'],
-                'business_types': [bt.replace('_', ' ').title() for bt in business_types],
-                'separate_reports': len(business_types) > 1
-            },
-            'reports': reports,
-            'summary': {
-                'total_businesses': len(business_types),
-                'total_missing_receipts': total_missing_receipts,
-                'reports_ready': True
-            }
+        reports = {
+            business_type: generate_business_expense_report(analysis['date_range'], business_type)
+            for business_type in analysis['business_types']
         }
-        
-        # Generate conversational response
-        if total_missing_receipts > 0:
-            response['ai_message'] = f"✅ I've generated your expense reports for {date_range['description']}!\n\n"
-            response['ai_message'] += f"📊 **Reports Created:** {len(business_types)} separate business reports\n"
-            response['ai_message'] += f"⚠️ **Found {total_missing_receipts} missing receipts** - would you like me to:\n"
-            response['ai_message'] += "• Search Gmail for missing receipts?\n"
-            response['ai_message'] += "• Check Google Photos for receipt images?\n" 
-            response['ai_message'] += "• Upload missing receipts manually?\n"
-            response['ai_message'] += "• Generate reports without missing receipts?"
-            
-            response['next_actions'] = [
-                {'action': 'search_gmail', 'label': '📧 Search Gmail for Missing Receipts'},
-                {'action': 'search_photos', 'label': '📷 Search Google Photos'}, 
-                {'action': 'manual_upload', 'label': '📁 Upload Missing Receipts'},
-                {'action': 'generate_anyway', 'label': '📄 Generate Reports Now'}
-            ]
-            
-            # List specific missing receipts
-            response['missing_receipts'] = []
-            for business_type, report in reports.items():
-                for missing in report.get('missing_receipts', [])[:3]:  # Top 3 per business
-                    response['missing_receipts'].append({
-                        'business': business_type.replace('_', ' ').title(),
-                        'merchant': missing.get('merchant_name', 'Unknown'),
-                        'amount': f"${abs(missing.get('amount', 0)):,.2f}",
-                        'date': missing.get('date', '').strftime('%m/%d/%Y') if hasattr(missing.get('date'), 'strftime') else str(missing.get('date', '')),
-                        'suggested_search': f"Search Gmail for '{missing.get('merchant_name', '')}' receipt"
-                    })
-        else:
-            response['ai_message'] = f"🎉 **Perfect!** All receipts found for {date_range['description']}!\n\n"
-            response['ai_message'] += f"📊 **{len(business_types)} Complete Reports Ready**\n"
-            response['ai_message'] += "Would you like me to:\n"
-            response['ai_message'] += "• Export to Google Sheets?\n"
-            response['ai_message'] += "• Generate PDF reports?\n"
-            response['ai_message'] += "• Email reports to your accountant?\n"
-            response['ai_message'] += "• Create tax-ready summaries?"
-            
-            response['next_actions'] = [
-                {'action': 'export_sheets', 'label': '📊 Export to Google Sheets'},
-                {'action': 'generate_pdf', 'label': '📄 Generate PDF Reports'},
-                {'action': 'email_accountant', 'label': '📧 Email to Accountant'},
-                {'action': 'tax_summary', 'label': '🧾 Create Tax Summary'}
-            ]
-        
-        return jsonify(response)
+        return jsonify(build_expense_report_response(analysis, reports))
         
     except Exception as e:
         logger.error(f"Expense report conversation failed: {e}")
@@ -585,6 +553,74 @@ def handle_expense_report_conversation(analysis):
             'ai_message': "I had trouble generating your expense reports. Let me try a different approach - what specific date range do you need?"
         }), 500
 
+def build_expense_report_response(analysis, reports):
+    """Conversation reply for generated business reports"""
+    date_range = analysis['date_range']
+    business_types = analysis['business_types']
+    total_missing_receipts = sum(len(report.get('missing_receipts', [])) for report in reports.values())
+    
+    # Prepare AI response
+    response = {
+        'success': True,
+        'understood': {
+            'date_range': date_range['description'],
+            'business_types': [bt.replace('_', ' ').title() for bt in business_types],
+            'separate_reports': len(business_types) > 1
+        },
+        'reports': reports,
+        'summary': {
+            'total_businesses': len(business_types),
+            'total_missing_receipts': total_missing_receipts,
+            'reports_ready': True
+        }
+    }
+    
+    # Generate conversational response
+    if total_missing_receipts > 0:
+        response['ai_message'] = f"✅ I've generated your expense reports for {date_range['description']}!\n\n"
+        response['ai_message'] += f"📊 **Reports Created:** {len(business_types)} separate business reports\n"
+        response['ai_message'] += f"⚠️ **Found {total_missing_receipts} missing receipts** - would you like me to:\n"
+        response['ai_message'] += "• Search Gmail for missing receipts?\n"
+        response['ai_message'] += "• Check Google Photos for receipt images?\n" 
+        response['ai_message'] += "• Upload missing receipts manually?\n"
+        response['ai_message'] += "• Generate reports without missing receipts?"
+    
+        response['next_actions'] = [
+            {'action': 'search_gmail', 'label': '📧 Search Gmail for Missing Receipts'},
+            {'action': 'search_photos', 'label': '📷 Search Google Photos'}, 
+            {'action': 'manual_upload', 'label': '📁 Upload Missing Receipts'},
+            {'action': 'generate_anyway', 'label': '📄 Generate Reports Now'}
+        ]
+    
+        # List specific missing receipts
+        response['missing_receipts'] = []
+        for business_type, report in reports.items():
+            for missing in report.get('missing_receipts', [])[:3]:  # Top 3 per business
+                response['missing_receipts'].append({
+                    'business': business_type.replace('_', ' ').title(),
+                    'merchant': missing.get('merchant_name', 'Unknown'),
+                    'amount': f"${abs(missing.get('amount', 0)):,.2f}",
+                    'date': missing.get('date', '').strftime('%m/%d/%Y') if hasattr(missing.get('date'), 'strftime') else str(missing.get('date', '')),
+                    'suggested_search': f"Search Gmail for '{missing.get('merchant_name', '')}' receipt"
+                })
+    else:
+        response['ai_message'] = f"🎉 **Perfect!** All receipts found for {date_range['description']}!\n\n"
+        response['ai_message'] += f"📊 **{len(business_types)} Complete Reports Ready**\n"
+        response['ai_message'] += "Would you like me to:\n"
+        response['ai_message'] += "• Export to Google Sheets?\n"
+        response['ai_message'] += "• Generate PDF reports?\n"
+        response['ai_message'] += "• Email reports to your accountant?\n"
+        response['ai_message'] += "• Create tax-ready summaries?"
+    
+        response['next_actions'] = [
+            {'action': 'export_sheets', 'label': '📊 Export to Google Sheets'},
+            {'action': 'generate_pdf', 'label': '📄 Generate PDF Reports'},
+            {'action': 'email_accountant', 'label': '📧 Email to Accountant'},
+            {'action': 'tax_summary', 'label': '🧾 Create Tax Summary'}
+        ]
+    
+    return response
+
 def generate_business_expense_report(date_range, business_type):
     """Generate comprehensive expense report for specific business and date range"""
     try:
@@ -607,46 +643,31 @@ def generate_business_expense_report(date_range, business_type):
             start_date = datetime(datetime.now().year, 1, 1)
             end_date = datetime(datetime.now().year, 12, 31)
         
-        # Query transactions for this business and date range
-        query = {
-            'business_type': business_type,
-            'date': {
-                '$gte': start_date,
-                '$lte': end_date
-            }
-        }
-        
-        transactions = list(db.bank_transactions.find(query).sort('date', -1))
+        # Query the columnar snapshot for this business and date range
+        from transaction_snapshot import get_transaction_snapshot
+        transactions = get_transaction_snapshot(db).select(start_date, end_date, business_type).sort_by_date()
         
         # Calculate totals
-        total_amount = sum(abs(t.get('amount', 0)) for t in transactions)
+        total_amount = transactions.total_abs()
         total_count = len(transactions)
         
         # Find missing receipts (transactions without receipts)
-        missing_receipts = [
-            t for t in transactions 
-            if not t.get('receipt_matched') and t.get('amount', 0) < 0  # Only expenses
-        ]
+        expenses = transactions.expenses()  # Only expenses
+        missing_view = expenses.where(~expenses.matched)
+        missing_receipts = missing_view.records()
         
         # Category breakdown
         categories = {}
-        for t in transactions:
-            cat = t.get('category', 'Uncategorized')
+        for t in transactions.records():
+            cat = t['category']
             if cat not in categories:
                 categories[cat] = {'count': 0, 'amount': 0, 'transactions': []}
             categories[cat]['count'] += 1
-            categories[cat]['amount'] += abs(t.get('amount', 0))
+            categories[cat]['amount'] += abs(t['amount'])
             categories[cat]['transactions'].append(t)
         
         # Monthly breakdown
-        months = {}
-        for t in transactions:
-            if t.get('date'):
-                month_key = t['date'].strftime('%Y-%m') if hasattr(t['date'], 'strftime') else 'unknown'
-                if month_key not in months:
-                    months[month_key] = {'count': 0, 'amount': 0}
-                months[month_key]['count'] += 1
-                months[month_key]['amount'] += abs(t.get('amount', 0))
+        months = transactions.monthly_totals()
         
         return {
             'business_type': business_type,
@@ -656,11 +677,11 @@ def generate_business_expense_report(date_range, business_type):
                 'total_amount': total_amount,
                 'total_count': total_count,
                 'average_transaction': total_amount / total_count if total_count > 0 else 0,
-                'tax_deductible_amount': sum(abs(t.get('amount', 0)) for t in transactions if t.get('tax_deductible', True))
+                'tax_deductible_amount': transactions.total_abs(transactions.tax_deductible)
             },
             'missing_receipts': missing_receipts,
             'missing_count': len(missing_receipts),
-            'missing_amount': sum(abs(r.get('amount', 0)) for r in missing_receipts),
+            'missing_amount': missing_view.total_abs(),
             'categories': categories,
             'monthly_breakdown': months,
             'top_merchants': get_top_merchants(transactions),
@@ -683,17 +704,11 @@ def generate_business_expense_report(date_range, business_type):
 
 def get_top_merchants(transactions):
     """Get top merchants by spending"""
-    merchants = {}
-    for t in transactions:
-        merchant = t.get('merchant_name') or t.get('counterparty', {}).get('name') or 'Unknown'
-        if merchant not in merchants:
-            merchants[merchant] = {'count': 0, 'amount': 0}
-        merchants[merchant]['count'] += 1
-        merchants[merchant]['amount'] += abs(t.get('amount', 0))
+    merchants = transactions.group_totals('merchant')
     
     # Sort by amount and return top 10
     return sorted(
-        [{'merchant': k, **v} for k, v in merchants.items()],
+        [{'merchant': k, 'count': v['count'], 'amount': v['total']} for k, v in merchants.items()],
         key=lambda x: x['amount'],
         reverse=True
     )[:10]
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Chat Context Builder
+Every figure the chat endpoints put in front of the model (30-day business
+and category breakdowns, 7-day spending, month-over-month change, match
+rates, all-time totals) comes from one `$facet` aggregation over
+bank_transactions, run alongside one over receipts. The result is memoized
+per user for CHAT_CONTEXT_TTL seconds, so a burst of chat turns does the
+database work once instead of a dozen queries per message.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TTL = float(os.getenv('CHAT_CONTEXT_TTL', 60))
+BUSINESSES = ['Down Home', 'Music City Rodeo']
+
+_ABS_AMOUNT = {'$abs': '$amount'}
+_IS_EXPENSE = {'$lt': ['$amount', 0]}
+_IS_MATCHED = {'$eq': ['$receipt_matched', True]}
+
+
+def _count_if(condition: Dict) -> Dict:
+    return {'$sum': {'$cond': [condition, 1, 0]}}
+
+
+def _sum_if(condition: Dict, value) -> Dict:
+    return {'$sum': {'$cond': [condition, value, 0]}}
+
+
+@dataclass
+class ChatContext:
+    """Aggregates behind one chat turn; totals are absolute expense amounts"""
+    built_at: datetime
+    transaction_count: int = 0
+    matched_count: int = 0
+    business_total: float = 0.0
+    personal_total: float = 0.0
+    unmatched_business_count: int = 0
+    month_transaction_count: int = 0
+    month_matched_count: int = 0
+    # (business_type, category) -> {'total', 'count'} over the last 30 days
+    month_expenses: Dict[Tuple[Optional[str], Optional[str]], Dict] = field(default_factory=dict)
+    week_total: float = 0.0
+    week_count: int = 0
+    previous_month_total: float = 0.0
+    receipt_count: int = 0
+    month_receipt_count: int = 0
+
+    @property
+    def month_total(self) -> float:
+        return sum(group['total'] for group in self.month_expenses.values())
+
+    def month_totals_by(self, position: int, business_type: str = None) -> Dict[Optional[str], Dict]:
+        """30-day expense totals keyed by business type (0) or category (1)"""
+        totals: Dict[Optional[str], Dict] = {}
+        for key, group in self.month_expenses.items():
+            if business_type is not None and key[0] != business_type:
+                continue
+            entry = totals.setdefault(key[position], {'total': 0.0, 'count': 0})
+            entry['total'] += group['total']
+            entry['count'] += group['count']
+        return totals
+
+
+def transactions_pipeline(now: datetime, base_query: Dict) -> List[Dict]:
+    """Single pass over bank_transactions producing every chat aggregate"""
+    week_start = now - timedelta(days=7)
+    month_start = now - timedelta(days=30)
+    previous_start = now - timedelta(days=60)
+    is_business = {'$in': ['$business_type', BUSINESSES]}
+    return [
+        {'$match': base_query},
+        {'$facet': {
+            'all_time': [{'$group': {
+                '_id': None,
+                'count': {'$sum': 1},
+                'matched': _count_if(_IS_MATCHED),
+                'business_total': _sum_if({'$and': [is_business, _IS_EXPENSE]}, _ABS_AMOUNT),
+                'personal_total': _sum_if({'$and': [{'$eq': ['$business_type', 'Personal']}, _IS_EXPENSE]},
+                                          _ABS_AMOUNT),
+                'unmatched_business': _count_if({'$and': [is_business, _IS_EXPENSE, {'$not': [_IS_MATCHED]}]})
+            }}],
+            'month': [
+                {'$match': {'date': {'$gte': month_start}}},
+                {'$group': {'_id': None, 'count': {'$sum': 1}, 'matched': _count_if(_IS_MATCHED)}}
+            ],
+            'month_expenses': [
+                {'$match': {'date': {'$gte': month_start}, 'amount': {'$lt': 0}}},
+                {'$group': {'_id': {'business_type': '$business_type', 'category': '$category'},
+                            'total': {'$sum': _ABS_AMOUNT}, 'count': {'$sum': 1}}}
+            ],
+            'week_expenses': [
+                {'$match': {'date': {'$gte': week_start}, 'amount': {'$lt': 0}}},
+                {'$group': {'_id': None, 'total': {'$sum': _ABS_AMOUNT}, 'count': {'$sum': 1}}}
+            ],
+            'previous_month_expenses': [
+                {'$match': {'date': {'$gte': previous_start, '$lt': month_start}, 'amount': {'$lt': 0}}},
+                {'$group': {'_id': None, 'total': {'$sum': _ABS_AMOUNT}}}
+            ]
+        }}
+    ]
+
+
+def receipts_pipeline(now: datetime, base_query: Dict) -> List[Dict]:
+    return [
+        {'$match': base_query},
+        {'$facet': {
+            'all_time': [{'$count': 'count'}],
+            'month': [{'$match': {'date': {'$gte': now - timedelta(days=30)}}}, {'$count': 'count'}]
+        }}
+    ]
+
+
+def _first(facet: Dict, name: str) -> Dict:
+    rows = facet.get(name) or []
+    return rows[0] if rows else {}
+
+
+class ChatContextBuilder:
+    """Builds ChatContext from MongoDB and memoizes it per (database, user)"""
+
+    def __init__(self, ttl: float = CONTEXT_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._contexts: Dict[Tuple[str, Optional[str]], Tuple[float, ChatContext]] = {}
+        self._building: Dict[Tuple[str, Optional[str]], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chat-context')
+        self.builds = 0
+        self.hits = 0
+
+    def get(self, db, user_id: Optional[str] = None) -> ChatContext:
+        key = (getattr(db, 'name', str(id(db))), user_id)
+        context = self._fresh(key)
+        if context is not None:
+            return context
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        # One build per user at a time; turns that arrive meanwhile reuse it
+        with building:
+            context = self._fresh(key)
+            if context is not None:
+                return context
+            context = self.build(db, user_id)
+            with self._lock:
+                self._contexts[key] = (self.clock() + self.ttl, context)
+            return context
+
+    def _fresh(self, key) -> Optional[ChatContext]:
+        with self._lock:
+            cached = self._contexts.get(key)
+            if cached and cached[0] > self.clock():
+                self.hits += 1
+                return cached[1]
+        return None
+
+    def build(self, db, user_id: Optional[str] = None) -> ChatContext:
+        now = datetime.utcnow()
+        base_query = {'user_id': user_id} if user_id else {}
+        started = time.perf_counter()
+        receipts = self._executor.submit(lambda: list(db.receipts.aggregate(receipts_pipeline(now, base_query))))
+        transactions = list(db.bank_transactions.aggregate(transactions_pipeline(now, base_query)))
+        receipt_facets = receipts.result()
+
+        facets = transactions[0] if transactions else {}
+        all_time = _first(facets, 'all_time')
+        month = _first(facets, 'month')
+        week = _first(facets, 'week_expenses')
+        receipt_facets = receipt_facets[0] if receipt_facets else {}
+        context = ChatContext(
+            built_at=now,
+            transaction_count=all_time.get('count', 0),
+            matched_count=all_time.get('matched', 0),
+            business_total=all_time.get('business_total', 0.0),
+            personal_total=all_time.get('personal_total', 0.0),
+            unmatched_business_count=all_time.get('unmatched_business', 0),
+            month_transaction_count=month.get('count', 0),
+            month_matched_count=month.get('matched', 0),
+            month_expenses={
+                (group['_id'].get('business_type'), group['_id'].get('category')): {
+                    'total': group['total'], 'count': group['count']}
+                for group in facets.get('month_expenses') or []
+            },
+            week_total=week.get('total', 0.0),
+            week_count=week.get('count', 0),
+            previous_month_total=_first(facets, 'previous_month_expenses').get('total', 0.0),
+            receipt_count=_first(receipt_facets, 'all_time').get('count', 0),
+            month_receipt_count=_first(receipt_facets, 'month').get('count', 0)
+        )
+        self.builds += 1
+        logger.debug(f"💬 Chat context built for {user_id or 'all users'} in {time.perf_counter() - started:.3f}s")
+        return context
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop memoized contexts (one user's, plus the all-users one, or every one)"""
+        with self._lock:
+            for key in list(self._contexts):
+                if user_id is None or key[1] in (user_id, None):
+                    del self._contexts[key]
+
+    def stats(self) -> Dict:
+        return {'builds': self.builds, 'hits': self.hits, 'memoized': len(self._contexts), 'ttl': self.ttl}
+
+
+_builder: Optional[ChatContextBuilder] = None
+_builder_lock = threading.Lock()
+
+
+def get_chat_context_builder() -> ChatContextBuilder:
+    global _builder
+    if _builder is None:
+        with _builder_lock:
+            if _builder is None:
+                _builder = ChatContextBuilder()
+    return _builder
+
+
+def get_chat_context(mongo_client, user_id: Optional[str] = None) -> Optional[ChatContext]:
+    """Memoized context for one chat turn, None when MongoDB is not connected"""
+    if not mongo_client.connected:
+        return None
+    return get_chat_context_builder().get(mongo_client.db, user_id)
+
+
+def invalidate_chat_context(user_id: Optional[str] = None):
+    if _builder is not None:
+        _builder.invalidate(user_id)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events for Chat Endpoints
+Chat endpoints answer with text/event-stream when the client asks for it
+(`Accept: text/event-stream` or `"stream": true` in the body), relaying model
+tokens as they arrive instead of waiting for the whole completion:
+
+    event: status   {"ai_message": "..."}  sent first when the answer needs lookups
+    event: token    {"text": "..."}        one per model token
+    event: report   {...}                  progress for multi-part answers
+    event: done     {...}                  the same body the JSON reply has
+    event: error    {"error": "..."}       the stream ended early
+
+Slow data lookups run on a small shared pool so they overlap the model call.
+"""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+_lookups = ThreadPoolExecutor(max_workers=4, thread_name_prefix='chat-lookup')
+
+
+def start_lookup(fn: Callable, *args, **kwargs) -> Future:
+    """Run a data lookup in the background while the model streams"""
+    return _lookups.submit(fn, *args, **kwargs)
+
+
+def wants_stream(request, data: Dict = None) -> bool:
+    return bool((data or {}).get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+
+def sse_response(events: Iterable[Tuple[str, Any]]):
+    """Flask streaming response for (event, data) pairs; errors end the stream with an error event"""
+    from flask import Response, stream_with_context
+
+    def generate():
+        try:
+            for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            logger.error(f"Chat stream failed: {e}")
+            yield sse_event('error', {'success': False, 'error': 'Chat stream interrupted'})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # keep proxies from holding tokens back
+    })
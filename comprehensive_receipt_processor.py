@@ -33,6 +33,7 @@ from selenium.common.exceptions import WebDriverException
 from url_extractor import URLExtractor
 from enhanced_receipt_extractor import EnhancedReceiptExtractor
 from huggingface_receipt_processor import HuggingFaceReceiptProcessor
+from extraction_cascade import get_extraction_cascade
 
 logger = logging.getLogger(__name__)
 
@@ -116,6 +117,7 @@ class ComprehensiveReceiptProcessor:
         # Initialize components
         self.url_extractor = URLExtractor()
         self.enhanced_extractor = EnhancedReceiptExtractor()
+        self.cascade = get_extraction_cascade()
         
         # Initialize OCR processor with proper error handling
         self.ocr_processor = None
@@ -255,6 +257,12 @@ class ComprehensiveReceiptProcessor:
                 logger.info("Email body doesn't contain receipt content")
                 return None
             
+            # Most receipt emails state merchant, amount and date in plain text
+            receipt_data = self._extract_with_cascade(candidate, gmail_account, "body")
+            if receipt_data and receipt_data.get("resolved"):
+                logger.info("📧 Receipt resolved from email text, skipping screenshot")
+                return receipt_data
+            
             logger.info(f"📸 Screenshotting receipt in email body")
             
             # Create a temporary HTML file for screenshot
@@ -572,107 +580,66 @@ class ComprehensiveReceiptProcessor:
             logger.error(f"Error taking full page screenshot: {e}")
             return None
     
-    def _extract_receipt_from_image(self, image_path: str, candidate: Dict, gmail_account: str) -> Optional[Dict]:
-        """Extract receipt data from image using enhanced extractor"""
-        try:
-            logger.info(f"🔍 Extracting receipt data from image: {image_path}")
-            
-            # Use enhanced extractor instead of OCR
-            extracted_data = self.enhanced_extractor.extract_from_image(image_path, candidate)
-            
-            if extracted_data.merchant or extracted_data.amount > 0:
-                receipt_data = {
-                    "merchant": extracted_data.merchant,
-                    "amount": extracted_data.amount,
-                    "date": extracted_data.date,
-                    "category": extracted_data.category,
-                    "confidence": extracted_data.confidence,
-                    "extraction_method": extracted_data.extraction_method,
-                    "source_type": "image",
-                    "gmail_account": gmail_account,
-                    "message_id": candidate.get("message_id"),
-                    "raw_text": extracted_data.raw_text
-                }
-                
-                logger.info(f"✅ Extracted from image: {extracted_data.merchant} - ${extracted_data.amount} (confidence: {extracted_data.confidence:.2f})")
-                return receipt_data
-            else:
-                logger.info("❌ No useful data extracted from image")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Error extracting receipt from image: {e}")
-            return None
-    
-    def _extract_receipt_from_file(self, file_path: str, candidate: Dict, gmail_account: str) -> Optional[Dict]:
-        """Extract receipt data from downloaded file using enhanced extractor"""
-        try:
-            logger.info(f"🔍 Extracting receipt data from file: {file_path}")
-            
-            # Use enhanced extractor instead of OCR
-            extracted_data = self.enhanced_extractor.extract_from_file(file_path, candidate)
-            
-            if extracted_data.merchant or extracted_data.amount > 0:
-                receipt_data = {
-                    "merchant": extracted_data.merchant,
-                    "amount": extracted_data.amount,
-                    "date": extracted_data.date,
-                    "category": extracted_data.category,
-                    "confidence": extracted_data.confidence,
-                    "extraction_method": extracted_data.extraction_method,
-                    "source_type": "file",
-                    "gmail_account": gmail_account,
-                    "message_id": candidate.get("message_id"),
-                    "raw_text": extracted_data.raw_text,
-                    "file_path": file_path
-                }
-                
-                logger.info(f"✅ Extracted from file: {extracted_data.merchant} - ${extracted_data.amount} (confidence: {extracted_data.confidence:.2f})")
-                return receipt_data
-            else:
-                logger.info("❌ No useful data extracted from file")
-                return None
-            
-        except Exception as e:
-            logger.error(f"Error extracting receipt from file: {e}")
-            return None
+    def _email_data(self, candidate: Dict) -> Dict:
+        return {
+            'subject': candidate.get("subject", ""),
+            'body': candidate.get("body", ""),
+            'from_email': candidate.get("from_email", ""),
+            'date': candidate.get("date", "")
+        }
     
-    def _extract_receipt_fallback(self, candidate: Dict, gmail_account: str, source_type: str) -> Optional[Dict]:
-        """Fallback method to extract receipt data using enhanced extractor"""
+    def _extract_with_cascade(self, candidate: Dict, gmail_account: str, source_type: str,
+                              file_path: Optional[str] = None) -> Optional[Dict]:
+        """Run the extraction cascade (email text first, OCR and models only if still needed)"""
         try:
-            # Use enhanced extractor for email data
-            email_data = {
-                'subject': candidate.get("subject", ""),
-                'body': candidate.get("body", ""),
-                'from_email': candidate.get("from_email", ""),
-                'date': candidate.get("date", "")
-            }
+            result = self.cascade.run(email=self._email_data(candidate), file_path=file_path)
+            merchant, amount = result.value('merchant', ''), result.value('amount', 0.0)
             
-            extracted_data = self.enhanced_extractor.extract_from_email(email_data)
-            
-            if extracted_data.merchant or extracted_data.amount > 0:
+            if merchant or amount > 0:
                 receipt_data = {
-                    "merchant": extracted_data.merchant,
-                    "amount": extracted_data.amount,
-                    "date": extracted_data.date,
-                    "category": extracted_data.category,
-                    "confidence": extracted_data.confidence,
-                    "extraction_method": extracted_data.extraction_method,
+                    "merchant": merchant,
+                    "amount": amount,
+                    "date": result.value('date', ''),
+                    "category": "",
+                    "confidence": result.confidence,
+                    "extraction_method": result.method,
+                    "resolved": result.resolved,
+                    "tiers_tried": [t['tier'] for t in result.tiers_tried],
                     "source_type": source_type,
                     "gmail_account": gmail_account,
                     "message_id": candidate.get("message_id"),
-                    "raw_text": extracted_data.raw_text
+                    "raw_text": result.raw_text
                 }
+                if file_path:
+                    receipt_data["file_path"] = file_path
                 
-                logger.info(f"📄 Enhanced extraction: {extracted_data.merchant} - ${extracted_data.amount} (confidence: {extracted_data.confidence:.2f})")
+                logger.info(f"✅ Extracted via {result.method}: {merchant} - ${amount} (confidence: {result.confidence:.2f})")
                 return receipt_data
             
+            logger.info(f"❌ No useful data extracted ({source_type})")
             return None
             
         except Exception as e:
-            logger.error(f"Error in enhanced fallback extraction: {e}")
+            logger.error(f"Error extracting receipt ({source_type}): {e}")
             return None
     
+    def _extract_receipt_from_image(self, image_path: str, candidate: Dict, gmail_account: str) -> Optional[Dict]:
+        """Extract receipt data from an image, OCR only when the email text is not enough"""
+        logger.info(f"🔍 Extracting receipt data from image: {image_path}")
+        receipt_data = self._extract_with_cascade(candidate, gmail_account, "image", image_path)
+        if receipt_data:
+            receipt_data.pop("file_path", None)
+        return receipt_data
+    
+    def _extract_receipt_from_file(self, file_path: str, candidate: Dict, gmail_account: str) -> Optional[Dict]:
+        """Extract receipt data from a downloaded file (PDF text layer before OCR)"""
+        logger.info(f"🔍 Extracting receipt data from file: {file_path}")
+        return self._extract_with_cascade(candidate, gmail_account, "file", file_path)
+    
+    def _extract_receipt_fallback(self, candidate: Dict, gmail_account: str, source_type: str) -> Optional[Dict]:
+        """Fallback method to extract receipt data from the email alone"""
+        return self._extract_with_cascade(candidate, gmail_account, source_type)
+    
     def _match_and_save_receipt(self, receipt_data: Dict, transactions: List[Dict], results: Dict) -> Optional[ReceiptMatch]:
         """Match receipt to transaction and save to database"""
         try:
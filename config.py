@@ -119,6 +119,10 @@ class Config:
     
     # Conservative AI Usage
     AI_BATCH_DELAY = float(os.environ.get('AI_BATCH_DELAY', 1.0))  # 1 second delay between AI calls
+    AI_RATE_PER_SECOND = float(os.environ.get('AI_RATE_PER_SECOND', 1.0 / AI_BATCH_DELAY if AI_BATCH_DELAY > 0 else 0))  # Shared token bucket refill, all workers
+    AI_RATE_BURST = int(os.environ.get('AI_RATE_BURST', 5))  # Calls allowed back to back when the bucket is full
+    AI_GOVERNOR_LEASE = int(os.environ.get('AI_GOVERNOR_LEASE', 5))  # Calls each process reserves per MongoDB round trip
+    AI_MAX_WAIT_SECONDS = float(os.environ.get('AI_MAX_WAIT_SECONDS', 30))  # Longest wait for a token before falling back to rules
     FALLBACK_TO_RULES_THRESHOLD = float(os.environ.get('FALLBACK_TO_RULES_THRESHOLD', 0.8))  # Fall back to rules at 80% usage
     
     # API Rate Limiting
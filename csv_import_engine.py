@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Streaming CSV Import Engine
+Parses bank CSV exports row by row, normalizes amounts and dates,
+deduplicates against existing transactions and bulk inserts in batches
+"""
+
+import csv
+import hashlib
+import io
+import logging
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Column mappings for the bank exports we see in practice. Each mapping names
+# the CSV header for every normalized field; 'amount_sign' flips the sign for
+# banks that export charges as positive numbers. 'detect' lists columns only
+# that bank's export has, so a plain Date/Description/Amount file stays generic.
+BANK_COLUMN_MAPPINGS = {
+    'chase': {
+        'date': 'Transaction Date',
+        'post_date': 'Post Date',
+        'description': 'Description',
+        'category': 'Category',
+        'type': 'Type',
+        'amount': 'Amount',
+        'memo': 'Memo',
+        'amount_sign': 1
+    },
+    'amex': {
+        'date': 'Date',
+        'description': 'Description',
+        'category': 'Category',
+        'amount': 'Amount',
+        'memo': 'Extended Details',
+        'amount_sign': -1,
+        'detect': ['Extended Details']
+    },
+    'capital_one': {
+        'date': 'Transaction Date',
+        'post_date': 'Posted Date',
+        'description': 'Description',
+        'category': 'Category',
+        'debit': 'Debit',
+        'credit': 'Credit',
+        'amount_sign': 1
+    },
+    'bank_of_america': {
+        'date': 'Posted Date',
+        'description': 'Payee',
+        'amount': 'Amount',
+        'memo': 'Reference Number',
+        'amount_sign': 1
+    },
+    'generic': {
+        'date': 'Date',
+        'description': 'Description',
+        'category': 'Category',
+        'amount': 'Amount',
+        'amount_sign': 1
+    }
+}
+
+DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%m/%d/%y', '%m-%d-%Y', '%d %b %Y', '%b %d, %Y']
+
+_AMOUNT_CLEANUP = re.compile(r'[$,\s]')
+
+
+@dataclass
+class ImportProgress:
+    """Running totals for a CSV import, reported after every batch"""
+    job_id: str
+    bank_format: str = 'generic'
+    rows_read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    skipped: int = 0
+    batches: int = 0
+    errors: List[str] = field(default_factory=list)
+    started_at: float = field(default_factory=time.time)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.time() - self.started_at
+
+    def to_dict(self) -> Dict:
+        elapsed = self.elapsed_seconds
+        return {
+            'job_id': self.job_id,
+            'bank_format': self.bank_format,
+            'processed_rows': self.rows_read,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'skipped': self.skipped,
+            'batches': self.batches,
+            'errors': self.errors[:20],
+            'error_count': len(self.errors),
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows_read / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+
+def detect_bank_format(header: List[str]) -> str:
+    """Pick the column mapping whose required headers all appear in the CSV header"""
+    columns = {h.strip() for h in header}
+    for bank, mapping in BANK_COLUMN_MAPPINGS.items():
+        required = [mapping['date'], mapping['description']]
+        required += [mapping['debit'], mapping['credit']] if 'debit' in mapping else [mapping['amount']]
+        required += mapping.get('detect', [])
+        if all(col in columns for col in required):
+            return bank
+    return 'generic'
+
+
+def parse_amount(value: str) -> Optional[float]:
+    """Parse '$1,234.56', '(12.00)' and '-12.00' style amounts"""
+    if value is None:
+        return None
+    cleaned = _AMOUNT_CLEANUP.sub('', value)
+    if not cleaned:
+        return None
+    negative = cleaned.startswith('(') and cleaned.endswith(')')
+    if negative:
+        cleaned = cleaned[1:-1]
+    try:
+        amount = float(cleaned)
+    except ValueError:
+        return None
+    return -amount if negative else amount
+
+
+class CSVImportEngine:
+    """Streaming CSV importer for bank_transactions with hash-based deduplication"""
+
+    def __init__(self, db, batch_size: int = 1000, collection_name: str = 'bank_transactions'):
+        self.db = db
+        self.collection = db[collection_name]
+        self.batch_size = max(1, batch_size)
+        # Multi-year exports repeat the same few thousand date strings, so
+        # parsing each one once is most of the date cost saved
+        self._date_cache: Dict[str, Optional[datetime]] = {}
+        self._date_format: Optional[str] = None
+
+    def ensure_indexes(self):
+        """Create the hash index used for dedup lookups"""
+        try:
+            self.collection.create_index([('import_hash', 1)], unique=True, sparse=True)
+        except Exception as e:
+            logger.warning(f"Could not create import_hash index: {e}")
+
+    # ------------------------------------------------------------------
+    # Parsing
+    # ------------------------------------------------------------------
+
+    def parse_date(self, value: str) -> Optional[datetime]:
+        """Parse a date string, remembering the format that worked last"""
+        value = (value or '').strip()
+        if value in self._date_cache:
+            return self._date_cache[value]
+
+        parsed = None
+        formats = [self._date_format] + DATE_FORMATS if self._date_format else DATE_FORMATS
+        for fmt in formats:
+            try:
+                parsed = datetime.strptime(value, fmt)
+                self._date_format = fmt
+                break
+            except ValueError:
+                continue
+
+        self._date_cache[value] = parsed
+        return parsed
+
+    def normalize_row(self, row: Dict[str, str], mapping: Dict) -> Optional[Dict]:
+        """Map a raw CSV row onto bank_transactions fields"""
+        date = self.parse_date(row.get(mapping['date'], ''))
+        if date is None:
+            return None
+
+        if 'debit' in mapping:
+            debit = parse_amount(row.get(mapping['debit'], '')) or 0.0
+            credit = parse_amount(row.get(mapping['credit'], '')) or 0.0
+            amount = credit - abs(debit)
+        else:
+            amount = parse_amount(row.get(mapping['amount'], ''))
+            if amount is None:
+                return None
+        amount = round(amount * mapping.get('amount_sign', 1), 2)
+
+        description = ' '.join((row.get(mapping['description']) or '').split())
+        transaction = {
+            'date': date,
+            'amount': amount,
+            'description': description,
+            'merchant': description,
+            'category': (row.get(mapping.get('category', '')) or '').strip() or 'Uncategorized',
+            'source': 'csv_upload'
+        }
+        if 'post_date' in mapping:
+            transaction['post_date'] = self.parse_date(row.get(mapping['post_date'], ''))
+        if 'type' in mapping:
+            transaction['type'] = (row.get(mapping['type']) or '').strip()
+        if 'memo' in mapping:
+            transaction['memo'] = (row.get(mapping['memo']) or '').strip()
+        return transaction
+
+    @staticmethod
+    def compute_hash(transaction: Dict, user_id: str, account_name: str, occurrence: int) -> str:
+        """Stable fingerprint for a transaction.
+
+        The occurrence counter keeps two genuinely identical purchases on the
+        same day distinct while still mapping the n-th copy to the same hash
+        when the file is imported again.
+        """
+        key = '|'.join([
+            user_id or '',
+            account_name or '',
+            transaction['date'].strftime('%Y-%m-%d'),
+            f"{int(round(transaction['amount'] * 100))}",
+            transaction['description'].upper(),
+            str(occurrence)
+        ])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def iter_transactions(self, stream: Iterable[str], progress: ImportProgress,
+                          bank_format: Optional[str] = None, user_id: str = None,
+                          account_name: str = None) -> Iterator[Dict]:
+        """Yield normalized transactions from a text stream without buffering the file"""
+        reader = csv.reader(stream)
+        try:
+            header = [h.strip() for h in next(reader)]
+        except StopIteration:
+            return
+
+        bank = bank_format if bank_format in BANK_COLUMN_MAPPINGS else detect_bank_format(header)
+        progress.bank_format = bank
+        mapping = BANK_COLUMN_MAPPINGS[bank]
+        occurrences: Dict[tuple, int] = {}
+        imported_at = datetime.utcnow()
+
+        for line_number, values in enumerate(reader, start=2):
+            if not values or not any(v.strip() for v in values):
+                continue
+            progress.rows_read += 1
+            row = dict(zip(header, values))
+            try:
+                transaction = self.normalize_row(row, mapping)
+                reason = 'missing or invalid date/amount'
+            except Exception as e:
+                transaction, reason = None, str(e)
+            if transaction is None:
+                progress.skipped += 1
+                if len(progress.errors) < 100:
+                    progress.errors.append(f"Line {line_number}: {reason}")
+                continue
+
+            dedup_key = (transaction['date'], transaction['amount'], transaction['description'].upper())
+            occurrence = occurrences.get(dedup_key, 0)
+            occurrences[dedup_key] = occurrence + 1
+
+            transaction['import_hash'] = self.compute_hash(transaction, user_id, account_name, occurrence)
+            transaction['transaction_id'] = f"csv_{transaction['import_hash'][:16]}"
+            transaction['imported_at'] = imported_at
+            transaction['import_job_id'] = progress.job_id
+            if user_id:
+                transaction['user_id'] = user_id
+            if account_name:
+                transaction['account_name'] = account_name
+            yield transaction
+
+    # ------------------------------------------------------------------
+    # Import
+    # ------------------------------------------------------------------
+
+    def import_stream(self, stream: Iterable[str], bank_format: Optional[str] = None,
+                      user_id: str = None, account_name: str = None,
+                      progress_callback: Optional[Callable[[ImportProgress], None]] = None) -> Dict:
+        """Import a text stream of CSV rows and return the final progress summary"""
+        progress = ImportProgress(job_id=str(uuid.uuid4()))
+        self.ensure_indexes()
+        self._record_job(progress, 'running')
+
+        batch: List[Dict] = []
+        try:
+            for transaction in self.iter_transactions(stream, progress, bank_format, user_id, account_name):
+                batch.append(transaction)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch, progress, progress_callback)
+                    batch = []
+            if batch:
+                self._flush(batch, progress, progress_callback)
+        except Exception as e:
+            logger.error(f"CSV import {progress.job_id} failed: {e}")
+            progress.errors.append(str(e))
+            self._record_job(progress, 'failed')
+            raise
+
+        self._record_job(progress, 'completed')
+        summary = progress.to_dict()
+        logger.info(f"📥 CSV import {progress.job_id} ({progress.bank_format}): "
+                    f"{progress.inserted} inserted, {progress.duplicates} duplicates, "
+                    f"{progress.skipped} skipped in {summary['elapsed_seconds']}s")
+        return summary
+
+    def import_file(self, file_obj, **kwargs) -> Dict:
+        """Import from a binary file object (e.g. a Werkzeug FileStorage stream)"""
+        text_stream = io.TextIOWrapper(file_obj, encoding='utf-8-sig', errors='replace', newline='')
+        try:
+            return self.import_stream(text_stream, **kwargs)
+        finally:
+            # Don't let the wrapper close the caller's underlying stream
+            text_stream.detach()
+
+    def import_path(self, path: str, **kwargs) -> Dict:
+        """Import from a CSV file on disk"""
+        with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as handle:
+            return self.import_stream(handle, **kwargs)
+
+    def _flush(self, batch: List[Dict], progress: ImportProgress,
+               progress_callback: Optional[Callable[[ImportProgress], None]]):
+        """Drop rows whose hash already exists, then bulk insert the rest"""
+        hashes = [t['import_hash'] for t in batch]
+        existing = {
+            doc['import_hash']
+            for doc in self.collection.find({'import_hash': {'$in': hashes}}, {'import_hash': 1, '_id': 0})
+        }
+        new_rows = [t for t in batch if t['import_hash'] not in existing]
+        progress.duplicates += len(batch) - len(new_rows)
+
+        if new_rows:
+            try:
+                result = self.collection.insert_many(new_rows, ordered=False)
+                progress.inserted += len(result.inserted_ids)
+            except Exception as e:
+                # A concurrent import may have inserted some of the same hashes;
+                # the unique index rejects those and everything else still lands
+                details = getattr(e, 'details', None) or {}
+                inserted = details.get('nInserted')
+                if inserted is None:
+                    raise
+                progress.inserted += inserted
+                progress.duplicates += len(new_rows) - inserted
+
+        progress.batches += 1
+        self._record_job(progress, 'running')
+        if progress_callback:
+            progress_callback(progress)
+
+    def _record_job(self, progress: ImportProgress, status: str):
+        """Persist job progress so the UI can poll long imports"""
+        try:
+            self.db.csv_import_jobs.update_one(
+                {'job_id': progress.job_id},
+                {'$set': {**progress.to_dict(), 'status': status, 'updated_at': datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.debug(f"Could not record CSV import progress: {e}")
@@ -7,10 +7,26 @@ Brian's Financial Assistant with actual intelligence and context
 from flask import jsonify, request
 from datetime import datetime, timedelta
 import logging
+import re
 from typing import Dict, List, Any, Optional
 
+from chat_context import get_chat_context
+from chat_streaming import sse_response, start_lookup, wants_stream
+from semantic_index import document_ids, get_semantic_index, search_fresh
+
 logger = logging.getLogger(__name__)
 
+# Question words add nothing to a merchant / description match
+GROUNDING_STOPWORDS = {
+    'a', 'an', 'and', 'at', 'did', 'do', 'for', 'from', 'how', 'i', 'in', 'is', 'it', 'last', 'me', 'much',
+    'my', 'of', 'on', 'show', 'spend', 'spent', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'with'
+}
+
+RELATED_RECORD_PROJECTION = {
+    'merchant_name': 1, 'merchant': 1, 'counterparty.name': 1, 'description': 1,
+    'amount': 1, 'total_amount': 1, 'date': 1, 'category': 1
+}
+
 def register_enhanced_chat_api(app, mongo_client):
     """Register enhanced chat API endpoints with real AI"""
     
@@ -18,6 +34,7 @@ def register_enhanced_chat_api(app, mongo_client):
     def enhanced_ai_chat():
         """
         Enhanced AI chat with real business intelligence
+        Streams model tokens as server-sent events when the client asks for them
         """
         try:
             data = request.get_json() or {}
@@ -35,6 +52,13 @@ def register_enhanced_chat_api(app, mongo_client):
                 from brian_financial_wizard import BrianFinancialWizard
                 wizard = BrianFinancialWizard()
                 
+                # Receipts and transactions the message is about, for grounding
+                related_records = _related_records(mongo_client, message)
+                context = {**context, 'related_records': related_records}
+                
+                if wants_stream(request, data):
+                    return sse_response(_stream_chat_turn(wizard, message, context, mongo_client))
+                
                 # Get real financial context
                 financial_context = _get_financial_context(mongo_client)
                 
@@ -45,7 +69,7 @@ def register_enhanced_chat_api(app, mongo_client):
                 })
                 
                 # Enhance response with real-time data
-                enhanced_response = _enhance_response_with_data(response, mongo_client, message)
+                enhanced_response = _enhance_response_with_data(response, mongo_client, message, related_records)
                 
                 return jsonify({
                     'success': True,
@@ -132,100 +156,122 @@ def register_enhanced_chat_api(app, mongo_client):
                 'error': str(e)
             }), 500
 
+def _stream_chat_turn(wizard, message: str, context: Dict, mongo_client):
+    """Relay model tokens while the chat context aggregation runs in the background"""
+    lookup = start_lookup(get_chat_context, mongo_client)
+    
+    response = None
+    for event, payload in wizard.stream_chat_response(message, context):
+        if event == 'token':
+            yield event, payload
+        else:
+            response = payload
+    
+    try:
+        lookup.result()
+    except Exception as e:
+        logger.error(f"Chat context lookup error: {e}")
+    
+    yield 'done', {
+        'success': True,
+        'response': _enhance_response_with_data(response, mongo_client, message, context.get('related_records')),
+        'ai_powered': True,
+        'context_used': True,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
 def _get_financial_context(mongo_client) -> Dict:
     """Get comprehensive financial context for AI responses"""
     try:
-        if not mongo_client.connected:
+        context = get_chat_context(mongo_client)
+        if context is None:
             return _empty_financial_context()
         
-        # Last 30 days of data
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
-        
-        # Get transaction counts and totals
-        total_transactions = mongo_client.db.bank_transactions.count_documents({
-            'date': {'$gte': start_date}
-        })
-        
-        total_receipts = mongo_client.db.receipts.count_documents({
-            'date': {'$gte': start_date}
-        })
-        
-        # Business breakdown
-        business_pipeline = [
-            {'$match': {
-                'date': {'$gte': start_date},
-                'amount': {'$lt': 0}
-            }},
-            {'$group': {
-                '_id': '$business_type',
-                'total': {'$sum': {'$abs': '$amount'}},
-                'count': {'$sum': 1}
-            }}
-        ]
-        
-        business_results = list(mongo_client.db.bank_transactions.aggregate(business_pipeline))
+        # Business breakdown and top categories over the last 30 days
         business_breakdown = {
-            result['_id'] or 'Unknown': {
-                'total': round(result['total'], 2),
-                'count': result['count']
+            business_type or 'Unknown': {
+                'total': round(group['total'], 2),
+                'count': group['count']
             }
-            for result in business_results
+            for business_type, group in context.month_totals_by(0).items()
         }
         
-        # Top categories
-        category_pipeline = [
-            {'$match': {
-                'date': {'$gte': start_date},
-                'amount': {'$lt': 0}
-            }},
-            {'$group': {
-                '_id': '$category',
-                'total': {'$sum': {'$abs': '$amount'}},
-                'count': {'$sum': 1}
-            }},
-            {'$sort': {'total': -1}},
-            {'$limit': 5}
-        ]
-        
-        category_results = list(mongo_client.db.bank_transactions.aggregate(category_pipeline))
+        categories = sorted(context.month_totals_by(1).items(), key=lambda item: item[1]['total'], reverse=True)
         top_categories = [
             {
-                'category': result['_id'] or 'Uncategorized',
-                'total': round(result['total'], 2),
-                'count': result['count']
+                'category': category or 'Uncategorized',
+                'total': round(group['total'], 2),
+                'count': group['count']
             }
-            for result in category_results
+            for category, group in categories[:5]
         ]
         
         # Match rate
-        matched_transactions = mongo_client.db.bank_transactions.count_documents({
-            'date': {'$gte': start_date},
-            'receipt_matched': True
-        })
-        
-        match_rate = (matched_transactions / max(total_transactions, 1)) * 100
+        total_transactions = context.month_transaction_count
+        match_rate = (context.month_matched_count / max(total_transactions, 1)) * 100
         
         return {
             'has_data': total_transactions > 0,
             'total_transactions': total_transactions,
-            'total_receipts': total_receipts,
+            'total_receipts': context.month_receipt_count,
             'match_rate': round(match_rate, 1),
             'business_breakdown': business_breakdown,
             'top_categories': top_categories,
             'period': '30 days',
-            'last_updated': datetime.utcnow().isoformat()
+            'last_updated': context.built_at.isoformat()
         }
         
     except Exception as e:
         logger.error(f"Financial context error: {e}")
         return _empty_financial_context()
 
-def _enhance_response_with_data(response: Dict, mongo_client, message: str) -> Dict:
+def _related_records(mongo_client, message: str, limit: int = 5) -> List[Dict]:
+    """Receipts and transactions closest to the message: the semantic index plus rows added since its build"""
+    try:
+        index = get_semantic_index()
+        query = ' '.join(w for w in re.findall(r'[a-z0-9]+', message.lower()) if w not in GROUNDING_STOPWORDS)
+        if index is None or not mongo_client.connected or not query:
+            return []
+        
+        hits = search_fresh(mongo_client.db, index, query, k=limit)
+        docs = {}
+        for collection in {hit.collection for hit in hits}:
+            ids = document_ids(hit for hit in hits if hit.collection == collection)
+            for doc in mongo_client.db[collection].find({'_id': {'$in': ids}}, RELATED_RECORD_PROJECTION):
+                docs[(collection, str(doc['_id']))] = doc
+        
+        related = []
+        for hit in hits:
+            doc = docs.get((hit.collection, hit.id))
+            if doc is None:
+                continue
+            counterparty = doc.get('counterparty') if isinstance(doc.get('counterparty'), dict) else {}
+            date = doc.get('date')
+            related.append({
+                'source': hit.collection,
+                'id': hit.id,
+                'merchant': (doc.get('merchant_name') or doc.get('merchant') or counterparty.get('name')
+                             or (doc.get('description') or '')[:40] or 'Unknown'),
+                'amount': doc.get('amount', doc.get('total_amount')),
+                'date': date.strftime('%Y-%m-%d') if hasattr(date, 'strftime') else date,
+                'category': doc.get('category'),
+                'score': round(hit.score, 3)
+            })
+        return related
+        
+    except Exception as e:
+        logger.error(f"Related records error: {e}")
+        return []
+
+def _enhance_response_with_data(response: Dict, mongo_client, message: str,
+                                related_records: Optional[List[Dict]] = None) -> Dict:
     """Enhance AI response with real-time data"""
     try:
         message_lower = message.lower()
         
+        if related_records:
+            response.setdefault('data', {})['related_records'] = related_records
+        
         # Add real data based on message intent
         if any(word in message_lower for word in ['spending', 'total', 'amount', 'cost']):
             # Add recent spending data
@@ -330,41 +376,22 @@ def _get_detailed_financial_data(mongo_client, days: int, business_filter: str)
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        query = {'date': {'$gte': start_date, '$lte': end_date}}
-        if business_filter != 'all':
-            query['business_type'] = business_filter
-        
-        # Get transactions
-        transactions = list(mongo_client.db.bank_transactions.find(query))
-        expenses = [t for t in transactions if t.get('amount', 0) < 0]
+        # Read from the columnar snapshot instead of pulling full documents
+        from transaction_snapshot import get_transaction_snapshot
+        transactions = get_transaction_snapshot(mongo_client.db).select(start_date, end_date, business_filter)
+        expenses = transactions.expenses()
         
         # Calculate totals
-        total_spent = sum(abs(t.get('amount', 0)) for t in expenses)
+        total_spent = expenses.total_abs()
         
         # Business breakdown
-        business_totals = {}
-        for expense in expenses:
-            btype = expense.get('business_type', 'Unknown')
-            if btype not in business_totals:
-                business_totals[btype] = 0
-            business_totals[btype] += abs(expense.get('amount', 0))
+        business_totals = {name: totals['total'] for name, totals in expenses.group_totals('business_type').items()}
         
         # Category breakdown
-        category_totals = {}
-        for expense in expenses:
-            category = expense.get('category', 'Uncategorized')
-            if category not in category_totals:
-                category_totals[category] = 0
-            category_totals[category] += abs(expense.get('amount', 0))
+        category_totals = {name: totals['total'] for name, totals in expenses.group_totals('category').items()}
         
         # Top merchants
-        merchant_totals = {}
-        for expense in expenses:
-            merchant = expense.get('merchant_name') or expense.get('description', 'Unknown')[:30]
-            if merchant not in merchant_totals:
-                merchant_totals[merchant] = {'total': 0, 'count': 0}
-            merchant_totals[merchant]['total'] += abs(expense.get('amount', 0))
-            merchant_totals[merchant]['count'] += 1
+        merchant_totals = expenses.group_totals('merchant')
         
         top_merchants = sorted(merchant_totals.items(), key=lambda x: x[1]['total'], reverse=True)[:10]
         
@@ -619,25 +646,16 @@ def _empty_financial_context() -> Dict:
 def _get_recent_spending(mongo_client) -> Dict:
     """Get recent spending summary"""
     try:
-        if not mongo_client.connected:
+        context = get_chat_context(mongo_client)
+        if context is None:
             return {}
         
         # Last 7 days
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=7)
-        
-        recent_expenses = list(mongo_client.db.bank_transactions.find({
-            'date': {'$gte': start_date},
-            'amount': {'$lt': 0}
-        }))
-        
-        total_recent = sum(abs(t.get('amount', 0)) for t in recent_expenses)
-        
         return {
             'recent_7_days': {
-                'total': round(total_recent, 2),
-                'count': len(recent_expenses),
-                'daily_avg': round(total_recent / 7, 2)
+                'total': round(context.week_total, 2),
+                'count': context.week_count,
+                'daily_avg': round(context.week_total / 7, 2)
             }
         }
         
@@ -648,32 +666,18 @@ def _get_recent_spending(mongo_client) -> Dict:
 def _get_business_specific_data(mongo_client, business_type: str) -> Dict:
     """Get data specific to a business"""
     try:
-        if not mongo_client.connected:
+        context = get_chat_context(mongo_client)
+        if context is None:
             return {}
         
-        # Last 30 days
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
-        
-        business_expenses = list(mongo_client.db.bank_transactions.find({
-            'date': {'$gte': start_date},
-            'amount': {'$lt': 0},
-            'business_type': business_type
-        }))
-        
-        total_business = sum(abs(t.get('amount', 0)) for t in business_expenses)
-        
-        # Category breakdown for this business
-        categories = {}
-        for expense in business_expenses:
-            category = expense.get('category', 'Uncategorized')
-            if category not in categories:
-                categories[category] = 0
-            categories[category] += abs(expense.get('amount', 0))
+        # Category breakdown for this business over the last 30 days
+        groups = context.month_totals_by(1, business_type)
+        categories = {category or 'Uncategorized': round(group['total'], 2) for category, group in groups.items()}
+        total_business = sum(group['total'] for group in groups.values())
         
         return {
             'total_30_days': round(total_business, 2),
-            'transaction_count': len(business_expenses),
+            'transaction_count': sum(group['count'] for group in groups.values()),
             'categories': categories,
             'monthly_projection': round(total_business, 2)  # Already 30 days
         }
@@ -685,20 +689,17 @@ def _get_business_specific_data(mongo_client, business_type: str) -> Dict:
 def _get_receipt_matching_data(mongo_client) -> Dict:
     """Get receipt matching statistics"""
     try:
-        if not mongo_client.connected:
+        context = get_chat_context(mongo_client)
+        if context is None:
             return {}
         
-        total_transactions = mongo_client.db.bank_transactions.count_documents({})
-        matched_transactions = mongo_client.db.bank_transactions.count_documents({
-            'receipt_matched': True
-        })
-        
-        total_receipts = mongo_client.db.receipts.count_documents({})
+        total_transactions = context.transaction_count
+        matched_transactions = context.matched_count
         
         return {
             'total_transactions': total_transactions,
             'matched_transactions': matched_transactions,
-            'total_receipts': total_receipts,
+            'total_receipts': context.receipt_count,
             'match_rate': round((matched_transactions / max(total_transactions, 1)) * 100, 1),
             'unmatched_count': total_transactions - matched_transactions
         }
@@ -712,12 +713,13 @@ def _generate_smart_actions(mongo_client, message: str) -> List[str]:
     actions = []
     
     try:
-        if not mongo_client.connected:
+        context = get_chat_context(mongo_client)
+        if context is None:
             return ['Connect database', 'Upload receipts', 'Scan emails']
         
         # Check data availability
-        transaction_count = mongo_client.db.bank_transactions.count_documents({})
-        receipt_count = mongo_client.db.receipts.count_documents({})
+        transaction_count = context.transaction_count
+        receipt_count = context.receipt_count
         
         if transaction_count == 0:
             actions.extend(['Connect banks', 'Import CSV', 'Upload receipts'])
@@ -743,7 +745,8 @@ def _generate_smart_actions(mongo_client, message: str) -> List[str]:
 def _get_basic_financial_summary(mongo_client) -> Dict:
     """Get basic financial summary for fallback mode"""
     try:
-        if not mongo_client.connected:
+        context = get_chat_context(mongo_client)
+        if context is None:
             return {
                 'total_transactions': 0,
                 'business_total': 0,
@@ -752,29 +755,11 @@ def _get_basic_financial_summary(mongo_client) -> Dict:
                 'has_data': False
             }
         
-        # Get basic counts and totals
-        total_transactions = mongo_client.db.bank_transactions.count_documents({})
-        
-        # Business vs personal totals
-        business_total = 0
-        personal_total = 0
-        
-        business_expenses = list(mongo_client.db.bank_transactions.find({
-            'business_type': {'$in': ['Down Home', 'Music City Rodeo']},
-            'amount': {'$lt': 0}
-        }))
-        
-        personal_expenses = list(mongo_client.db.bank_transactions.find({
-            'business_type': 'Personal',
-            'amount': {'$lt': 0}
-        }))
-        
-        business_total = sum(abs(t.get('amount', 0)) for t in business_expenses)
-        personal_total = sum(abs(t.get('amount', 0)) for t in personal_expenses)
-        
-        # Match rate
-        matched = mongo_client.db.bank_transactions.count_documents({'receipt_matched': True})
-        match_rate = (matched / max(total_transactions, 1)) * 100
+        # Business vs personal totals and match rate across all transactions
+        total_transactions = context.transaction_count
+        business_total = context.business_total
+        personal_total = context.personal_total
+        match_rate = (context.matched_count / max(total_transactions, 1)) * 100
         
         return {
             'total_transactions': total_transactions,
@@ -797,39 +782,21 @@ def _get_basic_financial_summary(mongo_client) -> Dict:
 def _get_insights_data(mongo_client) -> Dict:
     """Get data for generating smart insights"""
     try:
-        if not mongo_client.connected:
+        context = get_chat_context(mongo_client)
+        if context is None:
             return {}
         
-        # Get basic financial data for insights
-        end_date = datetime.utcnow()
-        start_date_30 = end_date - timedelta(days=30)
-        start_date_60 = end_date - timedelta(days=60)
-        
         # Current month vs previous month
-        current_month = list(mongo_client.db.bank_transactions.find({
-            'date': {'$gte': start_date_30},
-            'amount': {'$lt': 0}
-        }))
-        
-        previous_month = list(mongo_client.db.bank_transactions.find({
-            'date': {'$gte': start_date_60, '$lt': start_date_30},
-            'amount': {'$lt': 0}
-        }))
-        
-        current_total = sum(abs(t.get('amount', 0)) for t in current_month)
-        previous_total = sum(abs(t.get('amount', 0)) for t in previous_month)
+        current_total = context.month_total
+        previous_total = context.previous_month_total
         
         # Calculate spending change
         spending_change = 0
         if previous_total > 0:
             spending_change = ((current_total - previous_total) / previous_total) * 100
         
-        # Check for unmatched business expenses
-        unmatched_business = mongo_client.db.bank_transactions.count_documents({
-            'business_type': {'$in': ['Down Home', 'Music City Rodeo']},
-            'receipt_matched': {'$ne': True},
-            'amount': {'$lt': 0}
-        })
+        # Unmatched business expenses
+        unmatched_business = context.unmatched_business_count
         
         return {
             'spending_increased': spending_change > 10,
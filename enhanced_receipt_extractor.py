@@ -15,8 +15,16 @@ from typing import Dict, Optional, List, Tuple
 from dataclasses import dataclass
 import json
 
+from ocr_cache import get_ocr_cache, read_file_bytes
+from receipt_field_engine import EXTRACTOR_AMOUNT_PATTERNS, EXTRACTOR_DATE_PATTERNS, amount_in_range, pattern_set
+
 logger = logging.getLogger(__name__)
 
+_POSITIVE_AMOUNT = amount_in_range(0)
+
+# --psm 6: assume a uniform block of text; --oem 3: default OCR engine mode
+TESSERACT_CLI_ARGS = ('--psm', '6', '--oem', '3')
+
 @dataclass
 class ExtractedReceiptData:
     """Extracted receipt data"""
@@ -107,25 +115,9 @@ class EnhancedReceiptExtractor:
             'every.com': 'every.com'
         }
         
-        # Amount extraction patterns
-        self.amount_patterns = [
-            r'\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # $1,234.56
-            r'(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)\s*USD',  # 1,234.56 USD
-            r'USD\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # USD 1,234.56
-            r'(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)\s*dollars',  # 1,234.56 dollars
-            r'total.*?\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # total $1,234.56
-            r'amount.*?\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # amount $1,234.56
-            r'charged.*?\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # charged $1,234.56
-            r'payment.*?\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # payment $1,234.56
-        ]
-        
-        # Date patterns
-        self.date_patterns = [
-            r'(\d{1,2})[/\-](\d{1,2})[/\-](\d{2,4})',
-            r'(\d{4})-(\d{1,2})-(\d{1,2})',
-            r'(\w+)\s+(\d{1,2}),?\s+(\d{4})',
-            r'(\d{1,2})\s+(\w+)\s+(\d{4})'
-        ]
+        # Amount and date patterns (compiled once by receipt_field_engine)
+        self.amount_patterns = EXTRACTOR_AMOUNT_PATTERNS
+        self.date_patterns = EXTRACTOR_DATE_PATTERNS
         
         # Receipt keywords for confidence scoring
         self.receipt_keywords = [
@@ -224,16 +216,23 @@ class EnhancedReceiptExtractor:
             return self.extract_from_email(email_data)
     
     def _extract_text_with_tesseract(self, image_path: str) -> str:
-        """Extract text from image using Tesseract"""
+        """Extract text from image using Tesseract, reusing cached results for the same bytes"""
+        content = read_file_bytes(image_path)
+        if content is None:
+            return ""
+        return get_ocr_cache().get_or_compute(
+            content, 'tesseract-cli', lambda: self._run_tesseract(image_path),
+            config=' '.join(TESSERACT_CLI_ARGS)
+        )
+    
+    def _run_tesseract(self, image_path: str) -> str:
+        """Run the tesseract CLI on an image file"""
         try:
             # Run Tesseract OCR
-            result = subprocess.run([
-                'tesseract', 
-                image_path, 
-                'stdout', 
-                '--psm', '6',  # Assume uniform block of text
-                '--oem', '3'   # Default OCR Engine Mode
-            ], capture_output=True, text=True, timeout=30)
+            result = subprocess.run(
+                ['tesseract', image_path, 'stdout', *TESSERACT_CLI_ARGS],
+                capture_output=True, text=True, timeout=30
+            )
             
             if result.returncode == 0:
                 return result.stdout.strip()
@@ -435,14 +434,8 @@ class EnhancedReceiptExtractor:
     def _extract_amount_from_text(self, text: str) -> float:
         """Extract amount from text"""
         try:
-            for pattern in self.amount_patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    amount_str = match.group(1).replace(',', '')
-                    amount = float(amount_str)
-                    if amount > 0:
-                        return amount
-            return 0.0
+            amount = pattern_set(self.amount_patterns).first_value(text, _POSITIVE_AMOUNT)
+            return amount or 0.0
         except Exception as e:
             logger.warning(f"Error extracting amount from text: {e}")
             return 0.0
@@ -450,12 +443,8 @@ class EnhancedReceiptExtractor:
     def _extract_date_from_text(self, text: str) -> str:
         """Extract date from text"""
         try:
-            for pattern in self.date_patterns:
-                match = re.search(pattern, text)
-                if match:
-                    return match.group(0)
-            
-            return ""
+            match = pattern_set(self.date_patterns, flags=0).first(text)
+            return match.text if match else ""
             
         except Exception as e:
             logger.error(f"Error extracting date: {e}")
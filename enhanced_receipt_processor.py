@@ -52,8 +52,8 @@ class EnhancedReceiptProcessor:
         
         # Initialize OCR processor
         try:
-            from huggingface_receipt_processor import HuggingFaceReceiptProcessor
-            self.ocr_processor = HuggingFaceReceiptProcessor()
+            from huggingface_receipt_processor import create_huggingface_processor
+            self.ocr_processor = create_huggingface_processor()
             logger.info("✅ OCR processor initialized")
         except Exception as e:
             logger.warning(f"OCR processor not available: {e}")
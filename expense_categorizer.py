@@ -10,6 +10,11 @@ from typing import Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
 
+from ai_rate_governor import get_rate_governor
+from ai_tracing import payload_bytes, trace_call
+from expense_rule_engine import RuleMatrix
+from merchant_category_table import LearnedCategory, get_merchant_table
+
 logger = logging.getLogger(__name__)
 
 # Use Hugging Face for FREE AI categorization (better than OpenAI!)
@@ -22,6 +27,23 @@ if HUGGINGFACE_AVAILABLE:
 else:
     logger.warning("Hugging Face API key not found - using enhanced rule-based categorization")
 
+
+def _post_model(api_url: str, headers: Dict, payload: Dict, timeout: int) -> requests.Response:
+    """One hosted model call, traced per model"""
+    with trace_call('expense_categorizer', api_url.rsplit('/models/', 1)[-1], 'categorize',
+                    request_bytes=payload_bytes(payload)) as call:
+        response = requests.post(api_url, headers=headers, json=payload, timeout=timeout)
+        call.response(response)
+    return response
+
+
+# Local classifier answers at or above this probability are used without asking hosted models
+LOCAL_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv('EXPENSE_CLASSIFIER_MIN_CONFIDENCE', 0.6))
+
+# Content-based business type keywords
+MCR_KEYWORDS = ['rodeo', 'nfr', 'vegas', 'arena', 'cowboy', 'livestock', 'western']
+DH_KEYWORDS = ['client', 'business development', 'bd', 'down home']
+
 class BusinessType(Enum):
     """Business types for categorization"""
     DOWN_HOME = "DH"
@@ -63,6 +85,26 @@ class ExpenseCategorizer:
             r'meeting\s+with\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
             r'dinner\s+with\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)'
         ]
+        self.compile_rules()
+    
+    def compile_rules(self):
+        """
+        Compile keyword rules and extraction patterns once
+        Call again after changing categories, location_keywords or client_patterns.
+        """
+        self._rule_configs = list(self.categories.values())
+        self.rules = RuleMatrix(
+            [(config.keywords, config.confidence_boost) for config in self._rule_configs],
+            flags={'mcr': MCR_KEYWORDS, 'dh': DH_KEYWORDS}
+        )
+        # First config wins when two share a category name
+        self._configs_by_category = {}
+        for config in self._rule_configs:
+            self._configs_by_category.setdefault(config.category, config)
+        self._location_patterns = [re.compile(rf'{keyword}\s+([\w\s]+)(?:,|\.|$)', re.IGNORECASE)
+                                   for keyword in self.location_keywords]
+        self._city_state_pattern = re.compile(r'([A-Z][a-z]+),?\s+([A-Z]{2})')
+        self._client_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.client_patterns]
     
     def _initialize_categories(self) -> Dict[str, CategoryConfig]:
         """Initialize NetSuite expense categories with keywords and mappings"""
@@ -354,9 +396,8 @@ class ExpenseCategorizer:
             return None
         
         # Look for location patterns after keywords
-        for keyword in self.location_keywords:
-            pattern = rf'{keyword}\s+([\w\s]+)(?:,|\.|$)'
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in self._location_patterns:
+            match = pattern.search(text)
             if match:
                 location = match.group(1).strip()
                 # Filter out common non-location words
@@ -364,8 +405,7 @@ class ExpenseCategorizer:
                     return location
         
         # Look for city, state patterns
-        city_state_pattern = r'([A-Z][a-z]+),?\s+([A-Z]{2})'
-        match = re.search(city_state_pattern, text)
+        match = self._city_state_pattern.search(text)
         if match:
             return f"{match.group(1)}, {match.group(2)}"
         
@@ -384,8 +424,8 @@ class ExpenseCategorizer:
         if not text:
             return None
         
-        for pattern in self.client_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in self._client_patterns:
+            match = pattern.search(text)
             if match:
                 client_name = match.group(1).strip()
                 # Basic validation - should be reasonable length and format
@@ -406,7 +446,12 @@ class ExpenseCategorizer:
             Business type identifier
         """
         text_upper = text.upper()
-        
+        return self._business_type(email_account,
+                                   any(keyword.upper() in text_upper for keyword in MCR_KEYWORDS),
+                                   any(keyword.upper() in text_upper for keyword in DH_KEYWORDS))
+    
+    @staticmethod
+    def _business_type(email_account: Optional[str], mentions_mcr: bool, mentions_dh: bool) -> str:
         # Email account-based determination
         if email_account:
             if 'downhome.com' in email_account.lower():
@@ -415,20 +460,108 @@ class ExpenseCategorizer:
                 return BusinessType.MUSIC_CITY_RODEO.value
         
         # Content-based determination
-        mcr_keywords = ['rodeo', 'nfr', 'vegas', 'arena', 'cowboy', 'livestock', 'western']
-        dh_keywords = ['client', 'business development', 'bd', 'down home']
-        
-        if any(keyword.upper() in text_upper for keyword in mcr_keywords):
+        if mentions_mcr:
             return BusinessType.MUSIC_CITY_RODEO.value
-        elif any(keyword.upper() in text_upper for keyword in dh_keywords):
+        elif mentions_dh:
             return BusinessType.DOWN_HOME.value
         
         return BusinessType.BUSINESS_DEVELOPMENT.value
     
-    def get_ai_category_suggestion(self, expense: Dict) -> Optional[str]:
+    @staticmethod
+    def _local_classifier():
+        """Shared local classifier, or None until one has been trained (see expense_classifier.py)"""
+        try:
+            from model_registry import get_model_registry
+            return get_model_registry().get('expense_classifier')
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Local expense classifier unavailable: {e}")
+            return None
+    
+    def local_category_suggestions(self, expenses: List[Dict]) -> List[Optional[Tuple[str, float]]]:
+        """
+        (category, probability) from the local classifier for each expense
+        
+        One vectorized call for the whole list; entries are None when no model
+        has been trained yet.
+        """
+        classifier = self._local_classifier()
+        if classifier is None:
+            return [None] * len(expenses)
+        try:
+            with trace_call('expense_categorizer', 'expense_classifier', 'categorize', cost_units=0.0):
+                return classifier.classify_batch(expenses)
+        except Exception as e:
+            logger.error(f"Local expense classification failed: {e}")
+            return [None] * len(expenses)
+    
+    def get_ai_category_suggestion(self, expense: Dict, suggestion: Optional[Tuple[str, float]] = None,
+                                   cloud_fallback: bool = True) -> Optional[str]:
+        """
+        Get a model-based category suggestion
+        Merchants with a learned category answer from the merchant table, then
+        the local classifier; hosted Hugging Face models are only asked when it
+        is unsure or has not been trained yet.
+        
+        Args:
+            expense: Dictionary containing expense details
+            suggestion: Local (category, probability) already computed for this expense
+            cloud_fallback: Ask the hosted models when the local answer is not confident
+            
+        Returns:
+            Suggested NetSuite category or None
+        """
+        learned = get_merchant_table().lookup('netsuite', self._merchant_name(expense))
+        if suggestion is None and learned is None:
+            suggestion = self.local_category_suggestions([expense])[0]
+        return self._pick_suggestion(expense, suggestion, cloud_fallback, learned)
+    
+    @staticmethod
+    def _merchant_name(expense: Dict) -> Optional[str]:
+        return expense.get('merchant') or expense.get('description')
+    
+    def category_names(self) -> List[str]:
+        """NetSuite category names this categorizer can return"""
+        return list(self._configs_by_category)
+    
+    def rule_categories(self, expenses: List[Dict]) -> List[Optional[str]]:
+        """Category of the winning keyword rule per expense (None where no rule matches)"""
+        texts = []
+        for expense in expenses:
+            try:
+                texts.append(self._expense_texts(expense)[0])
+            except Exception:
+                texts.append('')
+        matches = self.rules.match(texts)
+        return [self._rule_configs[best].category if best >= 0 else None for best in matches.best]
+    
+    def _pick_suggestion(self, expense: Dict, suggestion: Optional[Tuple[str, float]],
+                         cloud_fallback: bool, learned: Optional[LearnedCategory] = None) -> Optional[str]:
+        # Answers outside the NetSuite names (e.g. a model trained on bank labels) count as no answer
+        if learned is not None and learned.category in self._configs_by_category:
+            logger.debug(f"📒 Learned category for {learned.merchant}: {learned.category} ({learned.count} seen)")
+            return learned.category
+        if suggestion and suggestion[0] not in self._configs_by_category:
+            logger.debug(f"🧠 Local classifier label {suggestion[0]!r} is not a NetSuite category, ignoring it")
+            suggestion = None
+        if suggestion and suggestion[1] >= LOCAL_CLASSIFIER_MIN_CONFIDENCE:
+            logger.debug(f"🧠 Local classifier suggested: {suggestion[0]} ({suggestion[1]:.2f})")
+            return suggestion[0]
+        if not cloud_fallback:
+            return None
+        return self._cloud_category_suggestion(expense)
+    
+    def _learn(self, expense: Dict, category: str, confidence: float) -> str:
+        """Record a hosted model's answer so this merchant is not sent again"""
+        get_merchant_table().record('netsuite', self._merchant_name(expense), category, confidence)
+        return category
+    
+    def _cloud_category_suggestion(self, expense: Dict) -> Optional[str]:
         """
         Get AI-enhanced category suggestion using FREE Hugging Face models
         Uses multiple state-of-the-art models that OBLITERATE OpenAI GPT-4!
+        Each model is a separate 15-20s call, so this is the low-confidence fallback only.
         
         Args:
             expense: Dictionary containing expense details
@@ -467,6 +600,7 @@ class ExpenseCategorizer:
             
             # PREMIUM HUGGING FACE AI ENSEMBLE - Multiple SOTA models!
             headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"}
+            governor = get_rate_governor('huggingface')
             
             # Method 1: Meta-Llama-3-8B-Instruct (LATEST! Beats GPT-4!)
             try:
@@ -501,7 +635,9 @@ Return only the exact category name."""
                     }
                 }
                 
-                response = requests.post(api_url, headers=headers, json=payload, timeout=20)
+                if not governor.acquire():
+                    raise RuntimeError("HuggingFace call budget used up")
+                response = _post_model(api_url, headers, payload, timeout=20)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -511,7 +647,7 @@ Return only the exact category name."""
                         for category in categories:
                             if category in generated_text:
                                 logger.info(f"🦙 Llama-3-8B suggested: {category}")
-                                return category
+                                return self._learn(expense, category, 0.9)
             except Exception as e:
                 logger.debug(f"Llama-3 failed: {e}")
             
@@ -526,7 +662,9 @@ Return only the exact category name."""
                     }
                 }
                 
-                response = requests.post(api_url, headers=headers, json=payload, timeout=15)
+                if not governor.acquire():
+                    raise RuntimeError("HuggingFace call budget used up")
+                response = _post_model(api_url, headers, payload, timeout=15)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -536,7 +674,7 @@ Return only the exact category name."""
                         
                         if confidence > 0.6:  # High confidence for DeBERTa
                             logger.info(f"🔥 DeBERTa-v3-Large suggested: {best_category} (confidence: {confidence:.2f})")
-                            return best_category
+                            return self._learn(expense, best_category, confidence)
             except Exception as e:
                 logger.debug(f"DeBERTa failed: {e}")
             
@@ -551,7 +689,9 @@ Return only the exact category name."""
                     }
                 }
                 
-                response = requests.post(api_url, headers=headers, json=payload, timeout=15)
+                if not governor.acquire():
+                    raise RuntimeError("HuggingFace call budget used up")
+                response = _post_model(api_url, headers, payload, timeout=15)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -561,7 +701,7 @@ Return only the exact category name."""
                         
                         if confidence > 0.5:
                             logger.info(f"🚀 BART-Large suggested: {best_category} (confidence: {confidence:.2f})")
-                            return best_category
+                            return self._learn(expense, best_category, confidence)
             except Exception as e:
                 logger.debug(f"BART failed: {e}")
             
@@ -580,7 +720,9 @@ Choose from: {', '.join(categories[:6])} [/INST]"""
                     }
                 }
                 
-                response = requests.post(api_url, headers=headers, json=payload, timeout=15)
+                if not governor.acquire():
+                    raise RuntimeError("HuggingFace call budget used up")
+                response = _post_model(api_url, headers, payload, timeout=15)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -589,7 +731,7 @@ Choose from: {', '.join(categories[:6])} [/INST]"""
                         for category in categories:
                             if category in generated_text:
                                 logger.info(f"🌟 Mistral-7B suggested: {category}")
-                                return category
+                                return self._learn(expense, category, 0.9)
             except Exception as e:
                 logger.debug(f"Mistral failed: {e}")
             
@@ -637,129 +779,139 @@ Choose from: {', '.join(categories[:6])} [/INST]"""
         
         return None
     
-    def categorize_expense(self, expense: Dict) -> ExpenseCategory:
+    def categorize_expense(self, expense: Dict, suggestion: Optional[Tuple[str, float]] = None,
+                           cloud_fallback: bool = True) -> ExpenseCategory:
         """
         Categorize a single expense using both AI and rule-based methods
         
         Args:
             expense: Dictionary containing expense details
                     Expected keys: description, memo, merchant, amount, etc.
+            suggestion: Local classifier (category, probability) computed by a batch
+            cloud_fallback: Allow hosted models when the local classifier is unsure
                     
         Returns:
             ExpenseCategory object with categorization results
         """
+        if suggestion is None:
+            suggestion = self.local_category_suggestions([expense])[0]
+        result = self._categorize([expense], [suggestion], cloud_fallback)[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    @staticmethod
+    def _expense_texts(expense: Dict) -> Tuple[str, str]:
+        """(description + memo + merchant, description + memo), upper-cased"""
         description = expense.get('description', '').upper()
         memo = expense.get('memo', '').upper()
         merchant = expense.get('merchant', '').upper()
-        combined_text = f"{description} {memo} {merchant}"
-        
-        # STEP 1: Try AI-enhanced categorization first
-        ai_suggested_category = self.get_ai_category_suggestion(expense)
-        ai_match = None
-        
-        if ai_suggested_category:
-            # Find the config for the AI suggested category
-            for config in self.categories.values():
-                if config.category == ai_suggested_category:
-                    ai_match = config
-                    break
+        return f"{description} {memo} {merchant}", f"{description} {memo}"
+    
+    def _categorize(self, expenses: List[Dict], suggestions: List[Optional[Tuple[str, float]]],
+                    cloud_fallback: bool) -> List[Union[ExpenseCategory, Exception]]:
+        """
+        Categorize a batch: every keyword rule is scored for all expenses at once
+        Expenses that fail come back as their exception instead of stopping the batch.
+        """
+        texts: List[Union[Tuple[str, str], Exception]] = []
+        for expense in expenses:
+            try:
+                texts.append(self._expense_texts(expense))
+            except Exception as e:
+                texts.append(e)
         
-        # STEP 2: Rule-based keyword matching
-        best_match = None
-        best_confidence = 0.0
+        # STEP 2 for the whole batch: rule-based keyword matching
+        matches = self.rules.match(['' if isinstance(t, Exception) else t[0] for t in texts])
+        # Merchants whose category was learned earlier skip the models entirely
+        learned = get_merchant_table().lookup_many(
+            'netsuite', [None if isinstance(t, Exception) else self._merchant_name(e) for e, t in zip(expenses, texts)])
         
-        # Check each category for keyword matches
-        for category_key, config in self.categories.items():
-            matches = 0
-            total_keywords = len(config.keywords)
-            
-            if total_keywords == 0:  # Skip categories with no keywords
+        results: List[Union[ExpenseCategory, Exception]] = []
+        for row, (expense, suggestion, text) in enumerate(zip(expenses, suggestions, texts)):
+            if isinstance(text, Exception):
+                results.append(text)
                 continue
-            
-            for keyword in config.keywords:
-                if keyword.upper() in combined_text:
-                    matches += 1
-            
-            if matches > 0:
-                # Calculate confidence based on keyword matches
-                base_confidence = matches / total_keywords
-                confidence = min(base_confidence + config.confidence_boost, 1.0)
+            combined_text, notes = text
+            try:
+                # STEP 1: AI-enhanced categorization (learned table, local classifier, hosted models if allowed)
+                ai_suggested_category = self._pick_suggestion(expense, suggestion, cloud_fallback, learned[row])
+                ai_match = self._configs_by_category.get(ai_suggested_category) if ai_suggested_category else None
                 
-                if confidence > best_confidence:
-                    best_confidence = confidence
-                    best_match = config
-        
-        # STEP 3: Choose best categorization method
-        final_category = None
-        final_confidence = 0.0
-        final_details = "Needs Classification"
-        
+                best = int(matches.best[row])
+                best_match = self._rule_configs[best] if best >= 0 else None
+                best_confidence = float(matches.best_confidence[row])
+                
+                # STEP 3: Choose best categorization method
+                final_category, final_details, final_confidence = self._choose_category(
+                    ai_match, best_match, best_confidence)
+                
+                # Extract additional information
+                location = self.extract_location(notes)
+                client_name = self.extract_client_name(notes)
+                business_type = self._business_type(expense.get('email_account'),
+                                                    bool(matches.flags['mcr'][row]), bool(matches.flags['dh'][row]))
+                
+                # Determine if manual review is needed
+                needs_review = 1 if final_confidence < 0.6 else 0
+                
+                results.append(ExpenseCategory(
+                    category=final_category,
+                    details=final_details,
+                    confidence=final_confidence,
+                    needs_review=needs_review,
+                    location=location,
+                    client_name=client_name,
+                    business_type=business_type
+                ))
+            except Exception as e:
+                results.append(e)
+        return results
+    
+    @staticmethod
+    def _choose_category(ai_match: Optional[CategoryConfig], best_match: Optional[CategoryConfig],
+                         best_confidence: float) -> Tuple[str, str, float]:
+        """Combine the AI suggestion and the best rule match into (category, details, confidence)"""
         if ai_match and best_match:
             # Both AI and rules found matches - choose based on confidence
             if ai_match.category == best_match.category:
                 # AI and rules agree - high confidence
-                final_category = ai_match.category
-                final_details = ai_match.details + " (AI + Rules)"
-                final_confidence = min(best_confidence + 0.3, 1.0)  # Boost for agreement
+                return ai_match.category, ai_match.details + " (AI + Rules)", min(best_confidence + 0.3, 1.0)
             elif best_confidence > 0.7:
                 # High confidence rule match
-                final_category = best_match.category
-                final_details = best_match.details + " (Rules)"
-                final_confidence = best_confidence
-            else:
-                # Use AI suggestion with moderate confidence
-                final_category = ai_match.category
-                final_details = ai_match.details + " (AI)"
-                final_confidence = 0.75  # Moderate AI confidence
+                return best_match.category, best_match.details + " (Rules)", best_confidence
+            # Use AI suggestion with moderate confidence
+            return ai_match.category, ai_match.details + " (AI)", 0.75
         elif ai_match:
             # Only AI found a match
-            final_category = ai_match.category
-            final_details = ai_match.details + " (AI)"
-            final_confidence = 0.7  # Good AI confidence
+            return ai_match.category, ai_match.details + " (AI)", 0.7
         elif best_match:
             # Only rules found a match
-            final_category = best_match.category
-            final_details = best_match.details + " (Rules)"
-            final_confidence = best_confidence
-        else:
-            # No matches found - use default
-            final_category = 'BD: Other Costs'
-            final_details = 'Needs Classification'
-            final_confidence = 0.3
-        
-        # Extract additional information
-        location = self.extract_location(f"{description} {memo}")
-        client_name = self.extract_client_name(f"{description} {memo}")
-        business_type = self.determine_business_type(combined_text, expense.get('email_account'))
-        
-        # Determine if manual review is needed
-        needs_review = 1 if final_confidence < 0.6 else 0
-        
-        return ExpenseCategory(
-            category=final_category,
-            details=final_details,
-            confidence=final_confidence,
-            needs_review=needs_review,
-            location=location,
-            client_name=client_name,
-            business_type=business_type
-        )
+            return best_match.category, best_match.details + " (Rules)", best_confidence
+        # No matches found - use default
+        return 'BD: Other Costs', 'Needs Classification', 0.3
     
-    def batch_categorize_expenses(self, expenses: List[Dict]) -> List[Dict]:
+    def batch_categorize_expenses(self, expenses: List[Dict], cloud_fallback: bool = False) -> List[Dict]:
         """
         Batch categorize multiple expenses
+        The local classifier and the keyword rules each run once over the whole list.
         
         Args:
             expenses: List of expense dictionaries
+            cloud_fallback: Ask hosted models about expenses the local classifier is
+                    unsure of (off by default: one slow call per such expense)
             
         Returns:
             List of expenses with categorization added
         """
         categorized_expenses = []
+        suggestions = self.local_category_suggestions(expenses)
+        results = self._categorize(expenses, suggestions, cloud_fallback)
         
-        for expense in expenses:
+        for expense, category_result in zip(expenses, results):
             try:
-                category_result = self.categorize_expense(expense)
+                if isinstance(category_result, Exception):
+                    raise category_result
                 
                 # Add categorization results to expense
                 categorized_expense = expense.copy()
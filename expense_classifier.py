@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Local Expense Classifier
+Hashed word / character n-gram TF-IDF features and a multinomial logistic
+regression, trained from bank_transactions that already carry a category.
+The model is a few MB of numpy arrays on disk, loaded once per worker through
+the model registry, and classifies thousands of expenses per second on CPU,
+so ExpenseCategorizer only asks hosted models about expenses it is unsure of.
+
+Imports and syncs store the bank's own labels ("Travel", "Food & Drink"), so
+training labels are translated to NetSuite categories first: a merchant's
+NetSuite entry in the merchant table (user corrections, agreeing model
+answers) wins, then BANK_CATEGORY_MAP, with the categorizer's keyword rules
+choosing between the NetSuite categories a broad bank label can stand for.
+
+    python expense_classifier.py --mongo                      # train from bank_transactions
+    python expense_classifier.py --csv bank_transactions.csv  # or from a bank CSV export
+"""
+
+import argparse
+import csv
+import json
+import logging
+import math
+import os
+import re
+import sys
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.getenv('EXPENSE_CLASSIFIER_PATH',
+                               os.path.expanduser('~/.cache/receipt-processor/expense_classifier.npz'))
+N_FEATURES = 2 ** 17
+MIN_EXAMPLES_PER_CATEGORY = 3
+UNLABELED = {'', 'other', 'uncategorized', 'needs classification', 'category'}
+
+# Bank / card export category -> the NetSuite categories it can stand for. A
+# single candidate is used as is; with several, the keyword rules have to pick
+# one of them or the row is left out. Personal labels (Health & Wellness,
+# Groceries, Gifts & Donations, ...) are not business expenses and stay out.
+BANK_CATEGORY_MAP = {
+    'Travel': ('DH: Travel Costs - Airfare', 'DH: Travel Costs - Cab/Uber/Bus Fare',
+               'DH: Travel Costs - Gas/Rental Car', 'DH: Travel Costs - Hotel', 'DH:  Soho House Fees'),
+    'Food & Drink': ('BD: Client Business Meals',),
+    'Shopping': ('Office Supplies', 'Office Equipment', 'Production Equipment', 'Software subscriptions'),
+    'Bills & Utilities': ('Internet Costs', 'Mobile Phone Costs', 'Software subscriptions',
+                          'BD: Subscriptions & Research Costs'),
+    'Professional Services': ('BD: Consultants',),
+    'Fees & Adjustments': ('BD: Commissions & Fees',),
+}
+
+_WORD = re.compile(r'[a-z0-9]+(?:[&\'.][a-z0-9]+)*')
+_DIGITS = re.compile(r'\d')
+
+
+# ============================================================================
+# FEATURES
+# ============================================================================
+
+def expense_text(expense: Dict) -> str:
+    """The text an expense is classified on: merchant, description and memo"""
+    parts = [expense.get('merchant') or expense.get('merchant_name'), expense.get('description'),
+             expense.get('memo')]
+    seen = []
+    for part in parts:
+        if part and part not in seen:
+            seen.append(str(part))
+    return ' '.join(seen)
+
+
+def _amount_token(amount) -> str:
+    try:
+        value = abs(float(amount or 0))
+    except (TypeError, ValueError):
+        return 'amt:none'
+    return f"amt:{int(math.log10(value + 1) * 2)}"  # half-decade buckets: $3, $10, $31, $100, ...
+
+
+def _tokens(text: str, amount) -> List[str]:
+    # Store numbers (#4410) and card tails mean nothing across transactions
+    words = [_DIGITS.sub('0', w) for w in _WORD.findall(text.lower())]
+    tokens = [f"w:{w}" for w in words]
+    tokens += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        if len(word) > 3:
+            padded = f"<{word}>"
+            tokens += [f"c:{padded[i:i + 4]}" for i in range(len(padded) - 3)]
+    tokens.append(_amount_token(amount))
+    return tokens
+
+
+def featurize(expenses: Sequence[Dict], n_features: int = N_FEATURES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Hashed term counts as CSR arrays (indices, counts, indptr).
+
+    Every expense gets at least its amount token, so no row is empty.
+    """
+    indices: List[int] = []
+    indptr = [0]
+    counts: List[float] = []
+    for expense in expenses:
+        row: Dict[int, float] = {}
+        for token in _tokens(expense_text(expense), expense.get('amount')):
+            # crc32 rather than hash(): str hashes change between processes
+            bucket = zlib.crc32(token.encode('utf-8')) % n_features
+            row[bucket] = row.get(bucket, 0.0) + 1.0
+        indices.extend(row)
+        counts.extend(row.values())
+        indptr.append(len(indices))
+    return np.asarray(indices, np.int64), np.asarray(counts, np.float32), np.asarray(indptr, np.int64)
+
+
+def _tfidf(indices: np.ndarray, counts: np.ndarray, indptr: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    """Sublinear tf times idf, L2-normalized per row"""
+    values = (1.0 + np.log(counts)) * idf[indices]
+    lengths = np.diff(indptr)
+    norms = np.sqrt(np.add.reduceat(values * values, indptr[:-1]))
+    return (values / np.repeat(np.maximum(norms, 1e-12), lengths)).astype(np.float32)
+
+
+def _row_scores(weights: np.ndarray, indices: np.ndarray, values: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+    return np.add.reduceat(weights[indices] * values[:, None], indptr[:-1], axis=0)
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    scores = scores - scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    return scores / scores.sum(axis=1, keepdims=True)
+
+
+# ============================================================================
+# MODEL
+# ============================================================================
+
+class ExpenseClassifier:
+    """Multinomial logistic regression over hashed TF-IDF features"""
+
+    def __init__(self, labels: Sequence[str], weights: np.ndarray, bias: np.ndarray, idf: np.ndarray,
+                 metadata: Optional[Dict] = None):
+        self.labels = list(labels)
+        self.weights = weights
+        self.bias = bias
+        self.idf = idf
+        self.n_features = idf.shape[0]
+        self.metadata = metadata or {}
+
+    @classmethod
+    def train(cls, expenses: Sequence[Dict], labels: Sequence[str], epochs: int = 12, batch_size: int = 256,
+              learning_rate: float = 0.5, l2: float = 1e-6, n_features: int = N_FEATURES,
+              seed: int = 41) -> 'ExpenseClassifier':
+        """Mini-batch AdaGrad on the softmax loss; deterministic for a given seed and input order"""
+        if len(expenses) != len(labels) or not expenses:
+            raise ValueError("Need one label per expense and at least one expense")
+        started = time.perf_counter()
+        classes = sorted(set(labels))
+        class_index = {label: i for i, label in enumerate(classes)}
+        targets = np.array([class_index[label] for label in labels])
+
+        indices, counts, indptr = featurize(expenses, n_features)
+        document_frequency = np.bincount(indices, minlength=n_features)
+        idf = np.log((1 + len(expenses)) / (1 + document_frequency)).astype(np.float32) + 1.0
+        values = _tfidf(indices, counts, indptr, idf)
+
+        weights = np.zeros((n_features, len(classes)), np.float32)
+        bias = np.zeros(len(classes), np.float32)
+        weight_history = np.zeros_like(weights)
+        bias_history = np.zeros_like(bias)
+        rng = np.random.RandomState(seed)
+
+        for _ in range(epochs):
+            order = rng.permutation(len(expenses))
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                # Gather this batch's CSR slice
+                lengths = indptr[rows + 1] - indptr[rows]
+                take = np.concatenate([np.arange(indptr[r], indptr[r + 1]) for r in rows])
+                batch_indices, batch_values = indices[take], values[take]
+                batch_indptr = np.concatenate([[0], np.cumsum(lengths)])
+
+                error = _softmax(_row_scores(weights, batch_indices, batch_values, batch_indptr) + bias)
+                error[np.arange(len(rows)), targets[rows]] -= 1.0
+                error /= len(rows)
+
+                # Accumulate per unique feature so only touched rows are updated
+                touched, inverse = np.unique(batch_indices, return_inverse=True)
+                gradient = np.zeros((len(touched), len(classes)), np.float32)
+                np.add.at(gradient, inverse, np.repeat(error, lengths, axis=0) * batch_values[:, None])
+                gradient += l2 * weights[touched]
+                weight_history[touched] += gradient * gradient
+                weights[touched] -= learning_rate * gradient / (np.sqrt(weight_history[touched]) + 1e-8)
+
+                bias_gradient = error.sum(axis=0)
+                bias_history += bias_gradient * bias_gradient
+                bias -= learning_rate * bias_gradient / (np.sqrt(bias_history) + 1e-8)
+
+        classifier = cls(classes, weights, bias, idf, {
+            'examples': len(expenses),
+            'categories': {label: int(n) for label, n in zip(classes, np.bincount(targets))},
+            'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'train_seconds': round(time.perf_counter() - started, 2)
+        })
+        classifier.metadata['train_accuracy'] = round(classifier.accuracy(expenses, labels), 4)
+        return classifier
+
+    def predict_proba(self, expenses: Sequence[Dict]) -> np.ndarray:
+        """(len(expenses), len(labels)) class probabilities"""
+        if not expenses:
+            return np.zeros((0, len(self.labels)), np.float32)
+        indices, counts, indptr = featurize(expenses, self.n_features)
+        values = _tfidf(indices, counts, indptr, self.idf)
+        return _softmax(_row_scores(self.weights, indices, values, indptr) + self.bias)
+
+    def classify_batch(self, expenses: Sequence[Dict]) -> List[Tuple[str, float]]:
+        """Best category and its probability for each expense"""
+        probabilities = self.predict_proba(expenses)
+        best = probabilities.argmax(axis=1)
+        return [(self.labels[i], float(probabilities[row, i])) for row, i in enumerate(best)]
+
+    def classify(self, expense: Dict) -> Tuple[str, float]:
+        return self.classify_batch([expense])[0]
+
+    def accuracy(self, expenses: Sequence[Dict], labels: Sequence[str]) -> float:
+        predicted = self.classify_batch(expenses)
+        return sum(p == label for (p, _), label in zip(predicted, labels)) / len(labels) if labels else 0.0
+
+    def save(self, path: str = DEFAULT_MODEL_PATH) -> str:
+        """Write the model atomically; workers pick it up on their next load"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Untouched hash buckets stay zero, so store only the rows that carry weight
+        rows = np.flatnonzero(np.any(self.weights != 0, axis=1))
+        temp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(temp_path, labels=np.array(self.labels), rows=rows, weights=self.weights[rows],
+                            bias=self.bias, idf=self.idf, metadata=np.array(json.dumps(self.metadata)))
+        os.replace(temp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> 'ExpenseClassifier':
+        with np.load(path, allow_pickle=False) as data:
+            idf = data['idf']
+            labels = [str(label) for label in data['labels']]
+            weights = np.zeros((idf.shape[0], len(labels)), np.float32)
+            weights[data['rows']] = data['weights']
+            return cls(labels, weights, data['bias'], idf, json.loads(str(data['metadata'])))
+
+
+# ============================================================================
+# TRAINING DATA
+# ============================================================================
+
+def is_labeled(category) -> bool:
+    return bool(category) and str(category).strip().lower() not in UNLABELED
+
+
+def rows_from_collection(collection, limit: int = 0) -> Tuple[List[Dict], List[str]]:
+    """Categorized bank_transactions documents (most recent first)"""
+    cursor = collection.find(
+        {'category': {'$exists': True, '$nin': [None, '', 'Other', 'Uncategorized']}},
+        {'description': 1, 'merchant': 1, 'merchant_name': 1, 'memo': 1, 'amount': 1, 'category': 1}
+    ).sort('date', -1)
+    if limit:
+        cursor = cursor.limit(limit)
+    expenses, labels = [], []
+    for doc in cursor:
+        if is_labeled(doc.get('category')):
+            expenses.append(doc)
+            labels.append(str(doc['category']).strip())
+    return expenses, labels
+
+
+def rows_from_csv(path: str) -> Tuple[List[Dict], List[str]]:
+    """Bank CSV export with Description, Category, Amount and (optional) Memo columns"""
+    expenses, labels = [], []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            if is_labeled(row.get('Category')):
+                expenses.append({'description': row.get('Description', ''), 'memo': row.get('Memo', ''),
+                                 'amount': row.get('Amount')})
+                labels.append(row['Category'].strip())
+    return expenses, labels
+
+
+def netsuite_labels(expenses: List[Dict], labels: List[str],
+                    categorizer=None) -> Tuple[List[Dict], List[str]]:
+    """Rows relabeled with NetSuite categories; rows with no usable label are dropped"""
+    from expense_categorizer import ExpenseCategorizer
+    from merchant_category_table import get_merchant_table
+
+    categorizer = categorizer or ExpenseCategorizer()
+    allowed = set(categorizer.category_names())
+    learned = get_merchant_table().lookup_many('netsuite', [ExpenseCategorizer._merchant_name(e) for e in expenses])
+    rules = categorizer.rule_categories(expenses)
+
+    kept_expenses, kept_labels = [], []
+    for expense, label, answer, rule in zip(expenses, labels, learned, rules):
+        if answer is not None and answer.category in allowed:
+            category = answer.category
+        elif label in allowed:
+            category = label
+        else:
+            candidates = BANK_CATEGORY_MAP.get(label, ())
+            category = candidates[0] if len(candidates) == 1 else (rule if rule in candidates else None)
+        if category:
+            kept_expenses.append(expense)
+            kept_labels.append(category)
+    return kept_expenses, kept_labels
+
+
+def drop_rare_categories(expenses: List[Dict], labels: List[str],
+                         minimum: int = MIN_EXAMPLES_PER_CATEGORY) -> Tuple[List[Dict], List[str]]:
+    """Categories with a handful of examples only add noise; rules and the fallback cover them"""
+    totals: Dict[str, int] = {}
+    for label in labels:
+        totals[label] = totals.get(label, 0) + 1
+    kept = [(e, label) for e, label in zip(expenses, labels) if totals[label] >= minimum]
+    return [e for e, _ in kept], [label for _, label in kept]
+
+
+def train_expense_classifier(expenses: List[Dict], labels: List[str], path: str = DEFAULT_MODEL_PATH,
+                             allowed: Optional[Iterable[str]] = None, **kwargs) -> ExpenseClassifier:
+    """Train, save and make workers reload; allowed restricts training to known category names"""
+    if allowed is not None:
+        allowed = set(allowed)
+        pairs = [(e, label) for e, label in zip(expenses, labels) if label in allowed]
+        expenses, labels = [e for e, _ in pairs], [label for _, label in pairs]
+    expenses, labels = drop_rare_categories(expenses, labels)
+    if len(set(labels)) < 2:
+        raise ValueError("Need at least two categories with enough examples to train")
+    classifier = ExpenseClassifier.train(expenses, labels, **kwargs)
+    classifier.save(path)
+    logger.info(f"🧠 Trained expense classifier on {len(labels)} expenses, {len(classifier.labels)} categories "
+                f"(train accuracy {classifier.metadata['train_accuracy']:.1%}) -> {path}")
+
+    from model_registry import get_model_registry
+    get_model_registry().evict('expense_classifier')
+    return classifier
+
+
+def load_expense_classifier(path: str = DEFAULT_MODEL_PATH) -> ExpenseClassifier:
+    """Registry factory; raises FileNotFoundError until a model has been trained"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No expense classifier at {path}")
+    classifier = ExpenseClassifier.load(path)
+    logger.info(f"🧠 Loaded expense classifier: {len(classifier.labels)} categories, "
+                f"{classifier.metadata.get('examples', '?')} training expenses")
+    return classifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the local expense classifier')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--mongo', action='store_true', help='train from categorized bank_transactions')
+    source.add_argument('--csv', help='train from a bank CSV export')
+    parser.add_argument('--limit', type=int, default=0, help='most recent N transactions (mongo)')
+    parser.add_argument('--output', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--epochs', type=int, default=12)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.csv:
+        expenses, labels = rows_from_csv(args.csv)
+    else:
+        sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+        from mongo_client import MongoDBClient
+        client = MongoDBClient()
+        if client.db is None:
+            raise SystemExit("MongoDB is not configured (MONGODB_URI)")
+        expenses, labels = rows_from_collection(client.db['bank_transactions'], args.limit)
+
+    # ExpenseCategorizer only answers with NetSuite names, so bank labels are translated first
+    from expense_categorizer import ExpenseCategorizer
+    from merchant_category_table import configure_merchant_table
+    if not args.csv:
+        configure_merchant_table(db=client.db)
+    categorizer = ExpenseCategorizer()
+    expenses, labels = netsuite_labels(expenses, labels, categorizer)
+    try:
+        classifier = train_expense_classifier(expenses, labels, args.output, allowed=categorizer.category_names(),
+                                              epochs=args.epochs)
+    except ValueError as e:
+        raise SystemExit(f"{e}: no transactions map to NetSuite categories "
+                         f"(see BANK_CATEGORY_MAP or correct merchants in the merchant table)")
+    print(f"✅ {len(classifier.labels)} categories, {classifier.metadata['examples']} expenses, "
+          f"train accuracy {classifier.metadata['train_accuracy']:.1%}, saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Tiered Receipt Extraction Cascade
+Runs extraction strategies cheapest first and stops as soon as merchant,
+amount and date are each known with enough confidence:
+
+    email      subject / body / sender regex                 ~microseconds
+    cached_ocr text any extractor already OCR'd for the file  one cache lookup
+    pdf_text   embedded PDF text layer                       milliseconds
+    tesseract  local OCR                                     ~1s of CPU
+    local_model  local Donut/TrOCR model (CASCADE_LOCAL_MODEL) seconds
+    cloud_model  HuggingFace Inference API                   API quota + latency
+
+Each field keeps the most confident value seen so far, and the result records
+which tier answered, so most email receipts never reach OCR at all.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ai_tracing import trace_call
+from receipt_field_engine import EMAIL_AMOUNT_PATTERNS, amount_in_range, pattern_set
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('merchant', 'amount', 'date')
+
+DEFAULT_THRESHOLDS = {'merchant': 0.6, 'amount': 0.7, 'date': 0.6}
+
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp')
+
+_EMAIL_AMOUNTS = pattern_set(EMAIL_AMOUNT_PATTERNS)
+_EMAIL_AMOUNT_RANGE = amount_in_range(0, 10000)
+_LABELED_AMOUNT_PATTERNS = 4  # total:, amount:, charged:, payment: come first in EMAIL_AMOUNT_PATTERNS
+
+
+@dataclass
+class ExtractionRequest:
+    """What is known about one receipt: the email it came in and/or a file"""
+    email: Dict = field(default_factory=dict)  # subject, body, from_email, date
+    file_path: Optional[str] = None
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.file_path)[1].lower() if self.file_path else ''
+
+
+@dataclass
+class FieldResult:
+    value: Any
+    confidence: float
+    tier: str
+
+
+@dataclass
+class TierOutcome:
+    fields: Dict[str, FieldResult] = field(default_factory=dict)
+    raw_text: str = ''
+
+
+@dataclass
+class Tier:
+    name: str
+    cost: float                                              # relative cost; tiers run in ascending order
+    extract: Callable[[ExtractionRequest], Optional[TierOutcome]]
+    applies: Callable[[ExtractionRequest], bool] = lambda request: True
+
+
+@dataclass
+class CascadeResult:
+    fields: Dict[str, FieldResult] = field(default_factory=dict)
+    tier: Optional[str] = None         # tier at which every required field crossed its threshold
+    tiers_tried: List[Dict] = field(default_factory=list)
+    raw_text: str = ''
+    seconds: float = 0.0
+
+    @property
+    def resolved(self) -> bool:
+        return self.tier is not None
+
+    def value(self, name: str, default: Any = None) -> Any:
+        result = self.fields.get(name)
+        return result.value if result else default
+
+    @property
+    def confidence(self) -> float:
+        """Mean confidence over merchant, amount and date (missing fields count as 0)"""
+        return round(sum(self.fields[f].confidence for f in FIELDS if f in self.fields) / len(FIELDS), 3)
+
+    @property
+    def method(self) -> str:
+        """Tier that answered, or the last tier that contributed anything"""
+        if self.tier:
+            return self.tier
+        contributing = [f.tier for f in self.fields.values()]
+        return contributing[-1] if contributing else 'none'
+
+    def to_dict(self) -> Dict:
+        return {
+            'merchant': self.value('merchant'),
+            'amount': self.value('amount', 0.0),
+            'date': self.value('date'),
+            'confidence': self.confidence,
+            'field_confidence': {name: round(f.confidence, 3) for name, f in self.fields.items()},
+            'field_tiers': {name: f.tier for name, f in self.fields.items()},
+            'resolved': self.resolved,
+            'answered_by': self.tier,
+            'tiers_tried': self.tiers_tried,
+            'seconds': round(self.seconds, 4)
+        }
+
+
+# ============================================================================
+# TIERS
+# ============================================================================
+
+def _field(fields: Dict[str, FieldResult], name: str, value: Any, confidence: float, tier: str):
+    if value not in (None, '', 0, 0.0) and confidence > fields.get(name, FieldResult(None, 0.0, '')).confidence:
+        fields[name] = FieldResult(value, round(min(confidence, 1.0), 3), tier)
+
+
+def _iso_date(value: str) -> Optional[str]:
+    if not value:
+        return None
+    for parse in (lambda v: parsedate_to_datetime(v), lambda v: datetime.fromisoformat(v.replace('Z', '+00:00'))):
+        try:
+            return parse(value).strftime('%Y-%m-%d')
+        except (TypeError, ValueError, IndexError):
+            continue
+    return None
+
+
+def _indexed_amount(match) -> Optional[tuple]:
+    amount = _EMAIL_AMOUNT_RANGE(match)
+    return (match.index, amount) if amount is not None else None
+
+
+def _registry():
+    from model_registry import get_model_registry
+    return get_model_registry()
+
+
+def email_tier(request: ExtractionRequest) -> Optional[TierOutcome]:
+    """Sender domain, subject and body regex; the email's own Date header backs up the date"""
+    subject = request.email.get('subject', '') or ''
+    body = request.email.get('body', '') or ''
+    sender = request.email.get('from_email', '') or ''
+    fields: Dict[str, FieldResult] = {}
+    extractor = _registry().get('enhanced_extractor')
+
+    _field(fields, 'merchant', extractor._extract_from_sender(sender).merchant, 0.85, 'email')
+    _field(fields, 'merchant', extractor._extract_merchant_from_text(subject), 0.7, 'email')
+    _field(fields, 'merchant', extractor._extract_merchant_from_text(body), 0.55, 'email')
+
+    for text, labeled, unlabeled in ((subject, 0.85, 0.75), (body, 0.85, 0.6)):
+        found = _EMAIL_AMOUNTS.first_value(text, _indexed_amount)
+        if found:
+            index, amount = found
+            _field(fields, 'amount', amount, labeled if index < _LABELED_AMOUNT_PATTERNS else unlabeled, 'email')
+
+    if body:
+        parsed = _registry().get('enhanced_receipt')._extract_date_enhanced(body.split('\n'))
+        _field(fields, 'date', parsed['date'], parsed['date_confidence'], 'email')
+    # Receipt emails are sent on (or within a day of) the purchase
+    _field(fields, 'date', _iso_date(request.email.get('date', '')), 0.65, 'email')
+    return TierOutcome(fields, raw_text='\n'.join(t for t in (subject, body) if t))
+
+
+def _text_outcome(text: str, tier: str, reliability: float) -> Optional[TierOutcome]:
+    """Parse receipt text with EnhancedReceiptProcessor, scaling its confidences by the tier's reliability"""
+    if not text or not text.strip():
+        return None
+    parsed = _registry().get('enhanced_receipt')._enhanced_parse_receipt(text)
+    fields: Dict[str, FieldResult] = {}
+    _field(fields, 'merchant', parsed.get('merchant'), parsed.get('merchant_confidence', 0.0) * reliability, tier)
+    _field(fields, 'amount', parsed.get('total_amount'), parsed.get('total_confidence', 0.0) * reliability, tier)
+    _field(fields, 'date', parsed.get('date'), parsed.get('date_confidence', 0.0) * reliability, tier)
+    return TierOutcome(fields, raw_text=text)
+
+
+def _file_bytes(request: ExtractionRequest) -> Optional[bytes]:
+    from ocr_cache import read_file_bytes
+    return read_file_bytes(request.file_path) if request.file_path else None
+
+
+def cached_ocr_tier(request: ExtractionRequest) -> Optional[TierOutcome]:
+    """Text any engine already produced for these bytes (see ocr_cache.peek_text)"""
+    from ocr_cache import get_ocr_cache
+    content = _file_bytes(request)
+    text = get_ocr_cache().peek_text(content) if content else None
+    return _text_outcome(text, 'cached_ocr', 0.9)
+
+
+def pdf_text_tier(request: ExtractionRequest) -> Optional[TierOutcome]:
+    from pdf_text_pipeline import extract_pdf_text
+    # Text layer only here; scanned pages are left to the OCR tier
+    return _text_outcome(extract_pdf_text(request.file_path, ocr=False).text, 'pdf_text', 1.0)
+
+
+def tesseract_tier(request: ExtractionRequest) -> Optional[TierOutcome]:
+    from PIL import Image
+    from ocr_cache import get_ocr_cache, tesseract_text_and_words
+
+    content = _file_bytes(request)
+    if content is None:
+        return None
+    text = get_ocr_cache().get_or_compute(content, 'tesseract',
+                                          lambda: tesseract_text_and_words(Image.open(request.file_path)))
+    return _text_outcome(text, 'tesseract', 0.9)
+
+
+def _model_outcome(result: Dict, tier: str, reliability: float) -> Optional[TierOutcome]:
+    """Map a HuggingFace processor result (several output schemas) onto merchant/amount/date"""
+    if not result or result.get('status') != 'success' or not isinstance(result.get('extracted_data'), dict):
+        return None
+    data = result['extracted_data']
+    confidence = float(result.get('confidence_score') or 0.0) * reliability
+
+    total = data.get('total_amount', data.get('total'))
+    if isinstance(total, dict):  # Donut CORD: {"total": {"total_price": "12.50"}}
+        total = total.get('total_price')
+    try:
+        amount = float(str(total).replace('$', '').replace(',', '')) if total not in (None, '') else None
+    except ValueError:
+        amount = None
+
+    fields: Dict[str, FieldResult] = {}
+    _field(fields, 'merchant', data.get('merchant') or data.get('store_name'), confidence, tier)
+    _field(fields, 'amount', amount, confidence, tier)
+    _field(fields, 'date', data.get('date'), confidence, tier)
+    return TierOutcome(fields, raw_text=result.get('raw_text', '') or '')
+
+
+def local_model_tier(request: ExtractionRequest) -> Optional[TierOutcome]:
+    from huggingface_receipt_processor import create_local_huggingface_processor
+    processor = create_local_huggingface_processor(os.getenv('CASCADE_LOCAL_MODEL'))
+    return _model_outcome(processor.process_receipt_image(request.file_path), 'local_model', 0.9)
+
+
+def cloud_model_tier(request: ExtractionRequest, api_token: Optional[str] = None) -> Optional[TierOutcome]:
+    from huggingface_receipt_processor import create_huggingface_processor
+    processor = create_huggingface_processor(api_token=api_token)
+    return _model_outcome(processor.process_receipt_image(request.file_path), 'cloud_model', 1.0)
+
+
+def _is_image(request: ExtractionRequest) -> bool:
+    return request.extension in IMAGE_EXTENSIONS
+
+
+def default_tiers(api_token: Optional[str] = None) -> List[Tier]:
+    """Built-in tiers; model tiers are only included when they can run"""
+    from functools import partial
+
+    tiers = [
+        Tier('email', 1, email_tier, lambda r: bool(r.email)),
+        Tier('cached_ocr', 2, cached_ocr_tier, lambda r: bool(r.file_path)),
+        Tier('pdf_text', 5, pdf_text_tier, lambda r: r.extension in PDF_EXTENSIONS),
+        Tier('tesseract', 20, tesseract_tier, _is_image),
+    ]
+    if os.getenv('CASCADE_LOCAL_MODEL'):
+        tiers.append(Tier('local_model', 50, local_model_tier, _is_image))
+    api_token = api_token or os.getenv('HUGGINGFACE_API_KEY')
+    if api_token:
+        tiers.append(Tier('cloud_model', 100, partial(cloud_model_tier, api_token=api_token), _is_image))
+    return tiers
+
+
+# ============================================================================
+# CASCADE
+# ============================================================================
+
+class ExtractionCascade:
+    """Cheapest-first extraction with per-field confidence thresholds and early exit"""
+
+    def __init__(self, tiers: Optional[Iterable[Tier]] = None, thresholds: Optional[Dict[str, float]] = None,
+                 required: Iterable[str] = FIELDS, api_token: Optional[str] = None):
+        self.tiers = sorted(tiers if tiers is not None else default_tiers(api_token), key=lambda t: t.cost)
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.required = tuple(required)
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.answered_by: Dict[str, int] = {}
+
+    def is_resolved(self, fields: Dict[str, FieldResult]) -> bool:
+        return all(name in fields and fields[name].confidence >= self.thresholds[name] for name in self.required)
+
+    def run(self, email: Optional[Dict] = None, file_path: Optional[str] = None,
+            max_cost: Optional[float] = None, only: Optional[Iterable[str]] = None) -> CascadeResult:
+        """
+        Run applicable tiers in cost order until every required field clears its threshold.
+
+        max_cost skips tiers more expensive than that; only restricts the run to
+        the named tiers.
+        """
+        request = ExtractionRequest(email=email or {}, file_path=file_path)
+        only = set(only) if only else None
+        result = CascadeResult()
+        started = time.perf_counter()
+        texts = []
+
+        for tier in self.tiers:
+            if (only and tier.name not in only) or (max_cost is not None and tier.cost > max_cost):
+                continue
+            if not tier.applies(request):
+                continue
+            tier_started = time.perf_counter()
+            # Hosted calls inside a tier trace their own quota use
+            with trace_call('extraction_cascade', tier.name, 'extract', cost_units=0.0) as call:
+                try:
+                    outcome = tier.extract(request)
+                except Exception as e:
+                    logger.warning(f"⚠️ Extraction tier {tier.name} failed: {e}")
+                    call.fail(error=str(e))
+                    outcome = None
+                if not outcome and call.outcome == 'ok':
+                    call.outcome = 'empty'
+                if tier.name == 'cached_ocr':
+                    call.cache = 'hit' if outcome else 'miss'
+            result.tiers_tried.append({
+                'tier': tier.name,
+                'seconds': round(time.perf_counter() - tier_started, 4),
+                'fields': sorted(outcome.fields) if outcome else []
+            })
+            if not outcome:
+                continue
+            if outcome.raw_text:
+                texts.append(outcome.raw_text)
+            for name, found in outcome.fields.items():
+                _field(result.fields, name, found.value, found.confidence, found.tier)
+            if self.is_resolved(result.fields):
+                result.tier = tier.name
+                break
+
+        result.raw_text = '\n'.join(texts)
+        result.seconds = time.perf_counter() - started
+        with self._lock:
+            self.runs += 1
+            key = result.tier or 'unresolved'
+            self.answered_by[key] = self.answered_by.get(key, 0) + 1
+        logger.debug(f"Extraction cascade: answered by {result.tier or 'nothing'} after "
+                     f"{len(result.tiers_tried)} tier(s) in {result.seconds:.3f}s")
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'answered_by': dict(self.answered_by),
+                'tiers': [{'tier': t.name, 'cost': t.cost} for t in self.tiers],
+                'thresholds': dict(self.thresholds)
+            }
+
+
+_cascade: Optional[ExtractionCascade] = None
+_cascade_lock = threading.Lock()
+
+
+def get_extraction_cascade() -> ExtractionCascade:
+    """Process-wide cascade with the default tiers"""
+    global _cascade
+    if _cascade is None:
+        with _cascade_lock:
+            if _cascade is None:
+                _cascade = ExtractionCascade()
+    return _cascade
@@ -10,6 +10,8 @@ from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
+FALLBACK_TIERS = ('email', 'cached_ocr')
+
 class FallbackOCRProcessor:
     """Fallback OCR when HuggingFace API fails"""
     
@@ -22,18 +24,19 @@ class FallbackOCRProcessor:
         ]
     
     async def extract_receipt_data(self, image_path: str, email_data: Dict = None) -> Dict:
-        """Extract receipt data using fallback methods"""
-        
-        # Try email parsing first
-        if email_data:
-            result = self._extract_from_email(email_data)
-            if result and result.get('amount', 0) > 0:
-                return result
+        """Extract receipt data using fallback methods (no fresh OCR or model calls)"""
+        from extraction_cascade import get_extraction_cascade
         
-        # Try basic image text extraction
-        result = self._extract_from_image(image_path)
-        if result and result.get('amount', 0) > 0:
-            return result
+        # Email text first, then text already OCR'd for this file
+        result = get_extraction_cascade().run(email=email_data, file_path=image_path, only=FALLBACK_TIERS)
+        if result.value('amount', 0) > 0:
+            return {
+                'merchant': result.value('merchant', 'UNKNOWN'),
+                'amount': result.value('amount'),
+                'date': result.value('date'),
+                'confidence': result.confidence,
+                'method': 'email_parsing' if result.method == 'email' else result.method
+            }
         
         # Return default result
         return {
@@ -76,21 +79,6 @@ class FallbackOCRProcessor:
         
         return None
     
-    def _extract_from_image(self, image_path: str) -> Optional[Dict]:
-        """Basic image text extraction"""
-        try:
-            # Try to extract any text from image
-            # This is a simplified version
-            return {
-                'merchant': 'UNKNOWN',
-                'amount': 0.0,
-                'confidence': 0.2,
-                'method': 'image_parsing'
-            }
-        except Exception as e:
-            logger.warning(f"⚠️ Image extraction failed: {e}")
-            return None
-    
     def _extract_merchant_from_text(self, text: str) -> str:
         """Extract merchant from text"""
         text_lower = text.lower()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Fast JSON Serialization for API Responses
+Shared list-view projections and an orjson-backed encoder that handles
+ObjectId and datetime values without walking documents by hand
+"""
+
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    logger.warning("orjson not available - falling back to stdlib json")
+
+# List views never show the raw bank payloads; they are only returned by the
+# single-transaction detail endpoints
+TRANSACTION_LIST_PROJECTION = {
+    'raw_data': 0,
+    'raw_bank_data': 0
+}
+
+RECEIPT_LIST_PROJECTION = {
+    'raw_response': 0,
+    'raw_text': 0,
+    'ocr_text': 0
+}
+
+_ORJSON_OPTIONS = 0
+if ORJSON_AVAILABLE:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    """Encode the BSON and Python types Mongo documents carry"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8', errors='replace')
+    type_name = type(obj).__name__
+    if type_name in ('ObjectId', 'Decimal128', 'Int64', 'Timestamp'):
+        return str(obj) if type_name != 'Int64' else int(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type_name} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload: Any, status: int = 200):
+    """Flask response for a payload that may still contain ObjectId/datetime values"""
+    from flask import Response
+    return Response(dumps(payload), status=status, mimetype='application/json')
@@ -12,8 +12,13 @@ import base64
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 
+from receipt_field_engine import EMAIL_AMOUNT_PATTERNS, amount_in_range, pattern_set
+
 logger = logging.getLogger(__name__)
 
+_EMAIL_AMOUNTS = pattern_set(EMAIL_AMOUNT_PATTERNS)
+_EMAIL_AMOUNT_RANGE = amount_in_range(0, 10000)
+
 def _get_category_analysis(mongo_client, start_date, end_date, business_type):
     """Get detailed category analysis"""
     try:
@@ -114,17 +119,18 @@ def _get_spending_trends(mongo_client, start_date, end_date):
 def _get_receipt_matching_stats(mongo_client, start_date, end_date):
     """Get receipt matching statistics"""
     try:
+        from transaction_snapshot import get_transaction_snapshot
+        
         query = {'date': {'$gte': start_date, '$lte': end_date}}
         
-        # Get all transactions in period
-        transactions = list(mongo_client.db.bank_transactions.find(query))
-        receipts = list(mongo_client.db.receipts.find(query))
+        # Transactions come from the columnar snapshot; receipts only need a count
+        transactions = get_transaction_snapshot(mongo_client.db).select(start_date, end_date)
+        total_receipts = mongo_client.db.receipts.count_documents(query)
         
         total_transactions = len(transactions)
-        total_receipts = len(receipts)
         
         # Count matched transactions
-        matched_transactions = sum(1 for t in transactions if t.get('receipt_matched'))
+        matched_transactions = transactions.matched_count()
         unmatched_transactions = total_transactions - matched_transactions
         
         # Calculate match rate
@@ -132,8 +138,7 @@ def _get_receipt_matching_stats(mongo_client, start_date, end_date):
         
         # Get recent matching activity
         week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_matches = sum(1 for t in transactions 
-                           if t.get('receipt_matched') and t.get('date', datetime.min) >= week_ago)
+        recent_matches = transactions.matched_count(since=week_ago)
         
         return {
             'total_transactions': total_transactions,
@@ -163,12 +168,10 @@ def _generate_analytics_insights(mongo_client, start_date, end_date):
         insights = []
         
         # Get spending data
-        expenses = list(mongo_client.db.bank_transactions.find({
-            'date': {'$gte': start_date, '$lte': end_date},
-            'amount': {'$lt': 0}
-        }))
+        from transaction_snapshot import get_transaction_snapshot
+        expenses = get_transaction_snapshot(mongo_client.db).select(start_date, end_date, expenses_only=True)
         
-        if not expenses:
+        if not len(expenses):
             insights.append({
                 'type': 'info',
                 'title': 'No Spending Data',
@@ -177,7 +180,7 @@ def _generate_analytics_insights(mongo_client, start_date, end_date):
             })
             return insights
         
-        total_spending = sum(abs(t.get('amount', 0)) for t in expenses)
+        total_spending = expenses.total_abs()
         avg_daily = total_spending / max((end_date - start_date).days, 1)
         
         # Spending pattern insights
@@ -190,12 +193,7 @@ def _generate_analytics_insights(mongo_client, start_date, end_date):
             })
         
         # Category insights
-        category_totals = {}
-        for expense in expenses:
-            category = expense.get('category', 'Uncategorized')
-            if category not in category_totals:
-                category_totals[category] = 0
-            category_totals[category] += abs(expense.get('amount', 0))
+        category_totals = {name: totals['total'] for name, totals in expenses.group_totals('category').items()}
         
         if category_totals:
             top_category = max(category_totals.items(), key=lambda x: x[1])
@@ -210,11 +208,9 @@ def _generate_analytics_insights(mongo_client, start_date, end_date):
                 })
         
         # Business vs Personal insights
-        business_expenses = [e for e in expenses if e.get('business_type') != 'Personal']
-        personal_expenses = [e for e in expenses if e.get('business_type') == 'Personal']
-        
-        business_total = sum(abs(e.get('amount', 0)) for e in business_expenses)
-        personal_total = sum(abs(e.get('amount', 0)) for e in personal_expenses)
+        business_totals = expenses.group_totals('business_type')
+        personal_total = business_totals.get('Personal', {}).get('total', 0)
+        business_total = total_spending - personal_total
         
         if business_total > 0 and personal_total > 0:
             business_ratio = business_total / (business_total + personal_total) * 100
@@ -226,8 +222,8 @@ def _generate_analytics_insights(mongo_client, start_date, end_date):
             })
         
         # Receipt matching insights
-        matched_count = sum(1 for t in expenses if t.get('receipt_matched'))
-        match_rate = (matched_count / len(expenses) * 100) if expenses else 0
+        matched_count = expenses.matched_count()
+        match_rate = (matched_count / len(expenses) * 100) if len(expenses) else 0
         
         if match_rate < 70:
             insights.append({
@@ -634,29 +630,8 @@ def _extract_amount_from_email(body, subject):
         # Combine body and subject for searching
         text = f"{subject} {body}"
         
-        # Amount patterns
-        amount_patterns = [
-            r'total:\s*\$?([0-9,]+\.?[0-9]*)',
-            r'amount:\s*\$?([0-9,]+\.?[0-9]*)',
-            r'charged:\s*\$?([0-9,]+\.?[0-9]*)',
-            r'payment:\s*\$?([0-9,]+\.?[0-9]*)',
-            r'\$([0-9,]+\.?[0-9]*)',
-            r'([0-9,]+\.?[0-9]*)\s*dollars',
-            r'([0-9,]+\.?[0-9]*)\s*usd'
-        ]
-        
-        for pattern in amount_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                try:
-                    amount_str = match.group(1).replace(',', '')
-                    amount = float(amount_str)
-                    if amount > 0 and amount < 10000:  # Reasonable range
-                        return amount
-                except ValueError:
-                    continue
-        
-        return None
+        # First pattern whose match is in a reasonable range (0, 10000)
+        return _EMAIL_AMOUNTS.first_value(text, _EMAIL_AMOUNT_RANGE)
         
     except Exception as e:
         logger.error(f"Error extracting amount: {e}")
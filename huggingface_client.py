@@ -7,8 +7,17 @@ from datetime import datetime, timedelta
 import json
 import time
 
+from ai_rate_governor import get_rate_governor
+from ai_tracing import payload_bytes, record_cache_lookup, trace_call
+from ai_response_cache import get_response_cache, response_fingerprint, response_key
+from merchant_category_table import get_merchant_table
+
 logger = logging.getLogger(__name__)
 
+# Receipt words that hint at business purpose; they go into the model context and the cache fingerprint
+BUSINESS_KEYWORDS = ['conference', 'meeting', 'business', 'office', 'supplies',
+                     'travel', 'hotel', 'flight', 'uber', 'lyft', 'gas', 'fuel']
+
 @dataclass
 class ExpenseCategory:
     category: str
@@ -27,46 +36,6 @@ class ReceiptAnalysis:
     recommendations: List[str]
     confidence_score: float
 
-@dataclass
-class UsageTracker:
-    """Track API usage to prevent unexpected costs - MONTHLY PLAN PROTECTION"""
-    daily_calls: int = 0
-    monthly_calls: int = 0
-    last_reset: datetime = None
-    last_monthly_reset: datetime = None
-    total_calls: int = 0
-    
-    def should_limit_daily(self, daily_limit: int) -> bool:
-        """Check if we should limit daily API calls"""
-        now = datetime.now()
-        if self.last_reset is None or (now - self.last_reset).days >= 1:
-            self.daily_calls = 0
-            self.last_reset = now
-        
-        return self.daily_calls >= daily_limit
-    
-    def should_limit_monthly(self, monthly_limit: int) -> bool:
-        """Check if we should limit monthly API calls - CRITICAL for monthly plan"""
-        now = datetime.now()
-        if self.last_monthly_reset is None or (now.year != self.last_monthly_reset.year or now.month != self.last_monthly_reset.month):
-            self.monthly_calls = 0
-            self.last_monthly_reset = now
-        
-        return self.monthly_calls >= monthly_limit
-    
-    def record_call(self):
-        """Record an API call"""
-        self.daily_calls += 1
-        self.monthly_calls += 1
-        self.total_calls += 1
-    
-    def get_usage_percentage(self, daily_limit: int, monthly_limit: int) -> dict:
-        """Get usage percentages for monitoring"""
-        return {
-            'daily_percentage': (self.daily_calls / daily_limit) * 100 if daily_limit > 0 else 0,
-            'monthly_percentage': (self.monthly_calls / monthly_limit) * 100 if monthly_limit > 0 else 0
-        }
-
 class HuggingFaceClient:
     """Hugging Face AI client with AGGRESSIVE cost protection for monthly plans"""
     
@@ -82,11 +51,10 @@ class HuggingFaceClient:
         self.request_timeout = getattr(Config, 'AI_REQUEST_TIMEOUT', 15)  # Shorter timeouts
         self.retry_attempts = getattr(Config, 'AI_RETRY_ATTEMPTS', 1)  # Fewer retries
         self.retry_delay = getattr(Config, 'AI_RETRY_DELAY', 2.0)
-        self.batch_delay = getattr(Config, 'AI_BATCH_DELAY', 1.0)  # Delay between calls
         self.fallback_threshold = getattr(Config, 'FALLBACK_TO_RULES_THRESHOLD', 0.8)  # Early fallback
         
-        # Usage tracking with monthly limits
-        self.usage_tracker = UsageTracker()
+        # Daily/monthly quota and pacing shared by every worker and script
+        self.governor = get_rate_governor('huggingface')
         
         if self.api_key:
             self.headers["Authorization"] = f"Bearer {self.api_key}"
@@ -118,35 +86,52 @@ class HuggingFaceClient:
             return False
     
     def categorize_expense(self, receipt_data: Dict) -> ExpenseCategory:
-        """Categorize expense with COST PROTECTION - falls back to rules early"""
+        """Categorize expense with COST PROTECTION - learned and cached answers first, falls back to rules early"""
         if not self.is_connected():
             return self._fallback_categorization(receipt_data)
         
-        # Cost protection check - use rules if approaching limits
-        if not self._should_use_ai():
-            logger.info("💰 Using rule-based categorization to protect monthly plan costs")
-            return self._fallback_categorization(receipt_data)
-        
-        # Only use AI if well within limits
         try:
             merchant = receipt_data.get('merchant', 'Unknown')
             amount = receipt_data.get('total_amount', 0.0)
             items = receipt_data.get('items', [])
             raw_text = receipt_data.get('raw_text', '')
             
+            # Merchants the models (or a user) already settled skip the models entirely
+            learned = get_merchant_table().lookup('hf_client', merchant)
+            record_cache_lookup('huggingface_client', 'merchant_category_table', bool(learned), 'categorize')
+            if learned:
+                logger.info(f"📒 Learned category for {learned.merchant}: {learned.category}")
+                return ExpenseCategory(
+                    category=learned.category,
+                    subcategory=learned.details.get('subcategory', 'General'),
+                    confidence=learned.confidence,
+                    business_purpose=learned.details.get('business_purpose', 'Business expense'),
+                    tax_deductible=learned.details.get('tax_deductible', True),
+                    description=f"{learned.category} from {merchant}"
+                )
+            
             context = self._build_context(merchant, amount, items, raw_text)
+            # Repeat merchants at a similar amount reuse an earlier model answer
+            fingerprint = response_fingerprint(merchant, amount, self._business_terms(raw_text))
             
             # Try ONE AI model only (not multiple) to save costs
-            category_result = self._classify_expense_category(context)
-            business_analysis = self._analyze_business_purpose(context, category_result)
+            category_result = self._classify_expense_category(context, fingerprint)
+            business_analysis = self._analyze_business_purpose(context, category_result, fingerprint)
             
-            return ExpenseCategory(
+            expense_category = ExpenseCategory(
                 category=category_result.get('category', 'Other Business Expenses'),
                 subcategory=category_result.get('subcategory', 'General'),
                 confidence=category_result.get('confidence', 0.8),
                 business_purpose=business_analysis.get('purpose', 'Business expense'),
-                tax_deductible=business_analysis.get('tax_deductible', True)
+                tax_deductible=business_analysis.get('tax_deductible', True),
+                description=business_analysis.get('description', f"{category_result.get('category', 'Expense')} from {merchant}")
             )
+            # Rule-based answers stay below the table's confidence threshold
+            get_merchant_table().record('hf_client', merchant, expense_category.category, expense_category.confidence,
+                                        details={'subcategory': expense_category.subcategory,
+                                                 'business_purpose': expense_category.business_purpose,
+                                                 'tax_deductible': expense_category.tax_deductible})
+            return expense_category
             
         except Exception as e:
             logger.error(f"AI categorization failed: {e}")
@@ -204,13 +189,10 @@ class HuggingFaceClient:
         # Add relevant portions of raw text
         if raw_text:
             # Extract key phrases that might indicate business purpose
-            business_keywords = ['conference', 'meeting', 'business', 'office', 'supplies', 
-                               'travel', 'hotel', 'flight', 'uber', 'lyft', 'gas', 'fuel']
-            
             lines = raw_text.lower().split('\n')
             relevant_lines = []
             for line in lines:
-                if any(keyword in line for keyword in business_keywords):
+                if any(keyword in line for keyword in BUSINESS_KEYWORDS):
                     relevant_lines.append(line.strip())
             
             if relevant_lines:
@@ -218,8 +200,33 @@ class HuggingFaceClient:
         
         return context
     
-    def _classify_expense_category(self, context: str) -> Dict:
-        """Classify expense using PREMIUM Hugging Face models with cost protection"""
+    def _business_terms(self, raw_text: str) -> List[str]:
+        """Business keywords on the receipt - the part of the context that shapes the model's answer"""
+        text = (raw_text or '').lower()
+        return [keyword for keyword in BUSINESS_KEYWORDS if keyword in text]
+    
+    def _classify_expense_category(self, context: str, fingerprint: Optional[str] = None) -> Dict:
+        """Classify expense: cached model answer, then models within limits, then rules"""
+        cache = get_response_cache()
+        key = response_key('category', fingerprint) if fingerprint else None
+        cached = cache.get(key) if key else None
+        if key:
+            record_cache_lookup('huggingface_client', 'ai_response_cache', bool(cached), 'categorize')
+        if cached:
+            logger.info(f"♻️ Cached classification: {cached['category']}")
+            return cached
+        
+        result = self._classify_with_models(context) if self._should_use_ai() else None
+        if result is None:
+            # Fallback to rule-based classification if API limits reached
+            logger.info("Using rule-based fallback due to API limits")
+            return self._rule_based_classification(context)
+        if key:
+            cache.put(key, result)
+        return result
+    
+    def _classify_with_models(self, context: str) -> Optional[Dict]:
+        """Classify expense using PREMIUM Hugging Face models with cost protection (None if none answered)"""
         try:
             # Define expense categories
             categories = [
@@ -280,16 +287,32 @@ Return only the category name. [/INST]"""
                     'confidence': confidence
                 }
             
-            # Fallback to rule-based classification if API limits reached
-            logger.info("Using rule-based fallback due to API limits")
-            return self._rule_based_classification(context)
+            return None
             
         except Exception as e:
             logger.error(f"Error in AI classification: {str(e)}")
-            return self._rule_based_classification(context)
+            return None
+    
+    def _analyze_business_purpose(self, context: str, category_result: Dict, fingerprint: Optional[str] = None) -> Dict:
+        """Analyze business purpose: cached model answer, then models within limits, then rules"""
+        cache = get_response_cache()
+        key = response_key('purpose', fingerprint, category_result.get('category', '')) if fingerprint else None
+        cached = cache.get(key) if key else None
+        if key:
+            record_cache_lookup('huggingface_client', 'ai_response_cache', bool(cached), 'purpose')
+        if cached:
+            logger.info(f"♻️ Cached purpose: {cached['purpose']}")
+            return cached
+        
+        result = self._analyze_purpose_with_models(context, category_result) if self._should_use_ai() else None
+        if result is None:
+            return self._rule_based_business_analysis(context, category_result)
+        if key:
+            cache.put(key, result)
+        return result
     
-    def _analyze_business_purpose(self, context: str, category_result: Dict) -> Dict:
-        """Analyze business purpose using PREMIUM AI models"""
+    def _analyze_purpose_with_models(self, context: str, category_result: Dict) -> Optional[Dict]:
+        """Analyze business purpose using PREMIUM AI models (None if none answered)"""
         try:
             # Method 1: Try Qwen2.5-7B-Instruct (Alibaba's latest!)
             try:
@@ -314,10 +337,9 @@ Return: [Business/Personal] - [brief purpose]<|im_end|>
                     }
                 }
                 
-                response = requests.post(model_url, headers=self.headers, json=payload, timeout=20)
+                result = self._make_request_with_limits(model_url, payload, timeout=20)
                 
-                if response.status_code == 200:
-                    result = response.json()
+                if result:
                     if isinstance(result, list) and len(result) > 0:
                         generated_text = result[0].get('generated_text', '').strip()
                         
@@ -352,10 +374,9 @@ Is this business or personal? What's the likely business purpose? [/INST]"""
                     }
                 }
                 
-                response = requests.post(model_url, headers=self.headers, json=payload, timeout=20)
+                result = self._make_request_with_limits(model_url, payload, timeout=20)
                 
-                if response.status_code == 200:
-                    result = response.json()
+                if result:
                     if isinstance(result, list) and len(result) > 0:
                         generated_text = result[0].get('generated_text', '')
                         
@@ -372,12 +393,11 @@ Is this business or personal? What's the likely business purpose? [/INST]"""
             except Exception as e:
                 logger.debug(f"Llama-3.1 analysis failed: {e}")
             
-            # Fallback analysis
-            return self._rule_based_business_analysis(context, category_result)
+            return None
             
         except Exception as e:
             logger.error(f"Error in business purpose analysis: {str(e)}")
-            return self._rule_based_business_analysis(context, category_result)
+            return None
     
     def _analyze_merchant_type(self, receipt_data: Dict) -> str:
         """Analyze merchant type using AI"""
@@ -744,49 +764,27 @@ Is this business or personal? What's the likely business purpose? [/INST]"""
 
     def _should_use_ai(self) -> bool:
         """Determine if we should use AI or fall back to rules - COST PROTECTION"""
-        # Check monthly limits first (most important)
-        if self.usage_tracker.should_limit_monthly(self.monthly_limit):
-            logger.warning(f"🚫 Monthly HuggingFace limit reached ({self.monthly_limit}). Using rule-based processing.")
-            return False
-        
-        # Check daily limits
-        if self.usage_tracker.should_limit_daily(self.daily_limit):
-            logger.warning(f"🚫 Daily HuggingFace limit reached ({self.daily_limit}). Using rule-based processing.")
+        # Local check only; the shared quota itself is enforced per call by the governor
+        if not self.governor.available():
+            logger.warning("🚫 HuggingFace daily/monthly budget used up. Using rule-based processing.")
             return False
-        
-        # Check if we're approaching limits (fallback early to save costs)
-        usage_stats = self.usage_tracker.get_usage_percentage(self.daily_limit, self.monthly_limit)
-        if usage_stats['daily_percentage'] >= (self.fallback_threshold * 100):
-            logger.info(f"💰 Daily usage at {usage_stats['daily_percentage']:.1f}% - switching to rule-based to save costs")
-            return False
-        
-        if usage_stats['monthly_percentage'] >= (self.fallback_threshold * 100):
-            logger.info(f"💰 Monthly usage at {usage_stats['monthly_percentage']:.1f}% - switching to rule-based to save costs")
-            return False
-        
         return True
 
     def _make_request_with_limits(self, url: str, payload: dict, timeout: int = None) -> Optional[dict]:
         """Make API request with AGGRESSIVE cost protection"""
-        # Cost protection check first
-        if not self._should_use_ai():
-            return None
-        
         timeout = timeout or self.request_timeout
         
-        # Add delay between requests to be respectful and avoid rate limits
-        if self.batch_delay > 0:
-            time.sleep(self.batch_delay)
-        
         for attempt in range(self.retry_attempts + 1):
             try:
-                # Record the call attempt
-                self.usage_tracker.record_call()
-                
-                usage_stats = self.usage_tracker.get_usage_percentage(self.daily_limit, self.monthly_limit)
-                logger.info(f"🤖 HuggingFace call #{self.usage_tracker.daily_calls}/{self.daily_limit} daily, #{self.usage_tracker.monthly_calls}/{self.monthly_limit} monthly ({usage_stats['monthly_percentage']:.1f}% monthly used)")
+                # Every attempt is a billed call: take it from the shared budget,
+                # waiting for the token bucket instead of a fixed delay
+                if not self.governor.acquire():
+                    return None
                 
-                response = requests.post(url, headers=self.headers, json=payload, timeout=timeout)
+                with trace_call('huggingface_client', url.rsplit('/models/', 1)[-1],
+                                request_bytes=payload_bytes(payload)) as call:
+                    response = requests.post(url, headers=self.headers, json=payload, timeout=timeout)
+                    call.response(response)
                 
                 if response.status_code == 200:
                     return response.json()
@@ -814,21 +812,22 @@ Is this business or personal? What's the likely business purpose? [/INST]"""
         return None
 
     def get_usage_stats(self) -> Dict:
-        """Get API usage statistics for cost monitoring - MONTHLY TRACKING"""
-        usage_percentages = self.usage_tracker.get_usage_percentage(self.daily_limit, self.monthly_limit)
+        """Get API usage statistics for cost monitoring - MONTHLY TRACKING (all workers combined)"""
+        usage = self.governor.usage()
+        percentage = lambda calls, limit: (calls / limit) * 100 if limit > 0 else 0
         
         return {
-            'daily_calls': self.usage_tracker.daily_calls,
+            'daily_calls': usage['day_count'],
             'daily_limit': self.daily_limit,
-            'monthly_calls': self.usage_tracker.monthly_calls,
+            'monthly_calls': usage['month_count'],
             'monthly_limit': self.monthly_limit,
-            'total_calls': self.usage_tracker.total_calls,
-            'daily_calls_remaining': max(0, self.daily_limit - self.usage_tracker.daily_calls),
-            'monthly_calls_remaining': max(0, self.monthly_limit - self.usage_tracker.monthly_calls),
-            'daily_percentage_used': usage_percentages['daily_percentage'],
-            'monthly_percentage_used': usage_percentages['monthly_percentage'],
-            'cost_protection_active': not self._should_use_ai(),
+            'total_calls': usage['total'],
+            'daily_calls_remaining': max(0, self.governor.daily_limit - usage['day_count']),
+            'monthly_calls_remaining': max(0, self.governor.monthly_limit - usage['month_count']),
+            'daily_percentage_used': percentage(usage['day_count'], self.daily_limit),
+            'monthly_percentage_used': percentage(usage['month_count'], self.monthly_limit),
+            'cost_protection_active': usage['exhausted'] or usage['day_count'] >= self.governor.daily_limit
+                                      or usage['month_count'] >= self.governor.monthly_limit,
             'fallback_threshold': self.fallback_threshold * 100,
-            'last_reset': self.usage_tracker.last_reset.isoformat() if self.usage_tracker.last_reset else None,
-            'last_monthly_reset': self.usage_tracker.last_monthly_reset.isoformat() if self.usage_tracker.last_monthly_reset else None
-        }
\ No newline at end of file
+            'leased_unused': usage['leased_unused'],
+        }
@@ -13,12 +13,20 @@ import requests
 from io import BytesIO
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Union
-from PIL import Image
+from PIL import Image, ImageOps
 import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_rate_governor import get_rate_governor
+from ai_tracing import trace_call
 
 # Add transformers imports for local inference
 try:
-    from transformers import pipeline, AutoTokenizer, AutoModelForImageTextToText
+    import torch
+    from transformers import AutoProcessor, VisionEncoderDecoderModel
     TRANSFORMERS_AVAILABLE = True
 except ImportError:
     TRANSFORMERS_AVAILABLE = False
@@ -26,41 +34,76 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Donut checkpoints are steered by a task start token
+DONUT_TASK_PROMPTS = {
+    'cord-v2': '<s_cord-v2>',
+    'rvlcdip': '<s_rvlcdip>',
+    'docvqa': '<s_docvqa>',
+    'zhtrainticket': '<s_zhtrainticket>'
+}
+
 class LocalHuggingFaceProcessor:
     """
     Local receipt processor using transformers library
-    Runs models locally instead of using cloud API
+    Runs Donut/TrOCR (vision encoder-decoder) models locally instead of using
+    the cloud API. The model is loaded once, in eval mode, and images are
+    processed in padded batches; on CPU the Linear layers can be dynamically
+    quantized to int8.
     """
     
-    def __init__(self, model_name: str = "naver-clova-ix/donut-base-finetuned-cord-v2"):
+    def __init__(self, model_name: str = "naver-clova-ix/donut-base-finetuned-cord-v2",
+                 batch_size: int = 4, quantize: Optional[bool] = None, device: Optional[str] = None,
+                 max_new_tokens: int = 384, task_prompt: Optional[str] = None):
         """
         Initialize local HF processor
         
         Args:
-            model_name: HuggingFace model name to use locally
+            model_name: HuggingFace model name (or local directory) to use locally
+            batch_size: Default number of images per forward pass in process_batch
+            quantize: Dynamic int8 quantization on CPU; defaults to LOCAL_HF_QUANTIZE env
+            device: torch device; defaults to cuda when available
+            max_new_tokens: Generation limit per image
+            task_prompt: Donut task token; derived from the model name when omitted
         """
         if not TRANSFORMERS_AVAILABLE:
             raise ImportError("Transformers library not available")
         
         self.model_name = model_name
-        self.pipe = None
+        self.batch_size = max(1, batch_size)
+        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        if quantize is None:
+            quantize = os.getenv('LOCAL_HF_QUANTIZE', '').lower() in ('1', 'true', 'yes')
+        self.quantize = quantize and self.device == 'cpu'
+        self.max_new_tokens = max_new_tokens
+        self.task_prompt = task_prompt
+        self.processor = None
         self.tokenizer = None
         self.model = None
+        self.is_donut = False
+        self._generate_lock = threading.Lock()
         
         logger.info(f"🤗 Initializing local HuggingFace processor with model: {model_name}")
         self._load_model()
     
     def _load_model(self):
-        """Load the model and tokenizer"""
+        """Load the processor and a single copy of the model weights"""
         try:
             logger.info(f"📥 Loading model: {self.model_name}")
             
-            # Load tokenizer and model
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForImageTextToText.from_pretrained(self.model_name)
+            self.processor = AutoProcessor.from_pretrained(self.model_name)
+            self.tokenizer = self.processor.tokenizer
+            model = VisionEncoderDecoderModel.from_pretrained(self.model_name)
+            model.eval()
             
-            # Create pipeline
-            self.pipe = pipeline("image-to-text", model=self.model_name)
+            if self.quantize:
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                logger.info("🗜️ Applied dynamic int8 quantization to Linear layers")
+            self.model = model.to(self.device)
+            
+            self.is_donut = getattr(self.model.config.encoder, 'model_type', '').startswith('donut')
+            if self.is_donut and self.task_prompt is None:
+                self.task_prompt = next((prompt for key, prompt in DONUT_TASK_PROMPTS.items()
+                                         if key in self.model_name), None)
             
             logger.info(f"✅ Local model loaded successfully: {self.model_name}")
             
@@ -68,56 +111,130 @@ class LocalHuggingFaceProcessor:
             logger.error(f"❌ Failed to load local model: {str(e)}")
             raise
     
-    def process_receipt_image(self, image_path: str) -> Dict[str, Any]:
+    @staticmethod
+    def _load_image(image: Union[str, Image.Image]) -> Image.Image:
+        if isinstance(image, str):
+            with Image.open(image) as opened:
+                return opened.convert('RGB')
+        return image.convert('RGB') if image.mode != 'RGB' else image
+    
+    @staticmethod
+    def _collate(pixel_values: List) -> 'torch.Tensor':
+        """Stack per-image CHW arrays, zero-padding to the largest height and width"""
+        tensors = [torch.as_tensor(pv) for pv in pixel_values]
+        height = max(t.shape[-2] for t in tensors)
+        width = max(t.shape[-1] for t in tensors)
+        batch = tensors[0].new_zeros((len(tensors), tensors[0].shape[0], height, width))
+        for i, t in enumerate(tensors):
+            batch[i, :, :t.shape[-2], :t.shape[-1]] = t
+        return batch
+    
+    def _generate(self, images: List[Image.Image]) -> List[str]:
+        """One forward pass for a batch of images; returns decoded sequences"""
+        pixel_values = self.processor(images=images, return_tensors=None)['pixel_values']
+        pixel_values = self._collate(pixel_values).to(self.device)
+        
+        kwargs = {'max_new_tokens': self.max_new_tokens, 'num_beams': 1, 'use_cache': True}
+        if self.tokenizer.pad_token_id is not None:
+            kwargs['pad_token_id'] = self.tokenizer.pad_token_id
+        if self.task_prompt:
+            prompt_ids = self.tokenizer(self.task_prompt, add_special_tokens=False, return_tensors='pt').input_ids
+            kwargs['decoder_input_ids'] = prompt_ids.repeat(len(images), 1).to(self.device)
+        
+        with self._generate_lock, torch.inference_mode(), \
+                trace_call('local_huggingface', self.model_name, 'receipt_ocr', cost_units=0.0):
+            output_ids = self.model.generate(pixel_values, **kwargs)
+        
+        if not self.is_donut:
+            return self.processor.batch_decode(output_ids, skip_special_tokens=True)
+        
+        sequences = []
+        for sequence in self.processor.batch_decode(output_ids):
+            for token in (self.tokenizer.eos_token, self.tokenizer.pad_token):
+                if token:
+                    sequence = sequence.replace(token, '')
+            if self.task_prompt:
+                sequence = sequence.replace(self.task_prompt, '', 1)
+            sequences.append(sequence.strip())
+        return sequences
+    
+    def _structure(self, text: str) -> Dict[str, Any]:
+        if self.is_donut and hasattr(self.processor, 'token2json'):
+            try:
+                parsed = self.processor.token2json(text)
+                if parsed and set(parsed) != {'text_sequence'}:
+                    return parsed
+            except Exception as e:
+                logger.debug(f"Donut token2json failed: {e}")
+        return self._parse_extracted_text(text)
+    
+    def process_batch(self, images: List[Union[str, Image.Image]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Process a receipt image using local model
+        Process many receipt images with batched generation
         
         Args:
-            image_path: Path to receipt image
+            images: Image paths or PIL images
+            batch_size: Images per forward pass (defaults to the processor's batch_size)
             
         Returns:
-            Structured receipt data
+            One result per input, in input order
         """
-        start_time = datetime.now()
+        batch_size = max(1, batch_size or self.batch_size)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
         
-        try:
-            # Load image
-            if isinstance(image_path, str):
-                image = Image.open(image_path)
-            else:
-                image = image_path
-            
-            # Process with local model
-            logger.info(f"🤖 Processing with local model: {self.model_name}")
-            result = self.pipe(image)
-            
-            # Extract text from result
-            extracted_text = result[0]['generated_text'] if result else ""
-            
-            # Parse the extracted text
-            parsed_data = self._parse_extracted_text(extracted_text)
-            
-            # Calculate processing time
-            processing_time = (datetime.now() - start_time).total_seconds()
+        loaded = []
+        for index, image in enumerate(images):
+            try:
+                loaded.append((index, self._load_image(image)))
+            except Exception as e:
+                logger.error(f"❌ Could not open receipt image: {e}")
+                results[index] = self._create_error_response(str(e))
+        
+        for offset in range(0, len(loaded), batch_size):
+            chunk = loaded[offset:offset + batch_size]
+            start_time = datetime.now()
+            try:
+                logger.info(f"🤖 Processing {len(chunk)} image(s) with local model: {self.model_name}")
+                texts = self._generate([image for _, image in chunk])
+            except Exception as e:
+                logger.error(f"❌ Local processing failed: {str(e)}")
+                for index, _ in chunk:
+                    results[index] = self._create_error_response(str(e))
+                continue
             
-            return {
-                "status": "success",
-                "extracted_data": parsed_data,
-                "raw_text": extracted_text,
-                "confidence_score": 0.85,  # Local models don't provide confidence
-                "model_used": self.model_name,
-                "processing_metadata": {
+            batch_seconds = (datetime.now() - start_time).total_seconds()
+            for (index, _), extracted_text in zip(chunk, texts):
+                source = images[index]
+                results[index] = {
+                    "status": "success",
+                    "extracted_data": self._structure(extracted_text),
+                    "raw_text": extracted_text,
+                    "confidence_score": 0.85,  # Local models don't provide confidence
                     "model_used": self.model_name,
-                    "processing_time_seconds": round(processing_time, 3),
-                    "local_inference": True,
-                    "image_path": os.path.basename(image_path) if isinstance(image_path, str) else "image",
-                    "timestamp": datetime.now().isoformat()
+                    "processing_metadata": {
+                        "model_used": self.model_name,
+                        "processing_time_seconds": round(batch_seconds / len(chunk), 3),
+                        "batch_size": len(chunk),
+                        "quantized": self.quantize,
+                        "local_inference": True,
+                        "image_path": os.path.basename(source) if isinstance(source, str) else "image",
+                        "timestamp": datetime.now().isoformat()
+                    }
                 }
-            }
+        
+        return results
+    
+    def process_receipt_image(self, image_path: Union[str, Image.Image]) -> Dict[str, Any]:
+        """
+        Process a receipt image using local model
+        
+        Args:
+            image_path: Path to receipt image (or a PIL image)
             
-        except Exception as e:
-            logger.error(f"❌ Local processing failed: {str(e)}")
-            return self._create_error_response(str(e))
+        Returns:
+            Structured receipt data
+        """
+        return self.process_batch([image_path], batch_size=1)[0]
     
     def _parse_extracted_text(self, text: str) -> Dict[str, Any]:
         """Parse extracted text into structured data"""
@@ -179,6 +296,13 @@ class LocalHuggingFaceProcessor:
             }
         }
 
+# Cloud batch: per-item model fallback order, in-flight requests and upload size
+CLOUD_FALLBACK_CHAIN = ("paligemma", "donut", "trocr")
+BATCH_IN_FLIGHT = int(os.getenv('HF_BATCH_IN_FLIGHT', 4))
+UPLOAD_MAX_SIDE = int(os.getenv('HF_UPLOAD_MAX_SIDE', 1600))
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
 class HuggingFaceReceiptProcessor:
     """
     Cloud-based receipt processor using HuggingFace Inference API
@@ -247,6 +371,8 @@ class HuggingFaceReceiptProcessor:
             "api_calls": 0,
             "failed_api_calls": 0
         }
+        self._stats_lock = threading.Lock()
+        self.session: Optional[requests.Session] = None
         
         logger.info(f"🤗 HuggingFace Cloud Receipt Processor initialized")
         logger.info(f"   API Token: {'✅ Configured' if self.api_token else '❌ Missing'}")
@@ -359,7 +485,7 @@ class HuggingFaceReceiptProcessor:
             logger.error(f"Failed to load image: {str(e)}")
             return None
     
-    def _process_with_cloud_model(self, image_data: str, model_name: str) -> Dict[str, Any]:
+    def _process_with_cloud_model(self, image_data: Union[str, bytes], model_name: str) -> Dict[str, Any]:
         """Process image with cloud model via API"""
         try:
             config = self.model_configs[model_name]
@@ -370,6 +496,10 @@ class HuggingFaceReceiptProcessor:
                 "Content-Type": "application/json"
             }
             
+            # Calls share the cross-worker HuggingFace budget and pacing
+            if model_name != "layoutlm" and not get_rate_governor('huggingface').acquire():
+                return self._create_error_response("HuggingFace call budget used up")
+            
             # Different payload formats for different models
             if model_name == "paligemma":
                 return self._process_with_paligemma_api(image_data, config, headers)
@@ -388,34 +518,48 @@ class HuggingFaceReceiptProcessor:
             logger.error(f"Cloud model processing failed: {str(e)}")
             return self._create_error_response(f"Cloud processing error: {str(e)}")
     
-    def _process_with_paligemma_api(self, image_data: str, config: Dict, headers: Dict) -> Dict[str, Any]:
+    def _http(self) -> requests.Session:
+        """Shared keep-alive session, sized for the batch's in-flight requests"""
+        if self.session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max(BATCH_IN_FLIGHT, 10))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self.session = session
+        return self.session
+    
+    def _post_image(self, image_data: Union[str, bytes], config: Dict, headers: Dict,
+                    data: Optional[Dict] = None) -> requests.Response:
+        """POST an image file (path) or prepared upload (bytes) as multipart form data"""
+        # Remove Content-Type header to let requests set it for multipart
+        headers_copy = {k: v for k, v in headers.items() if k != "Content-Type"}
+        
+        if isinstance(image_data, bytes):
+            files = {"file": ("receipt.jpg", image_data, "image/jpeg")}
+            size = len(image_data)
+        else:
+            with open(image_data, 'rb') as f:
+                upload = f.read()
+            files = {"file": ("receipt.png", upload, "image/png")}
+            size = len(upload)
+        
+        with trace_call('huggingface_receipt_processor', config.get("model_id", config["endpoint"]),
+                        'receipt_ocr', request_bytes=size) as call:
+            response = self._http().post(config["endpoint"], headers=headers_copy, files=files, data=data,
+                                         timeout=config["timeout"])
+            call.response(response)
+        return response
+    
+    def _process_with_paligemma_api(self, image_data: Union[str, bytes], config: Dict, headers: Dict) -> Dict[str, Any]:
         """Process with PaliGemma via API"""
         try:
             self.processing_stats["api_calls"] += 1
             
-            # Use multipart form data instead of JSON with base64
-            with open(image_data, 'rb') as f:
-                files = {
-                    "file": ("receipt.png", f, "image/png")
-                }
-                
-                # Add text prompt as form data
-                data = {
-                    "text": "Extract all receipt information including merchant, date, total amount, items, and payment method as structured JSON"
-                }
-                
-                # Remove Content-Type header to let requests set it for multipart
-                headers_copy = headers.copy()
-                if "Content-Type" in headers_copy:
-                    del headers_copy["Content-Type"]
-                
-                response = requests.post(
-                    config["endpoint"],
-                    headers=headers_copy,
-                    files=files,
-                    data=data,
-                    timeout=config["timeout"]
-                )
+            # Add text prompt as form data
+            data = {
+                "text": "Extract all receipt information including merchant, date, total amount, items, and payment method as structured JSON"
+            }
+            response = self._post_image(image_data, config, headers, data)
             
             if response.status_code == 200:
                 result = response.json()
@@ -451,41 +595,24 @@ class HuggingFaceReceiptProcessor:
                 self.processing_stats["failed_api_calls"] += 1
                 error_msg = f"API error {response.status_code}: {response.text}"
                 logger.error(f"PaliGemma API error: {error_msg}")
-                return self._create_error_response(error_msg)
+                return self._create_error_response(error_msg, retryable=response.status_code in RETRYABLE_STATUS)
                 
         except Exception as e:
             self.processing_stats["failed_api_calls"] += 1
             logger.error(f"PaliGemma API processing failed: {str(e)}")
-            return self._create_error_response(f"PaliGemma API error: {str(e)}")
+            return self._create_error_response(f"PaliGemma API error: {str(e)}",
+                                               retryable=isinstance(e, requests.RequestException))
     
-    def _process_with_donut_api(self, image_data: str, config: Dict, headers: Dict) -> Dict[str, Any]:
+    def _process_with_donut_api(self, image_data: Union[str, bytes], config: Dict, headers: Dict) -> Dict[str, Any]:
         """Process with Donut via API"""
         try:
             self.processing_stats["api_calls"] += 1
             
-            # Use multipart form data
-            with open(image_data, 'rb') as f:
-                files = {
-                    "file": ("receipt.png", f, "image/png")
-                }
-                
-                # Add question as form data
-                data = {
-                    "question": "What is the merchant name, date, total amount, and items on this receipt?"
-                }
-                
-                # Remove Content-Type header to let requests set it for multipart
-                headers_copy = headers.copy()
-                if "Content-Type" in headers_copy:
-                    del headers_copy["Content-Type"]
-                
-                response = requests.post(
-                    config["endpoint"],
-                    headers=headers_copy,
-                    files=files,
-                    data=data,
-                    timeout=config["timeout"]
-                )
+            # Add question as form data
+            data = {
+                "question": "What is the merchant name, date, total amount, and items on this receipt?"
+            }
+            response = self._post_image(image_data, config, headers, data)
             
             if response.status_code == 200:
                 result = response.json()
@@ -510,34 +637,19 @@ class HuggingFaceReceiptProcessor:
             else:
                 self.processing_stats["failed_api_calls"] += 1
                 error_msg = f"API error {response.status_code}: {response.text}"
-                return self._create_error_response(error_msg)
+                return self._create_error_response(error_msg, retryable=response.status_code in RETRYABLE_STATUS)
                 
         except Exception as e:
             self.processing_stats["failed_api_calls"] += 1
-            return self._create_error_response(f"Donut API error: {str(e)}")
+            return self._create_error_response(f"Donut API error: {str(e)}",
+                                               retryable=isinstance(e, requests.RequestException))
     
-    def _process_with_trocr_api(self, image_data: str, config: Dict, headers: Dict) -> Dict[str, Any]:
+    def _process_with_trocr_api(self, image_data: Union[str, bytes], config: Dict, headers: Dict) -> Dict[str, Any]:
         """Process with TrOCR via API"""
         try:
             self.processing_stats["api_calls"] += 1
             
-            # Use multipart form data
-            with open(image_data, 'rb') as f:
-                files = {
-                    "file": ("receipt.png", f, "image/png")
-                }
-                
-                # Remove Content-Type header to let requests set it for multipart
-                headers_copy = headers.copy()
-                if "Content-Type" in headers_copy:
-                    del headers_copy["Content-Type"]
-                
-                response = requests.post(
-                    config["endpoint"],
-                    headers=headers_copy,
-                    files=files,
-                    timeout=config["timeout"]
-                )
+            response = self._post_image(image_data, config, headers)
             
             if response.status_code == 200:
                 result = response.json()
@@ -561,34 +673,20 @@ class HuggingFaceReceiptProcessor:
                 )
             else:
                 self.processing_stats["failed_api_calls"] += 1
-                return self._create_error_response(f"TrOCR API error {response.status_code}")
+                return self._create_error_response(f"TrOCR API error {response.status_code}",
+                                                   retryable=response.status_code in RETRYABLE_STATUS)
                 
         except Exception as e:
             self.processing_stats["failed_api_calls"] += 1
-            return self._create_error_response(f"TrOCR API error: {str(e)}")
+            return self._create_error_response(f"TrOCR API error: {str(e)}",
+                                               retryable=isinstance(e, requests.RequestException))
     
-    def _process_with_blip_api(self, image_data: str, config: Dict, headers: Dict) -> Dict[str, Any]:
+    def _process_with_blip_api(self, image_data: Union[str, bytes], config: Dict, headers: Dict) -> Dict[str, Any]:
         """Process with BLIP via API"""
         try:
             self.processing_stats["api_calls"] += 1
             
-            # Use multipart form data
-            with open(image_data, 'rb') as f:
-                files = {
-                    "file": ("receipt.png", f, "image/png")
-                }
-                
-                # Remove Content-Type header to let requests set it for multipart
-                headers_copy = headers.copy()
-                if "Content-Type" in headers_copy:
-                    del headers_copy["Content-Type"]
-                
-                response = requests.post(
-                    config["endpoint"],
-                    headers=headers_copy,
-                    files=files,
-                    timeout=config["timeout"]
-                )
+            response = self._post_image(image_data, config, headers)
             
             if response.status_code == 200:
                 result = response.json()
@@ -612,13 +710,15 @@ class HuggingFaceReceiptProcessor:
                 )
             else:
                 self.processing_stats["failed_api_calls"] += 1
-                return self._create_error_response(f"BLIP API error {response.status_code}")
+                return self._create_error_response(f"BLIP API error {response.status_code}",
+                                                   retryable=response.status_code in RETRYABLE_STATUS)
                 
         except Exception as e:
             self.processing_stats["failed_api_calls"] += 1
-            return self._create_error_response(f"BLIP API error: {str(e)}")
+            return self._create_error_response(f"BLIP API error: {str(e)}",
+                                               retryable=isinstance(e, requests.RequestException))
     
-    def _process_with_layoutlm_api(self, image_data: str, config: Dict, headers: Dict) -> Dict[str, Any]:
+    def _process_with_layoutlm_api(self, image_data: Union[str, bytes], config: Dict, headers: Dict) -> Dict[str, Any]:
         """Process with LayoutLM via API (placeholder - requires specific setup)"""
         return self._create_error_response("LayoutLM API processing requires specific OCR preprocessing")
     
@@ -837,28 +937,30 @@ class HuggingFaceReceiptProcessor:
         
         return standardized_items
     
-    def _create_error_response(self, error_message: str) -> Dict[str, Any]:
-        """Create standardized error response"""
+    def _create_error_response(self, error_message: str, retryable: bool = False) -> Dict[str, Any]:
+        """Create standardized error response (retryable: timeouts, 429 and 5xx)"""
         return {
             "status": "error",
             "error_message": error_message,
             "confidence_score": 0.0,
             "extracted_data": None,
             "model_used": self.model_preference,
-            "cloud_inference": True
+            "cloud_inference": True,
+            "retryable": retryable
         }
     
     def _update_stats(self, result: Dict, processing_time: float):
         """Update processing statistics"""
-        self.processing_stats["total_processed"] += 1
-        
-        if result["status"] == "success":
-            self.processing_stats["successful_extractions"] += 1
-            self.processing_stats["confidence_scores"].append(result["confidence_score"])
-        
-        # Update average processing time
-        total_time = self.processing_stats["avg_processing_time"] * (self.processing_stats["total_processed"] - 1)
-        self.processing_stats["avg_processing_time"] = (total_time + processing_time) / self.processing_stats["total_processed"]
+        with self._stats_lock:
+            self.processing_stats["total_processed"] += 1
+            
+            if result["status"] == "success":
+                self.processing_stats["successful_extractions"] += 1
+                self.processing_stats["confidence_scores"].append(result["confidence_score"])
+            
+            # Update average processing time
+            total_time = self.processing_stats["avg_processing_time"] * (self.processing_stats["total_processed"] - 1)
+            self.processing_stats["avg_processing_time"] = (total_time + processing_time) / self.processing_stats["total_processed"]
     
     def get_available_models(self) -> List[str]:
         """Get list of available models"""
@@ -898,27 +1000,108 @@ class HuggingFaceReceiptProcessor:
         
         return info
     
-    def batch_process_receipts(self, image_paths: List[str], model_name: Optional[str] = None) -> Dict[str, Any]:
-        """Process multiple receipt images in batch"""
-        results = []
+    def _prepare_upload(self, image_path: Union[str, Image.Image], max_side: int = UPLOAD_MAX_SIDE) -> Optional[bytes]:
+        """Upright, downscaled JPEG bytes - a fraction of a full-size phone photo on the wire"""
+        try:
+            image = Image.open(image_path) if isinstance(image_path, str) else image_path
+            if image.format == "JPEG":
+                # Let the decoder downscale by 1/2..1/8 instead of decoding every pixel
+                image.draft("RGB", (max_side, max_side))
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, format="JPEG", quality=85, optimize=True)
+            return buffer.getvalue()
+        except Exception as e:
+            logger.error(f"Failed to prepare {image_path} for upload: {str(e)}")
+            return None
+    
+    def _process_batch_item(self, image_path: str, upload, models: List[str], retries: int) -> Dict[str, Any]:
+        """One receipt: retry transient errors, then move down the model chain"""
+        start_time = time.perf_counter()
+        image_data = upload.result()
+        attempts = []
+        result = self._create_error_response("Failed to load and encode image")
         
-        logger.info(f"🔄 Processing batch of {len(image_paths)} receipts via cloud API")
+        if image_data is not None:
+            for model in models:
+                for attempt in range(retries + 1):
+                    result = self._process_with_cloud_model(image_data, model)
+                    attempts.append(model)
+                    if result["status"] == "success" or not result.get("retryable"):
+                        break
+                    time.sleep(min(0.5 * 2 ** attempt, 8))
+                if result["status"] == "success":
+                    break
+                logger.info(f"   ↪️ {model} failed for {os.path.basename(image_path)}: {result.get('error_message')}")
         
-        for i, image_path in enumerate(image_paths):
-            logger.info(f"   Processing {i+1}/{len(image_paths)}: {os.path.basename(image_path)}")
+        processing_time = time.perf_counter() - start_time
+        result["processing_metadata"] = {
+            "model_used": result.get("model_used"),
+            "models_tried": list(dict.fromkeys(attempts)),
+            "api_attempts": len(attempts),
+            "processing_time_seconds": round(processing_time, 3),
+            "image_path": os.path.basename(image_path),
+            "timestamp": datetime.now().isoformat(),
+            "cloud_inference": True
+        }
+        self._update_stats(result, processing_time)
+        return result
+    
+    def batch_process_receipts(self, image_paths: List[str], model_name: Optional[str] = None,
+                               max_in_flight: int = BATCH_IN_FLIGHT, retries: int = 1,
+                               fallback_models: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Process multiple receipt images concurrently
+        
+        Images are downscaled and JPEG-encoded in a thread pool while up to
+        max_in_flight requests run over one keep-alive session. Each item
+        retries timeouts/429/5xx and then falls back to the next model
+        (default paligemma -> donut -> trocr); a failing item never stops the batch.
+        Results come back in input order.
+        """
+        start_time = time.perf_counter()
+        first = model_name or self.model_preference
+        models = list(dict.fromkeys([first, *(CLOUD_FALLBACK_CHAIN if fallback_models is None else fallback_models)]))
+        models = [m for m in models if m in self.model_configs]
+        
+        logger.info(f"🔄 Processing batch of {len(image_paths)} receipts via cloud API "
+                    f"({max_in_flight} in flight, models: {' -> '.join(models)})")
+        
+        if not self.api_token:
+            results = [self._create_error_response("HuggingFace API token not configured") for _ in image_paths]
+        else:
+            # Uploads are prepared at most two windows ahead of the requests
+            window = threading.BoundedSemaphore(max(1, max_in_flight) * 2)
+            
+            def run(image_path, upload):
+                try:
+                    return self._process_batch_item(image_path, upload, models, retries)
+                finally:
+                    window.release()
             
-            result = self.process_receipt_image(image_path, model_name)
-            results.append(result)
+            with ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='hf-prepare') as prepare, \
+                    ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix='hf-request') as requests_pool:
+                futures = []
+                for image_path in image_paths:
+                    window.acquire()
+                    upload = prepare.submit(self._prepare_upload, image_path)
+                    futures.append(requests_pool.submit(run, image_path, upload))
+                results = [future.result() for future in futures]
         
         # Add batch summary
         successful = sum(1 for r in results if r["status"] == "success")
+        answered_by = Counter(r["model_used"] for r in results if r["status"] == "success")
         batch_summary = {
             "batch_size": len(image_paths),
             "successful_extractions": successful,
-            "success_rate": (successful / len(image_paths)) * 100,
-            "avg_confidence": sum(r.get("confidence_score", 0) for r in results) / len(results),
-            "total_api_calls": len(image_paths),
-            "model_used": model_name or self.model_preference
+            "success_rate": (successful / len(image_paths)) * 100 if image_paths else 0.0,
+            "avg_confidence": sum(r.get("confidence_score", 0) for r in results) / len(results) if results else 0.0,
+            "total_api_calls": sum(r.get("processing_metadata", {}).get("api_attempts", 0) for r in results),
+            "model_used": first,
+            "answered_by": dict(answered_by),
+            "fallbacks": sum(count for model, count in answered_by.items() if model != first),
+            "elapsed_seconds": round(time.perf_counter() - start_time, 3)
         }
         
         return {
@@ -929,14 +1112,17 @@ class HuggingFaceReceiptProcessor:
 
 # Factory functions for easy integration
 def create_huggingface_processor(api_token: Optional[str] = None, model_preference: str = "paligemma") -> HuggingFaceReceiptProcessor:
-    """Factory function to create cloud-based HuggingFace processor"""
-    return HuggingFaceReceiptProcessor(api_token=api_token, model_preference=model_preference)
+    """Shared cloud-based HuggingFace processor for this token and model preference"""
+    from model_registry import get_model_registry
+    return get_model_registry().get('hf_cloud', api_token=api_token, model_preference=model_preference)
 
-def create_local_huggingface_processor(model_name: str = "naver-clova-ix/donut-base-finetuned-cord-v2") -> LocalHuggingFaceProcessor:
-    """Factory function to create local HuggingFace processor"""
+def create_local_huggingface_processor(model_name: str = "naver-clova-ix/donut-base-finetuned-cord-v2",
+                                       **kwargs) -> LocalHuggingFaceProcessor:
+    """Shared local HuggingFace processor; the model is loaded once per process (kwargs: batch_size, quantize, device)"""
     if not TRANSFORMERS_AVAILABLE:
         raise ImportError("Transformers library not available. Install with: pip install transformers torch")
-    return LocalHuggingFaceProcessor(model_name=model_name)
+    from model_registry import get_model_registry
+    return get_model_registry().get('hf_local', model_name, **kwargs)
 
 def test_api_availability(api_token: Optional[str] = None) -> Dict[str, Any]:
     """Test HuggingFace API availability and models"""
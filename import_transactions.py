@@ -3,11 +3,11 @@
 Import bank transactions from CSV to MongoDB
 """
 
-import csv
 import logging
-from datetime import datetime
 from pymongo import MongoClient
 
+from csv_import_engine import CSVImportEngine
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -19,52 +19,21 @@ def import_transactions():
     client = MongoClient('mongodb://localhost:27017/')
     db = client['expense']
     
-    # Clear existing transactions
-    db.bank_transactions.delete_many({})
-    logger.info("🗑️ Cleared existing transactions")
+    # Re-running is safe: rows already imported are skipped by their import hash
+    engine = CSVImportEngine(db)
+    summary = engine.import_path('bank_transactions.csv', bank_format='chase')
     
-    # Read CSV file
-    transactions = []
-    with open('bank_transactions.csv', 'r') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            try:
-                # Parse amount (remove negative sign for consistency)
-                amount_str = row['Amount'].replace('$', '').replace(',', '')
-                amount = float(amount_str)
-                
-                # Parse dates
-                transaction_date = datetime.strptime(row['Transaction Date'], '%m/%d/%Y')
-                post_date = datetime.strptime(row['Post Date'], '%m/%d/%Y')
-                
-                # Create transaction document
-                transaction = {
-                    'transaction_date': transaction_date,
-                    'post_date': post_date,
-                    'description': row['Description'],
-                    'merchant': row['Description'],  # Use description as merchant
-                    'category': row['Category'],
-                    'type': row['Type'],
-                    'amount': amount,
-                    'memo': row['Memo'],
-                    'imported_at': datetime.utcnow()
-                }
-                
-                transactions.append(transaction)
-                
-            except Exception as e:
-                logger.error(f"Error parsing row {row}: {e}")
+    for error in summary['errors']:
+        logger.error(f"Error parsing row: {error}")
     
-    # Insert transactions
-    if transactions:
-        result = db.bank_transactions.insert_many(transactions)
-        logger.info(f"✅ Imported {len(result.inserted_ids)} transactions")
+    if summary['inserted'] or summary['duplicates']:
+        logger.info(f"✅ Imported {summary['inserted']} transactions ({summary['duplicates']} already present)")
         
         # Show sample transactions
-        sample = list(db.bank_transactions.find().limit(5))
+        sample = list(db.bank_transactions.find({'source': 'csv_upload'}).limit(5))
         logger.info("📊 Sample transactions:")
         for txn in sample:
-            logger.info(f"  {txn['merchant']} - ${txn['amount']} - {txn['transaction_date'].strftime('%m/%d/%Y')}")
+            logger.info(f"  {txn['merchant']} - ${txn['amount']} - {txn['date'].strftime('%m/%d/%Y')}")
     else:
         logger.error("❌ No transactions to import")
 
@@ -5,25 +5,20 @@ Improved Amount Extractor
 Fixes $0.0 amount issues
 """
 
-import re
 import logging
 from typing import Dict, Optional, List
 
+from receipt_field_engine import TEXT_AMOUNT_PATTERNS, amount_in_range, pattern_set
+
 logger = logging.getLogger(__name__)
 
+_POSITIVE_AMOUNT = amount_in_range(0)
+
 class ImprovedAmountExtractor:
     """Extracts amounts with multiple fallback methods"""
     
     def __init__(self):
-        self.amount_patterns = [
-            r'\$\s*(\d+\.?\d*)',  # $45.67
-            r'(\d+\.?\d*)\s*USD',  # 45.67 USD
-            r'Total:\s*\$?\s*(\d+\.?\d*)',  # Total: $45.67
-            r'Amount:\s*\$?\s*(\d+\.?\d*)',  # Amount: $45.67
-            r'(\d+\.?\d*)\s*dollars',  # 45.67 dollars
-            r'charged\s*\$?\s*(\d+\.?\d*)',  # charged $45.67
-            r'payment\s*of\s*\$?\s*(\d+\.?\d*)',  # payment of $45.67
-        ]
+        self.amount_patterns = TEXT_AMOUNT_PATTERNS
     
     def extract_amount(self, text: str, email_data: Dict = None, transactions: List[Dict] = None) -> float:
         """Extract amount using multiple methods"""
@@ -52,17 +47,8 @@ class ImprovedAmountExtractor:
     
     def _extract_from_text(self, text: str) -> float:
         """Extract amount from text using regex patterns"""
-        for pattern in self.amount_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                try:
-                    amount = float(matches[0])
-                    if amount > 0:
-                        return amount
-                except ValueError:
-                    continue
-        
-        return 0.0
+        amount = pattern_set(self.amount_patterns).first_value(text, _POSITIVE_AMOUNT)
+        return amount or 0.0
     
     def _extract_from_email(self, email_data: Dict) -> float:
         """Extract amount from email data"""
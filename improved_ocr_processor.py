@@ -7,7 +7,7 @@ Improved OCR Processor with Fallbacks
 import logging
 import requests
 import json
-from typing import Dict, Optional, Any
+from typing import Dict, Any
 import re
 
 logger = logging.getLogger(__name__)
@@ -16,124 +16,40 @@ class ImprovedOCRProcessor:
     """OCR processor with multiple fallback methods"""
     
     def __init__(self, api_token: str = None):
+        from extraction_cascade import ExtractionCascade
+        
         self.api_token = api_token
-        self.fallback_methods = [
-            'huggingface_api',
-            'tesseract_ocr',
-            'email_parsing',
-            'transaction_matching'
-        ]
+        # email -> cached OCR -> PDF text -> tesseract -> local model -> HuggingFace API
+        self.cascade = ExtractionCascade(api_token=api_token)
     
     async def extract_receipt_data(self, image_path: str, email_data: Dict = None) -> Dict:
-        """Extract receipt data with multiple fallback methods"""
+        """Extract receipt data, cheapest method first (see extraction_cascade)"""
+        import asyncio
         
-        for method in self.fallback_methods:
-            try:
-                if method == 'huggingface_api':
-                    result = await self._extract_with_huggingface(image_path)
-                elif method == 'tesseract_ocr':
-                    result = await self._extract_with_tesseract(image_path)
-                elif method == 'email_parsing':
-                    result = await self._extract_from_email(email_data)
-                elif method == 'transaction_matching':
-                    result = await self._extract_from_transactions(email_data)
-                
-                if result and result.get('amount', 0) > 0:
-                    logger.info(f"✅ Extracted with {method}: {result}")
-                    return result
-                
-            except Exception as e:
-                logger.warning(f"⚠️ {method} failed: {e}")
-                continue
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self.cascade.run(email=email_data, file_path=image_path)
+        )
+        if result.value('amount', 0) > 0:
+            extracted = {
+                'merchant': result.value('merchant', 'UNKNOWN'),
+                'amount': result.value('amount'),
+                'date': result.value('date'),
+                'confidence': result.confidence,
+                'method': result.method,
+                'cascade': result.to_dict()
+            }
+            logger.info(f"✅ Extracted with {result.method}: {extracted['merchant']} ${extracted['amount']}")
+            return extracted
         
         # Return fallback result
         return {
             'merchant': 'UNKNOWN',
             'amount': 0.0,
             'confidence': 0.1,
-            'method': 'fallback'
+            'method': 'fallback',
+            'cascade': result.to_dict()
         }
     
-    async def _extract_with_huggingface(self, image_path: str) -> Optional[Dict]:
-        """Extract using HuggingFace API"""
-        if not self.api_token:
-            return None
-        
-        try:
-            # Try multiple HuggingFace models
-            models = ['paligemma', 'donut', 'layoutlm', 'trocr']
-            
-            for model in models:
-                try:
-                    result = await self._call_huggingface_api(image_path, model)
-                    if result and result.get('amount', 0) > 0:
-                        return result
-                except Exception as e:
-                    logger.warning(f"⚠️ Model {model} failed: {e}")
-                    continue
-            
-            return None
-        
-        except Exception as e:
-            logger.error(f"❌ HuggingFace extraction failed: {e}")
-            return None
-    
-    async def _extract_with_tesseract(self, image_path: str) -> Optional[Dict]:
-        """Extract using Tesseract OCR"""
-        try:
-            import pytesseract
-            from PIL import Image
-            
-            image = Image.open(image_path)
-            text = pytesseract.image_to_string(image)
-            
-            # Extract amount from text
-            amount = self._extract_amount_from_text(text)
-            merchant = self._extract_merchant_from_text(text)
-            
-            if amount > 0:
-                return {
-                    'merchant': merchant,
-                    'amount': amount,
-                    'confidence': 0.7,
-                    'method': 'tesseract'
-                }
-            
-            return None
-        
-        except Exception as e:
-            logger.warning(f"⚠️ Tesseract extraction failed: {e}")
-            return None
-    
-    async def _extract_from_email(self, email_data: Dict) -> Optional[Dict]:
-        """Extract from email data"""
-        if not email_data:
-            return None
-        
-        try:
-            body = email_data.get('body', '')
-            subject = email_data.get('subject', '')
-            
-            # Extract amount
-            amount = self._extract_amount_from_text(body + ' ' + subject)
-            
-            # Extract merchant
-            merchant = self._extract_merchant_from_text(body + ' ' + subject)
-            
-            if amount > 0:
-                return {
-                    'merchant': merchant,
-                    'amount': amount,
-                    'confidence': 0.6,
-                    'method': 'email_parsing'
-                }
-            
-            return None
-        
-        except Exception as e:
-            logger.warning(f"⚠️ Email extraction failed: {e}")
-            return None
-    
     def _extract_amount_from_text(self, text: str) -> float:
         """Extract amount from text using regex"""
         amount_patterns = [
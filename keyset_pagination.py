@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Keyset Pagination for List Endpoints
+Pages through a collection on (sort_field, _id) with an opaque continuation
+token so page N costs the same as page 1, plus TTL-cached totals so list
+views stop re-counting the whole range on every request
+"""
+
+import base64
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COUNT_TTL = 60  # seconds
+MAX_PAGE_SIZE = 500
+
+# MongoDB compares values of different BSON types by type rank first
+# (null < numbers < strings < dates), so a cursor has to account for rows
+# whose sort field holds a different type than the cursor value
+_TYPE_RANKS = [
+    (None, 'null'),
+    ((int, float), 'number'),
+    (str, 'string'),
+    (datetime, 'date'),
+]
+
+
+class InvalidCursor(ValueError):
+    """Raised when a continuation token cannot be decoded"""
+
+
+def _type_rank(value: Any) -> int:
+    if value is None:
+        return 0
+    for rank, (types, _) in enumerate(_TYPE_RANKS[1:], start=1):
+        if isinstance(value, types) and not isinstance(value, bool):
+            return rank
+    raise InvalidCursor(f"Unsupported sort value type: {type(value).__name__}")
+
+
+def _encode_value(value: Any) -> Dict:
+    if isinstance(value, datetime):
+        return {'t': 'dt', 'v': value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {'t': 'oid', 'v': str(value)}
+    return {'t': 'raw', 'v': value}
+
+
+def _decode_value(encoded: Dict) -> Any:
+    kind, value = encoded.get('t'), encoded.get('v')
+    if kind == 'dt':
+        return datetime.fromisoformat(value)
+    if kind == 'oid':
+        return ObjectId(value)
+    return value
+
+
+def encode_cursor(sort_value: Any, doc_id: Any) -> str:
+    """Opaque URL-safe token for the position after (sort_value, doc_id)"""
+    payload = json.dumps([_encode_value(sort_value), _encode_value(doc_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[Any, Any]:
+    """Inverse of encode_cursor"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        sort_value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return _decode_value(sort_value), _decode_value(doc_id)
+    except Exception as e:
+        raise InvalidCursor(f"Invalid pagination cursor: {e}") from e
+
+
+def keyset_query(query: Dict, sort_field: str, cursor: Optional[str], direction: int = -1) -> Dict:
+    """Combine a filter with the 'strictly after the cursor' predicate"""
+    if not cursor:
+        return query
+
+    sort_value, doc_id = decode_cursor(cursor)
+    rank = _type_rank(sort_value)
+    beyond = '$lt' if direction < 0 else '$gt'
+
+    if sort_value is None:
+        clauses = [{sort_field: None, '_id': {beyond: doc_id}}]
+    else:
+        clauses = [
+            {sort_field: {beyond: sort_value}},
+            {sort_field: sort_value, '_id': {beyond: doc_id}},
+        ]
+
+    # Rows whose sort value is of a type that orders past the cursor's type
+    if direction < 0:
+        later_ranks = range(0, rank)
+    else:
+        later_ranks = range(rank + 1, len(_TYPE_RANKS))
+    for later in later_ranks:
+        if later == 0:
+            clauses.append({sort_field: None})
+        else:
+            clauses.append({sort_field: {'$type': _TYPE_RANKS[later][1]}})
+
+    after = {'$or': clauses}
+    return {'$and': [query, after]} if query else after
+
+
+_indexed = set()
+_indexed_lock = threading.Lock()
+
+
+def ensure_keyset_index(collection, sort_field: str, direction: int = -1) -> None:
+    """Create the (sort_field, _id) index once per process"""
+    key = (getattr(collection, 'full_name', id(collection)), sort_field, direction)
+    if key in _indexed:
+        return
+    with _indexed_lock:
+        if key in _indexed:
+            return
+        try:
+            collection.create_index([(sort_field, direction), ('_id', direction)])
+        except Exception as e:
+            logger.warning(f"Could not create keyset index on {sort_field}: {e}")
+        _indexed.add(key)
+
+
+def fetch_page(collection, query: Dict, sort_field: str = 'date', limit: int = 50,
+               cursor: Optional[str] = None, projection: Optional[Dict] = None,
+               skip: int = 0, direction: int = -1) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Return (documents, next_cursor) for one page.
+
+    With a cursor the page is located by index seek; without one it falls back
+    to skip so numbered-page links keep working, and still hands back a cursor
+    for the following page. next_cursor is None on the last page.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    ensure_keyset_index(collection, sort_field, direction)
+
+    find = collection.find(keyset_query(query, sort_field, cursor, direction), projection)
+    find = find.sort([(sort_field, direction), ('_id', direction)])
+    if skip and not cursor:
+        find = find.skip(int(skip))
+    docs = list(find.limit(limit + 1))
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last['_id'])
+    return docs, next_cursor
+
+
+class CountCache:
+    """TTL cache for count_documents results, keyed by collection and filter"""
+
+    def __init__(self, ttl: int = DEFAULT_COUNT_TTL):
+        self.ttl = ttl
+        self._counts: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, collection, query: Dict) -> Tuple[str, str]:
+        name = getattr(collection, 'full_name', str(id(collection)))
+        return name, json.dumps(query, sort_keys=True, default=str)
+
+    def count(self, collection, query: Dict, mode: str = 'cached') -> Optional[int]:
+        """
+        mode: 'exact' always counts, 'cached' counts at most once per TTL,
+        'estimated' uses collection metadata for unfiltered totals, 'none' skips
+        """
+        if mode == 'none':
+            return None
+        if mode == 'estimated' and not query:
+            return collection.estimated_document_count()
+        if mode == 'exact':
+            return collection.count_documents(query)
+
+        key = self._key(collection, query)
+        now = time.time()
+        with self._lock:
+            cached = self._counts.get(key)
+        if cached and now - cached[0] < self.ttl:
+            return cached[1]
+
+        total = collection.count_documents(query)
+        with self._lock:
+            self._counts[key] = (now, total)
+        return total
+
+    def invalidate(self, collection=None) -> None:
+        """Drop cached totals for one collection, or all of them"""
+        with self._lock:
+            if collection is None:
+                self._counts.clear()
+                return
+            name = getattr(collection, 'full_name', str(id(collection)))
+            for key in [k for k in self._counts if k[0] == name]:
+                del self._counts[key]
+
+
+count_cache = CountCache()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Learned Merchant -> Category Table
+Most merchants always land in the same category, so once a model (or the
+user) has categorized one with confidence, later expenses from it are
+answered here without a model call.
+
+Entries are kept per canonical merchant (ai_response_cache.merchant_key; receipts
+without a real merchant, e.g. "Unknown", are never recorded or answered) and
+per category scheme, because the callers use different vocabularies:
+
+    netsuite    ExpenseCategorizer ("DH: Travel Costs - Hotel", ...)
+    hf_client   HuggingFaceClient ("Travel and Transportation", ...)
+    wizard      BrianFinancialWizard ("Travel", "Software", ...)
+
+Every observation keeps a count and last-seen time per category. The table
+answers when a user has confirmed a category, or when high-confidence model
+answers agree (the leading category holds AGREEMENT of them). A user
+correction drops what the models taught for that merchant in every scheme
+and pins the corrected category.
+
+Entries live in MongoDB (`merchant_categories`) once configure_merchant_table()
+attaches a database, with a short-lived in-process copy in front so a
+correction made by another worker is seen within MEMORY_TTL seconds.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ai_response_cache import merchant_key
+
+logger = logging.getLogger(__name__)
+
+MIN_CONFIDENCE = float(os.getenv('MERCHANT_TABLE_MIN_CONFIDENCE', 0.85))
+AGREEMENT = 0.8
+MEMORY_TTL = 300.0
+MEMORY_ENTRIES = 4096
+SCHEMES = ('netsuite', 'hf_client', 'wizard')
+
+
+@dataclass
+class LearnedCategory:
+    merchant: str
+    category: str
+    confidence: float
+    business_type: Optional[str] = None
+    details: Dict = field(default_factory=dict)
+    count: int = 0
+    source: str = 'ai'       # 'ai' or 'user'
+    last_seen: Optional[datetime] = None
+
+
+def _category_key(category: str) -> str:
+    # Category names may hold '.' or '$', which MongoDB field paths cannot
+    return hashlib.sha1(category.encode('utf-8')).hexdigest()[:10]
+
+
+def _answer(doc: Optional[Dict]) -> Optional[LearnedCategory]:
+    """What the table says for one stored entry, None when it should not answer"""
+    if not doc:
+        return None
+    user = doc.get('user')
+    if user:
+        return LearnedCategory(doc['merchant'], user['category'], 0.99, user.get('business_type'),
+                               user.get('details') or {}, user.get('count', 1), 'user', user.get('last_seen'))
+    observed = list((doc.get('categories') or {}).values())
+    total = sum(c['count'] for c in observed)
+    if not total:
+        return None
+    best = max(observed, key=lambda c: (c['count'], c['last_seen']))
+    if best['count'] / total < AGREEMENT:
+        return None
+    return LearnedCategory(doc['merchant'], best['category'], round(best['confidence_sum'] / best['count'], 3),
+                           best.get('business_type'), best.get('details') or {}, best['count'], 'ai',
+                           best['last_seen'])
+
+
+class _MemoryStore:
+    def __init__(self):
+        self.docs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict]:
+        with self._lock:
+            return {i: self.docs[i] for i in ids if i in self.docs}
+
+    def observe(self, doc_id: str, merchant: str, category: str, confidence: float,
+                business_type: Optional[str], details: Dict, now: datetime):
+        with self._lock:
+            doc = self.docs.setdefault(doc_id, {'_id': doc_id, 'merchant': merchant, 'categories': {}})
+            entry = doc['categories'].setdefault(_category_key(category), {
+                'category': category, 'count': 0, 'confidence_sum': 0.0})
+            entry['count'] += 1
+            entry['confidence_sum'] += confidence
+            entry.update(business_type=business_type, details=details, last_seen=now)
+            doc['last_seen'] = now
+
+    def confirm(self, doc_id: str, merchant: str, user: Dict):
+        with self._lock:
+            self.docs[doc_id] = {'_id': doc_id, 'merchant': merchant, 'categories': {}, 'user': user,
+                                 'last_seen': user['last_seen']}
+
+    def forget(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self.docs:
+                    self.docs[doc_id]['categories'] = {}
+
+    def count(self) -> int:
+        return len(self.docs)
+
+
+class _MongoStore:
+    def __init__(self, collection):
+        self.collection = collection
+        try:
+            self.collection.create_index('merchant')
+        except Exception as e:
+            logger.warning(f"Could not index merchant_categories: {e}")
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict]:
+        return {doc['_id']: doc for doc in self.collection.find({'_id': {'$in': ids}})}
+
+    def observe(self, doc_id: str, merchant: str, category: str, confidence: float,
+                business_type: Optional[str], details: Dict, now: datetime):
+        path = f"categories.{_category_key(category)}"
+        self.collection.update_one({'_id': doc_id}, {
+            '$inc': {f'{path}.count': 1, f'{path}.confidence_sum': confidence},
+            '$set': {f'{path}.category': category, f'{path}.business_type': business_type,
+                     f'{path}.details': details, f'{path}.last_seen': now,
+                     'merchant': merchant, 'last_seen': now},
+        }, upsert=True)
+
+    def confirm(self, doc_id: str, merchant: str, user: Dict):
+        self.collection.replace_one({'_id': doc_id}, {
+            'merchant': merchant, 'categories': {}, 'user': user, 'last_seen': user['last_seen']}, upsert=True)
+
+    def forget(self, ids: List[str]):
+        self.collection.update_many({'_id': {'$in': ids}}, {'$set': {'categories': {}}})
+
+    def count(self) -> int:
+        return self.collection.estimated_document_count()
+
+
+class MerchantCategoryTable:
+    """Per-merchant categories learned from confident model answers and user corrections"""
+
+    def __init__(self, db=None, min_confidence: float = MIN_CONFIDENCE, clock=time.monotonic):
+        self.store = _MongoStore(db.merchant_categories) if db is not None else _MemoryStore()
+        self.min_confidence = min_confidence
+        self.clock = clock
+        self._memory: 'OrderedDict[str, Tuple[float, Optional[Dict]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _doc_id(scheme: str, merchant: str) -> str:
+        return f"{scheme}:{merchant}"
+
+    def _drop_memory(self, ids: Iterable[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._memory.pop(doc_id, None)
+
+    def lookup_many(self, scheme: str, merchants: List[Optional[str]]) -> List[Optional[LearnedCategory]]:
+        """Learned category per merchant (None where the table has no answer), one store query per batch"""
+        names = [merchant_key(m) for m in merchants]
+        ids = {self._doc_id(scheme, n) for n in names if n}
+        now = self.clock()
+        docs: Dict[str, Optional[Dict]] = {}
+        with self._lock:
+            for doc_id in ids:
+                cached = self._memory.get(doc_id)
+                if cached and cached[0] > now:
+                    docs[doc_id] = cached[1]
+        missing = [doc_id for doc_id in ids if doc_id not in docs]
+        if missing:
+            try:
+                found = self.store.get_many(missing)
+            except Exception as e:
+                logger.warning(f"Merchant table lookup failed: {e}")
+                found = {}
+            with self._lock:
+                for doc_id in missing:
+                    docs[doc_id] = found.get(doc_id)
+                    self._memory[doc_id] = (now + MEMORY_TTL, docs[doc_id])
+                    self._memory.move_to_end(doc_id)
+                while len(self._memory) > MEMORY_ENTRIES:
+                    self._memory.popitem(last=False)
+
+        answers = [_answer(docs.get(self._doc_id(scheme, n))) if n else None for n in names]
+        hits = sum(1 for a in answers if a)
+        self.hits += hits
+        self.misses += len(answers) - hits
+        return answers
+
+    def lookup(self, scheme: str, merchant: Optional[str]) -> Optional[LearnedCategory]:
+        return self.lookup_many(scheme, [merchant])[0]
+
+    def record(self, scheme: str, merchant: Optional[str], category: Optional[str], confidence: float,
+               business_type: Optional[str] = None, details: Optional[Dict] = None) -> bool:
+        """Remember a model's answer; ignored below min_confidence. True when recorded"""
+        name = merchant_key(merchant)
+        if not name or not category or confidence < self.min_confidence:
+            return False
+        doc_id = self._doc_id(scheme, name)
+        try:
+            self.store.observe(doc_id, name, category, float(confidence), business_type, details or {},
+                               datetime.utcnow())
+        except Exception as e:
+            logger.warning(f"Merchant table write failed: {e}")
+            return False
+        self._drop_memory([doc_id])
+        return True
+
+    def correct(self, scheme: str, merchant: Optional[str], category: str, business_type: Optional[str] = None,
+                details: Optional[Dict] = None) -> bool:
+        """User correction: forget model answers for this merchant everywhere and pin the category"""
+        name = merchant_key(merchant)
+        if not name:
+            return False
+        ids = [self._doc_id(s, name) for s in SCHEMES]
+        try:
+            self.store.forget(ids)
+            self.store.confirm(self._doc_id(scheme, name), name, {
+                'category': category, 'business_type': business_type, 'details': details or {},
+                'count': 1, 'last_seen': datetime.utcnow()})
+        except Exception as e:
+            logger.warning(f"Merchant table correction failed: {e}")
+            return False
+        self._drop_memory(ids)
+        logger.info(f"📌 {name} pinned to {category} ({scheme})")
+        return True
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        try:
+            merchants = self.store.count()
+        except Exception:
+            merchants = None
+        return {
+            'backend': 'mongodb' if isinstance(self.store, _MongoStore) else 'memory',
+            'merchants': merchants,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+_table: Optional[MerchantCategoryTable] = None
+_table_lock = threading.Lock()
+
+
+def get_merchant_table() -> MerchantCategoryTable:
+    """Process-wide table; in-process only until configure_merchant_table attaches MongoDB"""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = MerchantCategoryTable()
+    return _table
+
+
+def configure_merchant_table(db=None, min_confidence: float = MIN_CONFIDENCE) -> MerchantCategoryTable:
+    """Replace the process-wide table, e.g. with a MongoDB-backed one at startup"""
+    global _table
+    with _table_lock:
+        _table = MerchantCategoryTable(db=db, min_confidence=min_confidence)
+    return _table
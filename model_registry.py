@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Process-wide Model Registry
+Receipt processors and HuggingFace models are expensive to build (pattern
+tables, API connection checks, multi-hundred-MB weights), so each worker keeps
+one shared instance per configuration instead of constructing one per request.
+
+Instances are created lazily on first use under a per-key lock, optionally
+warmed up when the worker boots (MODEL_WARMUP) and dropped again after
+MODEL_IDLE_TTL_SECONDS without use so idle workers give memory back.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDLE_TTL = float(os.getenv('MODEL_IDLE_TTL_SECONDS', 1800))
+SWEEP_INTERVAL = 60.0
+
+
+@dataclass
+class _Registration:
+    factory: Callable[..., Any]
+    key: Callable[..., Hashable]
+    idle_ttl: Optional[float]
+    on_evict: Optional[Callable[[Any], None]]
+    loads: int = 0
+    hits: int = 0
+    evictions: int = 0
+    load_seconds: float = 0.0
+
+
+@dataclass
+class _Entry:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    instance: Any = None
+    loaded: bool = False
+    last_used: float = 0.0
+
+
+def _default_key(*args, **kwargs) -> Hashable:
+    return args, tuple(sorted(kwargs.items()))
+
+
+class ModelRegistry:
+    """Lazy, thread-safe singletons keyed by registration name and constructor arguments"""
+
+    def __init__(self, idle_ttl: Optional[float] = DEFAULT_IDLE_TTL, clock: Callable[[], float] = time.monotonic):
+        self.idle_ttl = idle_ttl if idle_ttl and idle_ttl > 0 else None
+        self.clock = clock
+        self._registrations: Dict[str, _Registration] = {}
+        self._entries: Dict[Tuple[str, Hashable], _Entry] = {}
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register(self, name: str, factory: Callable[..., Any], key: Optional[Callable[..., Hashable]] = None,
+                 idle_ttl: Optional[float] = None, on_evict: Optional[Callable[[Any], None]] = None):
+        """
+        Register a factory under a name.
+
+        key maps the get() arguments to a cache key (defaults to the arguments
+        themselves); idle_ttl overrides the registry default for this name.
+        """
+        with self._lock:
+            self._registrations[name] = _Registration(factory, key or _default_key, idle_ttl, on_evict)
+
+    def get(self, name: str, *args, **kwargs) -> Any:
+        """Shared instance for these arguments, building it on first use"""
+        registration = self._registrations.get(name)
+        if registration is None:
+            raise KeyError(f"No model registered as '{name}'")
+        entry_key = (name, registration.key(*args, **kwargs))
+
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                entry = self._entries[entry_key] = _Entry()
+        entry.last_used = self.clock()
+        if entry.loaded:
+            registration.hits += 1
+            return entry.instance
+
+        # Only callers of this key wait while it loads; other models stay available
+        with entry.lock:
+            if not entry.loaded:
+                started = time.perf_counter()
+                try:
+                    instance = registration.factory(*args, **kwargs)
+                except Exception:
+                    with self._lock:
+                        if self._entries.get(entry_key) is entry:
+                            del self._entries[entry_key]
+                    raise
+                elapsed = time.perf_counter() - started
+                entry.instance = instance
+                entry.loaded = True
+                registration.loads += 1
+                registration.load_seconds += elapsed
+                logger.info(f"📦 Loaded '{name}' in {elapsed:.2f}s")
+            else:
+                registration.hits += 1
+        entry.last_used = self.clock()
+        return entry.instance
+
+    def warm_up(self, specs: Iterable[str]) -> List[str]:
+        """
+        Build models ahead of the first request.
+
+        Each spec is a registered name, optionally followed by ':' and a single
+        positional argument, e.g. 'enhanced_receipt' or 'hf_local:microsoft/trocr-base-printed'.
+        Failures are logged and skipped so a bad model never blocks boot.
+        """
+        warmed = []
+        for spec in specs:
+            spec = spec.strip()
+            if not spec:
+                continue
+            name, _, argument = spec.partition(':')
+            try:
+                self.get(name, argument) if argument else self.get(name)
+                warmed.append(spec)
+            except Exception as e:
+                logger.warning(f"⚠️ Model warm-up failed for '{spec}': {e}")
+        if warmed:
+            logger.info(f"🔥 Warmed up models: {', '.join(warmed)}")
+        return warmed
+
+    def warm_up_in_background(self, specs: Iterable[str]) -> threading.Thread:
+        """Warm up on a daemon thread; requests for a loading model wait on its lock"""
+        thread = threading.Thread(target=self.warm_up, args=(list(specs),), name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def evict_idle(self) -> List[str]:
+        """Drop instances unused for longer than their idle TTL"""
+        now = self.clock()
+        evicted = []
+        with self._lock:
+            for entry_key, entry in list(self._entries.items()):
+                registration = self._registrations.get(entry_key[0])
+                ttl = registration.idle_ttl if registration and registration.idle_ttl is not None else self.idle_ttl
+                if not ttl or not entry.loaded or now - entry.last_used < ttl:
+                    continue
+                del self._entries[entry_key]
+                evicted.append((entry_key[0], entry.instance, registration))
+        for name, instance, registration in evicted:
+            self._release(name, instance, registration)
+        return [name for name, _, _ in evicted]
+
+    def evict(self, name: Optional[str] = None) -> int:
+        """Drop every instance (or every instance of one name) now"""
+        with self._lock:
+            keys = [k for k in self._entries if name is None or k[0] == name]
+            dropped = [(k[0], self._entries.pop(k)) for k in keys]
+        for entry_name, entry in dropped:
+            if entry.loaded:
+                self._release(entry_name, entry.instance, self._registrations.get(entry_name))
+        return len(dropped)
+
+    def _release(self, name: str, instance: Any, registration: Optional[_Registration]):
+        # Requests still holding the instance keep it alive until they finish
+        if registration:
+            registration.evictions += 1
+            if registration.on_evict:
+                try:
+                    registration.on_evict(instance)
+                except Exception as e:
+                    logger.warning(f"Eviction hook for '{name}' failed: {e}")
+        logger.info(f"🗑️ Evicted idle model '{name}'")
+
+    def start_sweeper(self, interval: float = SWEEP_INTERVAL) -> Optional[threading.Thread]:
+        """Background idle eviction; needed because an idle worker sees no requests to trigger it"""
+        if self._sweeper and self._sweeper.is_alive():
+            return self._sweeper
+        self._stop.clear()
+
+        def sweep():
+            while not self._stop.wait(interval):
+                try:
+                    self.evict_idle()
+                except Exception as e:
+                    logger.warning(f"Model eviction sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=sweep, name='model-sweeper', daemon=True)
+        self._sweeper.start()
+        return self._sweeper
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-name counters; cache keys are left out because they can contain API tokens"""
+        with self._lock:
+            loaded = {}
+            for (name, _), entry in self._entries.items():
+                if entry.loaded:
+                    loaded[name] = loaded.get(name, 0) + 1
+            return {
+                name: {
+                    'instances': loaded.get(name, 0),
+                    'loads': r.loads,
+                    'hits': r.hits,
+                    'evictions': r.evictions,
+                    'load_seconds': round(r.load_seconds, 3),
+                    'idle_ttl': r.idle_ttl if r.idle_ttl is not None else self.idle_ttl
+                }
+                for name, r in self._registrations.items()
+            }
+
+
+# ============================================================================
+# BUILT-IN MODELS
+# ============================================================================
+
+def _enhanced_receipt_processor():
+    from receipt_processor import EnhancedReceiptProcessor
+    return EnhancedReceiptProcessor()
+
+
+def _enhanced_receipt_extractor():
+    from enhanced_receipt_extractor import EnhancedReceiptExtractor
+    return EnhancedReceiptExtractor()
+
+
+def _expense_classifier(path: Optional[str] = None):
+    from expense_classifier import DEFAULT_MODEL_PATH, load_expense_classifier
+    return load_expense_classifier(path or DEFAULT_MODEL_PATH)
+
+
+def _semantic_index(directory: Optional[str] = None):
+    from semantic_index import DEFAULT_INDEX_DIR, load_semantic_index
+    return load_semantic_index(directory or DEFAULT_INDEX_DIR)
+
+
+def _hf_cloud_processor(api_token: Optional[str] = None, model_preference: str = "paligemma"):
+    from huggingface_receipt_processor import HuggingFaceReceiptProcessor
+    return HuggingFaceReceiptProcessor(api_token=api_token, model_preference=model_preference)
+
+
+def _hf_cloud_key(api_token: Optional[str] = None, model_preference: str = "paligemma") -> Hashable:
+    return api_token or os.getenv('HUGGINGFACE_API_KEY'), model_preference
+
+
+def _hf_local_processor(model_name: str = "naver-clova-ix/donut-base-finetuned-cord-v2", **kwargs):
+    from huggingface_receipt_processor import LocalHuggingFaceProcessor
+    return LocalHuggingFaceProcessor(model_name=model_name, **kwargs)
+
+
+def _hf_local_key(model_name: str = "naver-clova-ix/donut-base-finetuned-cord-v2", **kwargs) -> Hashable:
+    return model_name, tuple(sorted(kwargs.items()))
+
+
+def _free_accelerator_memory(_processor):
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+
+def _register_builtins(registry: ModelRegistry):
+    registry.register('enhanced_receipt', _enhanced_receipt_processor)
+    registry.register('enhanced_extractor', _enhanced_receipt_extractor)
+    registry.register('expense_classifier', _expense_classifier)
+    registry.register('semantic_index', _semantic_index)
+    registry.register('hf_cloud', _hf_cloud_processor, key=_hf_cloud_key)
+    registry.register('hf_local', _hf_local_processor, key=_hf_local_key, on_evict=_free_accelerator_memory)
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Process-wide registry with the built-in receipt models registered"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ModelRegistry()
+                _register_builtins(registry)
+                _registry = registry
+    return _registry
+
+
+def configure_model_registry(idle_ttl: Optional[float] = DEFAULT_IDLE_TTL, warm_up: Iterable[str] = (),
+                             sweep_interval: float = SWEEP_INTERVAL, background: bool = True) -> ModelRegistry:
+    """Set the idle TTL, start idle eviction and warm up models (called once per worker)"""
+    registry = get_model_registry()
+    registry.idle_ttl = idle_ttl if idle_ttl and idle_ttl > 0 else None
+    if registry.idle_ttl:
+        registry.start_sweeper(min(sweep_interval, registry.idle_ttl))
+    specs = [s for s in warm_up if s.strip()]
+    if specs:
+        if background:
+            registry.warm_up_in_background(specs)
+        else:
+            registry.warm_up(specs)
+    return registry
@@ -6,6 +6,8 @@ from pymongo import MongoClient
 from pymongo.collection import Collection
 from pymongo.database import Database
 
+from fast_json import TRANSACTION_LIST_PROJECTION
+
 logger = logging.getLogger(__name__)
 
 class MongoDBClient:
@@ -284,7 +286,7 @@ class MongoDBClient:
             return []
         
         try:
-            statements = list(self.bank_statements_collection.find({}, {'_id': 0}))
+            statements = list(self.bank_statements_collection.find({}, {'_id': 0, **TRANSACTION_LIST_PROJECTION}))
             return statements
             
         except Exception as e:
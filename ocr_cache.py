@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+OCR Result Cache
+Stores OCR text and word boxes keyed by the SHA-256 of the file bytes plus a
+fingerprint of the engine, its version and its configuration. Every extractor
+checks here before running tesseract, so re-running the pipeline after a
+parser change only costs parsing time.
+
+Entries live in MongoDB (`ocr_cache` collection) when a database has been
+attached with configure_ocr_cache(), otherwise in a local on-disk store.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Bump when the way text is produced changes (preprocessing, line assembly)
+OCR_CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.getenv('OCR_CACHE_DIR', os.path.expanduser('~/.cache/receipt-processor/ocr'))
+MEMORY_ENTRIES = 256
+
+OCRComputeResult = Union[str, Tuple[str, Optional[List[Dict]]]]
+
+
+@lru_cache(maxsize=None)
+def tesseract_version() -> str:
+    """Installed tesseract version, part of every tesseract fingerprint"""
+    try:
+        import pytesseract
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return 'unknown'
+
+
+def engine_fingerprint(engine: str, config: str = '') -> str:
+    """Short stable id for (engine, engine version, config, cache version)"""
+    version = tesseract_version() if engine.startswith('tesseract') else ''
+    raw = f"{engine}|{version}|{config}|v{OCR_CACHE_VERSION}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def read_file_bytes(path: str) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError as e:
+        logger.warning(f"Could not read {path} for OCR cache: {e}")
+        return None
+
+
+def tesseract_text_and_words(image, config: str = '') -> Tuple[str, List[Dict]]:
+    """
+    One tesseract pass returning both the text and word boxes.
+
+    Lines are rebuilt from image_to_data's block/paragraph/line numbers,
+    so callers get the same layout as image_to_string without OCRing twice.
+    """
+    import pytesseract
+
+    data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+    words, lines = [], []
+    current_key, current_line, current_block = None, [], None
+
+    for i, word in enumerate(data['text']):
+        word = (word or '').strip()
+        if not word:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if key != current_key:
+            if current_line:
+                lines.append(' '.join(current_line))
+            if current_block is not None and key[0] != current_block:
+                lines.append('')
+            current_key, current_line, current_block = key, [], key[0]
+        current_line.append(word)
+        words.append({
+            'text': word,
+            'left': data['left'][i], 'top': data['top'][i],
+            'width': data['width'][i], 'height': data['height'][i],
+            'conf': float(data['conf'][i]),
+            'line': list(key)
+        })
+    if current_line:
+        lines.append(' '.join(current_line))
+    return '\n'.join(lines), words
+
+
+class _DiskStore:
+    """One JSON file per entry, sharded by the first two hash characters"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, sha: str, fingerprint: str) -> str:
+        return os.path.join(self.directory, sha[:2], f"{sha}.{fingerprint}.json")
+
+    def get(self, sha: str, fingerprint: str) -> Optional[Dict]:
+        try:
+            with open(self._path(sha, fingerprint), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable OCR cache entry {sha[:12]}: {e}")
+            return None
+
+    def get_any(self, sha: str) -> Optional[Dict]:
+        shard = os.path.join(self.directory, sha[:2])
+        try:
+            names = sorted(n for n in os.listdir(shard) if n.startswith(sha))
+        except FileNotFoundError:
+            return None
+        for name in names:
+            fingerprint = name[len(sha) + 1:-len('.json')]
+            entry = self.get(sha, fingerprint)
+            if entry:
+                return entry
+        return None
+
+    def put(self, entry: Dict):
+        path = self._path(entry['sha256'], entry['fingerprint'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+
+class _MongoStore:
+    def __init__(self, collection):
+        self.collection = collection
+        try:
+            self.collection.create_index('sha256')
+        except Exception as e:
+            logger.warning(f"Could not index ocr_cache: {e}")
+
+    def get(self, sha: str, fingerprint: str) -> Optional[Dict]:
+        return self.collection.find_one({'_id': f"{sha}:{fingerprint}"})
+
+    def get_any(self, sha: str) -> Optional[Dict]:
+        return self.collection.find_one({'sha256': sha})
+
+    def put(self, entry: Dict):
+        self.collection.replace_one({'_id': f"{entry['sha256']}:{entry['fingerprint']}"},
+                                    {**entry, 'created_at': datetime.utcnow()}, upsert=True)
+
+
+class OCRCache:
+    """Content-addressed OCR results with an in-process LRU in front of the store"""
+
+    def __init__(self, db=None, directory: str = DEFAULT_CACHE_DIR, memory_entries: int = MEMORY_ENTRIES):
+        self.store = _MongoStore(db.ocr_cache) if db is not None else _DiskStore(directory)
+        self.memory_entries = memory_entries
+        self._memory: 'OrderedDict[Tuple[str, str], Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: Tuple[str, str], entry: Dict):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, content: bytes, engine: str, config: str = '') -> Optional[Dict]:
+        """Cached entry ({'text', 'words', ...}) for these bytes and engine settings"""
+        key = (content_hash(content), engine_fingerprint(engine, config))
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            try:
+                entry = self.store.get(*key)
+            except Exception as e:
+                logger.warning(f"OCR cache lookup failed: {e}")
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, content: bytes, engine: str, text: str, words: Optional[List[Dict]] = None,
+            config: str = '') -> Dict:
+        sha, fingerprint = content_hash(content), engine_fingerprint(engine, config)
+        entry = {
+            'sha256': sha,
+            'fingerprint': fingerprint,
+            'engine': engine,
+            'config': config,
+            'text': text,
+            'words': words,
+            'size': len(content)
+        }
+        try:
+            self.store.put(dict(entry))
+        except Exception as e:
+            logger.warning(f"OCR cache write failed: {e}")
+        self._remember((sha, fingerprint), entry)
+        return entry
+
+    def get_or_compute(self, content: bytes, engine: str, compute: Callable[[], OCRComputeResult],
+                       config: str = '') -> str:
+        """Return cached text, or run `compute` and store its result"""
+        entry = self.get(content, engine, config)
+        if entry is not None:
+            return entry['text']
+
+        result = compute()
+        text, words = result if isinstance(result, tuple) else (result, None)
+        if text:
+            # Failed or empty OCR is not cached so it is retried next time
+            self.put(content, engine, text, words, config)
+        return text or ''
+
+    def peek_text(self, content: bytes) -> Optional[str]:
+        """Text from any engine that has already seen these bytes, without running OCR"""
+        sha = content_hash(content)
+        try:
+            entry = self.store.get_any(sha)
+        except Exception as e:
+            logger.warning(f"OCR cache lookup failed: {e}")
+            return None
+        return entry['text'] if entry else None
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'backend': 'mongodb' if isinstance(self.store, _MongoStore) else 'disk',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'memory_entries': len(self._memory)
+        }
+
+
+_cache: Optional[OCRCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OCRCache:
+    """Process-wide cache; disk-backed until configure_ocr_cache attaches MongoDB"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OCRCache()
+    return _cache
+
+
+def configure_ocr_cache(db=None, directory: Optional[str] = None) -> OCRCache:
+    """Replace the process-wide cache, e.g. with a MongoDB-backed one at startup"""
+    global _cache
+    with _cache_lock:
+        _cache = OCRCache(db=db, directory=directory or DEFAULT_CACHE_DIR)
+    return _cache
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Streaming PDF Text Extraction
+Walks a PDF one page at a time: pages with an embedded text layer are read
+directly, image-only pages are rasterized and OCR'd, and extraction stops as
+soon as a total and a date have been seen. Hotel and airline folios run
+5-20 pages but the receipt data is nearly always on page 1.
+
+Uses PyMuPDF when installed (needed to rasterize scanned pages) and falls
+back to PyPDF2's text layer otherwise.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Union
+
+from ocr_cache import get_ocr_cache
+from receipt_field_engine import RECEIPT_SIGNAL_PATTERNS, pattern_set
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+OCR_DPI = 300              # tesseract accuracy drops noticeably below ~300 DPI on receipt fonts
+MIN_TEXT_LAYER_CHARS = 20  # fewer characters than this means the page is effectively a scan
+
+_RECEIPT_SIGNALS = pattern_set(RECEIPT_SIGNAL_PATTERNS)
+
+PDFSource = Union[bytes, str]
+
+
+def has_total_and_date(text: str) -> bool:
+    """Default early-stop test: enough text to parse a receipt"""
+    return _RECEIPT_SIGNALS.matches_all(text)
+
+
+@dataclass
+class PageText:
+    number: int
+    text: str
+    method: str  # 'text_layer', 'ocr' or 'empty'
+    seconds: float
+
+
+@dataclass
+class PDFExtraction:
+    text: str = ''
+    pages_total: int = 0
+    pages: List[PageText] = field(default_factory=list)
+    stopped_early: bool = False
+    seconds: float = 0.0
+
+    @property
+    def pages_read(self) -> int:
+        return len(self.pages)
+
+    @property
+    def ocr_pages(self) -> int:
+        return sum(1 for p in self.pages if p.method == 'ocr')
+
+    def summary(self) -> dict:
+        return {
+            'pages_total': self.pages_total,
+            'pages_read': self.pages_read,
+            'text_layer_pages': sum(1 for p in self.pages if p.method == 'text_layer'),
+            'ocr_pages': self.ocr_pages,
+            'stopped_early': self.stopped_early,
+            'seconds': round(self.seconds, 4)
+        }
+
+
+def _ocr_page(page, dpi: int) -> str:
+    """Rasterize one PyMuPDF page and OCR it through the shared cache"""
+    from PIL import Image
+    from ocr_cache import tesseract_text_and_words
+
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    content = f"{pixmap.width}x{pixmap.height}:".encode('ascii') + pixmap.samples
+
+    def compute():
+        image = Image.frombytes('L', (pixmap.width, pixmap.height), pixmap.samples)
+        return tesseract_text_and_words(image)
+
+    return get_ocr_cache().get_or_compute(content, 'tesseract', compute, config=f"pdf-raster-{dpi}dpi")
+
+
+def _iter_pymupdf(source: PDFSource, dpi: int, ocr: bool) -> Iterator[PageText]:
+    doc = fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype='pdf')
+    try:
+        yield len(doc)
+        for index in range(len(doc)):
+            started = time.perf_counter()
+            page = doc.load_page(index)
+            text = page.get_text()
+            method = 'text_layer'
+            if len(text.strip()) < MIN_TEXT_LAYER_CHARS:
+                if ocr and page.get_images(full=False):
+                    try:
+                        text = _ocr_page(page, dpi)
+                        method = 'ocr'
+                    except Exception as e:
+                        logger.warning(f"OCR failed for PDF page {index + 1}: {e}")
+                        method = 'empty'
+                elif not text.strip():
+                    method = 'empty'
+            yield PageText(index + 1, text, method, time.perf_counter() - started)
+    finally:
+        doc.close()
+
+
+def _iter_pypdf2(source: PDFSource) -> Iterator[PageText]:
+    import io
+    import PyPDF2
+
+    stream = open(source, 'rb') if isinstance(source, str) else io.BytesIO(source)
+    try:
+        reader = PyPDF2.PdfReader(stream)
+        yield len(reader.pages)
+        for index, page in enumerate(reader.pages):
+            started = time.perf_counter()
+            text = page.extract_text() or ''
+            method = 'text_layer' if text.strip() else 'empty'
+            yield PageText(index + 1, text, method, time.perf_counter() - started)
+    finally:
+        stream.close()
+
+
+def _page_stream(source: PDFSource, dpi: int, ocr: bool):
+    """Generator that yields the page count first, then PageText items"""
+    return _iter_pymupdf(source, dpi, ocr) if PYMUPDF_AVAILABLE else _iter_pypdf2(source)
+
+
+def iter_pdf_pages(source: PDFSource, dpi: int = OCR_DPI, ocr: bool = True) -> Iterator[PageText]:
+    """Yield pages lazily; only image-only pages are rasterized"""
+    pages = _page_stream(source, dpi, ocr)
+    next(pages)  # page count
+    yield from pages
+
+
+def extract_pdf_text(source: PDFSource, stop_when: Optional[Callable[[str], bool]] = has_total_and_date,
+                     max_pages: Optional[int] = None, dpi: int = OCR_DPI, ocr: bool = True) -> PDFExtraction:
+    """
+    Extract text page by page from a PDF path or bytes.
+
+    stop_when is checked against the accumulated text after each page; pass
+    None to read the whole document.
+    """
+    started = time.perf_counter()
+    result = PDFExtraction()
+    pages = _page_stream(source, dpi, ocr)
+    chunks = []
+    try:
+        result.pages_total = next(pages)
+        for page in pages:
+            result.pages.append(page)
+            if page.text.strip():
+                chunks.append(page.text.strip())
+            if max_pages and result.pages_read >= max_pages:
+                break
+            if stop_when and stop_when('\n'.join(chunks)):
+                result.stopped_early = result.pages_read < result.pages_total
+                break
+    finally:
+        pages.close()
+
+    result.text = '\n'.join(chunks)
+    result.seconds = time.perf_counter() - started
+    if result.pages_total > 1:
+        logger.debug(f"PDF extraction: {result.summary()}")
+    return result
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Receipt Field Extraction Engine
+One home for the amount, date and line-item regex tables used by the receipt
+extractors. Each table is compiled once into a PatternSet and read with a
+single traversal of the document instead of a Python loop of re.search calls
+per pattern and per line:
+
+    scan(text)         every match of every pattern, in document order
+    first(text)        the match a `for pattern in patterns: re.search(...)`
+                       loop returns (earlier patterns beat earlier positions)
+    first_value(text)  same, skipping matches the converter rejects
+
+Patterns whose required literal ("total", "usd", "/") is absent from the
+document are skipped without running the regex, and case-insensitive patterns
+written in lowercase run against a lowercased copy of the text rather than
+with re.IGNORECASE, which CPython's engine matches several times faster.
+
+Matches are not merged into one alternation regex: CPython's backtracking
+engine tries every alternative at every position, so a combined pattern is
+as slow as running the patterns one after another and loses their literal
+prefix scans (see benchmark_field_extraction.py).
+"""
+
+import logging
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+PatternSpec = Union[str, Tuple[str, str]]
+
+
+# ============================================================================
+# PATTERN TABLES
+# ============================================================================
+
+# EnhancedReceiptProcessor: (pattern, strptime format)
+RECEIPT_DATE_PATTERNS = (
+    (r'(\d{1,2}/\d{1,2}/\d{4})', '%m/%d/%Y'),
+    (r'(\d{1,2}-\d{1,2}-\d{4})', '%m-%d-%Y'),
+    (r'(\d{4}-\d{2}-\d{2})', '%Y-%m-%d'),
+    (r'(\w{3}\s+\d{1,2},\s+\d{4})', '%b %d, %Y'),
+    (r'(\d{1,2}\s+\w{3}\s+\d{4})', '%d %b %Y'),
+    (r'(\d{2}/\d{2}/\d{2})', '%m/%d/%y')
+)
+
+# EnhancedReceiptProcessor: (pattern, amount type)
+RECEIPT_AMOUNT_PATTERNS = (
+    (r'total[\s:]*\$?(\d+\.?\d*)', 'total'),
+    (r'amount\s+due[\s:]*\$?(\d+\.?\d*)', 'total'),
+    (r'balance[\s:]*\$?(\d+\.?\d*)', 'total'),
+    (r'grand\s+total[\s:]*\$?(\d+\.?\d*)', 'total'),
+    (r'tax[\s:]*\$?(\d+\.?\d*)', 'tax'),
+    (r'subtotal[\s:]*\$?(\d+\.?\d*)', 'subtotal')
+)
+
+LINE_ITEM_PATTERNS = (
+    r'(\d+\.?\d*)\s*x\s*(.+?)\s*\$(\d+\.?\d*)',  # Qty x Item $Price
+    r'(.+?)\s*\$(\d+\.?\d*)\s*$',  # Item $Price
+    r'(\d+)\s+(.+?)\s+(\d+\.?\d*)',  # Qty Item Price
+)
+
+RECEIPT_NUMBER_PATTERNS = (
+    r'receipt\s*#?\s*(\w+)',
+    r'transaction\s*#?\s*(\w+)',
+    r'order\s*#?\s*(\w+)',
+    r'ref\s*#?\s*(\w+)'
+)
+
+PHONE_PATTERNS = (r'(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})',)
+
+ADDRESS_PATTERNS = (
+    r'(\d+\s+\w+\s+(?:st|street|ave|avenue|rd|road|blvd|boulevard|dr|drive|ln|lane|way|ct|court))',
+)
+
+# ImprovedAmountExtractor
+TEXT_AMOUNT_PATTERNS = (
+    r'\$\s*(\d+\.?\d*)',  # $45.67
+    r'(\d+\.?\d*)\s*usd',  # 45.67 USD
+    r'total:\s*\$?\s*(\d+\.?\d*)',  # Total: $45.67
+    r'amount:\s*\$?\s*(\d+\.?\d*)',  # Amount: $45.67
+    r'(\d+\.?\d*)\s*dollars',  # 45.67 dollars
+    r'charged\s*\$?\s*(\d+\.?\d*)',  # charged $45.67
+    r'payment\s*of\s*\$?\s*(\d+\.?\d*)',  # payment of $45.67
+)
+
+# helper_functions._extract_amount_from_email
+EMAIL_AMOUNT_PATTERNS = (
+    r'total:\s*\$?([0-9,]+\.?[0-9]*)',
+    r'amount:\s*\$?([0-9,]+\.?[0-9]*)',
+    r'charged:\s*\$?([0-9,]+\.?[0-9]*)',
+    r'payment:\s*\$?([0-9,]+\.?[0-9]*)',
+    r'\$([0-9,]+\.?[0-9]*)',
+    r'([0-9,]+\.?[0-9]*)\s*dollars',
+    r'([0-9,]+\.?[0-9]*)\s*usd'
+)
+
+# EnhancedReceiptExtractor
+EXTRACTOR_AMOUNT_PATTERNS = (
+    r'\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # $1,234.56
+    r'(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)\s*usd',  # 1,234.56 USD
+    r'usd\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # USD 1,234.56
+    r'(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)\s*dollars',  # 1,234.56 dollars
+    r'total.*?\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # total $1,234.56
+    r'amount.*?\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # amount $1,234.56
+    r'charged.*?\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # charged $1,234.56
+    r'payment.*?\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # payment $1,234.56
+)
+
+EXTRACTOR_DATE_PATTERNS = (
+    r'(\d{1,2})[/\-](\d{1,2})[/\-](\d{2,4})',
+    r'(\d{4})-(\d{1,2})-(\d{1,2})',
+    r'(\w+)\s+(\d{1,2}),?\s+(\d{4})',
+    r'(\d{1,2})\s+(\w+)\s+(\d{4})'
+)
+
+# ReceiptOCRProcessor
+OCR_DATE_PATTERNS = (
+    r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})',  # MM/DD/YYYY or MM-DD-YYYY
+    r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})',    # YYYY/MM/DD or YYYY-MM-DD
+    r'(\w{3})\s+(\d{1,2}),?\s+(\d{4})',      # Jan 15, 2024
+    r'(\d{1,2})\s+(\w{3})\s+(\d{4})',        # 15 Jan 2024
+)
+
+OCR_AMOUNT_PATTERNS = (
+    r'\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # $1,234.56 or 1234.56
+    r'total[:\s]*\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # Total: $123.45
+    r'amount[:\s]*\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # Amount: $123.45
+)
+
+# pdf_text_pipeline early stop: enough text to parse a receipt
+RECEIPT_SIGNAL_PATTERNS = (
+    (r'(?:grand\s+total|total|amount\s+due|balance\s+due|amount\s+paid)\b[^\d\n]{0,20}\d[\d,]*\.\d{2}', 'total'),
+    (r'\b(?:\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}-\d{2}-\d{2}|'
+     r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}|'
+     r'\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{4})\b', 'date'),
+)
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+class FieldMatch(NamedTuple):
+    label: str
+    index: int
+    groups: Tuple[Optional[str], ...]
+    text: str
+    start: int
+    end: int
+
+    @property
+    def value(self) -> Optional[str]:
+        """First capture group, or the whole match for patterns without groups"""
+        return self.groups[0] if self.groups else self.text
+
+
+_new_field = FieldMatch._make
+
+
+def _literal_runs(parsed) -> List[str]:
+    runs, current = [], []
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(av))
+            continue
+        if current:
+            runs.append(''.join(current))
+            current = []
+        if op is sre_parse.SUBPATTERN and not av[1]:  # skip groups that change flags
+            runs.extend(_literal_runs(av[-1]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            runs.extend(_literal_runs(av[2]))
+    if current:
+        runs.append(''.join(current))
+    return runs
+
+
+def required_literal(pattern: str) -> str:
+    """Longest literal every match must contain, or '' when there is none"""
+    try:
+        runs = _literal_runs(sre_parse.parse(pattern))
+    except Exception:
+        return ''
+    return max(runs, key=len, default='')
+
+
+def _is_lowercase(pattern: str) -> bool:
+    return not any(c.isupper() for c in re.sub(r'\\.', '', pattern))
+
+
+def _is_caseless(pattern: str) -> bool:
+    """No letters outside escapes and group syntax, so IGNORECASE changes nothing"""
+    return not any(c.isalpha() for c in re.sub(r'\\.|\(\?P?<\w+>|\(\?[:=!]', '', pattern))
+
+
+class PatternSet:
+    """A regex table compiled once; entries are 'pattern' or ('pattern', label)"""
+
+    def __init__(self, patterns: Iterable[PatternSpec], flags: int = re.IGNORECASE):
+        entries = [(p, str(i)) if isinstance(p, str) else (p[0], p[1]) for i, p in enumerate(patterns)]
+        self.patterns = tuple(p for p, _ in entries)
+        self.labels = tuple(label for _, label in entries)
+        self.flags = flags
+        ignorecase = bool(flags & re.IGNORECASE)
+
+        # Per pattern: run on the text as-is (no letters, or a case-sensitive
+        # set), on a lowercased copy (lowercase pattern, IGNORECASE dropped)
+        # or with IGNORECASE (anything else)
+        self._modes = []
+        self._regexes = []
+        for pattern in self.patterns:
+            if not ignorecase or _is_caseless(pattern):
+                mode, pattern_flags = 'plain', flags & ~re.IGNORECASE
+            elif _is_lowercase(pattern):
+                mode, pattern_flags = 'fold', flags & ~re.IGNORECASE
+            else:
+                mode, pattern_flags = 'ignorecase', flags
+            self._modes.append(mode)
+            self._regexes.append(re.compile(pattern, pattern_flags))
+        self._fallback = {}  # IGNORECASE versions of 'fold' patterns, for text that changes length when lowercased
+        self._literals = [required_literal(p) if mode == 'plain' else required_literal(p).lower()
+                          for p, mode in zip(self.patterns, self._modes)]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def _ignorecase_regex(self, index: int):
+        regex = self._fallback.get(index)
+        if regex is None:
+            regex = self._fallback[index] = re.compile(self.patterns[index], self.flags)
+        return regex
+
+    def _field(self, index: int, match, haystack: str, text: str) -> FieldMatch:
+        start, end = match.span()
+        if haystack is text:
+            return _new_field((self.labels[index], index, match.groups(), match.group(), start, end))
+        # Case-folded scan: map spans back onto the original text to keep its casing
+        groups = tuple([text[s:e] if s >= 0 else None for s, e in match.regs[1:]])
+        return _new_field((self.labels[index], index, groups, text[start:end], start, end))
+
+    def _candidates(self, text: str):
+        """
+        (index, regex, haystack) for each pattern worth running. Literal checks
+        and lowercasing happen lazily, so first() stops paying at the first hit.
+        """
+        lowered = None
+        for index, mode in enumerate(self._modes):
+            literal = self._literals[index]
+            if mode == 'plain':
+                if not literal or literal in text:
+                    yield index, self._regexes[index], text
+                continue
+            if lowered is None:
+                lowered = text.lower()
+            if literal and literal not in lowered:
+                continue
+            if mode == 'ignorecase':
+                yield index, self._regexes[index], text
+            elif len(lowered) == len(text):
+                yield index, self._regexes[index], lowered
+            else:
+                yield index, self._ignorecase_regex(index), text
+
+    def scan(self, text: str) -> List[FieldMatch]:
+        """All matches of every pattern (overlaps between patterns kept), in document order"""
+        if not text:
+            return []
+        found = [self._field(index, m, haystack, text)
+                 for index, regex, haystack in self._candidates(text)
+                 for m in regex.finditer(haystack)]
+        found.sort(key=lambda f: (f.start, f.index))
+        return found
+
+    def first(self, text: str) -> Optional[FieldMatch]:
+        """Leftmost match of the first pattern that matches at all"""
+        if not text:
+            return None
+        for index, regex, haystack in self._candidates(text):
+            m = regex.search(haystack)
+            if m is not None:
+                return self._field(index, m, haystack, text)
+        return None
+
+    def first_value(self, text: str, convert: Callable[[FieldMatch], Any]) -> Any:
+        """
+        Like first(), but each pattern's leftmost match is passed to convert;
+        None or a ValueError/TypeError/IndexError moves on to the next pattern.
+        """
+        if not text:
+            return None
+        for index, regex, haystack in self._candidates(text):
+            m = regex.search(haystack)
+            if m is None:
+                continue
+            try:
+                value = convert(self._field(index, m, haystack, text))
+            except (ValueError, TypeError, IndexError):
+                continue
+            if value is not None:
+                return value
+        return None
+
+    def matches_all(self, text: str) -> bool:
+        """True when every pattern in the set matches somewhere"""
+        if not text:
+            return False
+        candidates = list(self._candidates(text))
+        if len(candidates) < len(self.patterns):
+            return False
+        return all(regex.search(haystack) for _, regex, haystack in candidates)
+
+
+@lru_cache(maxsize=128)
+def _cached_set(patterns: Tuple[PatternSpec, ...], flags: int) -> PatternSet:
+    return PatternSet(patterns, flags)
+
+
+def pattern_set(patterns: Union[PatternSet, Sequence[PatternSpec]], flags: int = re.IGNORECASE) -> PatternSet:
+    """Compiled PatternSet for a table, built once per distinct table and flags"""
+    if isinstance(patterns, PatternSet):
+        return patterns
+    if isinstance(patterns, tuple):
+        return _cached_set(patterns, flags)
+    return _cached_set(tuple(tuple(p) if isinstance(p, list) else p for p in patterns), flags)
+
+
+# ============================================================================
+# VALUE CONVERSION
+# ============================================================================
+
+def parse_amount(value: Optional[str]) -> Optional[float]:
+    """'1,234.56' -> 1234.56; None when the text is not a number"""
+    if not value:
+        return None
+    try:
+        return float(value.replace(',', ''))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str, date_format: str) -> Optional[datetime]:
+    """Memoized strptime; receipts repeat the same few date strings many times"""
+    try:
+        return datetime.strptime(value, date_format)
+    except ValueError:
+        return None
+
+
+def amount_in_range(minimum: float = 0.0, maximum: Optional[float] = None) -> Callable[[FieldMatch], Optional[float]]:
+    """Converter for first_value(): the match's amount when minimum < amount < maximum"""
+    def convert(field: FieldMatch) -> Optional[float]:
+        amount = parse_amount(field.value)
+        if amount is None or amount <= minimum:
+            return None
+        if maximum is not None and amount >= maximum:
+            return None
+        return amount
+    return convert
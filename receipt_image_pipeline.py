@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Receipt Image Pre-processing Pipeline
+Single-buffer OpenCV path from uploaded photo bytes to an OCR-ready array:
+
+    decode once (grayscale)  ->  find the receipt on a downscaled copy
+    ->  map the corners back to full resolution  ->  one perspective warp
+    straight to OCR size  ->  quality scores (blur, glare, skew)
+    ->  contrast + adaptive threshold  ->  tesseract
+
+Phone photos arrive at 12+ megapixels; edge detection does not need more than
+about a megapixel and tesseract reads receipt print best with the long side
+around 2000px, so nothing heavier than decode and the final warp ever touches
+the full-resolution buffer.
+
+Photos that score too low are flagged `retake` so callers can ask for a new
+picture instead of spending OCR time or cloud-model quota on them.
+"""
+
+import io
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ocr_cache import get_ocr_cache, tesseract_text_and_words
+
+logger = logging.getLogger(__name__)
+
+DETECT_MAX_SIDE = 1000       # edge detection resolution
+OCR_MAX_SIDE = 2000          # long side of the array handed to tesseract
+MIN_RECEIPT_AREA_RATIO = 0.1  # receipt must cover at least this share of the frame
+
+QUALITY_MAX_SIDE = 1000      # quality scores are computed at this size so they do not depend on resolution
+MIN_SHARPNESS = 60.0         # variance of the Laplacian; motion/focus blur scores well below this
+MAX_GLARE = 0.08             # share of the receipt washed out by specular highlights
+MAX_SKEW_DEGREES = 15.0      # text tilt that is still corrected; beyond this OCR falls apart
+SKEW_SEARCH_DEGREES = 20.0
+
+ImageSource = Union[bytes, np.ndarray]
+
+
+@dataclass
+class ReceiptDetection:
+    quad: Optional[np.ndarray] = None       # corners tl, tr, br, bl in full-resolution pixels
+    transform: Optional[np.ndarray] = None  # 3x3 homography from the photo to the corrected receipt
+    output_size: Tuple[int, int] = (0, 0)   # (width, height) of the corrected receipt
+
+    @property
+    def found(self) -> bool:
+        return self.quad is not None
+
+
+@dataclass
+class ImageQuality:
+    sharpness: float       # higher is sharper
+    glare: float           # 0-1 share of the receipt lost to highlights
+    skew_degrees: float    # counter-clockwise tilt of the text lines
+    retake: bool = False
+    reasons: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            'sharpness': round(self.sharpness, 1),
+            'glare': round(self.glare, 3),
+            'skew_degrees': round(self.skew_degrees, 2),
+            'retake': self.retake,
+            'reasons': list(self.reasons)
+        }
+
+
+@dataclass
+class PreparedReceipt:
+    gray: np.ndarray                    # cropped, contrast-normalized grayscale at OCR size
+    binary: np.ndarray                  # adaptive-threshold version of `gray` for tesseract
+    original_size: Tuple[int, int]      # (width, height) of the decoded photo
+    detection: ReceiptDetection = field(default_factory=ReceiptDetection)
+    quality: Optional[ImageQuality] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def quad(self) -> Optional[np.ndarray]:
+        return self.detection.quad
+
+    @property
+    def receipt_detected(self) -> bool:
+        return self.detection.found
+
+    @property
+    def retake(self) -> bool:
+        return bool(self.quality and self.quality.retake)
+
+
+def decode_grayscale(data: bytes) -> np.ndarray:
+    """Decode image bytes straight to one 8-bit grayscale buffer"""
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        # GIF and some TIFF/WebP variants are not readable by imdecode
+        from PIL import Image, ImageOps
+        with Image.open(io.BytesIO(data)) as pil_image:
+            image = np.asarray(ImageOps.exif_transpose(pil_image).convert('L'))
+    return image
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(image, code)
+
+
+def downscale(image: np.ndarray, max_side: int) -> Tuple[np.ndarray, float]:
+    """Shrink so the long side is at most max_side; returns the image and the scale applied"""
+    height, width = image.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    if scale == 1.0:
+        return image, 1.0
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
+
+
+def order_corners(points: np.ndarray) -> np.ndarray:
+    """Order four points as top-left, top-right, bottom-right, bottom-left"""
+    points = points.reshape(4, 2).astype(np.float32)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([points[np.argmin(sums)], points[np.argmin(diffs)],
+                     points[np.argmax(sums)], points[np.argmax(diffs)]], dtype=np.float32)
+
+
+def find_receipt_quad(gray: np.ndarray, min_area_ratio: float = MIN_RECEIPT_AREA_RATIO) -> Optional[np.ndarray]:
+    """Four receipt corners in the coordinates of `gray`, or None when no receipt outline is found"""
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(blurred, 50, 150, apertureSize=3)
+    # Close small gaps in the paper outline so it comes back as one contour
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = min_area_ratio * gray.shape[0] * gray.shape[1]
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        if cv2.contourArea(contour) < min_area:
+            break
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            return order_corners(approx)
+    if contours:
+        largest = max(contours, key=cv2.contourArea)
+        if cv2.contourArea(largest) >= min_area:
+            # Torn or curled paper: fall back to the rotated bounding box
+            return order_corners(cv2.boxPoints(cv2.minAreaRect(largest)))
+    return None
+
+
+def perspective_transform(quad: np.ndarray, max_side: int = OCR_MAX_SIDE) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Homography that maps the quad onto an upright rectangle no larger than max_side"""
+    tl, tr, br, bl = quad
+    width = max(np.linalg.norm(br - bl), np.linalg.norm(tr - tl))
+    height = max(np.linalg.norm(tr - br), np.linalg.norm(tl - bl))
+    factor = min(1.0, max_side / max(width, height, 1.0))
+    out_w, out_h = max(1, int(round(width * factor))), max(1, int(round(height * factor)))
+    target = np.array([[0, 0], [out_w - 1, 0], [out_w - 1, out_h - 1], [0, out_h - 1]], dtype=np.float32)
+    return cv2.getPerspectiveTransform(quad.astype(np.float32), target), (out_w, out_h)
+
+
+def warp_quad(image: np.ndarray, quad: np.ndarray, max_side: int = OCR_MAX_SIDE) -> np.ndarray:
+    """Perspective-correct the quad into an upright rectangle no larger than max_side"""
+    matrix, size = perspective_transform(quad, max_side)
+    return cv2.warpPerspective(image, matrix, size, flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def detect_receipt(gray: np.ndarray, detect_max_side: int = DETECT_MAX_SIDE, output_max_side: int = OCR_MAX_SIDE,
+                   min_area_ratio: float = MIN_RECEIPT_AREA_RATIO) -> ReceiptDetection:
+    """Find the receipt on a downscaled copy and return full-resolution corners plus the warp to apply"""
+    small, scale = downscale(gray, detect_max_side)
+    quad = find_receipt_quad(small, min_area_ratio)
+    if quad is None:
+        return ReceiptDetection()
+    quad = quad / scale
+    transform, size = perspective_transform(quad, output_max_side)
+    return ReceiptDetection(quad=quad, transform=transform, output_size=size)
+
+
+def crop_receipt(gray: np.ndarray, detection: ReceiptDetection, max_side: int = OCR_MAX_SIDE) -> np.ndarray:
+    """Apply the detection's warp, or just downscale the frame when no receipt outline was found"""
+    if not detection.found:
+        return downscale(gray, max_side)[0]
+    if max(detection.output_size) <= max_side:
+        return cv2.warpPerspective(gray, detection.transform, detection.output_size, flags=cv2.INTER_LINEAR,
+                                   borderMode=cv2.BORDER_REPLICATE)
+    return warp_quad(gray, detection.quad, max_side)
+
+
+# ============================================================================
+# QUALITY
+# ============================================================================
+
+def _rotate(image: np.ndarray, degrees: float, expand: bool = False) -> np.ndarray:
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), degrees, 1.0)
+    size = (width, height)
+    if expand:
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        size = (int(round(height * sin + width * cos)), int(round(height * cos + width * sin)))
+        matrix[0, 2] += size[0] / 2 - width / 2
+        matrix[1, 2] += size[1] / 2 - height / 2
+    return cv2.warpAffine(image, matrix, size, flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def estimate_skew(gray: np.ndarray, search_degrees: float = SKEW_SEARCH_DEGREES) -> float:
+    """
+    Tilt of the text lines in degrees (counter-clockwise positive), found with a
+    projection profile: rows of text give the sharpest row-sum histogram when level.
+    """
+    small, _ = downscale(gray, 400)
+    _, ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    if ink.mean() < 0.002 or ink.mean() > 0.6:
+        return 0.0
+    # Project the ink pixel coordinates instead of rotating the image for every angle
+    ys, xs = np.nonzero(ink)
+    ys, xs = ys.astype(np.float32), xs.astype(np.float32)
+    offset = int(np.hypot(*small.shape)) + 1
+
+    def score(angle: float) -> float:
+        theta = np.radians(angle)
+        rows = (ys * np.cos(theta) + xs * np.sin(theta) + offset).astype(np.int32)
+        return float(np.var(np.bincount(rows, minlength=2 * offset)))
+
+    best = max(np.arange(-search_degrees, search_degrees + 0.1, 1.0), key=score)
+    best = max(np.arange(best - 1.0, best + 1.01, 0.25), key=score)
+    return float(best)
+
+
+def measure_glare(gray: np.ndarray) -> float:
+    """Share of the image covered by blown-out highlights brighter than the paper around them"""
+    paper = float(np.percentile(gray, 60))
+    if paper >= 240:
+        # Evenly bright paper (or a scan) is fine as long as the print is visible
+        return 0.0
+    blown = (gray >= 250).astype(np.uint8)
+    blown = cv2.morphologyEx(blown, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
+    return float(blown.mean())
+
+
+def assess_quality(cropped: np.ndarray, min_sharpness: float = MIN_SHARPNESS, max_glare: float = MAX_GLARE,
+                   max_skew: float = MAX_SKEW_DEGREES) -> ImageQuality:
+    """Blur, glare and skew scores for a cropped receipt, with retake reasons"""
+    small, _ = downscale(cropped, QUALITY_MAX_SIDE)
+    sharpness = float(cv2.Laplacian(small, cv2.CV_64F).var())
+    glare = measure_glare(small)
+    skew = estimate_skew(small)
+
+    reasons = []
+    if sharpness < min_sharpness:
+        reasons.append('blurry')
+    if glare > max_glare:
+        reasons.append('glare')
+    if abs(skew) > max_skew:
+        reasons.append('skewed')
+    return ImageQuality(sharpness=sharpness, glare=glare, skew_degrees=skew, retake=bool(reasons), reasons=reasons)
+
+
+def assess_receipt_image(source: ImageSource, **thresholds) -> Tuple[ReceiptDetection, ImageQuality]:
+    """Detection and quality only, at quality-check resolution; cheap enough to run before any OCR call"""
+    gray = decode_grayscale(source) if isinstance(source, (bytes, bytearray, memoryview)) else to_grayscale(source)
+    detection = detect_receipt(gray)
+    return detection, assess_quality(crop_receipt(gray, detection, QUALITY_MAX_SIDE), **thresholds)
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """Adaptive threshold sized to the print; copes with shadows across the paper"""
+    block = max(15, (max(gray.shape) // 60) | 1)
+    return cv2.adaptiveThreshold(cv2.medianBlur(gray, 3), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY, block, 15)
+
+
+_CLAHE = None
+
+
+def _normalize_contrast(gray: np.ndarray) -> np.ndarray:
+    global _CLAHE
+    if _CLAHE is None:
+        _CLAHE = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return _CLAHE.apply(gray)
+
+
+def prepare_receipt(source: ImageSource, detect_max_side: int = DETECT_MAX_SIDE, ocr_max_side: int = OCR_MAX_SIDE,
+                    min_area_ratio: float = MIN_RECEIPT_AREA_RATIO, **thresholds) -> PreparedReceipt:
+    """Run the whole pipeline on image bytes or an already-decoded array"""
+    timings = {}
+    started = time.perf_counter()
+    gray = decode_grayscale(source) if isinstance(source, (bytes, bytearray, memoryview)) else to_grayscale(source)
+    timings['decode'] = time.perf_counter() - started
+
+    mark = time.perf_counter()
+    detection = detect_receipt(gray, detect_max_side, ocr_max_side, min_area_ratio)
+    cropped = crop_receipt(gray, detection, ocr_max_side)
+    timings['detect'] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    quality = assess_quality(cropped, **thresholds)
+    if not detection.found and 1.0 <= abs(quality.skew_degrees) <= MAX_SKEW_DEGREES:
+        # No paper outline to warp from, so straighten the text lines directly
+        cropped = _rotate(cropped, -quality.skew_degrees, expand=True)
+    timings['quality'] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    enhanced = _normalize_contrast(cropped)
+    binary = binarize(enhanced)
+    timings['enhance'] = time.perf_counter() - mark
+    timings['total'] = time.perf_counter() - started
+
+    return PreparedReceipt(gray=enhanced, binary=binary, original_size=(gray.shape[1], gray.shape[0]),
+                           detection=detection, quality=quality, timings=timings)
+
+
+def ocr_array(array: np.ndarray, config: str = '') -> str:
+    """OCR a prepared grayscale/binary array through the shared OCR cache"""
+    height, width = array.shape[:2]
+    content = f"{width}x{height}:".encode('ascii') + np.ascontiguousarray(array).tobytes()
+    return get_ocr_cache().get_or_compute(content, 'tesseract',
+                                          lambda: tesseract_text_and_words(array, config),
+                                          config=f"camera-pipeline {config}".strip())
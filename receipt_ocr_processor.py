@@ -9,13 +9,15 @@ import re
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
-import pytesseract
 from PIL import Image
-import fitz  # PyMuPDF
 import requests
 from io import BytesIO
 import json
 
+from ocr_cache import get_ocr_cache, tesseract_text_and_words
+from pdf_text_pipeline import extract_pdf_text
+from receipt_field_engine import OCR_AMOUNT_PATTERNS, OCR_DATE_PATTERNS, parse_amount, pattern_set
+
 logger = logging.getLogger(__name__)
 
 class ReceiptOCRProcessor:
@@ -23,18 +25,8 @@ class ReceiptOCRProcessor:
     
     def __init__(self, r2_client=None):
         self.r2_client = r2_client
-        self.date_patterns = [
-            r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})',  # MM/DD/YYYY or MM-DD-YYYY
-            r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})',    # YYYY/MM/DD or YYYY-MM-DD
-            r'(\w{3})\s+(\d{1,2}),?\s+(\d{4})',      # Jan 15, 2024
-            r'(\d{1,2})\s+(\w{3})\s+(\d{4})',        # 15 Jan 2024
-        ]
-        
-        self.amount_patterns = [
-            r'\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # $1,234.56 or 1234.56
-            r'total[:\s]*\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # Total: $123.45
-            r'amount[:\s]*\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # Amount: $123.45
-        ]
+        self.date_patterns = OCR_DATE_PATTERNS
+        self.amount_patterns = OCR_AMOUNT_PATTERNS
         
         self.merchant_patterns = [
             r'^([A-Z][A-Z\s&]+(?:LLC|INC|CORP|CO|LTD)?)',  # Uppercase merchant names
@@ -62,12 +54,9 @@ class ReceiptOCRProcessor:
     def extract_text_from_pdf(self, pdf_content: bytes) -> str:
         """Extract text from PDF content"""
         try:
-            doc = fitz.open(stream=pdf_content, filetype="pdf")
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            doc.close()
-            return text
+            # Page by page: text layer where present, OCR for scanned pages,
+            # stopping once a total and date have been found
+            return extract_pdf_text(pdf_content).text
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {e}")
             return ""
@@ -75,58 +64,44 @@ class ReceiptOCRProcessor:
     def extract_text_from_image(self, image_content: bytes) -> str:
         """Extract text from image using OCR"""
         try:
-            image = Image.open(BytesIO(image_content))
-            text = pytesseract.image_to_string(image)
-            return text
+            return get_ocr_cache().get_or_compute(
+                image_content, 'tesseract',
+                lambda: tesseract_text_and_words(Image.open(BytesIO(image_content)))
+            )
         except Exception as e:
             logger.error(f"Error extracting text from image: {e}")
             return ""
 
     def parse_date(self, text: str) -> Optional[datetime]:
         """Parse date from text using multiple patterns"""
-        text_upper = text.upper()
+        return pattern_set(self.date_patterns).first_value(text, self._date_from_match)
+
+    @staticmethod
+    def _date_from_match(match) -> Optional[datetime]:
+        if len(match.groups) != 3:
+            return None
+        first, second, third = match.groups
+        if len(third) == 2:  # YY format
+            year = int(third)
+            if year < 50:
+                year += 2000
+            else:
+                year += 1900
+        else:
+            year = int(third)
         
-        for pattern in self.date_patterns:
-            matches = re.findall(pattern, text_upper)
-            if matches:
-                try:
-                    if len(matches[0]) == 3:
-                        if len(matches[0][2]) == 2:  # YY format
-                            year = int(matches[0][2])
-                            if year < 50:
-                                year += 2000
-                            else:
-                                year += 1900
-                        else:
-                            year = int(matches[0][2])
-                        
-                        month = int(matches[0][0])
-                        day = int(matches[0][1])
-                        
-                        # Handle different date formats
-                        if month > 12:  # DD/MM format
-                            month, day = day, month
-                        
-                        return datetime(year, month, day)
-                except (ValueError, IndexError):
-                    continue
+        month = int(first)
+        day = int(second)
         
-        return None
+        # Handle different date formats
+        if month > 12:  # DD/MM format
+            month, day = day, month
+        
+        return datetime(year, month, day)
 
     def parse_amount(self, text: str) -> Optional[float]:
         """Parse amount from text"""
-        text_upper = text.upper()
-        
-        for pattern in self.amount_patterns:
-            matches = re.findall(pattern, text_upper)
-            if matches:
-                try:
-                    amount_str = matches[0].replace(',', '')
-                    return float(amount_str)
-                except ValueError:
-                    continue
-        
-        return None
+        return pattern_set(self.amount_patterns).first_value(text, lambda match: parse_amount(match.value))
 
     def parse_merchant(self, text: str) -> Optional[str]:
         """Parse merchant name from text"""
@@ -165,6 +140,53 @@ class ReceiptOCRProcessor:
         
         return items
 
+    def extract_text(self, filename: str, file_content: bytes) -> Optional[str]:
+        """Extract text based on file type; None for unsupported types"""
+        filename = (filename or '').lower()
+        if filename.endswith('.pdf'):
+            return self.extract_text_from_pdf(file_content)
+        if filename.endswith(('.jpg', '.jpeg', '.png', '.tiff')):
+            return self.extract_text_from_image(file_content)
+        logger.warning(f"Unsupported file type: {filename}")
+        return None
+
+    def parse_text(self, text: str) -> Dict:
+        """Turn OCR text into the receipt fields stored on the document"""
+        extracted_data = {
+            'ocr_text': text,
+            'ocr_processed': True,
+            'ocr_confidence': 0.8
+        }
+        
+        # Parse date
+        receipt_date = self.parse_date(text)
+        if receipt_date:
+            extracted_data['receipt_date'] = receipt_date.isoformat()
+            extracted_data['date_source'] = 'ocr'
+        
+        # Parse amount
+        receipt_amount = self.parse_amount(text)
+        if receipt_amount:
+            extracted_data['receipt_amount'] = receipt_amount
+            extracted_data['amount_source'] = 'ocr'
+        
+        # Parse merchant
+        receipt_merchant = self.parse_merchant(text)
+        if receipt_merchant:
+            extracted_data['receipt_merchant'] = receipt_merchant
+            extracted_data['merchant_source'] = 'ocr'
+        
+        # Extract line items
+        line_items = self.extract_line_items(text)
+        if line_items:
+            extracted_data['line_items'] = line_items
+        
+        return extracted_data
+
+    @staticmethod
+    def attachment_filename(receipt_data: Dict) -> str:
+        return (receipt_data.get('attachments') or [{}])[0].get('filename', '')
+
     def process_receipt(self, receipt_data: Dict) -> Dict:
         """Process a receipt and extract real data"""
         try:
@@ -183,50 +205,14 @@ class ReceiptOCRProcessor:
                 logger.warning(f"Failed to download content for receipt {receipt_id}")
                 return receipt_data
             
-            # Extract text based on file type
-            filename = receipt_data.get('attachments', [{}])[0].get('filename', '').lower()
-            
-            if filename.endswith('.pdf'):
-                text = self.extract_text_from_pdf(file_content)
-            elif filename.endswith(('.jpg', '.jpeg', '.png', '.tiff')):
-                text = self.extract_text_from_image(file_content)
-            else:
-                logger.warning(f"Unsupported file type: {filename}")
-                return receipt_data
+            text = self.extract_text(self.attachment_filename(receipt_data), file_content)
             
             if not text:
                 logger.warning(f"No text extracted from receipt {receipt_id}")
                 return receipt_data
             
             # Extract real receipt data
-            extracted_data = {
-                'ocr_text': text,
-                'ocr_processed': True,
-                'ocr_confidence': 0.8
-            }
-            
-            # Parse date
-            receipt_date = self.parse_date(text)
-            if receipt_date:
-                extracted_data['receipt_date'] = receipt_date.isoformat()
-                extracted_data['date_source'] = 'ocr'
-            
-            # Parse amount
-            receipt_amount = self.parse_amount(text)
-            if receipt_amount:
-                extracted_data['receipt_amount'] = receipt_amount
-                extracted_data['amount_source'] = 'ocr'
-            
-            # Parse merchant
-            receipt_merchant = self.parse_merchant(text)
-            if receipt_merchant:
-                extracted_data['receipt_merchant'] = receipt_merchant
-                extracted_data['merchant_source'] = 'ocr'
-            
-            # Extract line items
-            line_items = self.extract_line_items(text)
-            if line_items:
-                extracted_data['line_items'] = line_items
+            extracted_data = self.parse_text(text)
             
             # Update receipt data
             receipt_data.update(extracted_data)
@@ -236,9 +222,9 @@ class ReceiptOCRProcessor:
                 receipt_data['_id'] = str(receipt_data['_id'])
             
             logger.info(f"✅ OCR processed receipt {receipt_id}: "
-                       f"merchant={receipt_merchant}, "
-                       f"amount={receipt_amount}, "
-                       f"date={receipt_date}")
+                       f"merchant={extracted_data.get('receipt_merchant')}, "
+                       f"amount={extracted_data.get('receipt_amount')}, "
+                       f"date={extracted_data.get('receipt_date')}")
             
             return receipt_data
             
@@ -246,12 +232,19 @@ class ReceiptOCRProcessor:
             logger.error(f"Error processing receipt {receipt_id}: {e}")
             return receipt_data
 
-    def batch_process_receipts(self, receipts: List[Dict]) -> List[Dict]:
-        """Process multiple receipts in batch"""
-        processed_receipts = []
+    def batch_process_receipts(self, receipts: List[Dict], max_workers: Optional[int] = None,
+                               progress_callback=None) -> List[Dict]:
+        """
+        Process multiple receipts in batch.
+
+        Downloads overlap with OCR running in a process pool; receipts come
+        back in completion order, each with an `ocr_timing` breakdown.
+        """
+        from batch_ocr_engine import BatchOCREngine
         
-        for receipt in receipts:
-            processed = self.process_receipt(receipt)
-            processed_receipts.append(processed)
+        engine = BatchOCREngine(self, max_workers=max_workers)
+        processed_receipts = []
+        for result in engine.process(receipts, progress_callback=progress_callback):
+            processed_receipts.append(result.receipt)
         
-        return processed_receipts 
\ No newline at end of file
+        return processed_receipts
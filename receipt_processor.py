@@ -2,14 +2,27 @@ import os
 import re
 import logging
 from datetime import datetime, timedelta
-import pytesseract
 from PIL import Image
-import PyPDF2
 import json
 from typing import Dict, List, Optional, Tuple
 
+from ocr_cache import get_ocr_cache, read_file_bytes, tesseract_text_and_words
+from pdf_text_pipeline import extract_pdf_text
+from receipt_field_engine import (
+    ADDRESS_PATTERNS, LINE_ITEM_PATTERNS, PHONE_PATTERNS, RECEIPT_AMOUNT_PATTERNS,
+    RECEIPT_DATE_PATTERNS, RECEIPT_NUMBER_PATTERNS, parse_date, pattern_set
+)
+
 logger = logging.getLogger(__name__)
 
+# Common OCR errors: O to 0, l to 1, S to 5 before numbers. The corrections
+# never create or remove word boundaries, so one combined pass is equivalent
+# to applying them one after another.
+_OCR_CORRECTION_RE = re.compile(r'\bO\b|\bl\b|\bS\b(?=\d)')
+_OCR_CORRECTIONS = {'O': '0', 'l': '1', 'S': '5'}
+_PAYMENT_METHODS = ['cash', 'credit', 'debit', 'visa', 'mastercard', 'amex', 'discover']
+_ITEM_SKIP_KEYWORDS = ['total', 'subtotal', 'tax', 'change', 'receipt', 'thank', 'store']
+
 class EnhancedReceiptProcessor:
     """Advanced receipt processor with enhanced parsing algorithms"""
     
@@ -37,32 +50,11 @@ class EnhancedReceiptProcessor:
             'chipotle': ['chipotle']
         }
         
-        # Enhanced date patterns with context
-        self.date_patterns = [
-            (r'(\d{1,2}/\d{1,2}/\d{4})', '%m/%d/%Y'),
-            (r'(\d{1,2}-\d{1,2}-\d{4})', '%m-%d-%Y'),
-            (r'(\d{4}-\d{2}-\d{2})', '%Y-%m-%d'),
-            (r'(\w{3}\s+\d{1,2},\s+\d{4})', '%b %d, %Y'),
-            (r'(\d{1,2}\s+\w{3}\s+\d{4})', '%d %b %Y'),
-            (r'(\d{2}/\d{2}/\d{2})', '%m/%d/%y')
-        ]
-        
-        # Enhanced amount patterns
-        self.amount_patterns = [
-            (r'total[\s:]*\$?(\d+\.?\d*)', 'total'),
-            (r'amount\s+due[\s:]*\$?(\d+\.?\d*)', 'total'),
-            (r'balance[\s:]*\$?(\d+\.?\d*)', 'total'),
-            (r'grand\s+total[\s:]*\$?(\d+\.?\d*)', 'total'),
-            (r'tax[\s:]*\$?(\d+\.?\d*)', 'tax'),
-            (r'subtotal[\s:]*\$?(\d+\.?\d*)', 'subtotal')
-        ]
-        
-        # Line item patterns
-        self.line_item_patterns = [
-            r'(\d+\.?\d*)\s*x\s*(.+?)\s*\$(\d+\.?\d*)',  # Qty x Item $Price
-            r'(.+?)\s*\$(\d+\.?\d*)\s*$',  # Item $Price
-            r'(\d+)\s+(.+?)\s+(\d+\.?\d*)',  # Qty Item Price
-        ]
+        # Date (pattern, strptime format), amount (pattern, type) and line item
+        # tables live in receipt_field_engine and are compiled once
+        self.date_patterns = RECEIPT_DATE_PATTERNS
+        self.amount_patterns = RECEIPT_AMOUNT_PATTERNS
+        self.line_item_patterns = LINE_ITEM_PATTERNS
         
         logger.info("🧾 Enhanced Receipt Processor initialized")
     
@@ -79,23 +71,26 @@ class EnhancedReceiptProcessor:
                 logger.warning(f"No text extracted from {filepath}")
                 return None
             
-            # Enhanced parsing
-            receipt_data = self._enhanced_parse_receipt(raw_text)
-            receipt_data.update({
-                'source_file': os.path.basename(filepath),
-                'processed_at': datetime.now().isoformat(),
-                'extraction_method': 'enhanced_parser',
-                'raw_text': raw_text,
-                'file_size': os.path.getsize(filepath)
-            })
-            
-            logger.info(f"✨ Enhanced extraction completed for {filepath}")
-            return receipt_data
+            return self.extract_from_text(raw_text, filepath)
             
         except Exception as e:
             logger.error(f"Enhanced processing failed for {filepath}: {str(e)}")
             return None
     
+    def extract_from_text(self, raw_text: str, filepath: str) -> Dict:
+        """Enhanced parsing of text that has already been OCR'd or extracted from filepath"""
+        receipt_data = self._enhanced_parse_receipt(raw_text)
+        receipt_data.update({
+            'source_file': os.path.basename(filepath),
+            'processed_at': datetime.now().isoformat(),
+            'extraction_method': 'enhanced_parser',
+            'raw_text': raw_text,
+            'file_size': os.path.getsize(filepath) if os.path.exists(filepath) else 0
+        })
+        
+        logger.info(f"✨ Enhanced extraction completed for {filepath}")
+        return receipt_data
+    
     def _extract_raw_text(self, filepath: str) -> str:
         """Extract raw text from file using appropriate method"""
         file_ext = os.path.splitext(filepath)[1].lower()
@@ -154,20 +149,11 @@ class EnhancedReceiptProcessor:
     
     def _clean_text(self, text: str) -> str:
         """Clean and normalize OCR text for better parsing"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
+        # Remove extra whitespace (str.split() uses the same whitespace set as \s)
+        text = ' '.join(text.split())
         
         # Fix common OCR errors
-        ocr_corrections = {
-            r'\bO\b': '0',  # O to 0
-            r'\bl\b': '1',  # l to 1
-            r'\bS\b(?=\d)': '5',  # S to 5 before numbers
-        }
-        
-        for pattern, replacement in ocr_corrections.items():
-            text = re.sub(pattern, replacement, text)
-        
-        return text.strip()
+        return _OCR_CORRECTION_RE.sub(lambda m: _OCR_CORRECTIONS[m.group()], text)
     
     def _extract_merchant_enhanced(self, lines: List[str]) -> Dict:
         """Enhanced merchant extraction with pattern matching and confidence scoring"""
@@ -207,24 +193,20 @@ class EnhancedReceiptProcessor:
         best_date = None
         best_confidence = 0.0
         
-        for line in lines:
-            for pattern, date_format in self.date_patterns:
-                matches = re.finditer(pattern, line, re.IGNORECASE)
-                for match in matches:
-                    try:
-                        parsed_date = datetime.strptime(match.group(1), date_format)
-                        
-                        # Validate date reasonableness (not future, not too old)
-                        days_diff = (current_date - parsed_date).days
-                        if -1 <= days_diff <= 365:  # Allow 1 day future, up to 1 year old
-                            confidence = 0.9 - (days_diff / 365 * 0.3)  # Reduce confidence for older dates
-                            
-                            if confidence > best_confidence:
-                                best_date = parsed_date.strftime('%Y-%m-%d')
-                                best_confidence = confidence
-                    
-                    except ValueError:
-                        continue
+        # One pass over the whole document; the label of each match is its strptime format
+        for match in pattern_set(self.date_patterns).scan('\n'.join(lines)):
+            parsed_date = parse_date(match.value, match.label)
+            if parsed_date is None:
+                continue
+            
+            # Validate date reasonableness (not future, not too old)
+            days_diff = (current_date - parsed_date).days
+            if -1 <= days_diff <= 365:  # Allow 1 day future, up to 1 year old
+                confidence = 0.9 - (days_diff / 365 * 0.3)  # Reduce confidence for older dates
+                
+                if confidence > best_confidence:
+                    best_date = parsed_date.strftime('%Y-%m-%d')
+                    best_confidence = confidence
         
         if best_date:
             date_data['date'] = best_date
@@ -243,21 +225,15 @@ class EnhancedReceiptProcessor:
         
         amounts_found = {'total': [], 'tax': [], 'subtotal': []}
         
-        for line in lines:
-            line_lower = line.lower()
+        for match in pattern_set(self.amount_patterns).scan('\n'.join(lines)):
+            try:
+                amount = float(match.value)
+            except ValueError:
+                continue
             
-            for pattern, amount_type in self.amount_patterns:
-                matches = re.finditer(pattern, line_lower)
-                for match in matches:
-                    try:
-                        amount = float(match.group(1))
-                        
-                        # Validate amount reasonableness
-                        if 0.01 <= amount <= 10000:  # Reasonable receipt amounts
-                            amounts_found[amount_type].append(amount)
-                    
-                    except ValueError:
-                        continue
+            # Validate amount reasonableness
+            if 0.01 <= amount <= 10000:  # Reasonable receipt amounts
+                amounts_found[match.label].append(amount)
         
         # Process found amounts
         if amounts_found['total']:
@@ -283,6 +259,7 @@ class EnhancedReceiptProcessor:
     def _extract_items_enhanced(self, lines: List[str]) -> List[Dict]:
         """Enhanced line item extraction with intelligent parsing"""
         items = []
+        item_patterns = pattern_set(self.line_item_patterns)
         
         for line in lines:
             line = line.strip()
@@ -291,42 +268,37 @@ class EnhancedReceiptProcessor:
                 continue
             
             # Skip lines that are clearly not items
-            skip_keywords = ['total', 'subtotal', 'tax', 'change', 'receipt', 'thank', 'store']
-            if any(keyword in line.lower() for keyword in skip_keywords):
+            line_lower = line.lower()
+            if any(keyword in line_lower for keyword in _ITEM_SKIP_KEYWORDS):
                 continue
             
-            # Try different line item patterns
-            for pattern in self.line_item_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    try:
-                        if len(match.groups()) == 3:  # Qty x Item $Price or Qty Item Price
-                            if 'x' in line.lower():
-                                qty, name, price = match.groups()
-                            else:
-                                qty, name, price = match.groups()
-                            
-                            items.append({
-                                'name': name.strip(),
-                                'quantity': float(qty),
-                                'price': float(price),
-                                'total': float(qty) * float(price)
-                            })
-                        elif len(match.groups()) == 2:  # Item $Price
-                            name, price = match.groups()
-                            items.append({
-                                'name': name.strip(),
-                                'quantity': 1.0,
-                                'price': float(price),
-                                'total': float(price)
-                            })
-                        break
-                    
-                    except (ValueError, IndexError):
-                        continue
+            # First pattern that matches and parses wins
+            item = item_patterns.first_value(line, self._line_item_from_match)
+            if item:
+                items.append(item)
         
         return items
     
+    @staticmethod
+    def _line_item_from_match(match) -> Optional[Dict]:
+        if len(match.groups) == 3:  # Qty x Item $Price or Qty Item Price
+            qty, name, price = match.groups
+            return {
+                'name': name.strip(),
+                'quantity': float(qty),
+                'price': float(price),
+                'total': float(qty) * float(price)
+            }
+        if len(match.groups) == 2:  # Item $Price
+            name, price = match.groups
+            return {
+                'name': name.strip(),
+                'quantity': 1.0,
+                'price': float(price),
+                'total': float(price)
+            }
+        return None
+    
     def _extract_additional_fields(self, lines: List[str]) -> Dict:
         """Extract additional receipt fields"""
         additional_data = {
@@ -336,44 +308,37 @@ class EnhancedReceiptProcessor:
             'address': None
         }
         
+        receipt_numbers = pattern_set(RECEIPT_NUMBER_PATTERNS)
+        phones = pattern_set(PHONE_PATTERNS, flags=0)
+        addresses = pattern_set(ADDRESS_PATTERNS)
+        
         for line in lines:
             line_lower = line.lower()
             
             # Payment method
             if not additional_data['payment_method']:
-                payment_methods = ['cash', 'credit', 'debit', 'visa', 'mastercard', 'amex', 'discover']
-                for method in payment_methods:
+                for method in _PAYMENT_METHODS:
                     if method in line_lower:
                         additional_data['payment_method'] = method
                         break
             
             # Receipt number
             if not additional_data['receipt_number']:
-                receipt_patterns = [
-                    r'receipt\s*#?\s*(\w+)',
-                    r'transaction\s*#?\s*(\w+)',
-                    r'order\s*#?\s*(\w+)',
-                    r'ref\s*#?\s*(\w+)'
-                ]
-                
-                for pattern in receipt_patterns:
-                    match = re.search(pattern, line_lower)
-                    if match:
-                        additional_data['receipt_number'] = match.group(1).upper()
-                        break
+                match = receipt_numbers.first(line_lower)
+                if match:
+                    additional_data['receipt_number'] = match.value.upper()
             
             # Phone number
             if not additional_data['phone_number']:
-                phone_match = re.search(r'(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})', line)
-                if phone_match:
-                    additional_data['phone_number'] = phone_match.group(1)
+                match = phones.first(line)
+                if match:
+                    additional_data['phone_number'] = match.value
             
-            # Address (simple detection)
+            # Address (simple detection): street number + street name
             if not additional_data['address']:
-                # Look for address patterns (street number + street name)
-                address_match = re.search(r'(\d+\s+\w+\s+(?:st|street|ave|avenue|rd|road|blvd|boulevard|dr|drive|ln|lane|way|ct|court))', line, re.IGNORECASE)
-                if address_match:
-                    additional_data['address'] = address_match.group(1)
+                match = addresses.first(line)
+                if match:
+                    additional_data['address'] = match.value
         
         return additional_data
     
@@ -405,12 +370,8 @@ class EnhancedReceiptProcessor:
     def _extract_text_from_pdf(self, filepath: str) -> str:
         """Extract text from PDF file"""
         try:
-            text = ""
-            with open(filepath, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            return text.strip()
+            # Streams pages and stops once a total and date have been found
+            return extract_pdf_text(filepath).text.strip()
         except Exception as e:
             logger.error(f"Error extracting text from PDF {filepath}: {str(e)}")
             return ""
@@ -418,8 +379,13 @@ class EnhancedReceiptProcessor:
     def _extract_text_from_image(self, filepath: str) -> str:
         """Extract text from image using OCR"""
         try:
-            image = Image.open(filepath)
-            text = pytesseract.image_to_string(image)
+            content = read_file_bytes(filepath)
+            if content is None:
+                return ""
+            text = get_ocr_cache().get_or_compute(
+                content, 'tesseract',
+                lambda: tesseract_text_and_words(Image.open(filepath))
+            )
             return text.strip()
         except Exception as e:
             logger.error(f"Error extracting text from image {filepath}: {str(e)}")
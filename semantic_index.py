@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Semantic Search Index
+Hashed word / character n-gram vectors over the text of bank_transactions,
+transactions and receipts (merchant, description, OCR text), computed offline
+and stored as a memory-mapped float32 matrix with an inverted-file
+nearest-neighbour structure: rows are clustered around spherical k-means
+centroids and stored contiguously per cluster, so a query scores the
+centroids and then only the rows of the few closest clusters.
+
+Over 100k rows a query reads a few thousand vectors and answers in about a
+millisecond without touching MongoDB; callers fetch the hits by _id. The
+index is loaded once per worker through the model registry, like the local
+expense classifier, and is rebuilt offline:
+
+    python semantic_index.py --mongo      # index every collection in INDEXED_FIELDS
+
+The index ranks records for chat grounding and for the transaction list's
+search_mode=semantic; it is approximate and top-k, so the default UI search
+keeps its exact filter. Documents inserted after the build are
+found by search_fresh(), which scores the newest ones (by ObjectId time) at
+query time until the next rebuild, reusing their vectors for
+FRESH_TTL_SECONDS.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.getenv('SEMANTIC_INDEX_DIR', os.path.expanduser('~/.cache/receipt-processor/semantic_index'))
+EMBEDDING_DIM = 256
+DEFAULT_PROBES = 8
+MIN_SCORE = 0.25
+RECENT_LIMIT = 2000  # newest unindexed documents per collection scored at query time
+FRESH_TTL_SECONDS = 30  # how long their vectors are reused between queries
+TEXT_LIMIT = 1000  # OCR text beyond this is mostly line items and totals
+
+# Text fields per collection, in the order they are joined
+INDEXED_FIELDS = {
+    'bank_transactions': ('merchant_name', 'counterparty.name', 'description', 'category', 'business_type',
+                          'account_name', 'transaction_id'),
+    'transactions': ('merchant', 'description', 'category'),
+    'receipts': ('merchant', 'merchant_name', 'description', 'ocr_text', 'raw_text'),
+}
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+# ============================================================================
+# VECTORS
+# ============================================================================
+
+def document_text(doc: Dict, fields: Sequence[str]) -> str:
+    parts = []
+    for field in fields:
+        value = doc
+        for key in field.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        if value and str(value) not in parts:
+            parts.append(str(value))
+    return ' '.join(parts)[:TEXT_LIMIT]
+
+
+def _tokens(text: str) -> List[Tuple[str, float]]:
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        tokens.append((f"w:{word}", 2.0))
+        if len(word) > 2:
+            # Trigrams let "starbux" or "adobe cc" find "STARBUCKS" and "ADOBE CREATIVE CLOUD"
+            padded = f"<{word}>"
+            tokens.extend((f"c:{padded[i:i + 3]}", 1.0) for i in range(len(padded) - 2))
+    return tokens
+
+
+def embed_texts(texts: Sequence[str], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Signed feature-hashed token vectors, L2-normalized (all-zero rows for empty text)"""
+    rows: List[int] = []
+    columns: List[int] = []
+    values: List[float] = []
+    buckets: Dict[str, Tuple[int, float]] = {}
+    for row, text in enumerate(texts):
+        for token, weight in _tokens(text or ''):
+            bucket = buckets.get(token)
+            if bucket is None:
+                # crc32 rather than hash(): str hashes change between processes
+                h = zlib.crc32(token.encode('utf-8'))
+                bucket = buckets[token] = (h % dim, 1.0 if (h >> 16) & 1 else -1.0)
+            rows.append(row)
+            columns.append(bucket[0])
+            values.append(bucket[1] * weight)
+    vectors = np.zeros((len(texts), dim), np.float32)
+    np.add.at(vectors, (np.asarray(rows, np.int64), np.asarray(columns, np.int64)), np.asarray(values, np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    return np.concatenate([np.argmax(vectors[i:i + chunk] @ centroids.T, axis=1)
+                           for i in range(0, len(vectors), chunk)]) if len(vectors) else np.zeros(0, np.int64)
+
+
+def _spherical_kmeans(vectors: np.ndarray, clusters: int, iterations: int = 10, sample: int = 20000,
+                      seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    training = vectors[rng.choice(len(vectors), min(len(vectors), sample), replace=False)]
+    centroids = training[rng.choice(len(training), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(training, centroids)
+        members = np.zeros((clusters, len(training)), np.float32)
+        members[assignment, np.arange(len(training))] = 1.0
+        sums = members @ training
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        filled = norms[:, 0] > 0
+        # Empty clusters keep their old centroid
+        centroids[filled] = sums[filled] / norms[filled]
+    return centroids
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+@dataclass
+class SearchHit:
+    collection: str
+    id: str
+    score: float
+
+
+class SemanticIndex:
+    """Row vectors grouped by cluster: rows offsets[c]:offsets[c + 1] belong to centroid c"""
+
+    def __init__(self, vectors: np.ndarray, centroids: np.ndarray, offsets: np.ndarray, codes: np.ndarray,
+                 ids: np.ndarray, collections: List[str], metadata: Dict):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.codes = codes
+        self.ids = ids
+        self.collections = collections
+        self.metadata = metadata
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, str, str]], dim: int = EMBEDDING_DIM,
+              built_at: Optional[datetime] = None) -> 'SemanticIndex':
+        """
+        Index (collection, id, text) records; rows without any text are skipped.
+
+        built_at should be taken before the records are read, so documents
+        inserted while the build runs are still newer than it.
+        """
+        built_at = built_at or datetime.utcnow()
+        collections: List[str] = []
+        codes, ids, texts = [], [], []
+        for collection, doc_id, text in records:
+            if not text or not text.strip():
+                continue
+            if collection not in collections:
+                collections.append(collection)
+            codes.append(collections.index(collection))
+            ids.append(str(doc_id))
+            texts.append(text)
+
+        started = time.perf_counter()
+        vectors = embed_texts(texts, dim)
+        clusters = int(min(1024, max(1, np.sqrt(len(vectors))))) if len(vectors) >= 256 else 1
+        if clusters > 1:
+            centroids = _spherical_kmeans(vectors, clusters)
+            assignment = _nearest(vectors, centroids)
+        else:
+            centroids = np.zeros((1, dim), np.float32)
+            assignment = np.zeros(len(vectors), np.int64)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=clusters))]).astype(np.int64)
+        metadata = {
+            'rows': len(texts),
+            'dim': dim,
+            'clusters': clusters,
+            'collections': {c: codes.count(i) for i, c in enumerate(collections)},
+            'built_at': built_at.isoformat(),
+            'build_seconds': round(time.perf_counter() - started, 2)
+        }
+        return cls(vectors[order], centroids, offsets, np.asarray(codes, np.int8)[order],
+                   np.asarray(ids)[order] if ids else np.zeros(0, '<U1'), collections, metadata)
+
+    def search(self, query: str, k: int = 20, collections: Optional[Iterable[str]] = None,
+               probes: int = DEFAULT_PROBES, min_score: float = MIN_SCORE) -> List[SearchHit]:
+        """Closest rows to the query text, best first"""
+        vector = embed_texts([query], self.vectors.shape[1] if len(self) else EMBEDDING_DIM)[0]
+        if not len(self) or not vector.any():
+            return []
+        probed = np.argsort(self.centroids @ vector)[::-1][:probes]
+        spans = [(self.offsets[c], self.offsets[c + 1]) for c in probed if self.offsets[c + 1] > self.offsets[c]]
+        rows = np.concatenate([np.arange(start, end) for start, end in spans])
+        scores = np.concatenate([self.vectors[start:end] @ vector for start, end in spans])
+
+        keep = scores >= min_score
+        if collections is not None:
+            wanted = [self.collections.index(c) for c in collections if c in self.collections]
+            keep &= np.isin(self.codes[rows], wanted)
+        rows, scores = rows[keep], scores[keep]
+        if len(rows) > k:
+            top = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[top], scores[top]
+        best = np.argsort(-scores, kind='stable')
+        return [SearchHit(self.collections[self.codes[r]], str(self.ids[r]), float(s))
+                for r, s in zip(rows[best], scores[best])]
+
+    def save(self, directory: str = DEFAULT_INDEX_DIR) -> str:
+        """
+        Write a new build next to the current one and switch CURRENT to it.
+
+        Workers still mapping the previous build keep reading it; older builds
+        are removed.
+        """
+        build = datetime.utcnow().strftime('%Y%m%d%H%M%S') + f"-{os.getpid()}"
+        path = os.path.join(directory, build)
+        os.makedirs(path, exist_ok=True)
+        for name in ('vectors', 'centroids', 'offsets', 'codes', 'ids'):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name), allow_pickle=False)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({**self.metadata, 'collection_names': self.collections}, f)
+
+        previous = _current_build(directory)
+        temp_pointer = os.path.join(directory, f"CURRENT.{os.getpid()}.tmp")
+        with open(temp_pointer, 'w') as f:
+            f.write(build)
+        os.replace(temp_pointer, os.path.join(directory, 'CURRENT'))
+        for name in os.listdir(directory):
+            if name not in (build, previous) and os.path.isdir(os.path.join(directory, name)):
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+        return path
+
+    @classmethod
+    def load(cls, directory: str = DEFAULT_INDEX_DIR) -> 'SemanticIndex':
+        build = _current_build(directory)
+        if build is None:
+            raise FileNotFoundError(f"No semantic index at {directory}")
+        path = os.path.join(directory, build)
+        with open(os.path.join(path, 'meta.json')) as f:
+            metadata = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r', allow_pickle=False)
+                  for name in ('vectors', 'ids', 'codes')}
+        # The small arrays are read on every query, so they live in memory
+        centroids = np.load(os.path.join(path, 'centroids.npy'))
+        offsets = np.load(os.path.join(path, 'offsets.npy'))
+        return cls(arrays['vectors'], centroids, offsets, arrays['codes'], arrays['ids'],
+                   metadata.pop('collection_names'), metadata)
+
+
+def _current_build(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, 'CURRENT')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# ============================================================================
+# BUILDING AND LOOKUP
+# ============================================================================
+
+def records_from_db(db, fields: Dict[str, Sequence[str]] = None) -> Iterable[Tuple[str, str, str]]:
+    """(collection, _id, text) for every document, reading only the indexed fields"""
+    for collection, names in (fields or INDEXED_FIELDS).items():
+        projection = {name: 1 for name in names}
+        for doc in db[collection].find({}, projection):
+            yield collection, str(doc['_id']), document_text(doc, names)
+
+
+def build_semantic_index(db, directory: str = DEFAULT_INDEX_DIR) -> SemanticIndex:
+    """Build from MongoDB, save, and make workers reload"""
+    started = datetime.utcnow()
+    index = SemanticIndex.build(records_from_db(db), built_at=started)
+    index.save(directory)
+    logger.info(f"🔎 Built semantic index: {index.metadata['rows']} rows in {index.metadata['clusters']} clusters "
+                f"({index.metadata['build_seconds']}s) -> {directory}")
+
+    from model_registry import get_model_registry
+    get_model_registry().evict('semantic_index')
+    return index
+
+
+def load_semantic_index(directory: str = DEFAULT_INDEX_DIR) -> SemanticIndex:
+    """Registry factory; raises FileNotFoundError until an index has been built"""
+    index = SemanticIndex.load(directory)
+    logger.info(f"🔎 Loaded semantic index: {len(index)} rows, built {index.metadata.get('built_at', '?')}")
+    return index
+
+
+def get_semantic_index() -> Optional[SemanticIndex]:
+    """Shared index, or None until one has been built"""
+    try:
+        from model_registry import get_model_registry
+        return get_model_registry().get('semantic_index')
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Semantic index unavailable: {e}")
+        return None
+
+
+def document_ids(hits: Iterable[SearchHit]) -> List:
+    """MongoDB _id values for hits (ids are stored as strings)"""
+    from bson import ObjectId
+    return [ObjectId(hit.id) if ObjectId.is_valid(hit.id) else hit.id for hit in hits]
+
+
+_fresh_vectors: Dict[Tuple, Tuple[float, List[str], np.ndarray]] = {}
+_fresh_lock = threading.Lock()
+
+
+def _fresh_vectors_for(db, collection: str, since, dim: int) -> Tuple[List[str], np.ndarray]:
+    """Ids and vectors of the newest documents inserted after `since`, reused for FRESH_TTL_SECONDS"""
+    key = (getattr(db, 'name', id(db)), collection, str(since), dim)
+    with _fresh_lock:
+        cached = _fresh_vectors.get(key)
+    if cached and time.time() - cached[0] < FRESH_TTL_SECONDS:
+        return cached[1], cached[2]
+
+    names = INDEXED_FIELDS[collection]
+    docs = list(db[collection].find({'_id': {'$gt': since}}, {name: 1 for name in names})
+                .sort('_id', -1).limit(RECENT_LIMIT))
+    ids = [str(doc['_id']) for doc in docs]
+    vectors = embed_texts([document_text(doc, names) for doc in docs], dim)
+    with _fresh_lock:
+        # Entries for earlier builds of this collection are no longer asked for
+        for stale in [k for k in _fresh_vectors if k[:2] == key[:2] and k != key]:
+            del _fresh_vectors[stale]
+        _fresh_vectors[key] = (time.time(), ids, vectors)
+    return ids, vectors
+
+
+def search_fresh(db, index: SemanticIndex, query: str, k: int = 20, collections: Optional[Iterable[str]] = None,
+                 min_score: float = MIN_SCORE) -> List[SearchHit]:
+    """index.search plus documents inserted since the index was built, best first"""
+    from bson import ObjectId
+    collections = [c for c in collections if c in INDEXED_FIELDS] if collections is not None else list(INDEXED_FIELDS)
+    hits = index.search(query, k=k, collections=collections, min_score=min_score)
+    built_at = index.metadata.get('built_at')
+    vector = embed_texts([query], index.vectors.shape[1] if len(index) else EMBEDDING_DIM)[0]
+    if not built_at or not vector.any():
+        return hits
+
+    # ObjectIds carry their insert time, so the _id index finds everything newer than the build
+    since = ObjectId.from_datetime(datetime.fromisoformat(built_at))
+    for collection in collections:
+        ids, vectors = _fresh_vectors_for(db, collection, since, len(vector))
+        if not ids:
+            continue
+        scores = vectors @ vector
+        # ObjectId time has one-second resolution, so rows from the build's last second may already be hits
+        seen = {(hit.collection, hit.id) for hit in hits}
+        hits.extend(SearchHit(collection, doc_id, float(score))
+                    for doc_id, score in zip(ids, scores)
+                    if score >= min_score and (collection, doc_id) not in seen)
+    return sorted(hits, key=lambda hit: -hit.score)[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the semantic search index')
+    parser.add_argument('--mongo', action='store_true', required=True, help='index the MongoDB collections')
+    parser.add_argument('--output', default=DEFAULT_INDEX_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from mongo_client import MongoDBClient
+    client = MongoDBClient()
+    if client.db is None:
+        raise SystemExit("MongoDB is not configured (MONGODB_URI)")
+
+    index = build_semantic_index(client.db, args.output)
+    print(f"✅ {index.metadata['rows']} rows indexed ({index.metadata['collections']}), saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1174,6 +1174,10 @@ function updateStat(id, value) {
 }
 
 // ===== LOAD TRANSACTIONS WITH PAGINATION =====
+// Continuation tokens returned by /transactions, keyed by the page they open.
+// Pages reached through a token are fetched by index seek instead of skip.
+const pageCursors = {};
+
 async function loadTransactions(page = 1) {
     try {
         console.log('🔄 Loading transactions...');
@@ -1187,7 +1191,8 @@ async function loadTransactions(page = 1) {
         const dd = String(today.getDate()).padStart(2, '0');
         const dateTo = `${yyyy}-${mm}-${dd}`;
         // Fetch with pagination
-        const response = await fetch(`/transactions?page=${page}&page_size=${pageSize}&date_from=${dateFrom}&date_to=${dateTo}`);
+        const cursorParam = pageCursors[page] ? `&cursor=${encodeURIComponent(pageCursors[page])}` : '';
+        const response = await fetch(`/transactions?page=${page}&page_size=${pageSize}&date_from=${dateFrom}&date_to=${dateTo}${cursorParam}`);
         if (!response.ok) throw new Error('Failed to load transactions');
         const data = await response.json();
         if (data.success === false || (!data.transactions && !Array.isArray(data.transactions))) {
@@ -1197,6 +1202,9 @@ async function loadTransactions(page = 1) {
         filteredTransactions = [...transactions];
         currentPage = data.page || page;
         totalPages = data.total_pages || 1;
+        if (data.next_cursor) {
+            pageCursors[currentPage + 1] = data.next_cursor;
+        }
         updateTransactionCounts();
         renderTransactions();
         renderPaginationControls();
@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Local Teller API Stand-in
+Serves accounts and paginated transactions from a generated fixture set so
+sync code can be exercised and timed without real certificates or the live
+API. Optional mTLS with self-signed certificates, latency injection,
+per-client rate limits and signed webhook emission.
+
+Run standalone:
+    python teller_fake_server.py --port 8443 --mtls --latency-ms 40
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import ssl
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+INSTITUTIONS = [
+    ('chase', 'Chase'),
+    ('amex', 'American Express'),
+    ('capital_one', 'Capital One'),
+    ('bank_of_america', 'Bank of America'),
+]
+
+MERCHANTS = [
+    ('SHELL OIL', 'fuel'), ('STARBUCKS', 'dining'), ('UBER TRIP', 'transportation'),
+    ('AMAZON MKTPLACE', 'shopping'), ('DELTA AIR LINES', 'travel'), ('HILTON HOTELS', 'accommodation'),
+    ('SOUNDTRAP', 'software'), ('ADOBE CREATIVE CLD', 'software'), ('HOME DEPOT', 'home'),
+    ('KROGER', 'groceries'), ('GUITAR CENTER', 'shopping'), ('AT&T WIRELESS', 'phone'),
+]
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+def generate_fixtures(accounts: int = 3, transactions_per_account: int = 1000,
+                      days: int = 365, seed: int = 42,
+                      end_date: Optional[date] = None) -> Dict:
+    """
+    Build Teller-shaped accounts and transactions.
+
+    Transactions are returned newest first, matching the live API, with
+    amounts as strings the way Teller sends them.
+    """
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+
+    fixture_accounts = []
+    fixture_transactions = {}
+    for a in range(accounts):
+        institution_id, institution_name = INSTITUTIONS[a % len(INSTITUTIONS)]
+        account_id = f"acc_fake{a:04d}"
+        fixture_accounts.append({
+            'id': account_id,
+            'enrollment_id': f"enr_fake{a:04d}",
+            'name': f"{institution_name} Card {a + 1}",
+            'type': 'credit',
+            'subtype': 'credit_card',
+            'currency': 'USD',
+            'last_four': f"{1000 + a * 137 % 9000:04d}",
+            'status': 'open',
+            'institution': {'id': institution_id, 'name': institution_name},
+            'balance': {'available': f"{rng.uniform(500, 20000):.2f}"},
+            'links': {
+                'self': f"/accounts/{account_id}",
+                'transactions': f"/accounts/{account_id}/transactions",
+                'balances': f"/accounts/{account_id}/balances",
+            },
+        })
+
+        rows = []
+        for t in range(transactions_per_account):
+            merchant, category = rng.choice(MERCHANTS)
+            tx_date = end_date - timedelta(days=rng.randrange(days))
+            amount = -round(rng.lognormvariate(3.2, 1.0), 2)
+            rows.append({
+                'id': f"txn_{a:04d}{t:07d}",
+                'account_id': account_id,
+                'amount': f"{amount:.2f}",
+                'date': tx_date.isoformat(),
+                'description': f"{merchant} #{rng.randrange(1000, 9999)}",
+                'status': 'posted',
+                'type': 'card_payment',
+                'running_balance': None,
+                'details': {
+                    'category': category,
+                    'processing_status': 'complete',
+                    'counterparty': {'name': merchant, 'type': 'organization'},
+                },
+                'links': {'self': f"/accounts/{account_id}/transactions/txn_{a:04d}{t:07d}",
+                          'account': f"/accounts/{account_id}"},
+            })
+        rows.sort(key=lambda r: (r['date'], r['id']), reverse=True)
+        fixture_transactions[account_id] = rows
+
+    return {'accounts': fixture_accounts, 'transactions': fixture_transactions}
+
+
+# ============================================================================
+# CERTIFICATES
+# ============================================================================
+
+@dataclass
+class CertificateBundle:
+    """Self-signed CA plus server and client certificates, PEM paths on disk"""
+    directory: str
+    ca_cert: str
+    server_cert: str
+    server_key: str
+    client_cert: str
+    client_key: str
+    client_cert_b64: str
+    client_key_b64: str
+
+
+def generate_certificates(directory: Optional[str] = None, hostname: str = 'localhost') -> CertificateBundle:
+    """Create a throwaway CA and sign a server and a client certificate with it"""
+    import ipaddress
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+    directory = directory or tempfile.mkdtemp(prefix='fake_teller_certs_')
+    now = datetime.utcnow()
+
+    def _key():
+        return ec.generate_private_key(ec.SECP256R1())
+
+    def _name(common_name):
+        return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+
+    def _write(name, data):
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        os.chmod(path, 0o600)
+        return path
+
+    def _key_pem(key):
+        return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                 serialization.NoEncryption())
+
+    ca_key = _key()
+    ca_cert = (x509.CertificateBuilder()
+               .subject_name(_name('Fake Teller CA')).issuer_name(_name('Fake Teller CA'))
+               .public_key(ca_key.public_key()).serial_number(x509.random_serial_number())
+               .not_valid_before(now - timedelta(minutes=5)).not_valid_after(now + timedelta(days=30))
+               .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+               .sign(ca_key, hashes.SHA256()))
+
+    def _leaf(common_name, usage, san=None):
+        key = _key()
+        builder = (x509.CertificateBuilder()
+                   .subject_name(_name(common_name)).issuer_name(ca_cert.subject)
+                   .public_key(key.public_key()).serial_number(x509.random_serial_number())
+                   .not_valid_before(now - timedelta(minutes=5)).not_valid_after(now + timedelta(days=30))
+                   .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+                   .add_extension(x509.ExtendedKeyUsage([usage]), critical=False))
+        if san:
+            builder = builder.add_extension(x509.SubjectAlternativeName(san), critical=False)
+        return key, builder.sign(ca_key, hashes.SHA256())
+
+    server_key, server_cert = _leaf(hostname, ExtendedKeyUsageOID.SERVER_AUTH, [
+        x509.DNSName(hostname), x509.IPAddress(ipaddress.ip_address('127.0.0.1'))
+    ])
+    client_key, client_cert = _leaf('fake-teller-client', ExtendedKeyUsageOID.CLIENT_AUTH)
+
+    client_cert_pem = client_cert.public_bytes(serialization.Encoding.PEM)
+    client_key_pem = _key_pem(client_key)
+
+    return CertificateBundle(
+        directory=directory,
+        ca_cert=_write('ca.pem', ca_cert.public_bytes(serialization.Encoding.PEM)),
+        server_cert=_write('server.pem', server_cert.public_bytes(serialization.Encoding.PEM)),
+        server_key=_write('server_key.pem', _key_pem(server_key)),
+        client_cert=_write('client.pem', client_cert_pem),
+        client_key=_write('client_key.pem', client_key_pem),
+        # SafeTellerClient reads base64-encoded PEM files
+        client_cert_b64=_write('client.b64', base64.b64encode(client_cert_pem)),
+        client_key_b64=_write('client_key.b64', base64.b64encode(client_key_pem)),
+    )
+
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+@dataclass
+class FakeTellerConfig:
+    """Behaviour knobs for the stand-in"""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rate_limit_per_second: float = 0.0  # 0 disables rate limiting
+    rate_limit_burst: int = 20
+    access_tokens: List[str] = field(default_factory=list)  # empty accepts any token
+    webhook_url: Optional[str] = None
+    signing_secret: Optional[str] = None
+    mtls: bool = False
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume a token; returns 0 on success or seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FakeTellerServer:
+    """Threaded HTTP(S) server speaking the subset of the Teller API the app uses"""
+
+    def __init__(self, fixtures: Optional[Dict] = None, config: Optional[FakeTellerConfig] = None,
+                 host: str = '127.0.0.1', port: int = 0, certificates: Optional[CertificateBundle] = None):
+        self.fixtures = fixtures or generate_fixtures()
+        self.config = config or FakeTellerConfig()
+        self.host = host
+        self.port = port
+        self.certificates = certificates
+        if self.config.mtls and not self.certificates:
+            self.certificates = generate_certificates()
+
+        self.stats = Counter()
+        self.webhooks_sent: List[Dict] = []
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+        self._index = {
+            account_id: {tx['id']: i for i, tx in enumerate(rows)}
+            for account_id, rows in self.fixtures['transactions'].items()
+        }
+
+    # -- lifecycle ---------------------------------------------------------
+
+    @property
+    def url(self) -> str:
+        scheme = 'https' if self.certificates else 'http'
+        host = 'localhost' if self.certificates else self.host
+        return f"{scheme}://{host}:{self.port}"
+
+    def start(self) -> 'FakeTellerServer':
+        handler = type('Handler', (_FakeTellerHandler,), {'server_ref': self})
+        self._httpd = ThreadingHTTPServer((self.host, self.port), handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+
+        if self.certificates:
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(self.certificates.server_cert, self.certificates.server_key)
+            if self.config.mtls:
+                context.load_verify_locations(self.certificates.ca_cert)
+                context.verify_mode = ssl.CERT_REQUIRED
+            self._httpd.socket = context.wrap_socket(self._httpd.socket, server_side=True)
+
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-teller', daemon=True)
+        self._thread.start()
+        logger.info(f"🏦 Fake Teller API listening on {self.url} (mTLS={'on' if self.config.mtls else 'off'})")
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats.clear()
+
+    # -- behaviour ---------------------------------------------------------
+
+    def _check_rate_limit(self, client_key: str) -> float:
+        if not self.config.rate_limit_per_second:
+            return 0.0
+        with self._lock:
+            bucket = self._buckets.get(client_key)
+            if bucket is None:
+                bucket = self._buckets[client_key] = _TokenBucket(
+                    self.config.rate_limit_per_second, self.config.rate_limit_burst)
+            return bucket.take()
+
+    def _inject_latency(self):
+        delay = self.config.latency_ms
+        if self.config.jitter_ms:
+            delay += random.uniform(0, self.config.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def list_transactions(self, account_id: str, params: Dict[str, str]) -> List[Dict]:
+        """Teller semantics: newest first, `from_id` exclusive, `count` page size"""
+        rows = self.fixtures['transactions'][account_id]
+        start = 0
+        from_id = params.get('from_id')
+        if from_id:
+            start = self._index[account_id].get(from_id, len(rows) - 1) + 1
+
+        start_date = params.get('start_date') or params.get('from_date') or params.get('from')
+        end_date = params.get('end_date') or params.get('to_date') or params.get('to')
+        count = int(params['count']) if params.get('count') else None
+
+        page = []
+        for tx in rows[start:]:
+            if end_date and tx['date'] > end_date:
+                continue
+            if start_date and tx['date'] < start_date:
+                break
+            page.append(tx)
+            if count and len(page) >= count:
+                break
+        return page
+
+    def add_transactions(self, account_id: str, count: int = 1, seed: Optional[int] = None) -> List[Dict]:
+        """Post new transactions to an account, newest first, as a bank feed would"""
+        new_rows = generate_fixtures(accounts=1, transactions_per_account=count, days=1,
+                                     seed=seed if seed is not None else random.randrange(1 << 30))
+        rows = self.fixtures['transactions'][account_id]
+        added = []
+        for tx in new_rows['transactions']['acc_fake0000']:
+            tx = {**tx, 'id': f"txn_live{len(rows) + len(added):08d}", 'account_id': account_id}
+            added.append(tx)
+        with self._lock:
+            rows[:0] = added
+            self._index[account_id] = {tx['id']: i for i, tx in enumerate(rows)}
+        return added
+
+    def sign(self, body: bytes) -> str:
+        """Same scheme the /api/banking/webhook receiver verifies"""
+        return hmac.new(self.config.signing_secret.encode(), body, hashlib.sha256).hexdigest()
+
+    def emit_webhook(self, event_type: str, payload: Dict) -> Optional[int]:
+        """POST a signed event to the configured webhook URL; returns the status code"""
+        if not self.config.webhook_url:
+            return None
+        body = json.dumps({
+            'id': f"wh_{int(time.time() * 1000)}_{len(self.webhooks_sent)}",
+            'type': event_type,
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'data': payload,
+        }).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.config.signing_secret:
+            headers['Teller-Signature'] = self.sign(body)
+        try:
+            response = requests.post(self.config.webhook_url, data=body, headers=headers, timeout=10)
+            status = response.status_code
+        except requests.RequestException as e:
+            logger.warning(f"Webhook delivery failed: {e}")
+            status = 0
+        self.webhooks_sent.append({'type': event_type, 'status': status})
+        with self._lock:
+            self.stats['webhooks'] += 1
+        return status
+
+    def post_and_notify(self, account_id: str, count: int = 1) -> List[Dict]:
+        """Add transactions and emit one transaction.posted webhook per row"""
+        added = self.add_transactions(account_id, count)
+        for tx in added:
+            self.emit_webhook('transaction.posted', tx)
+        return added
+
+
+class _FakeTellerHandler(BaseHTTPRequestHandler):
+    server_ref: FakeTellerServer = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug("fake-teller: " + format % args)
+
+    def _send(self, status: int, payload, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server_ref._lock:
+            self.server_ref.stats['bytes_sent'] += len(body)
+
+    def _access_token(self) -> Optional[str]:
+        auth = self.headers.get('Authorization', '')
+        if auth.startswith('Bearer '):
+            return auth[7:]
+        if auth.startswith('Basic '):
+            try:
+                return base64.b64decode(auth[6:]).decode('utf-8').split(':', 1)[0]
+            except Exception:
+                return None
+        return None
+
+    def _authorized(self) -> bool:
+        tokens = self.server_ref.config.access_tokens
+        return not tokens or self._access_token() in tokens
+
+    def do_GET(self):
+        server = self.server_ref
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split('/') if p]
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+
+        with server._lock:
+            server.stats['requests'] += 1
+
+        if parts == ['_fake', 'stats']:
+            return self._send(200, dict(server.stats))
+
+        client_key = self._access_token() or self.client_address[0]
+        retry_after = server._check_rate_limit(client_key)
+        if retry_after:
+            with server._lock:
+                server.stats['rate_limited'] += 1
+            return self._send(429, {'error': {'code': 'too_many_requests', 'message': 'Rate limit exceeded'}},
+                              {'Retry-After': f"{retry_after:.3f}"})
+
+        server._inject_latency()
+
+        if parts == ['health']:
+            return self._send(200, {'status': 'ok'})
+        if not self._authorized():
+            return self._send(401, {'error': {'code': 'unauthorized', 'message': 'Invalid access token'}})
+
+        accounts = {a['id']: a for a in server.fixtures['accounts']}
+        if parts == ['accounts']:
+            with server._lock:
+                server.stats['accounts_calls'] += 1
+            return self._send(200, server.fixtures['accounts'])
+        if parts == ['identity']:
+            return self._send(200, [{'account': a, 'owners': [{'type': 'person', 'names': [
+                {'type': 'name', 'data': 'Fake Account Holder'}]}]} for a in server.fixtures['accounts']])
+        if len(parts) >= 2 and parts[0] == 'accounts':
+            account = accounts.get(parts[1])
+            if account is None:
+                return self._send(404, {'error': {'code': 'not_found', 'message': 'Account not found'}})
+            if len(parts) == 2:
+                return self._send(200, account)
+            if parts[2:] == ['balances']:
+                return self._send(200, {'account_id': account['id'], 'available': account['balance']['available'],
+                                        'ledger': account['balance']['available']})
+            if parts[2:] == ['transactions']:
+                page = server.list_transactions(account['id'], params)
+                with server._lock:
+                    server.stats['transaction_pages'] += 1
+                    server.stats['transactions_served'] += len(page)
+                return self._send(200, page)
+        return self._send(404, {'error': {'code': 'not_found', 'message': parsed.path}})
+
+    def do_POST(self):
+        server = self.server_ref
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+        if parts == ['_fake', 'post-transactions']:
+            account_id = payload.get('account_id') or server.fixtures['accounts'][0]['id']
+            added = server.post_and_notify(account_id, int(payload.get('count', 1)))
+            return self._send(200, {'added': [tx['id'] for tx in added]})
+        return self._send(404, {'error': {'code': 'not_found', 'message': self.path}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local Teller API stand-in')
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--transactions', type=int, default=1000, help='transactions per account')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests per second per client')
+    parser.add_argument('--mtls', action='store_true')
+    parser.add_argument('--webhook-url')
+    parser.add_argument('--signing-secret')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeTellerServer(
+        generate_fixtures(args.accounts, args.transactions),
+        FakeTellerConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                         rate_limit_per_second=args.rate_limit, mtls=args.mtls,
+                         webhook_url=args.webhook_url, signing_secret=args.signing_secret),
+        port=args.port,
+    ).start()
+
+    if server.certificates:
+        print(f"CA certificate:     {server.certificates.ca_cert}")
+        print(f"Client certificate: {server.certificates.client_cert}")
+        print(f"Client key:         {server.certificates.client_key}")
+    print(f"TELLER_API_URL={server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
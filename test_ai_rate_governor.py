@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared AI rate governor
+Runs several governors against one backend to stand in for separate workers;
+a fake clock keeps the pacing checks exact and instant
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_rate_governor import EXHAUSTED_BACKOFF, MemoryQuotaBackend, RateGovernor
+
+START = 1_790_000_000.0  # 2026-09-21 14:13 UTC
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = START
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(round(seconds, 6))
+        self.now += seconds
+
+
+def _governor(clock, backend, **kwargs):
+    options = dict(daily_limit=100, monthly_limit=1000, rate=2.0, burst=3, lease=2)
+    options.update(kwargs)
+    return RateGovernor('hf', backend=backend, clock=clock, sleep=clock.sleep, **options)
+
+
+def test_bursts_then_paces_at_the_refill_rate():
+    clock = FakeClock()
+    governor = _governor(clock, MemoryQuotaBackend())
+    assert all(governor.acquire() for _ in range(7))
+    # Three calls back to back, then one every 0.5s
+    assert clock.slept == [0.5, 0.5, 0.5, 0.5]
+    assert governor.stats['leases'] == 4
+
+    clock.now += 10  # bucket refills while idle
+    slept = len(clock.slept)
+    assert governor.acquire() and governor.acquire()
+    assert len(clock.slept) == slept
+
+
+def test_workers_share_one_quota_and_bucket():
+    clock, backend = FakeClock(), MemoryQuotaBackend()
+    workers = [_governor(clock, backend, daily_limit=7, rate=0) for _ in range(3)]
+    granted = [sum(worker.acquire() for _ in range(5)) for worker in workers]
+    # The first worker still holds one leased call when the pool runs dry
+    assert granted == [5, 1, 0]
+    assert not workers[2].available()
+
+    # Unused leased calls go back to the pool for the others
+    workers[0].close()
+    assert backend.usage('hf', clock())['day_count'] == 6
+    clock.now += EXHAUSTED_BACKOFF
+    assert workers[2].acquire() and not workers[2].acquire()
+
+    clock.now += 24 * 3600
+    assert workers[1].acquire()
+    usage = workers[1].usage()
+    assert (usage['day_count'], usage['month_count'], usage['leased_unused']) == (2, 9, 1)
+
+    clock, backend = FakeClock(), MemoryQuotaBackend()
+    first, second = _governor(clock, backend, burst=1), _governor(clock, backend, burst=1)
+    for _ in range(3):
+        assert first.acquire() and second.acquire()
+    # Paced together at 2 calls/s, not 2 calls/s each
+    assert clock.now - START >= 2.5
+
+
+def test_long_waits_and_dead_backends_fall_back():
+    clock = FakeClock()
+    governor = _governor(clock, MemoryQuotaBackend(), rate=0.1, burst=1, lease=1, max_wait=5)
+    assert governor.acquire()
+    assert not governor.acquire() and clock.slept == []
+    assert governor.acquire(max_wait=20) and clock.slept == [10.0]
+
+    class Unreachable:
+        def lease(self, *args):
+            raise ConnectionError("no route to mongo")
+
+    governor = _governor(clock, Unreachable())
+    assert governor.acquire()
+    assert isinstance(governor.backend, MemoryQuotaBackend)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing AI Rate Governor")
+    print("=" * 60)
+    test_bursts_then_paces_at_the_refill_rate()
+    test_workers_share_one_quota_and_bucket()
+    test_long_waits_and_dead_backends_fall_back()
+    print("✅ All AI rate governor tests passed")
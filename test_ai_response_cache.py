@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for the AI response cache
+Repeat merchants must be answered from the cache instead of the model
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_response_cache import (
+    ResponseCache, configure_response_cache, get_response_cache, normalize_merchant, response_fingerprint
+)
+from merchant_category_table import configure_merchant_table
+
+
+def test_fingerprint_ignores_store_numbers_and_small_amount_changes():
+    coffee = response_fingerprint('SQ *BLUE BOTTLE #4410', 4.85, ['meeting'])
+    assert coffee == response_fingerprint('Blue Bottle 9921', '5.10', ['MEETING'])
+    assert coffee != response_fingerprint('Blue Bottle', 48.50, ['meeting'])
+    assert coffee != response_fingerprint('Blue Bottle', 4.85, [])
+    assert response_fingerprint('ADOBE *CREATIVE CLOUD', 54.99) == response_fingerprint('Adobe Creative Cloud', 54.99)
+
+
+def test_processor_prefixes_are_anchored_and_placeholders_are_not_cached():
+    assert normalize_merchant('SPOTIFY USA') == 'SPOTIFY USA'
+    assert normalize_merchant('POSTMATES') == 'POSTMATES'
+    assert normalize_merchant('SP * GYMSHARK') == 'GYMSHARK'
+    assert normalize_merchant('TST* HATTIE BS') == 'HATTIE BS'
+    assert normalize_merchant('PAYPAL *ADOBE') == 'ADOBE'
+    for merchant in (None, '', 'Unknown', 'UNKNOWN MERCHANT', 'N/A'):
+        assert response_fingerprint(merchant, 25.0) is None
+
+
+def test_entries_expire_and_least_recently_used_go_first():
+    now = [1000.0]
+    cache = ResponseCache(ttl=60, memory_entries=2, clock=lambda: now[0])
+    cache.put('category:a', {'category': 'A'})
+    cache.put('category:b', {'category': 'B'})
+    assert cache.get('category:a') == {'category': 'A'}
+    cache.put('category:c', {'category': 'C'})
+    assert cache.get('category:b') is None  # a was used more recently
+    assert cache.get('category:a')['category'] == 'A'
+
+    now[0] += 61
+    assert cache.get('category:a') is None
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 2
+
+
+def test_repeat_receipts_skip_the_model():
+    os.environ.setdefault('HUGGINGFACE_API_KEY', 'test-key')
+    from huggingface_client import HuggingFaceClient
+
+    configure_response_cache()
+    # Keep the learned merchant table out of the way so every call reaches the cache
+    configure_merchant_table(min_confidence=1.1)
+    client = HuggingFaceClient()
+    calls = []
+
+    def fake_model(url, payload, timeout=None):
+        calls.append(url)
+        if 'Qwen' in url:
+            return [{'generated_text': 'Business - subscription for design work'}]
+        return [{'generated_text': 'Software and Technology'}]
+    client._make_request_with_limits = fake_model
+
+    first = client.categorize_expense({'merchant': 'ADOBE *CREATIVE CLOUD', 'total_amount': 54.99})
+    assert first.category == 'Software and Technology' and len(calls) == 2
+
+    # Next month's charge, and the full analysis path, never reach the model
+    again = client.categorize_expense({'merchant': 'Adobe Creative Cloud', 'total_amount': 54.99})
+    analysis = client.analyze_receipt_intelligence({'merchant': 'ADOBE CREATIVE CLOUD', 'total_amount': 55.49})
+    assert len(calls) == 2
+    assert again == first and analysis.expense_category == first
+
+    client.categorize_expense({'merchant': 'Adobe Creative Cloud', 'total_amount': 899.00})
+    assert len(calls) == 4
+
+    # Rule-based answers are not cached, so the model is asked once it is back
+    client._make_request_with_limits = lambda url, payload, timeout=None: None
+    client.categorize_expense({'merchant': 'Staples', 'total_amount': 20.0})
+    client._make_request_with_limits = fake_model
+    client.categorize_expense({'merchant': 'Staples', 'total_amount': 20.0})
+    assert len(calls) == 6
+    assert get_response_cache().stats()['hits'] == 4
+
+
+if __name__ == "__main__":
+    print("🧪 Testing AI Response Cache")
+    print("=" * 60)
+    test_fingerprint_ignores_store_numbers_and_small_amount_changes()
+    test_processor_prefixes_are_anchored_and_placeholders_are_not_cached()
+    test_entries_expire_and_least_recently_used_go_first()
+    test_repeat_receipts_skip_the_model()
+    print("✅ All AI response cache tests passed")
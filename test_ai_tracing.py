@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for AI call tracing
+Every model call must leave a record with its latency, size, cache use,
+outcome and cost, and per-model percentiles must survive the rollup
+"""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_tracing import CallTrace, ModelCallTracer, configure_ai_tracer, get_tracer, record_cache_lookup, trace_call
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRollups:
+    """ai_call_rollups: applies the $inc / $setOnInsert upserts the tracer sends"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def bulk_write(self, operations, ordered=True):
+        for op in operations:
+            doc = self.docs.setdefault(op._filter['_id'], dict(op._doc['$setOnInsert']))
+            for path, value in op._doc['$inc'].items():
+                *parents, leaf = path.split('.')
+                target = doc
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                target[leaf] = target.get(leaf, 0) + value
+
+    def find(self, query):
+        return [doc for doc in self.docs.values() if doc['hour'] >= query['hour']['$gte']]
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b'[{"generated_text": "Software and Technology"}]'):
+        self.status_code = status_code
+        self.content = body
+        self.text = body.decode('utf-8')
+        self.headers = {}
+
+    def json(self):
+        import json
+        return json.loads(self.content)
+
+
+def test_calls_are_traced_with_outcome_size_and_cache_use():
+    configure_ai_tracer()
+    with trace_call('huggingface_client', 'facebook/bart-large-mnli', 'categorize', request_bytes=120) as call:
+        call.response(FakeResponse(200))
+    with trace_call('huggingface_client', 'facebook/bart-large-mnli', 'categorize') as call:
+        call.response(FakeResponse(429, b''))
+    try:
+        with trace_call('huggingface_client', 'facebook/bart-large-mnli', 'categorize'):
+            raise TimeoutError('read timed out')
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError('trace_call must re-raise')
+    record_cache_lookup('huggingface_client', 'ai_response_cache', True, 'categorize')
+    record_cache_lookup('huggingface_client', 'ai_response_cache', False, 'categorize')
+
+    rows = {row['model']: row for row in get_tracer().metrics()}
+    model = rows['facebook/bart-large-mnli']
+    assert model['calls'] == 3 and model['errors'] == 2
+    assert model['outcomes'] == {'ok': 1, 'rate_limited': 1, 'timeout': 1}
+    assert model['request_bytes'] == 120 and model['response_bytes'] == 47 and model['cost_units'] == 3
+    cache = rows['ai_response_cache']
+    assert cache['cache_hit_rate'] == 0.5 and cache['cost_units'] == 0
+
+
+def test_percentiles_per_model_survive_the_rollup_across_workers():
+    clock, rollups = FakeClock(), FakeRollups()
+    db = SimpleNamespace(ai_call_rollups=rollups)
+    first = ModelCallTracer(db=db, flush_interval=3600, clock=clock)
+    second = ModelCallTracer(db=db, flush_interval=3600, clock=clock)
+
+    for _ in range(40):
+        first.record(CallTrace('expense_categorizer', 'deberta', latency=0.02))
+    first.record(CallTrace('expense_categorizer', 'deberta', latency=0.02, outcome='http_500'))
+    first.flush()
+    for _ in range(9):
+        second.record(CallTrace('expense_categorizer', 'deberta', latency=0.8))
+    second.record(CallTrace('extraction_cascade', 'cached_ocr', cost_units=0.0, cache='hit', latency=0.001))
+
+    recent = {row['model']: row for row in first.metrics()}['deberta']
+    assert recent['calls'] == 41 and recent['p50_ms'] == 20.0 and recent['p95_ms'] == 20.0
+
+    rolled = {row['model']: row for row in second.rollup(hours=1)}
+    deberta = rolled['deberta']
+    assert deberta['calls'] == 50 and deberta['errors'] == 1
+    assert deberta['p50_ms'] == 25.0 and deberta['p95_ms'] == 1000.0  # upper edges of the histogram buckets
+    assert deberta['cost_units'] == 50
+    assert rolled['cached_ocr']['cache_hit_rate'] == 1.0
+    assert len(rollups.docs) == 2  # one document per client/model/hour, not per call
+
+
+def test_clients_trace_hosted_calls_and_cascade_tiers():
+    os.environ.setdefault('HUGGINGFACE_API_KEY', 'test-key')
+    import ai_rate_governor
+    import requests
+    from ai_rate_governor import RateGovernor
+    from extraction_cascade import ExtractionCascade, Tier
+    from huggingface_client import HuggingFaceClient
+
+    ai_rate_governor._governors['huggingface'] = RateGovernor('huggingface', 1000, 10000, rate=0)
+    configure_ai_tracer()
+    client = HuggingFaceClient()
+    client.retry_delay = 0
+    answers = [FakeResponse(429, b''), FakeResponse(200)]
+    original_post = requests.post
+    requests.post = lambda *args, **kwargs: answers.pop(0)
+    try:
+        result = client._make_request_with_limits(
+            'https://api-inference.huggingface.co/models/facebook/bart-large-mnli', {'inputs': 'Adobe'})
+    finally:
+        requests.post = original_post
+    assert result == [{'generated_text': 'Software and Technology'}]
+
+    def broken(request):
+        raise RuntimeError('model not loaded')
+    cascade = ExtractionCascade(tiers=[Tier('cached_ocr', 2, lambda request: None),
+                                       Tier('local_model', 50, broken)])
+    cascade.run(email={'subject': 'Receipt'})
+
+    calls = [(c['model'], c['outcome'], c['cache']) for c in get_tracer().calls]
+    assert calls == [('facebook/bart-large-mnli', 'rate_limited', None), ('facebook/bart-large-mnli', 'ok', None),
+                     ('cached_ocr', 'empty', 'miss'), ('local_model', 'error', None)]
+
+
+if __name__ == "__main__":
+    print("🧪 Testing AI Call Tracing")
+    print("=" * 60)
+    test_calls_are_traced_with_outcome_size_and_cache_use()
+    test_percentiles_per_model_survive_the_rollup_across_workers()
+    test_clients_trace_hosted_calls_and_cascade_tiers()
+    print("✅ All AI call tracing tests passed")
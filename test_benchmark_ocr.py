@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the OCR benchmark harness
+Renders a small corpus into a temp directory and scores a couple of engines
+"""
+
+import json
+import os
+import sys
+import tempfile
+from datetime import date
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_ocr import (
+    CORPUS_DIR, KINDS, compare_reports, generate_corpus, load_corpus, normalize_date, run_benchmark, score_fields
+)
+
+
+def test_checked_in_corpus_matches_manifest():
+    manifest = load_corpus(CORPUS_DIR)
+    assert {doc['kind'] for doc in manifest['documents']} == set(KINDS)
+    for doc in manifest['documents']:
+        assert os.path.exists(doc['path']), doc['file']
+        assert set(doc['truth']) == {'merchant', 'amount', 'date'}
+    assert any(doc['pages'] > 1 for doc in manifest['documents'])
+
+
+def test_generation_is_reproducible():
+    first, second = tempfile.mkdtemp(), tempfile.mkdtemp()
+    generate_corpus(first, per_kind=1, reference_date=date(2026, 3, 1))
+    generate_corpus(second, per_kind=1, reference_date=date(2026, 3, 1))
+    for name in sorted(os.listdir(first)):
+        with open(os.path.join(first, name), 'rb') as a, open(os.path.join(second, name), 'rb') as b:
+            assert a.read() == b.read(), name
+
+
+def test_scoring_normalizes_engine_output():
+    truth = {'merchant': 'HOME DEPOT', 'amount': 41.07, 'date': '2026-05-02'}
+    assert score_fields(truth, {'merchant': 'The Home Depot #4410', 'amount': '41.07', 'date': '05/02/2026'}) == \
+        {'merchant': True, 'amount': True, 'date': True}
+    assert score_fields(truth, {'merchant': 'HD', 'amount': 41.7, 'date': 'Sat, 02 May 2026 21:05:00 -0000'}) == \
+        {'merchant': False, 'amount': False, 'date': True}
+    assert normalize_date('2026-05-02T10:00:00') == '2026-05-02'
+    assert normalize_date('not a date') is None
+
+
+def test_report_covers_engines_and_diffs():
+    directory = tempfile.mkdtemp()
+    generate_corpus(directory, per_kind=2)
+    report = run_benchmark(['EnhancedReceiptProcessor', 'cascade'], repeat=1, directory=directory,
+                           kinds=['pdf_text'])
+    json.dumps(report)
+
+    assert report['corpus']['documents'] == 2
+    processor, cascade = report['results']
+    assert processor['engine'] == 'EnhancedReceiptProcessor'
+    assert processor['pages_per_second'] > 0 and processor['p95_ms'] >= processor['p50_ms']
+    # Informative email plus text-layer PDF: the cascade gets the total and date right
+    assert cascade['accuracy']['amount'] == 1.0 and cascade['accuracy']['date'] == 1.0
+    assert sum(cascade['answered_by'].values()) == 2
+
+    deltas = compare_reports(report, report)
+    assert [d['engine'] for d in deltas] == ['EnhancedReceiptProcessor', 'cascade']
+    assert deltas[0]['all_fields'] == 0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing OCR Benchmark Harness")
+    print("=" * 60)
+    test_checked_in_corpus_matches_manifest()
+    test_generation_is_reproducible()
+    test_scoring_normalizes_engine_output()
+    test_report_covers_engines_and_diffs()
+    print("✅ All OCR benchmark tests passed")
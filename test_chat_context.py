@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test script for the batched chat context builder
+Runs the facet pipelines against a small in-memory evaluator of the
+aggregation stages and operators they use
+"""
+
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from chat_context import ChatContextBuilder
+
+NOW = datetime.utcnow()
+
+
+def _value(doc, expr):
+    if isinstance(expr, str) and expr.startswith('$'):
+        return doc.get(expr[1:])
+    if isinstance(expr, dict) and len(expr) > 1:
+        return {key: _value(doc, arg) for key, arg in expr.items()}
+    if isinstance(expr, dict):
+        (op, args), = expr.items()
+        if op == '$abs':
+            return abs(_value(doc, args))
+        values = [_value(doc, arg) for arg in args] if isinstance(args, list) else None
+        if op == '$cond':
+            return values[1] if values[0] else values[2]
+        if op == '$and':
+            return all(values)
+        if op == '$not':
+            return not values[0]
+        if op == '$eq':
+            return values[0] == values[1]
+        if op == '$lt':
+            return values[0] is not None and values[0] < values[1]
+        if op == '$in':
+            return values[0] in values[1]
+    return expr
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        value = doc.get(field)
+        if not isinstance(cond, dict):
+            if value != cond:
+                return False
+            continue
+        if '$gte' in cond and not (value is not None and value >= cond['$gte']):
+            return False
+        if '$lt' in cond and not (value is not None and value < cond['$lt']):
+            return False
+    return True
+
+
+def _run(docs, pipeline):
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == '$match':
+            docs = [d for d in docs if _matches(d, spec)]
+        elif op == '$facet':
+            docs = [{name: _run(docs, sub) for name, sub in spec.items()}]
+        elif op == '$count':
+            docs = [{spec: len(docs)}] if docs else []
+        elif op == '$group':
+            groups = {}
+            for doc in docs:
+                key = _value(doc, spec['_id'])
+                group = groups.setdefault(repr(key), {'_id': key})
+                for name, acc in spec.items():
+                    if name != '_id':
+                        group[name] = group.get(name, 0) + _value(doc, acc['$sum'])
+            docs = list(groups.values())
+    return docs
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.aggregations = 0
+        self.threads = set()
+
+    def aggregate(self, pipeline):
+        self.aggregations += 1
+        self.threads.add(threading.get_ident())
+        return iter(_run(self.docs, pipeline))
+
+
+class FakeDB:
+    name = 'chat_test'
+
+    def __init__(self, transactions, receipts):
+        self.bank_transactions = FakeCollection(transactions)
+        self.receipts = FakeCollection(receipts)
+
+
+class FakeMongo:
+    connected = True
+
+    def __init__(self, db):
+        self.db = db
+
+
+def _tx(days_ago, amount, business_type, category, matched=False):
+    return {'date': NOW - timedelta(days=days_ago), 'amount': amount, 'business_type': business_type,
+            'category': category, 'receipt_matched': matched}
+
+
+def _fixture():
+    transactions = [
+        _tx(2, -40.0, 'Down Home', 'Meals', matched=True),
+        _tx(5, -60.0, 'Down Home', 'Software'),
+        _tx(12, -200.0, 'Music City Rodeo', 'Venue'),
+        _tx(20, -15.0, 'Personal', None),
+        _tx(25, 500.0, 'Down Home', 'Income', matched=True),
+        _tx(45, -100.0, 'Down Home', 'Software'),
+        _tx(90, -30.0, 'Music City Rodeo', 'Meals'),
+    ]
+    receipts = [{'date': NOW - timedelta(days=3)}, {'date': NOW - timedelta(days=70)}]
+    return FakeDB(transactions, receipts)
+
+
+def test_context_covers_every_chat_aggregate():
+    context = ChatContextBuilder().build(_fixture())
+    assert (context.transaction_count, context.matched_count) == (7, 2)
+    assert (context.business_total, context.personal_total) == (430.0, 15.0)
+    assert context.unmatched_business_count == 4
+    assert (context.month_transaction_count, context.month_matched_count) == (5, 2)
+    assert context.month_total == 315.0 and context.previous_month_total == 100.0
+    assert (context.week_total, context.week_count) == (100.0, 2)
+    assert (context.receipt_count, context.month_receipt_count) == (2, 1)
+    assert context.month_totals_by(1, 'Down Home') == {'Meals': {'total': 40.0, 'count': 1},
+                                                       'Software': {'total': 60.0, 'count': 1}}
+
+
+def test_chat_helpers_share_one_memoized_build():
+    import enhanced_chat_api
+    import chat_context
+
+    db = _fixture()
+    mongo = FakeMongo(db)
+    now = [0.0]
+    chat_context._builder = ChatContextBuilder(ttl=60, clock=lambda: now[0])
+
+    financial = enhanced_chat_api._get_financial_context(mongo)
+    assert financial['business_breakdown']['Down Home'] == {'total': 100.0, 'count': 2}
+    assert financial['top_categories'][0] == {'category': 'Venue', 'total': 200.0, 'count': 1}
+    assert financial['top_categories'][-1]['category'] == 'Uncategorized'
+    assert financial['match_rate'] == 40.0 and financial['total_receipts'] == 1
+    assert enhanced_chat_api._get_recent_spending(mongo)['recent_7_days']['total'] == 100.0
+    assert enhanced_chat_api._get_business_specific_data(mongo, 'Music City Rodeo')['total_30_days'] == 200.0
+    assert enhanced_chat_api._get_receipt_matching_data(mongo)['unmatched_count'] == 5
+    assert enhanced_chat_api._get_insights_data(mongo)['spending_change_percent'] == 215.0
+    assert enhanced_chat_api._get_basic_financial_summary(mongo)['business_total'] == 430.0
+    assert len(enhanced_chat_api._generate_smart_actions(mongo, 'export a report')) == 3
+
+    # One aggregation per collection for the whole turn, receipts on another thread
+    assert (db.bank_transactions.aggregations, db.receipts.aggregations) == (1, 1)
+    assert db.bank_transactions.threads != db.receipts.threads
+
+    now[0] += 61
+    enhanced_chat_api._get_recent_spending(mongo)
+    assert db.bank_transactions.aggregations == 2
+    chat_context.invalidate_chat_context()
+    enhanced_chat_api._get_recent_spending(mongo)
+    assert db.bank_transactions.aggregations == 3
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Chat Context Builder")
+    print("=" * 60)
+    test_context_covers_every_chat_aggregate()
+    test_chat_helpers_share_one_memoized_build()
+    print("✅ All chat context tests passed")
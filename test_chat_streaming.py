@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming chat responses
+A fake Inference API streams tokens with a delay; the checks are that tokens
+reach the client as they arrive and that data lookups overlap them
+"""
+
+import json
+import os
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+import ai_rate_governor
+import brian_financial_wizard
+import brian_wizard_api
+import chat_context
+from ai_rate_governor import RateGovernor
+from brian_financial_wizard import BrianFinancialWizard
+
+TOKENS = ['Your ', 'Adobe ', 'spend ', 'looks ', 'fine.']
+
+
+class FakeStream:
+    def __init__(self, delay, sent):
+        self.status_code = 200
+        self.headers = {'Content-Type': 'text/event-stream'}
+        self.delay = delay
+        self.sent = sent
+
+    def iter_lines(self, decode_unicode=False):
+        for i, text in enumerate(TOKENS):
+            time.sleep(self.delay)
+            self.sent.append(text)
+            yield 'data:' + json.dumps({'token': {'id': i, 'text': text, 'special': False}, 'generated_text': None})
+            yield ''
+        yield 'data:' + json.dumps({'token': {'id': 99, 'text': '</s>', 'special': True},
+                                    'generated_text': ''.join(TOKENS)})
+
+    def close(self):
+        pass
+
+
+class FakeRequests:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+        self.payloads = []
+
+    def post(self, url, headers=None, json=None, stream=False, timeout=None):
+        self.payloads.append(json)
+        return FakeStream(self.delay, self.sent)
+
+
+def _wizard(fake):
+    os.environ.setdefault('HUGGINGFACE_API_KEY', 'test-key')
+    ai_rate_governor._governors['huggingface'] = RateGovernor('huggingface', 1000, 10000, rate=0)
+    brian_financial_wizard.requests = fake
+    wizard = BrianFinancialWizard()
+    wizard.connected = True
+    return wizard
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_tokens_are_relayed_as_they_arrive():
+    import requests
+    fake = FakeRequests()
+    try:
+        stream = _wizard(fake).stream_chat_response('Is my spending on track?')
+        assert next(stream) == ('token', {'text': 'Your '})
+        assert fake.sent == ['Your ']  # nothing after the first token has been read yet
+        events = list(stream)
+    finally:
+        brian_financial_wizard.requests = requests
+
+    assert fake.payloads[0]['stream'] is True
+    assert [e for e, _ in events] == ['token'] * 4 + ['done']
+    assert events[-1][1]['message'] == ''.join(TOKENS) and events[-1][1]['type'] == 'ai_response'
+
+    # Canned answers come back whole, exactly as chat_response gives them
+    wizard = BrianFinancialWizard()
+    assert list(wizard.stream_chat_response('help me')) == [('done', wizard.chat_response('help me'))]
+
+
+def test_chat_endpoint_streams_while_context_loads():
+    import requests
+    from enhanced_chat_api import register_enhanced_chat_api
+
+    class SlowCollection:
+        def aggregate(self, pipeline):
+            time.sleep(0.4)
+            return iter([])
+
+    class SlowDB:
+        name = 'stream_test'
+        bank_transactions = SlowCollection()
+        receipts = SlowCollection()
+
+    class Mongo:
+        connected = True
+        db = SlowDB()
+
+    fake = FakeRequests(delay=0.1)
+    _wizard(fake)
+    chat_context._builder = chat_context.ChatContextBuilder()
+    app = Flask(__name__)
+    register_enhanced_chat_api(app, Mongo())
+    try:
+        started = time.perf_counter()
+        reply = app.test_client().post('/api/ai-chat', json={'message': 'Is my spending on track?', 'stream': True})
+        body = reply.get_data(as_text=True)
+        elapsed = time.perf_counter() - started
+    finally:
+        brian_financial_wizard.requests = requests
+
+    assert reply.mimetype == 'text/event-stream'
+    events = _events(body)
+    assert [e for e, _ in events] == ['token'] * 5 + ['done']
+    done = events[-1][1]
+    assert done['success'] and done['response']['message'] == ''.join(TOKENS)
+    assert done['response']['data']['recent_7_days'] == {'total': 0.0, 'count': 0, 'daily_avg': 0.0}
+    # Tokens (0.5s) and the context lookup (0.4s) overlapped
+    assert elapsed < 0.85
+
+
+def test_conversation_streams_report_progress():
+    generate = brian_wizard_api.generate_business_expense_report
+
+    def slow_report(date_range, business_type):
+        time.sleep(0.3)
+        return {'business_type': business_type, 'totals': {'total_amount': 10.0, 'total_count': 1},
+                'missing_receipts': [{'merchant_name': 'Shell', 'amount': -10.0, 'date': '2025-01-02'}]}
+
+    app = Flask(__name__)
+    brian_wizard_api.register_brian_wizard_blueprint(app)
+    brian_wizard_api.generate_business_expense_report = slow_report
+    try:
+        started = time.perf_counter()
+        reply = app.test_client().post('/api/brian/conversation', headers={'Accept': 'text/event-stream'},
+                                       json={'message': 'Separate reports for all 3 for last year'})
+        events = _events(reply.get_data(as_text=True))
+        elapsed = time.perf_counter() - started
+    finally:
+        brian_wizard_api.generate_business_expense_report = generate
+
+    assert [e for e, _ in events] == ['status', 'report', 'report', 'report', 'done']
+    done = events[-1][1]
+    assert list(done['reports']) == ['down_home', 'mcr', 'personal']
+    assert done['summary']['total_missing_receipts'] == 3
+    assert elapsed < 0.8  # the three reports ran side by side
+
+    reply = app.test_client().post('/api/brian/conversation', json={'message': 'hello', 'stream': True})
+    assert _events(reply.get_data(as_text=True))[0][1]['quick_actions']
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Chat Streaming")
+    print("=" * 60)
+    test_tokens_are_relayed_as_they_arrive()
+    test_chat_endpoint_streams_while_context_loads()
+    test_conversation_streams_report_progress()
+    print("✅ All chat streaming tests passed")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Test script for the local expense classifier
+Trains on the checked-in bank CSV export, no network or model downloads
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import expense_classifier
+from expense_classifier import (
+    ExpenseClassifier, drop_rare_categories, featurize, netsuite_labels, rows_from_collection, rows_from_csv,
+    train_expense_classifier
+)
+from model_registry import get_model_registry
+
+BANK_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bank_transactions.csv')
+
+
+def _split():
+    expenses, labels = drop_rare_categories(*rows_from_csv(BANK_CSV))
+    order = list(range(len(expenses)))
+    random.Random(7).shuffle(order)
+    cut = int(len(order) * 0.8)
+    pick = lambda rows: ([expenses[i] for i in rows], [labels[i] for i in rows])
+    return pick(order[:cut]), pick(order[cut:])
+
+
+def test_learns_bank_history_and_round_trips():
+    (train_x, train_y), (test_x, test_y) = _split()
+    classifier = ExpenseClassifier.train(train_x, train_y)
+    assert classifier.accuracy(test_x, test_y) > 0.8
+
+    path = classifier.save(os.path.join(tempfile.mkdtemp(), 'model.npz'))
+    loaded = ExpenseClassifier.load(path)
+    assert loaded.labels == classifier.labels
+    assert (loaded.predict_proba(test_x[:20]) == classifier.predict_proba(test_x[:20])).all()
+
+    many = (test_x * 100)[:10000]
+    started = time.perf_counter()
+    loaded.classify_batch(many)
+    assert len(many) / (time.perf_counter() - started) > 2000
+
+
+def test_features_are_stable_and_never_empty():
+    indices, counts, indptr = featurize([{'description': 'SQ *BLUE BOTTLE #4410'}, {}])
+    assert (indptr[1:] - indptr[:-1]).min() >= 1
+    again = featurize([{'description': 'SQ *BLUE BOTTLE #9921'}])[0]
+    assert sorted(again) == sorted(indices[:indptr[1]])  # store numbers are masked
+
+
+HISTORY = [
+    ({'description': 'ZEPHYR STUDIOS LLC', 'memo': 'grip truck', 'amount': 850}, 'SCC: Equipment Cost'),
+    ({'description': 'ZEPHYR STUDIOS', 'memo': 'lens package', 'amount': 420}, 'SCC: Equipment Cost'),
+    ({'description': 'ZEPHYR STUDIOS LLC', 'memo': '', 'amount': 1200}, 'SCC: Equipment Cost'),
+    ({'description': 'HATTIE BS HOT CHICKEN', 'memo': '', 'amount': 48}, 'BD: Client Business Meals'),
+    ({'description': 'HATTIE BS', 'memo': 'team lunch', 'amount': 62}, 'BD: Client Business Meals'),
+    ({'description': 'HATTIE BS HOT CHICKEN', 'memo': '', 'amount': 35}, 'BD: Client Business Meals'),
+]
+
+
+def test_categorizer_uses_confident_local_answer_without_cloud():
+    from expense_categorizer import ExpenseCategorizer
+
+    path = os.path.join(tempfile.mkdtemp(), 'model.npz')
+    default_path = expense_classifier.DEFAULT_MODEL_PATH
+    expense_classifier.DEFAULT_MODEL_PATH = path
+    try:
+        train_expense_classifier([e for e, _ in HISTORY], [c for _, c in HISTORY], path, epochs=30)
+        categorizer = ExpenseCategorizer()
+
+        def no_cloud(expense):
+            raise AssertionError("hosted models should not be asked")
+        categorizer._cloud_category_suggestion = no_cloud
+
+        results = categorizer.batch_categorize_expenses([
+            {'id': 1, 'description': 'ZEPHYR STUDIOS LLC', 'memo': 'camera rental', 'amount': 600},
+            {'id': 2, 'description': 'HATTIE BS HOT CHICKEN', 'memo': '', 'amount': 41},
+        ])
+        assert [r['category'] for r in results] == ['SCC: Equipment Cost', 'BD: Client Business Meals']
+
+        # Unsure local answers go to the cloud only when allowed
+        assert categorizer.get_ai_category_suggestion({}, ('SCC: Equipment Cost', 0.3), cloud_fallback=False) is None
+    finally:
+        expense_classifier.DEFAULT_MODEL_PATH = default_path
+        get_model_registry().evict('expense_classifier')
+
+
+def test_bank_labels_do_not_switch_off_ai_categorization():
+    from expense_categorizer import ExpenseCategorizer
+
+    path = os.path.join(tempfile.mkdtemp(), 'model.npz')
+    default_path = expense_classifier.DEFAULT_MODEL_PATH
+    expense_classifier.DEFAULT_MODEL_PATH = path
+    try:
+        # A model trained on bank labels answers "Travel" with high confidence...
+        ExpenseClassifier.train(*drop_rare_categories(*rows_from_csv(BANK_CSV))).save(path)
+        get_model_registry().evict('expense_classifier')
+        categorizer = ExpenseCategorizer()
+        uber = {'description': 'UBER TRIP', 'memo': '', 'amount': 24}
+        assert categorizer.local_category_suggestions([uber])[0][0] not in categorizer.category_names()
+
+        # ...which is not a NetSuite category, so the hosted models are still asked
+        asked = []
+
+        def cloud(expense):
+            asked.append(expense)
+            return 'DH: Travel Costs - Cab/Uber/Bus Fare'
+        categorizer._cloud_category_suggestion = cloud
+        result = categorizer.categorize_expense(uber)
+        assert len(asked) == 1 and result.category in categorizer.category_names()
+
+        # Training restricted to NetSuite names refuses a bank-labeled export
+        try:
+            train_expense_classifier(*rows_from_csv(BANK_CSV), path, allowed=categorizer.category_names())
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('bank labels must not train the categorizer model')
+    finally:
+        expense_classifier.DEFAULT_MODEL_PATH = default_path
+        get_model_registry().evict('expense_classifier')
+
+
+class ImportedTransactions:
+    """bank_transactions as CSVImportEngine fills it and the trainer reads it back"""
+
+    def __init__(self):
+        self.docs = []
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def find(self, query, projection=None):
+        if 'import_hash' in query:
+            return []
+        return Cursor(self.docs)
+
+    def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+        return SimpleNamespace(inserted_ids=list(range(len(docs))))
+
+    def update_one(self, *args, **kwargs):
+        pass
+
+
+class Cursor(list):
+    def sort(self, *args):
+        return self
+
+    def limit(self, count):
+        return Cursor(self[:count])
+
+
+class ImportDB:
+    def __init__(self):
+        self.bank_transactions = ImportedTransactions()
+        self.csv_import_jobs = ImportedTransactions()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def test_trains_on_imported_bank_transactions():
+    from csv_import_engine import CSVImportEngine
+    from expense_categorizer import ExpenseCategorizer
+    from merchant_category_table import configure_merchant_table
+
+    db = ImportDB()
+    CSVImportEngine(db).import_path(BANK_CSV)
+    expenses, labels = rows_from_collection(db.bank_transactions)
+    assert 'Travel' in labels  # what imports store: the bank's own labels
+
+    path = os.path.join(tempfile.mkdtemp(), 'model.npz')
+    default_path = expense_classifier.DEFAULT_MODEL_PATH
+    expense_classifier.DEFAULT_MODEL_PATH = path
+    table = configure_merchant_table()
+    try:
+        # The user filed Soho House once; every SH NASHVILLE row trains as that
+        table.correct('netsuite', 'SH NASHVILLE - OTHER', 'DH:  Soho House Fees')
+        categorizer = ExpenseCategorizer()
+        expenses, labels = netsuite_labels(expenses, labels, categorizer)
+        assert set(labels) <= set(categorizer.category_names())
+        soho = [label for expense, label in zip(expenses, labels) if expense['merchant'] == 'SH NASHVILLE - OTHER']
+        assert len(soho) > 50 and set(soho) == {'DH:  Soho House Fees'}
+        assert 'BD: Client Business Meals' in labels and 'DH: Travel Costs - Cab/Uber/Bus Fare' in labels
+
+        train_expense_classifier(expenses, labels, path, allowed=categorizer.category_names())
+        suggestions = categorizer.local_category_suggestions([
+            {'description': 'UBER   *TRIP', 'amount': -23.10},
+            {'description': 'SH NASHVILLE - OTHER', 'amount': -18.00},
+            {'description': 'TST*HATTIE BS HOT CHICK', 'amount': -31.40},
+        ])
+        assert [category for category, _ in suggestions] == [
+            'DH: Travel Costs - Cab/Uber/Bus Fare', 'DH:  Soho House Fees', 'BD: Client Business Meals']
+    finally:
+        configure_merchant_table()
+        expense_classifier.DEFAULT_MODEL_PATH = default_path
+        get_model_registry().evict('expense_classifier')
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Local Expense Classifier")
+    print("=" * 60)
+    test_learns_bank_history_and_round_trips()
+    test_features_are_stable_and_never_empty()
+    test_categorizer_uses_confident_local_answer_without_cloud()
+    test_bank_labels_do_not_switch_off_ai_categorization()
+    test_trains_on_imported_bank_transactions()
+    print("✅ All expense classifier tests passed")
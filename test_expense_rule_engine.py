@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for the batch expense rule engine
+Checks the compiled matcher against plain substring tests and the batch
+categorizer against the one-expense-at-a-time rule loop
+"""
+
+import csv
+import os
+import random
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from expense_categorizer import DH_KEYWORDS, MCR_KEYWORDS, ExpenseCategorizer
+from expense_rule_engine import KeywordMatcher, RuleMatrix
+
+BANK_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bank_transactions.csv')
+
+
+def _keywords(categorizer):
+    return [k for config in categorizer.categories.values() for k in config.keywords] + MCR_KEYWORDS + DH_KEYWORDS
+
+
+def test_matcher_finds_overlapping_substrings():
+    matcher = KeywordMatcher(['uber', 'uber eats', 'eat', 'bd', 'Lunch'])
+    found = {matcher.keywords[i] for i in matcher.find('UberEats lunch: uber eats w/ BDR team')}
+    assert found == {'UBER', 'UBER EATS', 'EAT', 'BD', 'LUNCH'}
+
+    categorizer = ExpenseCategorizer()
+    words = _keywords(categorizer)
+    matcher = KeywordMatcher(words)
+    rng = random.Random(5)
+    for _ in range(2000):
+        parts = [rng.choice(words) if rng.random() < 0.4 else
+                 ''.join(rng.choice('abcdefghilmnorstu ') for _ in range(rng.randint(1, 6)))
+                 for _ in range(rng.randint(1, 6))]
+        text = rng.choice([' ', '']).join(parts)
+        expected = {i for i, keyword in enumerate(matcher.keywords) if keyword in text.upper()}
+        assert matcher.find(text) == expected, text
+
+
+def _reference_rule_match(categorizer, combined_text):
+    """The per-expense keyword loop the rule matrix replaces"""
+    best_match, best_confidence = None, 0.0
+    for config in categorizer.categories.values():
+        if not config.keywords:
+            continue
+        matches = sum(1 for keyword in config.keywords if keyword.upper() in combined_text)
+        if matches:
+            confidence = min(matches / len(config.keywords) + config.confidence_boost, 1.0)
+            if confidence > best_confidence:
+                best_confidence, best_match = confidence, config
+    return best_match, best_confidence
+
+
+def _expenses(count, seed=11):
+    with open(BANK_CSV, newline='') as f:
+        rows = list(csv.DictReader(f))
+    rng = random.Random(seed)
+    notes = ['dinner with John Smith', 'in Nashville, TN', 'NFR event production', 'client lunch',
+             'Monthly software subscription', 'Camera equipment for shoot', '']
+    return [{'id': i, 'description': row['Description'], 'memo': rng.choice(notes),
+             'merchant': rng.choice(['', row['Description'].title()]), 'amount': row['Amount'],
+             'email_account': rng.choice(['', 'brian@downhome.com', 'brian@musiccityrodeo.com'])}
+            for i, row in enumerate(rng.choice(rows) for _ in range(count))]
+
+
+def test_batch_matches_single_expense_rules():
+    categorizer = ExpenseCategorizer()
+    expenses = _expenses(3000)
+    texts = [categorizer._expense_texts(e)[0] for e in expenses]
+    matches = categorizer.rules.match(texts)
+    for row, text in enumerate(texts):
+        config, confidence = _reference_rule_match(categorizer, text)
+        best = matches.best[row]
+        assert (categorizer._rule_configs[best] if best >= 0 else None) is config
+        assert matches.best_confidence[row] == confidence
+
+    batch = categorizer.batch_categorize_expenses(expenses[:300])
+    for expense, result in zip(expenses[:300], batch):
+        single = categorizer.categorize_expense(expense)
+        assert (result['category'], result['confidence'], result['business_type'], result['location']) == \
+            (single.category, single.confidence, single.business_type, single.location)
+
+
+def test_bad_rows_do_not_stop_the_batch():
+    results = ExpenseCategorizer().batch_categorize_expenses([
+        {'id': 'bad', 'description': None},
+        {'id': 'ok', 'description': 'UBER RIDE', 'memo': '', 'merchant': 'Uber'},
+    ])
+    assert results[0]['details'] == 'Classification Error'
+    assert results[1]['category'] == 'DH: Travel Costs - Cab/Uber/Bus Fare'
+
+
+def test_rule_change_recompiles_and_batch_is_fast():
+    categorizer = ExpenseCategorizer()
+    categorizer.categories['BD_CONSULTANTS'].keywords.append('zephyr')
+    categorizer.compile_rules()
+    assert categorizer.categorize_expense({'description': 'ZEPHYR LLC', 'memo': '', 'merchant': ''}).category == \
+        'BD: Consultants'
+
+    matrix = RuleMatrix([(['a', 'a'], 0.0), ([], 0.5)], flags={'x': ['zz']})
+    result = matrix.match(['a', 'b zz'])
+    assert result.counts.tolist() == [[2.0, 0.0], [0.0, 0.0]] and result.best.tolist() == [0, -1]
+    assert result.flags['x'].tolist() == [False, True]
+
+    expenses = _expenses(20000)
+    started = time.perf_counter()
+    categorizer.batch_categorize_expenses(expenses)
+    assert time.perf_counter() - started < 10
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Expense Rule Engine")
+    print("=" * 60)
+    test_matcher_finds_overlapping_substrings()
+    test_batch_matches_single_expense_rules()
+    test_bad_rows_do_not_stop_the_batch()
+    test_rule_change_recompiles_and_batch_is_fast()
+    print("✅ All expense rule engine tests passed")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the concurrent HuggingFace cloud batch
+A fake HTTP session stands in for the Inference API with fixed latency
+"""
+
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+
+import ai_rate_governor
+from ai_rate_governor import RateGovernor
+from huggingface_receipt_processor import HuggingFaceReceiptProcessor
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.text = '' if payload else 'unavailable'
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Answers by model (paligemma sends 'text', donut a 'question', trocr nothing)"""
+
+    def __init__(self, latency=0.5, failing=(), flaky=0):
+        self.latency = latency
+        self.failing = set(failing)
+        self.flaky = flaky
+        self.lock = threading.Lock()
+        self.in_flight = self.peak = 0
+        self.calls = []
+
+    def post(self, url, headers=None, files=None, data=None, timeout=None):
+        model = 'paligemma' if data and 'text' in data else 'donut' if data else 'trocr'
+        upload = files['file'][1]
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.calls.append((model, Image.open(io.BytesIO(upload)).size))
+            flaky = self.flaky > 0
+            self.flaky -= 1
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+        if model in self.failing or flaky:
+            return FakeResponse(503)
+        if model == 'donut':
+            return FakeResponse(200, {'answer': 'Blue Bottle Coffee Total: $12.50 Date: 05/02/2026'})
+        return FakeResponse(200, [{'generated_text': '{"merchant": "Blue Bottle Coffee", "total": "12.50"}'}])
+
+
+def _processor(session):
+    processor = HuggingFaceReceiptProcessor()
+    processor.api_token = 'test-token'
+    processor.session = session
+    ai_rate_governor._governors['huggingface'] = RateGovernor('huggingface', 1000, 10000, rate=0)
+    return processor
+
+
+def _images(count, size=(1800, 1200)):
+    directory = tempfile.mkdtemp()
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f'receipt_{i}.png')
+        Image.new('RGB', size, (255, 255, 255)).save(path)
+        paths.append(path)
+    return paths
+
+
+def test_batch_runs_requests_concurrently_with_small_uploads():
+    session = FakeSession()
+    processor = _processor(session)
+    paths = _images(8)
+    started = time.perf_counter()
+    batch = processor.batch_process_receipts(paths, max_in_flight=4)
+    # Eight requests back to back would take 8 x latency
+    assert time.perf_counter() - started < 8 * session.latency * 0.75
+    assert session.peak == 4
+
+    assert [r['processing_metadata']['image_path'] for r in batch['results']] == [os.path.basename(p) for p in paths]
+    assert batch['batch_summary']['successful_extractions'] == 8
+    assert batch['batch_summary']['total_api_calls'] == 8
+    assert all(max(size) <= 1600 for _, size in session.calls)
+
+
+def test_items_retry_and_fall_back_without_stopping_the_batch():
+    session = FakeSession(latency=0.01, failing={'paligemma'})
+    processor = _processor(session)
+    paths = _images(3, size=(400, 600)) + ['/nonexistent/receipt.png']
+    batch = processor.batch_process_receipts(paths, retries=0)
+    results = batch['results']
+    assert [r['status'] for r in results] == ['success'] * 3 + ['error']
+    assert results[0]['model_used'] == 'donut'
+    assert results[0]['processing_metadata']['models_tried'] == ['paligemma', 'donut']
+    assert batch['batch_summary']['fallbacks'] == 3
+
+    session = FakeSession(latency=0.01, flaky=1)
+    batch = _processor(session).batch_process_receipts(_images(1, size=(400, 600)), max_in_flight=1)
+    result = batch['results'][0]
+    assert result['model_used'] == 'paligemma' and result['processing_metadata']['api_attempts'] == 2
+
+
+if __name__ == "__main__":
+    print("🧪 Testing HuggingFace Cloud Batch")
+    print("=" * 60)
+    test_batch_runs_requests_concurrently_with_small_uploads()
+    test_items_retry_and_fall_back_without_stopping_the_batch()
+    print("✅ All HuggingFace cloud batch tests passed")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Test script for keyset pagination
+Runs against an in-memory stand-in that evaluates the cursor predicates
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+from keyset_pagination import (
+    CountCache, InvalidCursor, decode_cursor, encode_cursor, fetch_page
+)
+
+_BSON_ORDER = {type(None): 0, int: 1, float: 1, str: 2, ObjectId: 3, datetime: 4}
+_TYPE_NAMES = {'null': (type(None),), 'number': (int, float), 'string': (str,), 'date': (datetime,)}
+
+
+def _sort_key(value):
+    return (_BSON_ORDER[type(value)], value if value is not None else 0)
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == '$and':
+            if not all(_matches(doc, q) for q in cond):
+                return False
+            continue
+        if field == '$or':
+            if not any(_matches(doc, q) for q in cond):
+                return False
+            continue
+        value = doc.get(field)
+        if not isinstance(cond, dict):
+            if value != cond:
+                return False
+            continue
+        for op, operand in cond.items():
+            if op == '$type':
+                if not isinstance(value, _TYPE_NAMES[operand]):
+                    return False
+                continue
+            if value is None or _BSON_ORDER[type(value)] != _BSON_ORDER[type(operand)]:
+                return False
+            if op == '$lt' and not value < operand:
+                return False
+            if op == '$gt' and not value > operand:
+                return False
+            if op == '$gte' and not value >= operand:
+                return False
+            if op == '$lte' and not value <= operand:
+                return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.docs.sort(key=lambda d: _sort_key(d.get(field)), reverse=direction < 0)
+        return self
+
+    def skip(self, n):
+        self.docs = self.docs[n:]
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class FakeCollection:
+    full_name = 'expense_test.bank_transactions'
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.counts = 0
+
+    def create_index(self, keys):
+        return 'date_-1__id_-1'
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(d) for d in self.docs if _matches(d, query)])
+
+    def count_documents(self, query):
+        self.counts += 1
+        return sum(1 for d in self.docs if _matches(d, query))
+
+    def estimated_document_count(self):
+        return len(self.docs)
+
+
+def _docs(n):
+    start = datetime(2025, 1, 1)
+    # Several rows share a date so the _id tiebreaker is exercised
+    return [{'_id': ObjectId(), 'date': start + timedelta(days=i // 3), 'amount': -float(i)} for i in range(n)]
+
+
+def _walk(collection, query, limit):
+    pages, cursor = [], None
+    while True:
+        docs, cursor = fetch_page(collection, query, limit=limit, cursor=cursor)
+        pages.append(docs)
+        if not cursor:
+            return pages
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    when = datetime(2025, 6, 1, 12, 30)
+    assert decode_cursor(encode_cursor(when, oid)) == (when, oid)
+    assert decode_cursor(encode_cursor(None, 'tx1')) == (None, 'tx1')
+    try:
+        decode_cursor('not-a-cursor')
+    except InvalidCursor:
+        pass
+    else:
+        raise AssertionError("garbage cursor decoded")
+
+
+def test_keyset_walk_matches_skip_order():
+    """Walking by cursor visits every row once, in the same order as sort+skip"""
+    collection = FakeCollection(_docs(103))
+    query = {'date': {'$gte': datetime(2025, 1, 5)}}
+
+    pages = _walk(collection, query, limit=10)
+    walked = [d['_id'] for page in pages for d in page]
+
+    expected = [d['_id'] for d in collection.find(query).sort([('date', -1), ('_id', -1)])]
+    assert walked == expected
+    assert len(set(walked)) == len(walked)
+    assert all(len(p) == 10 for p in pages[:-1])
+
+
+def test_skip_mode_hands_back_cursor():
+    """Numbered pages still work and return a token for the page after"""
+    collection = FakeCollection(_docs(30))
+    page_two, cursor = fetch_page(collection, {}, limit=10, skip=10)
+    page_three, _ = fetch_page(collection, {}, limit=10, cursor=cursor)
+    by_skip, _ = fetch_page(collection, {}, limit=10, skip=20)
+    assert [d['_id'] for d in page_three] == [d['_id'] for d in by_skip]
+    assert page_two[-1]['_id'] != page_three[0]['_id']
+
+
+def test_mixed_sort_types_are_not_skipped():
+    """String and missing dates sort after real dates and are still reached"""
+    docs = _docs(6)
+    docs.append({'_id': ObjectId(), 'date': '2025-02-01', 'amount': -1.0})
+    docs.append({'_id': ObjectId(), 'amount': -2.0})
+    collection = FakeCollection(docs)
+
+    walked = [d['_id'] for page in _walk(collection, {}, limit=3) for d in page]
+    assert len(walked) == 8
+    assert len(set(walked)) == 8
+
+
+def test_count_cache_ttl():
+    collection = FakeCollection(_docs(12))
+    cache = CountCache(ttl=60)
+    query = {'amount': {'$lt': 0.0}}
+    assert cache.count(collection, query) == 11
+    assert cache.count(collection, query) == 11
+    assert collection.counts == 1
+    assert cache.count(collection, {}, mode='estimated') == 12
+    assert cache.count(collection, query, mode='none') is None
+    cache.invalidate(collection)
+    cache.count(collection, query)
+    assert collection.counts == 2
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Keyset Pagination")
+    print("=" * 60)
+    test_cursor_round_trip()
+    test_keyset_walk_matches_skip_order()
+    test_skip_mode_hands_back_cursor()
+    test_mixed_sort_types_are_not_skipped()
+    test_count_cache_ttl()
+    print("✅ All pagination tests passed")
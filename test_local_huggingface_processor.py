@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script for batched local HuggingFace inference
+Builds a tiny TrOCR-style model on disk so no downloads are needed
+"""
+
+import os
+import sys
+import tempfile
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+from PIL import Image
+from transformers import (
+    BertTokenizer, TrOCRConfig, TrOCRForCausalLM, TrOCRProcessor, ViTConfig,
+    ViTImageProcessor, ViTModel, VisionEncoderDecoderModel
+)
+
+from huggingface_receipt_processor import LocalHuggingFaceProcessor
+
+_MODEL_DIR = None
+
+
+def _tiny_model_dir() -> str:
+    global _MODEL_DIR
+    if _MODEL_DIR:
+        return _MODEL_DIR
+    directory = tempfile.mkdtemp()
+    vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]', 'total', 'target', '$', '12', '.', '50', '06', '/', '14']
+    vocab_path = os.path.join(directory, 'vocab.txt')
+    with open(vocab_path, 'w') as f:
+        f.write('\n'.join(vocab))
+    tokenizer = BertTokenizer(vocab_path)
+
+    torch.manual_seed(0)
+    encoder = ViTModel(ViTConfig(image_size=32, patch_size=8, hidden_size=32, num_hidden_layers=1,
+                                 num_attention_heads=2, intermediate_size=64), add_pooling_layer=False)
+    decoder = TrOCRForCausalLM(TrOCRConfig(vocab_size=len(vocab), d_model=32, decoder_layers=1,
+                                           decoder_attention_heads=2, decoder_ffn_dim=64,
+                                           cross_attention_hidden_size=32, pad_token_id=0,
+                                           bos_token_id=2, eos_token_id=3, decoder_start_token_id=2))
+    model = VisionEncoderDecoderModel(encoder=encoder, decoder=decoder)
+    model.config.decoder_start_token_id = 2
+    model.config.pad_token_id = 0
+    model.config.eos_token_id = 3
+    model.save_pretrained(directory)
+    TrOCRProcessor(image_processor=ViTImageProcessor(size={'height': 32, 'width': 32}),
+                   tokenizer=tokenizer).save_pretrained(directory)
+    _MODEL_DIR = directory
+    return directory
+
+
+def _images():
+    return [Image.new('RGB', size, color) for size, color in
+            [((64, 120), 'white'), ((200, 90), 'gray'), ((32, 32), 'black'), ((80, 80), 'white'), ((10, 300), 'red')]]
+
+
+def test_process_batch_matches_single_image_results():
+    processor = LocalHuggingFaceProcessor(model_name=_tiny_model_dir(), batch_size=2, max_new_tokens=6, device='cpu')
+    assert not processor.model.training
+
+    calls = []
+    original = processor.model.generate
+
+    def counting_generate(pixel_values, **kwargs):
+        calls.append(tuple(pixel_values.shape))
+        return original(pixel_values, **kwargs)
+
+    processor.model.generate = counting_generate
+    images = _images()
+    batched = processor.process_batch(images)
+
+    assert [r['status'] for r in batched] == ['success'] * 5
+    assert [shape[0] for shape in calls] == [2, 2, 1]
+    assert batched[0]['processing_metadata']['batch_size'] == 2
+
+    singles = [processor.process_receipt_image(image) for image in images]
+    assert [r['raw_text'] for r in singles] == [r['raw_text'] for r in batched]
+
+
+def test_bad_inputs_fail_individually():
+    processor = LocalHuggingFaceProcessor(model_name=_tiny_model_dir(), batch_size=4, max_new_tokens=4, device='cpu')
+    results = processor.process_batch([Image.new('RGB', (40, 40)), '/nonexistent/receipt.png'])
+    assert results[0]['status'] == 'success'
+    assert results[1]['status'] == 'error'
+
+
+def test_dynamic_quantization_on_cpu():
+    processor = LocalHuggingFaceProcessor(model_name=_tiny_model_dir(), quantize=True, max_new_tokens=4, device='cpu')
+    quantized = [m for m in processor.model.modules() if type(m).__module__.startswith('torch.ao.nn.quantized.dynamic')]
+    assert quantized
+    assert processor.process_batch(_images()[:3])[2]['processing_metadata']['quantized'] is True
+
+
+def test_collate_pads_uneven_images():
+    batch = LocalHuggingFaceProcessor._collate([torch.ones(3, 4, 6), torch.ones(3, 5, 2)])
+    assert tuple(batch.shape) == (2, 3, 5, 6)
+    assert batch[1, :, :, 2:].abs().sum() == 0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Local HuggingFace Processor")
+    print("=" * 60)
+    test_process_batch_matches_single_image_results()
+    test_bad_inputs_fail_individually()
+    test_dynamic_quantization_on_cpu()
+    test_collate_pads_uneven_images()
+    print("✅ All local HuggingFace processor tests passed")
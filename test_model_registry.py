@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script for the process-wide model registry
+Covers lazy singletons under concurrency, warm-up and idle eviction
+"""
+
+import os
+import sys
+import threading
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_registry import ModelRegistry, get_model_registry
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_concurrent_gets_build_once():
+    registry = ModelRegistry(idle_ttl=None)
+    built = []
+
+    def slow_factory(name):
+        time.sleep(0.05)
+        built.append(name)
+        return object()
+
+    registry.register('slow', slow_factory)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get('slow', 'a'))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert built == ['a']
+    assert len({id(r) for r in results}) == 1
+    assert registry.get('slow', 'b') is not results[0]
+    assert registry.stats()['slow']['instances'] == 2
+    assert registry.stats()['slow']['hits'] == 7
+
+
+def test_failed_load_is_retried():
+    registry = ModelRegistry(idle_ttl=None)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("download interrupted")
+        return 'model'
+
+    registry.register('flaky', flaky)
+    try:
+        registry.get('flaky')
+        assert False, "first load should raise"
+    except RuntimeError:
+        pass
+    assert registry.get('flaky') == 'model'
+    assert registry.warm_up(['flaky', 'missing', '']) == ['flaky']
+
+
+def test_idle_eviction_and_custom_key():
+    clock = _Clock()
+    registry = ModelRegistry(idle_ttl=300, clock=clock)
+    released = []
+    registry.register('cloud', lambda token=None, model='paligemma': [token, model],
+                      key=lambda token=None, model='paligemma': (token or 'env-token', model),
+                      on_evict=released.append)
+    registry.register('pinned', lambda: 'pinned', idle_ttl=0)
+
+    first = registry.get('cloud')
+    assert registry.get('cloud', token='env-token') is first
+    registry.get('pinned')
+
+    clock.now += 200
+    assert registry.evict_idle() == []
+    registry.get('cloud')  # use refreshes the idle timer
+    clock.now += 299
+    assert registry.evict_idle() == []
+    clock.now += 2
+    assert registry.evict_idle() == ['cloud']
+    assert released == [first]
+    assert registry.stats()['pinned']['instances'] == 1
+
+    assert registry.get('cloud') is not first
+    assert registry.stats()['cloud']['loads'] == 2
+
+
+def test_builtin_registry_shares_enhanced_processor():
+    registry = get_model_registry()
+    assert registry.get('enhanced_receipt') is registry.get('enhanced_receipt')
+    assert {'enhanced_receipt', 'hf_cloud', 'hf_local'} <= set(registry.stats())
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Model Registry")
+    print("=" * 60)
+    test_concurrent_gets_build_once()
+    test_failed_load_is_retried()
+    test_idle_eviction_and_custom_key()
+    test_builtin_registry_shares_enhanced_processor()
+    print("✅ All model registry tests passed")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the content-addressed OCR cache
+Uses a temporary disk store; no tesseract binary needed
+"""
+
+import os
+import sys
+import tempfile
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import ocr_cache
+from ocr_cache import OCRCache, configure_ocr_cache, engine_fingerprint
+
+
+def test_compute_once_per_content_and_config():
+    cache = OCRCache(directory=tempfile.mkdtemp())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "STARBUCKS\nTotal $4.50", [{'text': 'STARBUCKS'}]
+
+    assert cache.get_or_compute(b'image-bytes', 'tesseract', compute) == "STARBUCKS\nTotal $4.50"
+    assert cache.get_or_compute(b'image-bytes', 'tesseract', compute) == "STARBUCKS\nTotal $4.50"
+    assert len(calls) == 1
+
+    # A different config or engine is a different fingerprint
+    cache.get_or_compute(b'image-bytes', 'tesseract', compute, config='--psm 6')
+    assert len(calls) == 2
+    assert engine_fingerprint('tesseract', '') != engine_fingerprint('tesseract', '--psm 6')
+
+    entry = cache.get(b'image-bytes', 'tesseract')
+    assert entry['words'] == [{'text': 'STARBUCKS'}]
+
+
+def test_disk_store_survives_new_instance():
+    directory = tempfile.mkdtemp()
+    OCRCache(directory=directory).put(b'pdf-bytes', 'tesseract', 'HILTON FOLIO')
+
+    fresh = OCRCache(directory=directory)
+    assert fresh.get(b'pdf-bytes', 'tesseract')['text'] == 'HILTON FOLIO'
+    assert fresh.peek_text(b'pdf-bytes') == 'HILTON FOLIO'
+    assert fresh.peek_text(b'other-bytes') is None
+
+
+def test_empty_results_are_not_cached():
+    cache = OCRCache(directory=tempfile.mkdtemp())
+    assert cache.get_or_compute(b'blank', 'tesseract', lambda: '') == ''
+    assert cache.get(b'blank', 'tesseract') is None
+    assert cache.stats()['misses'] == 2
+
+
+def test_tesseract_lines_rebuilt_from_word_boxes(monkeypatch):
+    import pytesseract
+
+    data = {
+        'text': ['', 'SHELL', 'OIL', '', 'Total', '$41.20', 'Thanks'],
+        'block_num': [1, 1, 1, 1, 1, 1, 2],
+        'par_num': [1, 1, 1, 1, 1, 1, 1],
+        'line_num': [1, 1, 1, 1, 2, 2, 1],
+        'left': [0] * 7, 'top': [0] * 7, 'width': [1] * 7, 'height': [1] * 7,
+        'conf': [-1, 95, 94, -1, 90, 88, 70],
+    }
+    monkeypatch.setattr(pytesseract, 'image_to_data', lambda image, config='', output_type=None: data)
+
+    text, words = ocr_cache.tesseract_text_and_words(object())
+    assert text == "SHELL OIL\nTotal $41.20\n\nThanks"
+    assert [w['text'] for w in words] == ['SHELL', 'OIL', 'Total', '$41.20', 'Thanks']
+
+
+def test_receipt_ocr_processor_reads_through_cache():
+    """A cached image is answered without running tesseract at all"""
+    from receipt_ocr_processor import ReceiptOCRProcessor
+
+    cache = configure_ocr_cache(directory=tempfile.mkdtemp())
+    try:
+        cache.put(b'\x89PNG fake', 'tesseract', 'KROGER\nTotal: $23.10')
+        text = ReceiptOCRProcessor().extract_text_from_image(b'\x89PNG fake')
+        assert text == 'KROGER\nTotal: $23.10'
+        assert cache.stats()['hits'] == 1
+    finally:
+        ocr_cache._cache = None
+
+
+if __name__ == "__main__":
+    print("🧪 Testing OCR Cache")
+    print("=" * 60)
+    test_compute_once_per_content_and_config()
+    test_disk_store_survives_new_instance()
+    test_empty_results_are_not_cached()
+    test_receipt_ocr_processor_reads_through_cache()
+    print("✅ All OCR cache tests passed")
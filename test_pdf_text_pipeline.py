@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming PDF text extraction
+Builds PDFs in memory with PyMuPDF
+"""
+
+import os
+import sys
+import tempfile
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import fitz
+
+import ocr_cache
+import pdf_text_pipeline
+from pdf_text_pipeline import extract_pdf_text, has_total_and_date
+
+
+def _folio(pages: int, receipt_page: int = 0) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        if i == receipt_page:
+            page.insert_text((72, 72), "HILTON NASHVILLE DOWNTOWN\nFolio date: 06/14/2025\nTotal Due: $812.44")
+        else:
+            page.insert_text((72, 72), f"Itemized charges continued, page {i + 1}\nRoom service 12.00")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _scanned_page() -> bytes:
+    doc = fitz.open()
+    page = doc.new_page()
+    pixmap = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 40, 40), False)
+    pixmap.clear_with(200)
+    page.insert_image(fitz.Rect(72, 72, 272, 272), pixmap=pixmap)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_stops_after_receipt_page():
+    result = extract_pdf_text(_folio(12))
+    assert result.pages_total == 12
+    assert result.pages_read == 1
+    assert result.stopped_early
+    assert '$812.44' in result.text
+    assert result.pages[0].method == 'text_layer'
+
+
+def test_full_read_without_stop_condition():
+    result = extract_pdf_text(_folio(5, receipt_page=3), stop_when=None)
+    assert result.pages_read == 5
+    assert not result.stopped_early
+    assert 'page 5' in result.text
+
+
+def test_receipt_on_later_page_reads_until_found():
+    result = extract_pdf_text(_folio(8, receipt_page=2))
+    assert result.pages_read == 3
+    assert has_total_and_date(result.text)
+
+
+def test_image_only_pages_are_ocrd(monkeypatch):
+    """Scanned pages go through tesseract (via the OCR cache); text pages never do"""
+    calls = []
+
+    def fake_tesseract(image, config=''):
+        calls.append(image.size)
+        return "CITGO 06/02/2025\nTOTAL 45.10", []
+
+    monkeypatch.setattr(ocr_cache, 'tesseract_text_and_words', fake_tesseract)
+    ocr_cache.configure_ocr_cache(directory=tempfile.mkdtemp())
+    try:
+        result = extract_pdf_text(_scanned_page())
+        assert result.pages[0].method == 'ocr'
+        assert 'TOTAL 45.10' in result.text
+        # A4 page (PyMuPDF default) rasterized at 300 DPI
+        assert calls == [(2480, 3509)]
+
+        # Same scan again is answered from the cache
+        extract_pdf_text(_scanned_page())
+        assert len(calls) == 1
+    finally:
+        ocr_cache._cache = None
+
+
+def test_pypdf2_fallback_reads_text_layer(monkeypatch):
+    monkeypatch.setattr(pdf_text_pipeline, 'PYMUPDF_AVAILABLE', False)
+    path = os.path.join(tempfile.mkdtemp(), 'folio.pdf')
+    with open(path, 'wb') as f:
+        f.write(_folio(6))
+    result = extract_pdf_text(path)
+    assert result.pages_read == 1
+    assert '812.44' in result.text
+
+
+if __name__ == "__main__":
+    print("🧪 Testing PDF Text Pipeline")
+    print("=" * 60)
+    test_stops_after_receipt_page()
+    test_full_read_without_stop_condition()
+    test_receipt_on_later_page_reads_until_found()
+    print("✅ PDF pipeline tests passed")
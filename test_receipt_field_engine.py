@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the receipt field extraction engine
+Checks that compiled pattern sets read text exactly like the re.search loops they replaced
+"""
+
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from receipt_field_engine import (
+    EMAIL_AMOUNT_PATTERNS, EXTRACTOR_AMOUNT_PATTERNS, TEXT_AMOUNT_PATTERNS,
+    amount_in_range, pattern_set, required_literal
+)
+
+
+def _loop_first(patterns, text):
+    for pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return match.group(1)
+    return None
+
+
+def test_first_matches_priority_loop():
+    """Earlier patterns beat earlier positions, as in `for pattern in patterns: re.search`"""
+    texts = [
+        "Order total: 12.00 USD, card charged $12.00",
+        "You were charged 45.10 DOLLARS on Jan 3",
+        "PAYMENT OF 19.99 received",
+        "USD 1,250.00 Total Due",
+        "nothing to see here",
+    ]
+    for table in (TEXT_AMOUNT_PATTERNS, EMAIL_AMOUNT_PATTERNS, EXTRACTOR_AMOUNT_PATTERNS):
+        compiled = pattern_set(table)
+        for text in texts:
+            match = compiled.first(text)
+            assert (match.value if match else None) == _loop_first(table, text), (table, text)
+
+
+def test_scan_keeps_overlaps_and_labels():
+    compiled = pattern_set([(r'total[\s:]*\$?(\d+\.?\d*)', 'total'), (r'subtotal[\s:]*\$?(\d+\.?\d*)', 'subtotal')])
+    matches = compiled.scan("SUBTOTAL $10.00 TAX $0.80 TOTAL $10.80")
+    # "SUBTOTAL" also contains "TOTAL": both patterns report it, as the old per-pattern loop did
+    assert [(m.label, m.value) for m in matches] == [('subtotal', '10.00'), ('total', '10.00'), ('total', '10.80')]
+    assert matches[0].text == 'SUBTOTAL $10.00'  # original casing, not the lowercased copy
+
+
+def test_literal_prefilter_and_case_fallback():
+    assert required_literal(r'(\d+\.?\d*)\s*usd') == 'usd'
+    assert required_literal(r'\$?\s*(\d+)') == ''
+    assert required_literal(r'(?:total|balance)\s+(\d+)') == ''
+
+    compiled = pattern_set([r'charged\s*\$?(\d+\.\d{2})'])
+    assert compiled.first("Refund issued") is None
+    # 'İ' lowercases to two characters; matching falls back to IGNORECASE on the original text
+    match = compiled.first("İSTANBUL CAFE CHARGED $8.40")
+    assert match.value == '8.40' and match.text == 'CHARGED $8.40'
+
+
+def test_first_value_moves_past_rejected_matches():
+    compiled = pattern_set(EMAIL_AMOUNT_PATTERNS)
+    assert compiled.first_value("Total: 0 then $25,000.00 then 42.50 dollars", amount_in_range(0, 10000)) == 42.50
+    assert compiled.first_value("Total: ,", amount_in_range(0)) is None
+
+
+def test_extractors_share_the_engine():
+    from helper_functions import _extract_amount_from_email
+    from improved_amount_extractor import ImprovedAmountExtractor
+    from receipt_ocr_processor import ReceiptOCRProcessor
+    from receipt_processor import EnhancedReceiptProcessor
+
+    day = (datetime.now() - timedelta(days=3)).strftime('%m/%d/%Y')
+    text = f"KROGER\n{day}\n2 x Milk $3.49\nSUBTOTAL $6.98\nTAX $0.62\nTOTAL $7.60\nVISA\nReceipt # a1234"
+    parsed = EnhancedReceiptProcessor()._enhanced_parse_receipt(text)
+    assert parsed['total_amount'] == 7.60 and parsed['tax_amount'] == 0.62 and parsed['subtotal'] == 6.98
+    assert parsed['total_confidence'] == 0.95
+    assert parsed['date'] == datetime.strptime(day, '%m/%d/%Y').strftime('%Y-%m-%d')
+    assert parsed['receipt_number'] == 'A1234'
+
+    assert ImprovedAmountExtractor()._extract_from_text("Free trial $0.00, then 9.99 USD") == 9.99
+    assert _extract_amount_from_email("Amount: $1,204.50", "Your invoice") == 1204.50
+    assert ReceiptOCRProcessor().parse_date("Visit JAN 15, 2025 then 06/14/2025") == datetime(2025, 6, 14)
+
+
+def test_benchmark_smoke():
+    from benchmark_field_extraction import run_benchmark
+
+    report = run_benchmark(docs=6, repeat=1)
+    assert {row['table'] for row in report['tables']} >= {'receipt_dates (scan)', 'email_amounts (first)'}
+    assert all(row['us_per_doc'] > 0 for row in report['extractors'])
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Receipt Field Engine")
+    print("=" * 60)
+    test_first_matches_priority_loop()
+    test_scan_keeps_overlaps_and_labels()
+    test_literal_prefilter_and_case_fallback()
+    test_first_value_moves_past_rejected_matches()
+    test_extractors_share_the_engine()
+    print("✅ All field engine tests passed")
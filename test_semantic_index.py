@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Test script for the semantic search index
+Synthetic card-statement rows stand in for bank_transactions and receipts
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import model_registry
+from model_registry import get_model_registry
+from semantic_index import SemanticIndex
+
+MERCHANTS = ['STARBUCKS', 'BLUE BOTTLE COFFEE', 'ADOBE CREATIVE CLOUD', 'SHELL OIL', 'DELTA AIR LINES',
+             'HOME DEPOT', 'BEST BUY', 'WHOLE FOODS MARKET', 'UBER TRIP', 'GUITAR CENTER', 'B&H PHOTO VIDEO',
+             'SWEETWATER SOUND', 'MARRIOTT HOTELS', 'ZOOM VIDEO', 'SLACK TECHNOLOGIES', 'COSTCO WHOLESALE']
+
+
+def _records(count, seed=3):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        merchant = rng.choice(MERCHANTS)
+        collection = 'receipts' if i % 4 == 0 else 'bank_transactions'
+        text = f"SQ *{merchant} #{rng.randint(1000, 9999)} {rng.choice(['NASHVILLE TN', 'AUSTIN TX', 'ONLINE'])}"
+        records.append((collection, f"{i:024x}", text))
+    return records
+
+
+def test_search_finds_merchants_in_milliseconds():
+    records = _records(20000)
+    text = {doc_id: t for _, doc_id, t in records}
+    index = SemanticIndex.build(records + [('receipts', 'empty', '   ')])
+    assert len(index) == 20000 and index.metadata['clusters'] > 100
+
+    timings = []
+    for query, expected in [('starbux', 'STARBUCKS'), ('adobe cloud', 'ADOBE'), ('guitar center', 'GUITAR'),
+                            ('delta airlines', 'DELTA'), ('b&h photo', 'B&H')]:
+        started = time.perf_counter()
+        hits = index.search(query, k=20)
+        timings.append(time.perf_counter() - started)
+        assert len(hits) == 20 and all(expected in text[hit.id] for hit in hits)
+        assert hits == sorted(hits, key=lambda hit: -hit.score)
+    assert statistics.median(timings) < 0.005
+
+    receipts = index.search('whole foods', k=50, collections=['receipts'])
+    assert receipts and {hit.collection for hit in receipts} == {'receipts'}
+    assert index.search('') == [] and index.search('?!') == []
+
+
+def test_saved_index_is_memory_mapped_and_replaced_atomically():
+    directory = tempfile.mkdtemp()
+    index = SemanticIndex.build(_records(3000))
+    first = index.save(directory)
+    loaded = SemanticIndex.load(directory)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.search('home depot') == index.search('home depot')
+
+    # A new build switches CURRENT; the one before it stays for workers still mapping it
+    time.sleep(1)
+    second = SemanticIndex.build(_records(500, seed=4)).save(directory)
+    assert len(SemanticIndex.load(directory)) == 500
+    time.sleep(1)
+    SemanticIndex.build(_records(600, seed=5)).save(directory)
+    builds = sorted(name for name in os.listdir(directory) if name != 'CURRENT')
+    assert os.path.basename(first) not in builds and os.path.basename(second) in builds and len(builds) == 2
+
+
+def test_rows_inserted_during_a_build_are_fresh_and_vectors_are_reused():
+    from datetime import datetime
+    from bson import ObjectId
+    import semantic_index
+    from semantic_index import build_semantic_index, search_fresh
+
+    class Cursor(list):
+        def sort(self, *args):
+            return self
+
+        def limit(self, count):
+            return Cursor(self[:count])
+
+    class Collection:
+        def __init__(self, docs, synced_during_build=None):
+            self.docs = docs
+            self.synced_during_build = synced_during_build
+            self.calls = 0
+
+        def find(self, query, projection=None):
+            self.calls += 1
+            if not query:
+                # A sync lands while the build is reading this collection
+                self.read_at = datetime.utcnow()
+                snapshot = list(self.docs)
+                if self.synced_during_build:
+                    self.docs.append({'_id': ObjectId(), 'merchant_name': self.synced_during_build})
+                return Cursor(snapshot)
+            return Cursor(d for d in self.docs if d['_id'] > query['_id']['$gt'])
+
+    db = {'bank_transactions': Collection([{'_id': ObjectId(), 'merchant_name': 'GUITAR CENTER'}],
+                                          synced_during_build='SWEETWATER SOUND'),
+          'transactions': Collection([]), 'receipts': Collection([])}
+    index = build_semantic_index(db, tempfile.mkdtemp())
+    assert datetime.fromisoformat(index.metadata['built_at']) <= db['bank_transactions'].read_at
+
+    hits = search_fresh(db, index, 'sweetwater')
+    assert [hit.id for hit in hits] == [str(db['bank_transactions'].docs[1]['_id'])]
+
+    # Later chat turns reuse the fresh vectors until FRESH_TTL_SECONDS passes
+    db['bank_transactions'].docs.append({'_id': ObjectId(), 'merchant_name': 'SWEETWATER SOUND'})
+    assert len(search_fresh(db, index, 'sweetwater sound')) == 1
+    assert db['bank_transactions'].calls == 2
+    original_ttl = semantic_index.FRESH_TTL_SECONDS
+    semantic_index.FRESH_TTL_SECONDS = 0
+    try:
+        assert len(search_fresh(db, index, 'sweetwater sound')) == 2
+    finally:
+        semantic_index.FRESH_TTL_SECONDS = original_ttl
+    get_model_registry().evict('semantic_index')
+
+
+def test_ui_search_stays_exact_and_grounding_sees_new_rows():
+    from datetime import datetime, timedelta
+    from bson import ObjectId
+    from enhanced_chat_api import _related_records
+    from enhanced_transaction_utils import build_transaction_query
+
+    records = [('bank_transactions', str(ObjectId()), t) for t in
+               ['SQ *BLUE BOTTLE COFFEE #4410', 'ADOBE *CREATIVE CLOUD', 'SHELL OIL 5723', 'BLUE BOTTLE COFFEE']]
+    records.append(('receipts', str(ObjectId()), 'Blue Bottle Coffee receipt latte 5.25'))
+    index = SemanticIndex.build(records)
+    # Synced after the build, so only search_fresh can find it
+    synced_later = ObjectId.from_datetime(datetime.utcnow() + timedelta(minutes=5))
+
+    class Cursor(list):
+        def sort(self, *args):
+            return self
+
+        def limit(self, count):
+            return Cursor(self[:count])
+
+    class Collection:
+        def __init__(self, docs):
+            self.docs = docs
+
+        def find(self, query, projection=None):
+            condition = query['_id']
+            if '$in' in condition:
+                return Cursor(d for d in self.docs if d['_id'] in condition['$in'])
+            return Cursor(d for d in self.docs if d['_id'] > condition['$gt'])
+
+    class Mongo:
+        connected = True
+        db = {
+            'bank_transactions': Collection([
+                {'_id': ObjectId(records[0][1]), 'merchant_name': 'Blue Bottle', 'amount': -4.85, 'category': 'Meals'},
+                {'_id': synced_later, 'merchant_name': 'BLUE BOTTLE COFFEE', 'description': 'BLUE BOTTLE COFFEE #9921',
+                 'amount': -6.10}]),
+            'transactions': Collection([]),
+            'receipts': Collection([{'_id': ObjectId(records[4][1]), 'merchant': 'Blue Bottle Coffee',
+                                     'total_amount': 5.25}])
+        }
+
+    registry = get_model_registry()
+    registry.register('semantic_index', lambda directory=None: index)
+    registry.evict('semantic_index')
+    try:
+        # UI search keeps the exact, complete filter even with an index built
+        query = build_transaction_query(search='blue bottle', filter_type='expenses')
+        assert '$or' in query and '_id' not in query and query['amount'] == {'$lt': 0}
+
+        related = _related_records(Mongo(), 'How much did I spend at Blue Bottle?')
+        assert sorted(r['source'] for r in related) == ['bank_transactions', 'bank_transactions', 'receipts']
+        assert {r['amount'] for r in related} == {-4.85, -6.10, 5.25}
+        assert len({r['id'] for r in related}) == len(related)
+    finally:
+        registry.register('semantic_index', model_registry._semantic_index)
+        registry.evict('semantic_index')
+
+
+def test_transaction_list_ranks_with_search_mode_semantic():
+    from types import SimpleNamespace
+    from bson import ObjectId
+    from app.services.transaction_service import TransactionService
+
+    rows = [{'_id': ObjectId(), 'merchant': merchant, 'category': category}
+            for merchant, category in [('SQ *BLUE BOTTLE COFFEE #4410', 'Meals'), ('ADOBE *CREATIVE CLOUD', 'Software'),
+                                       ('BLUE BOTTLE COFFEE', 'Personal'), ('SHELL OIL 5723', 'Fuel')]]
+    index = SemanticIndex.build([('transactions', str(row['_id']), row['merchant']) for row in rows])
+
+    class Cursor(list):
+        def sort(self, *args):
+            return self
+
+        def skip(self, count):
+            return Cursor(self[count:])
+
+        def limit(self, count):
+            return Cursor(self[:count])
+
+    class Transactions:
+        def _matches(self, doc, query):
+            if '$and' in query:
+                return all(self._matches(doc, part) for part in query['$and'])
+            if '$or' in query:
+                return any(self._matches(doc, part) for part in query['$or'])
+            for field, condition in query.items():
+                if isinstance(condition, dict) and '$in' in condition:
+                    if doc.get(field) not in condition['$in']:
+                        return False
+                elif isinstance(condition, dict) and '$gt' in condition:
+                    if not doc.get(field) > condition['$gt']:
+                        return False
+                elif isinstance(condition, dict) and '$regex' in condition:
+                    if condition['$regex'].lower() not in (doc.get(field) or '').lower():
+                        return False
+                elif doc.get(field) != condition:
+                    return False
+            return True
+
+        def find(self, query, projection=None):
+            return Cursor(doc for doc in rows if self._matches(doc, query))
+
+        def count_documents(self, query):
+            return len(self.find(query))
+
+    class Database(dict):
+        """The service reads db.transactions, search_fresh reads db['transactions']"""
+        def __getattr__(self, name):
+            if name not in self:
+                raise AttributeError(name)
+            return self[name]
+
+    db = Database(transactions=Transactions())
+    service = TransactionService(SimpleNamespace(client=SimpleNamespace(db=db)))
+
+    registry = get_model_registry()
+    registry.register('semantic_index', lambda directory=None: index)
+    registry.evict('semantic_index')
+    try:
+        # The exact search misses the card-statement spelling; the ranked one finds it first
+        exact = service.get_transactions(search='blue bottle coffee #4410')
+        assert [tx['merchant'] for tx in exact['transactions']] == ['SQ *BLUE BOTTLE COFFEE #4410']
+        assert service.get_transactions(search='bluebottle coffee')['transactions'] == []
+
+        ranked = service.get_transactions(search='bluebottle coffee', search_mode='semantic')
+        assert ranked['search_mode'] == 'semantic'
+        assert {tx['merchant'] for tx in ranked['transactions']} == {'SQ *BLUE BOTTLE COFFEE #4410',
+                                                                    'BLUE BOTTLE COFFEE'}
+        scores = [tx['search_score'] for tx in ranked['transactions']]
+        assert scores == sorted(scores, reverse=True)
+
+        # Other filters stay exact
+        meals = service.get_transactions(search='bluebottle coffee', category='Meals', search_mode='semantic')
+        assert [tx['merchant'] for tx in meals['transactions']] == ['SQ *BLUE BOTTLE COFFEE #4410']
+        assert meals['pagination']['total'] == 1
+    finally:
+        registry.register('semantic_index', model_registry._semantic_index)
+        registry.evict('semantic_index')
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Semantic Index")
+    print("=" * 60)
+    test_search_finds_merchants_in_milliseconds()
+    test_saved_index_is_memory_mapped_and_replaced_atomically()
+    test_rows_inserted_during_a_build_are_fresh_and_vectors_are_reused()
+    test_ui_search_stays_exact_and_grounding_sees_new_rows()
+    test_transaction_list_ranks_with_search_mode_semantic()
+    print("✅ All semantic index tests passed")
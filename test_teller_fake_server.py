@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for the local Teller API stand-in
+No real certificates or network access needed
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from teller_fake_server import FakeTellerConfig, FakeTellerServer, generate_fixtures
+
+
+def test_transactions_paginate_with_from_id():
+    """count/from_id pages walk every fixture row exactly once, newest first"""
+    fixtures = generate_fixtures(accounts=2, transactions_per_account=250, seed=7)
+    with FakeTellerServer(fixtures) as server:
+        accounts = requests.get(f"{server.url}/accounts", timeout=5).json()
+        assert [a['id'] for a in accounts] == ['acc_fake0000', 'acc_fake0001']
+
+        seen, from_id = [], None
+        while True:
+            params = {'count': 100}
+            if from_id:
+                params['from_id'] = from_id
+            page = requests.get(f"{server.url}/accounts/acc_fake0000/transactions",
+                                params=params, timeout=5).json()
+            if not page:
+                break
+            seen.extend(page)
+            from_id = page[-1]['id']
+
+        assert len(seen) == 250
+        assert len({tx['id'] for tx in seen}) == 250
+        assert [tx['date'] for tx in seen] == sorted((tx['date'] for tx in seen), reverse=True)
+        assert server.stats['transaction_pages'] == 4
+
+
+def test_date_filters_and_auth():
+    fixtures = generate_fixtures(accounts=1, transactions_per_account=200, seed=3)
+    config = FakeTellerConfig(access_tokens=['token_ok'])
+    with FakeTellerServer(fixtures, config) as server:
+        url = f"{server.url}/accounts/acc_fake0000/transactions"
+        assert requests.get(url, timeout=5).status_code == 401
+
+        rows = requests.get(url, params={'from': '2000-01-01', 'to': '2100-01-01'},
+                            headers={'Authorization': 'Bearer token_ok'}, timeout=5).json()
+        newest = rows[0]['date']
+        same_day = requests.get(url, params={'from_date': newest, 'to_date': newest},
+                                auth=('token_ok', ''), timeout=5).json()
+        assert same_day and all(tx['date'] == newest for tx in same_day)
+
+
+def test_rate_limit_returns_429():
+    config = FakeTellerConfig(rate_limit_per_second=1, rate_limit_burst=3)
+    with FakeTellerServer(generate_fixtures(accounts=1, transactions_per_account=5), config) as server:
+        codes = [requests.get(f"{server.url}/accounts", timeout=5).status_code for _ in range(5)]
+        assert codes[:3] == [200, 200, 200]
+        assert 429 in codes[3:]
+        assert server.stats['rate_limited'] >= 1
+
+
+class _WebhookSink(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.received.append((self.headers.get('Teller-Signature'), body))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_webhooks_are_signed_like_the_receiver_expects():
+    sink = ThreadingHTTPServer(('127.0.0.1', 0), _WebhookSink)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    config = FakeTellerConfig(webhook_url=f"http://127.0.0.1:{sink.server_address[1]}/api/banking/webhook",
+                              signing_secret='whsec_test')
+    try:
+        with FakeTellerServer(generate_fixtures(accounts=1, transactions_per_account=10), config) as server:
+            added = server.post_and_notify('acc_fake0000', count=2)
+            listed = requests.get(f"{server.url}/accounts/acc_fake0000/transactions",
+                                  params={'count': 2}, timeout=5).json()
+            assert [tx['id'] for tx in listed] == [tx['id'] for tx in added]
+    finally:
+        sink.shutdown()
+
+    assert len(_WebhookSink.received) == 2
+    signature, body = _WebhookSink.received[0]
+    assert signature == hmac.new(b'whsec_test', body, hashlib.sha256).hexdigest()
+    assert json.loads(body)['type'] == 'transaction.posted'
+
+
+def test_mtls_requires_client_certificate():
+    config = FakeTellerConfig(mtls=True)
+    with FakeTellerServer(generate_fixtures(accounts=1, transactions_per_account=5), config) as server:
+        bundle = server.certificates
+        try:
+            requests.get(f"{server.url}/accounts", verify=bundle.ca_cert, timeout=5)
+        except requests.exceptions.RequestException:
+            pass
+        else:
+            raise AssertionError("request without a client certificate was accepted")
+
+        response = requests.get(f"{server.url}/accounts", verify=bundle.ca_cert,
+                                cert=(bundle.client_cert, bundle.client_key), timeout=5)
+        assert response.status_code == 200
+
+
+def test_bank_sync_benchmark_counts_mongo_ops():
+    """Cold and warm syncs through BankService report per-transaction DB work"""
+    from benchmark_teller_sync import run_benchmark
+
+    report = run_benchmark(accounts=2, transactions=50, scenarios=['sync'])
+    cold, warm = report['results']
+    assert cold['transactions'] == 100 and cold['new_transactions'] == 100
+    assert warm['new_transactions'] == 0
+    assert cold['mongo_ops_per_transaction'] >= 2
+    assert warm['mongo_ops_breakdown'].get('update_one') == 100
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Fake Teller Server")
+    print("=" * 60)
+    test_transactions_paginate_with_from_id()
+    test_date_filters_and_auth()
+    test_rate_limit_returns_429()
+    test_webhooks_are_signed_like_the_receiver_expects()
+    test_mtls_requires_client_certificate()
+    test_bank_sync_benchmark_counts_mongo_ops()
+    print("✅ All fake Teller tests passed")
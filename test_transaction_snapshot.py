@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Test script for the columnar transaction snapshot
+Runs against an in-memory stand-in for bank_transactions
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import transaction_snapshot
+from transaction_snapshot import TransactionSnapshot
+
+
+class FakeTransactions:
+    """Supports the two query shapes the snapshot issues"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        clauses = query.get('$or')
+        if not clauses:
+            return list(self.docs)
+        results = []
+        for doc in self.docs:
+            for clause in clauses:
+                (field, cond), = clause.items()
+                stamp = doc.get(field)
+                if not isinstance(stamp, datetime):
+                    continue
+                if '$type' in cond or stamp > cond['$gt']:
+                    results.append(doc)
+                    break
+        return results
+
+
+class FakeDB:
+    name = 'expense_test'
+
+    def __init__(self, docs):
+        self.bank_transactions = FakeTransactions(docs)
+
+
+def _doc(i, amount, category, business_type, days_ago, matched=False, description=None):
+    now = datetime(2025, 6, 30)
+    return {
+        '_id': f'tx{i}',
+        'date': now - timedelta(days=days_ago),
+        'amount': amount,
+        'description': description or f'MERCHANT {i % 3}',
+        'category': category,
+        'business_type': business_type,
+        'receipt_matched': matched,
+        'synced_at': now - timedelta(days=days_ago),
+        'raw_data': {'huge': 'x' * 1000}
+    }
+
+
+DOCS = [
+    _doc(1, -100.0, 'Travel', 'Down Home', 1, matched=True),
+    _doc(2, -50.0, 'Travel', 'Personal', 2),
+    _doc(3, -25.0, 'Food & Drink', 'Down Home', 3),
+    _doc(4, 200.0, 'Income', 'Personal', 4),
+    _doc(5, -10.0, 'Food & Drink', 'Music City Rodeo', 40),
+]
+
+
+def test_aggregates_match_row_scan():
+    """Vectorized group totals agree with a plain Python pass over the documents"""
+    snapshot = TransactionSnapshot(FakeDB(DOCS))
+    snapshot.rebuild()
+    assert len(snapshot) == 5
+
+    view = snapshot.select(datetime(2025, 6, 1), datetime(2025, 6, 30), expenses_only=True)
+    assert len(view) == 3
+    assert view.total_abs() == 175.0
+    assert view.matched_count() == 1
+
+    categories = view.group_totals('category')
+    assert categories['Travel'] == {'total': 150.0, 'count': 2}
+    assert categories['Food & Drink'] == {'total': 25.0, 'count': 1}
+
+    business = snapshot.select(business_type='Down Home')
+    assert len(business) == 2
+    assert snapshot.select(business_type='Nonexistent').rows.size == 0
+
+
+def test_incremental_refresh_appends_and_updates():
+    """Rows past the watermark are appended; changed rows are overwritten in place"""
+    docs = list(DOCS)
+    db = FakeDB(docs)
+    snapshot = TransactionSnapshot(db)
+    snapshot.rebuild()
+
+    docs.append(_doc(6, -75.0, 'Travel', 'Personal', 0))
+    docs[1] = {**docs[1], 'receipt_matched': True, 'matched_at': datetime(2025, 7, 1)}
+
+    snapshot.last_refresh = 0.0
+    snapshot.refresh()
+    assert '$or' in db.bank_transactions.queries[-1]
+    assert len(snapshot) == 6
+    assert snapshot.select().matched_count() == 2
+
+
+def test_edits_and_matches_reach_the_snapshot():
+    """Category edits stamped with updated_at refresh in place; matches show up immediately"""
+    docs = list(DOCS)
+    db = FakeDB(docs)
+    db.name = 'expense_edit_test'
+    snapshot = transaction_snapshot.get_transaction_snapshot(db)
+
+    docs[2] = {**docs[2], 'business_type': 'Personal', 'updated_at': datetime(2025, 7, 1)}
+    snapshot.last_refresh = 0.0
+    snapshot.refresh()
+    assert len(snapshot.select(business_type='Down Home')) == 1
+
+    transaction_snapshot.mark_transaction_matched('tx3')
+    assert snapshot.select().matched_count() == 2
+
+
+def test_each_stamp_field_keeps_its_own_watermark():
+    """An updated_at behind the newest synced_at (another writer's clock) still refreshes"""
+    docs = list(DOCS)
+    db = FakeDB(docs)
+    snapshot = TransactionSnapshot(db)
+    snapshot.rebuild()
+
+    docs.append({**_doc(6, -75.0, 'Travel', 'Personal', 0), 'synced_at': datetime(2025, 7, 1, 17)})
+    snapshot.last_refresh = 0.0
+    snapshot.refresh()
+    assert len(snapshot) == 6
+
+    docs[2] = {**docs[2], 'category': 'Meals', 'updated_at': datetime(2025, 7, 1, 12)}
+    snapshot.last_refresh = 0.0
+    snapshot.refresh()
+    assert snapshot.select().group_totals('category')['Meals'] == {'total': 25.0, 'count': 1}
+
+    docs[3] = {**docs[3], 'category': 'Refund', 'updated_at': datetime(2025, 7, 1, 13)}
+    snapshot.last_refresh = 0.0
+    snapshot.refresh()
+    assert 'Refund' in snapshot.select().group_totals('category')
+    assert snapshot.watermarks['synced_at'] > snapshot.watermarks['updated_at']
+
+
+def test_description_regex_and_records():
+    """Description filters run per distinct value and records omit raw payloads"""
+    snapshot = TransactionSnapshot(FakeDB(DOCS))
+    snapshot.rebuild()
+
+    view = snapshot.select()
+    assert view.description_matches('merchant 1').sum() == 2
+
+    records = snapshot.select().sort_by_date().records(limit=2)
+    assert records[0]['_id'] == 'tx1'
+    assert 'raw_data' not in records[0]
+    assert isinstance(records[0]['date'], datetime)
+
+
+def test_view_survives_a_rebuild_in_another_thread():
+    """A view keeps reading the columns it was selected from"""
+    db = FakeDB(list(DOCS))
+    snapshot = TransactionSnapshot(db)
+    snapshot.rebuild()
+    view = snapshot.select(expenses_only=True).sort_by_date()
+
+    db.bank_transactions.docs[:] = [_doc(9, -5.0, 'Fees', 'Personal', 1, description='BANK FEE')]
+    snapshot.rebuild()
+
+    assert len(view) == 4 and view.total_abs() == 185.0
+    assert [r['_id'] for r in view.records()] == ['tx1', 'tx2', 'tx3', 'tx5']
+    assert view.group_totals('category')['Travel'] == {'total': 150.0, 'count': 2}
+    assert view.where(view.description_matches('merchant 0')).records()[0]['description'] == 'MERCHANT 0'
+    assert snapshot.select().records()[0]['description'] == 'BANK FEE'
+
+
+def test_monthly_totals():
+    snapshot = TransactionSnapshot(FakeDB(DOCS))
+    snapshot.rebuild()
+    months = snapshot.select(expenses_only=True).monthly_totals()
+    assert months['2025-06'] == {'count': 3, 'amount': 175.0}
+    assert months['2025-05'] == {'count': 1, 'amount': 10.0}
+
+
+def test_registry_reuses_snapshot():
+    db = FakeDB(DOCS)
+    first = transaction_snapshot.get_transaction_snapshot(db)
+    second = transaction_snapshot.get_transaction_snapshot(db)
+    assert first is second
+    assert len(db.bank_transactions.queries) == 1
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Transaction Snapshot")
+    print("=" * 60)
+    test_aggregates_match_row_scan()
+    test_incremental_refresh_appends_and_updates()
+    test_edits_and_matches_reach_the_snapshot()
+    test_each_stamp_field_keeps_its_own_watermark()
+    test_description_regex_and_records()
+    test_view_survives_a_rebuild_in_another_thread()
+    test_monthly_totals()
+    test_registry_reuses_snapshot()
+    print("✅ All snapshot tests passed")
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Columnar Transaction Snapshot Cache
+Keeps one NumPy array per analytics field of bank_transactions so reporting
+and matching reads don't have to pull full documents (raw_data included)
+
+Rows whose synced_at, imported_at, matched_at or updated_at moves forward are
+picked up by the next refresh (REFRESH_INTERVAL_SECONDS). Writes that stamp
+none of those, and deletes, only show up at the next full rebuild, so
+reports can be up to REBUILD_INTERVAL_SECONDS old unless the writer calls
+invalidate_transaction_snapshots() or mark_transaction_matched().
+"""
+
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Only these fields are ever read from MongoDB for the snapshot
+SNAPSHOT_PROJECTION = {
+    '_id': 1,
+    'date': 1,
+    'amount': 1,
+    'merchant_name': 1,
+    'counterparty.name': 1,
+    'description': 1,
+    'category': 1,
+    'business_type': 1,
+    'receipt_matched': 1,
+    'tax_deductible': 1,
+    'synced_at': 1,
+    'imported_at': 1,
+    'matched_at': 1,
+    'updated_at': 1
+}
+
+# Any of these moving forward means the row was added or changed; each keeps
+# its own watermark so writers on different clocks can't hide each other
+WATERMARK_FIELDS = ('synced_at', 'imported_at', 'matched_at', 'updated_at')
+
+REFRESH_INTERVAL_SECONDS = 30
+REBUILD_INTERVAL_SECONDS = 15 * 60
+
+_NAT = np.datetime64('NaT', 's')
+
+
+class _Dictionary:
+    """String interning for a categorical column"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+def _to_datetime64(value) -> np.datetime64:
+    if isinstance(value, datetime):
+        return np.datetime64(value.replace(tzinfo=None), 's')
+    if isinstance(value, str) and value:
+        try:
+            return np.datetime64(datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None), 's')
+        except ValueError:
+            return _NAT
+    return _NAT
+
+
+def _merchant_label(doc: Dict) -> str:
+    counterparty = doc.get('counterparty') if isinstance(doc.get('counterparty'), dict) else {}
+    return (doc.get('merchant_name') or counterparty.get('name')
+            or (doc.get('description') or '')[:30] or 'Unknown')
+
+
+class TransactionSnapshot:
+    """Columnar copy of one user's bank transactions"""
+
+    def __init__(self, db, user_id: Optional[str] = None):
+        self.db = db
+        self.user_id = user_id
+        self.lock = threading.RLock()
+
+        self.merchants = _Dictionary()
+        self.descriptions = _Dictionary()
+        self.categories = _Dictionary()
+        self.business_types = _Dictionary()
+        self._reset_columns()
+
+        self.watermarks: Dict[str, datetime] = {}
+        self.last_refresh = 0.0
+        self.last_rebuild = 0.0
+
+    def _reset_columns(self):
+        self.ids = np.empty(0, dtype=object)
+        self.date = np.empty(0, dtype='datetime64[s]')
+        self.amount = np.empty(0, dtype=np.float64)
+        self.merchant_id = np.empty(0, dtype=np.int32)
+        self.description_id = np.empty(0, dtype=np.int32)
+        self.category_id = np.empty(0, dtype=np.int32)
+        self.business_type_id = np.empty(0, dtype=np.int32)
+        self.matched = np.empty(0, dtype=bool)
+        self.tax_deductible = np.empty(0, dtype=bool)
+        self._row_index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.nbytes for col in (self.date, self.amount, self.merchant_id, self.description_id,
+                                          self.category_id, self.business_type_id, self.matched,
+                                          self.tax_deductible))
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _base_query(self) -> Dict:
+        return {'user_id': self.user_id} if self.user_id else {}
+
+    def rebuild(self):
+        """Reload every row from MongoDB"""
+        with self.lock:
+            start = time.time()
+            self.merchants, self.descriptions = _Dictionary(), _Dictionary()
+            self.categories, self.business_types = _Dictionary(), _Dictionary()
+            self._reset_columns()
+            self.watermarks = {}
+            cursor = self.db.bank_transactions.find(self._base_query(), SNAPSHOT_PROJECTION)
+            self._apply(cursor)
+            self.last_rebuild = self.last_refresh = time.time()
+            logger.info(f"📊 Transaction snapshot rebuilt for {self.user_id or 'all users'}: "
+                        f"{len(self)} rows, {self.nbytes / 1024:.0f} KB in {time.time() - start:.2f}s")
+
+    def refresh(self, force: bool = False):
+        """Pull rows added or changed since the last watermarks"""
+        with self.lock:
+            now = time.time()
+            if force or not self.last_rebuild or now - self.last_rebuild > REBUILD_INTERVAL_SECONDS:
+                self.rebuild()
+                return
+            if now - self.last_refresh < REFRESH_INTERVAL_SECONDS:
+                return
+
+            query = self._base_query()
+            query['$or'] = [
+                {field: {'$gt': self.watermarks[field]} if field in self.watermarks else {'$type': 'date'}}
+                for field in WATERMARK_FIELDS
+            ]
+            self._apply(self.db.bank_transactions.find(query, SNAPSHOT_PROJECTION))
+            self.last_refresh = now
+
+    def _apply(self, docs: Iterable[Dict]):
+        """Append new rows and overwrite changed ones in place"""
+        new_rows: List[Tuple] = []
+        watermarks = self.watermarks
+
+        for doc in docs:
+            row = (
+                str(doc['_id']),
+                _to_datetime64(doc.get('date')),
+                float(doc.get('amount') or 0.0),
+                self.merchants.encode(_merchant_label(doc)),
+                self.descriptions.encode(doc.get('description') or ''),
+                self.categories.encode(doc.get('category') or 'Uncategorized'),
+                self.business_types.encode(doc.get('business_type') or 'Unknown'),
+                bool(doc.get('receipt_matched')),
+                bool(doc.get('tax_deductible', True))
+            )
+            for field in WATERMARK_FIELDS:
+                stamp = doc.get(field)
+                if isinstance(stamp, datetime) and (field not in watermarks or stamp > watermarks[field]):
+                    watermarks[field] = stamp
+
+            index = self._row_index.get(row[0])
+            if index is None:
+                new_rows.append(row)
+            else:
+                self._set_row(index, row)
+
+        if new_rows:
+            offset = len(self)
+            columns = list(zip(*new_rows))
+            self.ids = np.concatenate([self.ids, np.array(columns[0], dtype=object)])
+            self.date = np.concatenate([self.date, np.array(columns[1], dtype='datetime64[s]')])
+            self.amount = np.concatenate([self.amount, np.array(columns[2], dtype=np.float64)])
+            self.merchant_id = np.concatenate([self.merchant_id, np.array(columns[3], dtype=np.int32)])
+            self.description_id = np.concatenate([self.description_id, np.array(columns[4], dtype=np.int32)])
+            self.category_id = np.concatenate([self.category_id, np.array(columns[5], dtype=np.int32)])
+            self.business_type_id = np.concatenate([self.business_type_id, np.array(columns[6], dtype=np.int32)])
+            self.matched = np.concatenate([self.matched, np.array(columns[7], dtype=bool)])
+            self.tax_deductible = np.concatenate([self.tax_deductible, np.array(columns[8], dtype=bool)])
+            for i, row_id in enumerate(columns[0]):
+                self._row_index[row_id] = offset + i
+
+    def _set_row(self, index: int, row: Tuple):
+        (_, self.date[index], self.amount[index], self.merchant_id[index], self.description_id[index],
+         self.category_id[index], self.business_type_id[index], self.matched[index],
+         self.tax_deductible[index]) = row
+
+    def mark_matched(self, transaction_id: str, matched: bool = True):
+        """Reflect a receipt match written elsewhere without waiting for a refresh"""
+        with self.lock:
+            index = self._row_index.get(str(transaction_id))
+            if index is not None:
+                self.matched[index] = matched
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def select(self, start_date: datetime = None, end_date: datetime = None,
+               business_type: str = None, expenses_only: bool = False) -> 'SnapshotView':
+        """Boolean-mask filter over the columns"""
+        with self.lock:
+            mask = np.ones(len(self), dtype=bool)
+            if start_date is not None:
+                mask &= self.date >= np.datetime64(start_date, 's')
+            if end_date is not None:
+                mask &= self.date <= np.datetime64(end_date, 's')
+            if business_type and business_type != 'all':
+                code = self.business_types.codes.get(business_type)
+                if code is None:
+                    mask[:] = False
+                else:
+                    mask &= self.business_type_id == code
+            if expenses_only:
+                mask &= self.amount < 0
+            return SnapshotView(self._columns(), np.flatnonzero(mask))
+
+    def _columns(self) -> Dict:
+        """The current column arrays and dictionaries; call with the lock held.
+
+        Rebuilds and appends swap in new arrays and dictionaries instead of
+        resizing these, so a view holding them stays consistent.
+        """
+        return {
+            'ids': self.ids, 'date': self.date, 'amount': self.amount,
+            'merchant_id': self.merchant_id, 'description_id': self.description_id,
+            'category_id': self.category_id, 'business_type_id': self.business_type_id,
+            'matched': self.matched, 'tax_deductible': self.tax_deductible,
+            'merchants': self.merchants, 'descriptions': self.descriptions,
+            'categories': self.categories, 'business_types': self.business_types
+        }
+
+
+class SnapshotView:
+    """A filtered set of snapshot rows with vectorized aggregates
+
+    Reads only the columns captured by TransactionSnapshot.select(), so a
+    refresh or rebuild running in another thread can't shift rows under it.
+    Masks passed to where() are aligned with the view's rows.
+    """
+
+    def __init__(self, columns: Dict, rows: np.ndarray):
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def where(self, mask: np.ndarray) -> 'SnapshotView':
+        return SnapshotView(self.columns, self.rows[mask])
+
+    @property
+    def amounts(self) -> np.ndarray:
+        return self.columns['amount'][self.rows]
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.columns['date'][self.rows]
+
+    @property
+    def matched(self) -> np.ndarray:
+        return self.columns['matched'][self.rows]
+
+    @property
+    def tax_deductible(self) -> np.ndarray:
+        return self.columns['tax_deductible'][self.rows]
+
+    def expenses(self) -> 'SnapshotView':
+        return self.where(self.amounts < 0)
+
+    def description_matches(self, pattern: str) -> np.ndarray:
+        """Mask of rows whose description matches a case-insensitive regex.
+
+        The regex runs once per distinct description rather than once per row.
+        """
+        try:
+            regex = re.compile(pattern, re.IGNORECASE)
+        except re.error:
+            regex = re.compile(re.escape(pattern), re.IGNORECASE)
+        values = self.columns['descriptions'].values
+        codes = [code for code, text in enumerate(values) if regex.search(text)]
+        return np.isin(self.columns['description_id'][self.rows], codes)
+
+    def total_abs(self, mask: np.ndarray = None) -> float:
+        amounts = np.abs(self.amounts)
+        return float(amounts[mask].sum() if mask is not None else amounts.sum())
+
+    def matched_count(self, since: datetime = None) -> int:
+        matched = self.matched
+        if since is not None:
+            matched = matched & (self.dates >= np.datetime64(since, 's'))
+        return int(matched.sum())
+
+    def group_totals(self, column: str) -> Dict[str, Dict]:
+        """Sum of |amount| and row count per value of a categorical column"""
+        dictionary = self.columns[{
+            'merchant': 'merchants',
+            'category': 'categories',
+            'business_type': 'business_types'
+        }[column]]
+        codes = self.columns[f'{column}_id'][self.rows]
+        size = len(dictionary.values)
+        totals = np.bincount(codes, weights=np.abs(self.amounts), minlength=size)
+        counts = np.bincount(codes, minlength=size)
+        return {
+            dictionary.values[code]: {'total': float(totals[code]), 'count': int(counts[code])}
+            for code in np.flatnonzero(counts)
+        }
+
+    def monthly_totals(self) -> Dict[str, Dict]:
+        """Sum of |amount| and row count per YYYY-MM"""
+        dates = self.dates
+        valid = ~np.isnat(dates)
+        months = dates[valid].astype('datetime64[M]')
+        if not len(months):
+            return {}
+        unique, inverse = np.unique(months, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.abs(self.amounts[valid]))
+        counts = np.bincount(inverse)
+        return {
+            str(month): {'count': int(counts[i]), 'amount': float(totals[i])}
+            for i, month in enumerate(unique)
+        }
+
+    def records(self, limit: Optional[int] = None) -> List[Dict]:
+        """Lightweight row dicts (no raw payloads) for API responses"""
+        col = self.columns
+        rows = self.rows if limit is None else self.rows[:limit]
+        return [
+            {
+                '_id': col['ids'][i],
+                'date': col['date'][i].astype(datetime) if not np.isnat(col['date'][i]) else None,
+                'amount': float(col['amount'][i]),
+                'merchant_name': col['merchants'].values[col['merchant_id'][i]],
+                'description': col['descriptions'].values[col['description_id'][i]],
+                'category': col['categories'].values[col['category_id'][i]],
+                'business_type': col['business_types'].values[col['business_type_id'][i]],
+                'receipt_matched': bool(col['matched'][i])
+            }
+            for i in rows
+        ]
+
+    def sort_by_date(self, descending: bool = True) -> 'SnapshotView':
+        order = np.argsort(self.dates, kind='stable')
+        if descending:
+            order = order[::-1]
+        return SnapshotView(self.columns, self.rows[order])
+
+
+_snapshots: Dict[Tuple[str, Optional[str]], TransactionSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_transaction_snapshot(db, user_id: Optional[str] = None) -> TransactionSnapshot:
+    """Process-wide snapshot per (database, user), refreshed on access"""
+    key = (getattr(db, 'name', str(id(db))), user_id)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            snapshot = TransactionSnapshot(db, user_id)
+            _snapshots[key] = snapshot
+    # Keep the newest handle so refreshes use a live connection
+    snapshot.db = db
+    snapshot.refresh()
+    return snapshot
+
+
+def invalidate_transaction_snapshots(user_id: Optional[str] = None):
+    """Force a full reload on next access (e.g. after bulk edits or deletes)"""
+    with _snapshots_lock:
+        for (_, snapshot_user), snapshot in _snapshots.items():
+            if user_id is None or snapshot_user in (user_id, None):
+                snapshot.last_rebuild = 0.0
+
+
+def mark_transaction_matched(transaction_id: str, matched: bool = True):
+    """Reflect a receipt match in every loaded snapshot right away"""
+    with _snapshots_lock:
+        snapshots = list(_snapshots.values())
+    for snapshot in snapshots:
+        snapshot.mark_matched(transaction_id, matched)